@@ -0,0 +1,80 @@
+"""
+Бенчмарк: вартість одного кадру CrossfadeSource у потоці плеєра.
+
+discord.py викликає read() кожні 20 мс; мікшування має займати частку цього
+бюджету. Міряється звичайне відтворення (один трек), fade-out і перекриття
+двох треків з рівнопотужною кривою.
+
+Запуск (з кореня репозиторію):
+    python benchmarks/bench_crossfade.py [--frames 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord_music_bot.audio_source import CrossfadeSource  # noqa: E402
+
+FRAME_BUDGET_US = 20_000
+
+
+class _NoiseSource:
+    """Віддає заздалегідь згенеровані кадри PCM без I/O."""
+
+    def __init__(self, frames: int, seed: int):
+        rng = random.Random(seed)
+        self._frame = bytes(rng.getrandbits(8) for _ in range(CrossfadeSource.FRAME_SIZE))
+        self._left = frames
+        self.duration = frames / CrossfadeSource.FRAMES_PER_SECOND
+        self.volume = 1.0
+
+    def read(self) -> bytes:
+        if self._left <= 0:
+            return b""
+        self._left -= 1
+        return self._frame
+
+    def cleanup(self) -> None:
+        pass
+
+
+def _bench(label: str, frames: int, fade_frames: int, with_next: bool) -> None:
+    fade_seconds = fade_frames / CrossfadeSource.FRAMES_PER_SECOND
+    mixer = CrossfadeSource(_NoiseSource(frames, 1), fade_seconds=fade_seconds)
+    if with_next:
+        mixer.queue_next(_NoiseSource(frames, 2))
+    # Міряємо лише кадри потрібної фази
+    skip = frames - fade_frames if fade_frames else 0
+    for _ in range(skip):
+        mixer.read()
+    measured = fade_frames if fade_frames else frames
+    worst = 0.0
+    start = time.perf_counter()
+    for _ in range(measured):
+        t0 = time.perf_counter()
+        mixer.read()
+        worst = max(worst, time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    avg_us = total / measured * 1e6
+    print(
+        f"{label:<18} {measured:>7} кадрів  avg {avg_us:7.1f} мкс  max {worst * 1e6:8.1f} мкс  "
+        f"({avg_us / FRAME_BUDGET_US:.2%} бюджету 20 мс)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=20000, help="кадрів на сценарій")
+    args = parser.parse_args()
+    frames = max(2, args.frames)
+
+    _bench("один трек", frames, 0, with_next=False)
+    _bench("fade-out", frames, frames - 1, with_next=False)
+    _bench("перекриття", frames, frames - 1, with_next=True)
+
+
+if __name__ == "__main__":
+    main()
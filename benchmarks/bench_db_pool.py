@@ -0,0 +1,86 @@
+"""
+Бенчмарк: відкриття з'єднання на кожен виклик vs пул довгоживучих з'єднань.
+
+Запуск (з кореня репозиторію):
+    python benchmarks/bench_db_pool.py [--ops 2000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord_music_bot import database  # noqa: E402
+from discord_music_bot.repository import MusicRepository  # noqa: E402
+from discord_music_bot.track_catalog import canonical_track_key  # noqa: E402
+
+GUILD_ID = 1
+TRACK = {'title': 'Bench Track', 'url': 'https://youtube.com/watch?v=bench', 'duration': 180}
+
+
+async def _per_call_write() -> None:
+    """Поведінка до пулу: connect + PRAGMA + запис + commit + close."""
+    conn = await database.get_connection()
+    try:
+        await conn.execute(
+            "INSERT INTO history_tracks (guild_id, track_id) "
+            "SELECT ?, id FROM tracks WHERE canonical = ?",
+            (GUILD_ID, canonical_track_key(TRACK['url'])),
+        )
+        await conn.commit()
+    finally:
+        await conn.close()
+
+
+async def _per_call_read() -> None:
+    conn = await database.get_connection()
+    try:
+        cursor = await conn.execute("SELECT * FROM guild_state WHERE guild_id = ?", (GUILD_ID,))
+        await cursor.fetchone()
+    finally:
+        await conn.close()
+
+
+async def _run(label: str, fn, ops: int, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one():
+        async with sem:
+            await fn()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one() for _ in range(ops)))
+    elapsed = time.perf_counter() - start
+    rate = ops / elapsed
+    print(f"{label:<32} {ops:>6} ops  {elapsed:7.3f}s  {rate:10.1f} ops/s")
+    return rate
+
+
+async def main(ops: int, concurrency: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with patch.object(database, 'DB_PATH', db_path), patch.object(database, 'DB_DIR', tmp):
+            await database.init_db()
+            repo = MusicRepository()
+            await repo.save_guild_state(GUILD_ID)
+            await repo.enrich_tracks([TRACK])
+
+            old_w = await _run("per-call connect: write", _per_call_write, ops, concurrency)
+            old_r = await _run("per-call connect: read", _per_call_read, ops, concurrency)
+            new_w = await _run("pool: write", lambda: repo.add_history_track(GUILD_ID, TRACK), ops, concurrency)
+            new_r = await _run("pool: read", lambda: repo.load_guild_state(GUILD_ID), ops, concurrency)
+
+            print(f"\nwrite speedup: x{new_w / old_w:.1f}   read speedup: x{new_r / old_r:.1f}")
+            await database.close_db()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.ops, args.concurrency))
@@ -0,0 +1,122 @@
+"""
+Бенчмарк: CPU процесу бота на один голосовий потік — PCM vs Opus з ffmpeg.
+
+PCM-шлях: кадр з YTDLPPipeSource → PCMVolumeTransformer (audioop.mul) →
+libopus Encoder.encode (як VoiceClient.send_audio_packet з encode=True).
+Opus-шлях: готовий пакет з OpusPipeSource (ffmpeg уже закодував).
+Вхідні дані синтетичні — міряється лише робота в процесі бота, без мережі.
+
+Запуск (з кореня репозиторію):
+    python benchmarks/bench_opus_cpu.py [--streams 50] [--seconds 10]
+"""
+import argparse
+import io
+import logging
+import os
+import random
+import struct
+import sys
+import time
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord import opus  # noqa: E402
+from discord_music_bot.audio_source import OpusPipeSource, YTDLOpusSource, YTDLPPipeSource, YTDLSource  # noqa: E402
+
+FRAMES_PER_SECOND = 50
+
+
+def _process(stdout):
+    proc = Mock()
+    proc.stdout = stdout
+    proc.stderr = None
+    proc.poll.return_value = 0
+    proc.returncode = 0
+    return proc
+
+
+def _pcm_bytes(frames: int) -> bytes:
+    rng = random.Random(1)
+    frame = bytes(rng.getrandbits(8) for _ in range(YTDLPPipeSource.FRAME_SIZE))
+    return frame * frames
+
+
+def _ogg_bytes(frames: int) -> bytes:
+    """Ogg-сторінки по 50 пакетів ~160 байт (128 кбіт/с)."""
+    packet = bytes(random.Random(2).getrandbits(8) for _ in range(160))
+    out = []
+    for pagenum, start in enumerate(range(0, frames, 50)):
+        count = min(50, frames - start)
+        segtable = bytes([160]) * count
+        header = struct.pack("<BBQIIIB", 0, 0, 0, 1, pagenum, 0, count)
+        out.append(b"OggS" + header + segtable + packet * count)
+    return b"".join(out)
+
+
+def _drain(source, encoder) -> int:
+    """Читає джерело до кінця так, як це робить AudioPlayer; повертає кількість кадрів."""
+    frames = 0
+    while True:
+        data = source.read()
+        if not data:
+            return frames
+        if encoder is not None:
+            encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+        frames += 1
+
+
+def _bench(label: str, make_source, encoder, streams: int) -> float:
+    # process_time рахує всі потоки процесу — і читачів pipe, і споживача
+    start = time.process_time()
+    sources = [make_source() for _ in range(streams)]
+    for src in sources:
+        src.original._eof.wait(30)
+    total = sum(_drain(src, encoder) for src in sources)
+    cpu = time.process_time() - start
+    for src in sources:
+        src.cleanup()
+    per_stream = cpu / (total / FRAMES_PER_SECOND) * 1000 if total else 0.0
+    print(f"{label:<22} {total:>8} кадрів  CPU {cpu:6.2f} с  ≈ {per_stream:6.2f} мс CPU на потік за секунду аудіо")
+    return per_stream
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50, help="кількість потоків")
+    parser.add_argument("--seconds", type=float, default=10.0, help="секунд аудіо на потік")
+    args = parser.parse_args()
+    frames = max(1, int(args.seconds * FRAMES_PER_SECOND))
+    logging.disable(logging.ERROR)  # кінець потоку логується як помилка ffmpeg
+
+    encoder = None
+    try:
+        if not opus.is_loaded():
+            opus._load_default()
+        if opus.is_loaded():
+            encoder = opus.Encoder()
+    except Exception:
+        encoder = None
+    if encoder is None:
+        print("libopus не знайдено — PCM-шлях без кодування (нижня межа його вартості)")
+
+    # Буфери на весь потік: читачі не чекають споживача, underrun-тиша не потрапляє в заміри
+    pcm_source = type("_PCM", (YTDLPPipeSource,), {"RING_FRAMES": frames + 1})
+    opus_source = type("_Opus", (OpusPipeSource,), {"MAX_PACKETS": frames + 1})
+    pcm = _pcm_bytes(frames)
+    ogg = _ogg_bytes(frames)
+
+    def make_pcm():
+        return YTDLSource(pcm_source(None, _process(io.BytesIO(pcm))), data={}, volume=0.5)
+
+    def make_opus():
+        return YTDLOpusSource(opus_source(_process(io.BytesIO(ogg))), data={})
+
+    pcm_cost = _bench("PCM + volume + encode", make_pcm, encoder, args.streams)
+    opus_cost = _bench("Opus з ffmpeg", make_opus, None, args.streams)
+    if opus_cost > 0:
+        print(f"Opus-шлях дешевший у {pcm_cost / opus_cost:.1f}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Мікробенчмарк: YTDLPPipeSource.read() при багатьох одночасних гільдіях.
+
+Кожна «гільдія» — це os.pipe(), у який окремий потік-продюсер пише PCM
+пачками з джитером і рідкими довгими затримками (імітація ffmpeg, що читає
+мережу), а потік-споживач кожної гільдії раз на 20 мс читає кадр — як
+AudioPlayer discord.py.
+Порівнюються старий читач (bytes += chunk, time.sleep(0.1) на порожньому
+читанні) і кільцевий буфер з потоком-читачем.
+
+Запуск (з кореня репозиторію):
+    python benchmarks/bench_pipe_reader.py [--guilds 50] [--seconds 5] [--stall 0.02]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord_music_bot.audio_source import YTDLPPipeSource  # noqa: E402
+
+FRAME = YTDLPPipeSource.FRAME_SIZE
+TICK = 0.02
+
+
+class _FakeFFmpeg:
+    """Процес-заглушка: stdout — кінець pipe, у який пише потік-продюсер."""
+
+    def __init__(self, seconds: float, seed: int, stall_chance: float):
+        read_fd, self._write_fd = os.pipe()
+        self.stdout = os.fdopen(read_fd, "rb", buffering=4 * 1024 * 1024)
+        self.stderr = None
+        self.pid = seed
+        self.returncode = None
+        self._frames = int(seconds / TICK)
+        self._rng = random.Random(seed)
+        self._stall_chance = stall_chance
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _produce(self) -> None:
+        payload = b"\x01" * FRAME
+        sent = 0
+        start = time.perf_counter()
+        try:
+            while sent < self._frames:
+                # Пачка 5-25 кадрів і пауза — мережевий джитер
+                burst = min(self._rng.randint(5, 25), self._frames - sent)
+                os.write(self._write_fd, payload * burst)
+                sent += burst
+                target = start + sent * TICK - 0.2  # тримаємо ~200 мс запасу
+                delay = target - time.perf_counter() + self._rng.uniform(-0.05, 0.15)
+                if self._rng.random() < self._stall_chance:
+                    delay += 0.4  # довша мережева затримка — буфер пересихає
+                if delay > 0:
+                    time.sleep(delay)
+        except OSError:
+            pass
+        finally:
+            os.close(self._write_fd)
+            self.returncode = 0
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self) -> None:
+        pass
+
+
+class _LegacyPipeSource:
+    """Попередня реалізація read(): конкатенація bytes і sleep на порожньому читанні."""
+
+    MAX_READ_RETRIES = 150
+
+    def __init__(self, ffmpeg):
+        self._ffmpeg = ffmpeg
+        self._buffer = b""
+
+    def read(self):
+        retries = 0
+        while len(self._buffer) < FRAME:
+            chunk = self._ffmpeg.stdout.read1(FRAME - len(self._buffer))
+            if chunk:
+                self._buffer += chunk
+                retries = 0
+            else:
+                if self._ffmpeg.poll() is not None:
+                    return b""
+                retries += 1
+                if retries >= self.MAX_READ_RETRIES:
+                    return b""
+                time.sleep(0.1)
+        frame = self._buffer[:FRAME]
+        self._buffer = self._buffer[FRAME:]
+        return frame
+
+    def cleanup(self):
+        pass
+
+
+def _player(source, seconds: float, latencies: list, late: list) -> None:
+    """Імітація потоку AudioPlayer: один кадр кожні 20 мс."""
+    start = time.perf_counter()
+    for loops in range(int(seconds / TICK)):
+        t0 = time.perf_counter()
+        frame = source.read()
+        latencies.append(time.perf_counter() - t0)
+        if not frame:
+            break
+        next_time = start + TICK * (loops + 1)
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            late.append(-delay)
+
+
+def _run(label: str, factory, guilds: int, seconds: float, stall_chance: float) -> None:
+    sources = [factory(_FakeFFmpeg(seconds, seed, stall_chance)) for seed in range(guilds)]
+    latencies = [[] for _ in sources]
+    late = [[] for _ in sources]
+    threads = [
+        threading.Thread(target=_player, args=(src, seconds, latencies[i], late[i]), daemon=True)
+        for i, src in enumerate(sources)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for src in sources:
+        src.cleanup()
+
+    flat = sorted(x for lat in latencies for x in lat)
+    p99 = flat[int(len(flat) * 0.99) - 1] if flat else 0.0
+    late_frames = sum(len(x) for x in late)
+    line = (
+        f"{label:<8} guilds={guilds:<4} read avg {statistics.mean(flat) * 1e6:8.1f} мкс  "
+        f"p99 {p99 * 1e6:9.1f} мкс  max {flat[-1] * 1e3:7.1f} мс  запізнених кадрів {late_frames}"
+    )
+    if hasattr(sources[0], "stats"):
+        underruns = sum(src.stats()["underruns"] for src in sources)
+        line += f"  underruns {underruns}"
+    print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=50, help="одночасних потоків")
+    parser.add_argument("--seconds", type=float, default=5.0, help="тривалість відтворення")
+    parser.add_argument("--stall", type=float, default=0.02, help="ймовірність затримки продюсера на пачку")
+    args = parser.parse_args()
+
+    _run("legacy", _LegacyPipeSource, args.guilds, args.seconds, args.stall)
+    _run("ring", lambda ffmpeg: YTDLPPipeSource(None, ffmpeg), args.guilds, args.seconds, args.stall)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Бенчмарк: топ треків через GROUP BY по всій історії vs таблиця track_play_counts.
+
+get_top_tracks наповнює індекс кандидатів Automix і статистику гільдії, тож час
+запиту на великій історії — це затримка першого вибору Automix.
+
+Запуск (з кореня репозиторію):
+    python benchmarks/bench_top_tracks.py [--rows 1000000] [--tracks 20000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord_music_bot import database  # noqa: E402
+from discord_music_bot.repository import MusicRepository  # noqa: E402
+
+GUILD_ID = 1
+OTHER_GUILDS = 4
+
+# Агрегація по всій історії — як get_top_tracks працював до track_play_counts
+_GROUP_BY_SQL = """
+    SELECT t.url, t.title, t.duration, t.thumbnail, top.play_count
+    FROM (
+        SELECT track_id, COUNT(*) AS play_count
+        FROM history_tracks
+        WHERE guild_id = ?
+        GROUP BY track_id
+        ORDER BY play_count DESC
+        LIMIT ?
+    ) top
+    JOIN tracks t ON t.id = top.track_id
+    ORDER BY top.play_count DESC
+"""
+
+
+async def _populate(rows: int, tracks: int, seed: int) -> None:
+    rng = random.Random(seed)
+    pool = await database.get_pool()
+    async with pool.writer() as conn:
+        for guild_id in range(1, OTHER_GUILDS + 2):
+            await conn.execute("INSERT OR IGNORE INTO guild_state (guild_id) VALUES (?)", (guild_id,))
+        await conn.executemany(
+            "INSERT INTO tracks (canonical, url, title, duration) VALUES (?, ?, ?, ?)",
+            [(f"bench:{i}", f"https://example.com/{i}", f"Track {i}", 180) for i in range(tracks)],
+        )
+        # Zipf-подібний розподіл: кілька хітів і довгий хвіст; половина рядків — цільова гільдія
+        weights = [1.0 / (i + 1) for i in range(tracks)]
+        batch = 100_000
+        for start in range(0, rows, batch):
+            count = min(batch, rows - start)
+            picks = rng.choices(range(1, tracks + 1), weights=weights, k=count)
+            await conn.executemany(
+                "INSERT INTO history_tracks (guild_id, track_id, played_at) "
+                "VALUES (?, ?, datetime('now', ? || ' seconds'))",
+                [
+                    (GUILD_ID if rng.random() < 0.5 else rng.randint(2, OTHER_GUILDS + 1), track_id, -(rows - start - i))
+                    for i, track_id in enumerate(picks)
+                ],
+            )
+        await database._backfill_play_counts(conn)
+
+
+async def _time(label: str, fn, repeats: int) -> float:
+    await fn()  # прогрів кешу сторінок
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await fn()
+    per_call = (time.perf_counter() - start) / repeats * 1000
+    print(f"{label:<40} {per_call:9.2f} ms/call")
+    return per_call
+
+
+async def main(rows: int, tracks: int, limit: int, repeats: int, seed: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with patch.object(database, 'DB_PATH', db_path), patch.object(database, 'DB_DIR', tmp):
+            await database.init_db()
+            repo = MusicRepository()
+            started = time.perf_counter()
+            await _populate(rows, tracks, seed)
+            print(f"populated {rows} history rows / {tracks} tracks in {time.perf_counter() - started:.1f}s\n")
+
+            pool = await database.get_pool()
+
+            async def group_by():
+                async with pool.reader() as conn:
+                    cursor = await conn.execute(_GROUP_BY_SQL, (GUILD_ID, limit))
+                    return await cursor.fetchall()
+
+            async def counts():
+                return await repo.get_top_tracks(GUILD_ID, limit=limit)
+
+            old_top = [(r["url"], r["play_count"]) for r in await group_by()]
+            new_top = [(r["url"], r["play_count"]) for r in await counts()]
+            assert sorted(c for _, c in old_top) == sorted(c for _, c in new_top), "results differ"
+
+            old = await _time(f"GROUP BY history (limit {limit})", group_by, repeats)
+            new = await _time(f"track_play_counts (limit {limit})", counts, repeats)
+            write = await _time(
+                "add_history_track (history + counter)",
+                lambda: repo.add_history_track(GUILD_ID, {"url": "https://example.com/0", "title": "Track 0"}),
+                repeats,
+            )
+            print(f"\ntop-N speedup: x{old / new:.0f}   write cost: {write:.2f} ms")
+            await database.close_db()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--tracks', type=int, default=20_000)
+    parser.add_argument('--limit', type=int, default=300)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.tracks, args.limit, args.repeats, args.seed))
@@ -0,0 +1,110 @@
+"""
+Бенчмарк: новий YoutubeDL на кожну спробу vs пул готових екземплярів.
+
+`extract_stream_url` проходить справжній yt-dlp (реєстрація екстракторів,
+вибір формату), але URL обробляє локальний фейковий екстрактор без мережі.
+`--failures` перших спроб на трек падають (формат недоступний), тож видно
+вартість перебору профілів × форматів. Без пулу — YoutubeDLPool(max_idle=0):
+кожен checkout створює й закриває екземпляр, як було до пулу.
+
+Запуск (з кореня репозиторію):
+    python benchmarks/bench_ytdlp_pool.py [--tracks 50] [--failures 3]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+from yt_dlp.extractor.common import InfoExtractor  # noqa: E402
+from yt_dlp.utils import ExtractorError  # noqa: E402
+
+from discord_music_bot import ytdlp_config  # noqa: E402
+from discord_music_bot.ytdlp_pool import YoutubeDLPool  # noqa: E402
+
+_attempts: Counter = Counter()
+_failures = 0
+
+
+class FakeIE(InfoExtractor):
+    IE_NAME = "fake"
+    _VALID_URL = r"fake://(?P<id>[\w-]+)"
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        _attempts[video_id] += 1
+        if _attempts[video_id] <= _failures:
+            raise ExtractorError("Requested format is not available", expected=True)
+        return {
+            "id": video_id,
+            "title": f"Track {video_id}",
+            "duration": 180,
+            "formats": [
+                {"format_id": "251", "url": f"http://127.0.0.1/{video_id}.webm", "ext": "webm",
+                 "acodec": "opus", "vcodec": "none", "abr": 160},
+                {"format_id": "18", "url": f"http://127.0.0.1/{video_id}.mp4", "ext": "mp4",
+                 "acodec": "mp4a.40.2", "vcodec": "avc1", "abr": 96, "height": 360},
+            ],
+        }
+
+
+class BenchYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL з фейковим екстрактором, який обробляє fake:// замість generic."""
+
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init)
+        self.add_info_extractor(FakeIE())
+
+    def extract_info(self, url, *args, **kwargs):
+        kwargs.setdefault("ie_key", FakeIE.ie_key())
+        return super().extract_info(url, *args, **kwargs)
+
+
+def _run(label: str, pool: YoutubeDLPool, tracks: int) -> float:
+    _attempts.clear()
+    with patch.object(ytdlp_config, "ydl_pool", pool):
+        # Прогрів: перший виклик імпортує модулі екстракторів в обох режимах
+        ytdlp_config.extract_stream_url("fake://warmup")
+        _attempts.clear()
+        wall, cpu = time.perf_counter(), time.process_time()
+        for i in range(tracks):
+            stream_url, _ = ytdlp_config.extract_stream_url(f"fake://track-{i}")
+            assert stream_url, "fake extractor returned no stream URL"
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    stats = pool.stats()
+    per_track = wall / tracks * 1000
+    print(
+        f"{label:<18} {tracks:>5} tracks  {per_track:8.2f} ms/track  "
+        f"cpu {cpu / tracks * 1000:8.2f} ms/track  created={stats['created']:<5} reused={stats['reused']}"
+    )
+    pool.clear()
+    return per_track
+
+
+def main() -> None:
+    global _failures
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=50)
+    parser.add_argument("--failures", type=int, default=3, help="невдалих спроб на трек перед успіхом")
+    args = parser.parse_args()
+    _failures = max(0, args.failures)
+
+    logging.disable(logging.CRITICAL)
+    os.environ["YTDLP_PIPED_FIRST"] = "0"
+    # yt-dlp друкує ERROR для кожної невдалої спроби навіть з quiet=True
+    with patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL", BenchYoutubeDL), \
+         contextlib.redirect_stderr(io.StringIO()):
+        fresh = _run("new per attempt", YoutubeDLPool(max_idle=0), args.tracks)
+        pooled = _run("pooled", YoutubeDLPool(), args.tracks)
+    print(f"\nspeedup: {fresh / pooled:.1f}x  ({args.failures + 1} attempts per track)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Дисковий кеш аудіо популярних треків (Opus в Ogg) у DB_DATA_DIR/audio_cache.
+
+Трек, прослуханий щонайменше AUDIO_CACHE_MIN_PLAYS разів (лічильники
+засіваються з track_play_counts і ростуть з кожним відтворенням), після старту
+відтворення транскодується у фоні окремим ffmpeg з уже розв'язаного media URL.
+Наступні відтворення YTDLSource бере з локального файла: без екстракції й
+мережі на старті, а seek-restart (`-ss`) по файлу миттєвий.
+
+Розмір обмежений AUDIO_CACHE_MAX_BYTES: витісняються файли з найменшою
+кількістю влучань (LFU), серед рівних — найдавніше використані (LRU).
+Лічильники влучань і метадані зберігаються в index.json поруч із файлами.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import shlex
+import subprocess
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from discord_music_bot import consts
+from discord_music_bot.config import FFMPEG_OPTIONS
+from discord_music_bot.process_supervisor import process_supervisor
+from discord_music_bot.stream_cache import cache_key
+
+logger = logging.getLogger('MusicBot.AudioCache')
+
+# Ключ — YouTube video ID; перевірка гарантує безпечне ім'я файла
+_SAFE_KEY_RE = re.compile(r"^[A-Za-z0-9_-]{6,64}$")
+_INDEX_FILE = "index.json"
+_SUFFIX = ".ogg"
+_META_KEYS = ("title", "duration", "thumbnail", "webpage_url")
+
+
+def default_directory() -> str:
+    return os.path.join(os.environ.get("DB_DATA_DIR", "data"), "audio_cache")
+
+
+def is_local(stream_url) -> bool:
+    """Чи це шлях до файла кешу, а не мережевий media URL."""
+    return isinstance(stream_url, str) and os.path.isabs(stream_url)
+
+
+class AudioCache:
+    """Файли Opus/Ogg за video ID: пошук, фонове транскодування, LFU/LRU-витіснення."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: int = consts.AUDIO_CACHE_MAX_BYTES,
+        min_plays: int = consts.AUDIO_CACHE_MIN_PLAYS,
+        max_pending: int = consts.AUDIO_CACHE_MAX_PENDING,
+    ):
+        self.directory = os.path.abspath(directory or default_directory())
+        self.max_bytes = max_bytes
+        self.min_plays = max(1, min_plays)
+        self.max_pending = max_pending
+        self.enabled = False  # стає True після load()
+        self._entries: Dict[str, Dict[str, Any]] = {}  # {video_id: {size, hits, last_used, title, ...}}
+        self._plays: "OrderedDict[str, int]" = OrderedDict()  # {video_id: прослуховування}
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._slot = asyncio.Semaphore(1)  # один фоновий транскод за раз
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.transcoded = 0
+        self.failed = 0
+        self.evictions = 0
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove {path}: {e}")
+
+    # ── Індекс ───────────────────────────────────────────────────
+
+    def load(self) -> int:
+        """Звіряє index.json з файлами на диску; повертає кількість треків у кеші.
+        Недописані файли попередніх запусків видаляються."""
+        if not consts.AUDIO_CACHE_ENABLED:
+            return 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            names = os.listdir(self.directory)
+        except OSError as e:
+            logger.warning(f"Audio cache directory unavailable, cache disabled: {e}")
+            return 0
+        index: Dict[str, Any] = {}
+        try:
+            with open(os.path.join(self.directory, _INDEX_FILE), encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Audio cache index unreadable, rebuilding from files: {e}")
+
+        entries = {}
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if name.endswith((".part", ".tmp")):
+                self._remove(path)
+                continue
+            key, suffix = os.path.splitext(name)
+            if suffix != _SUFFIX or not _SAFE_KEY_RE.match(key):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stored = index.get(key) if isinstance(index, dict) else None
+            stored = stored if isinstance(stored, dict) else {}
+            entry = {k: stored[k] for k in _META_KEYS if stored.get(k) is not None}
+            try:
+                entry.update(hits=int(stored.get("hits", 0)), last_used=float(stored.get("last_used", stat.st_mtime)))
+            except (TypeError, ValueError):
+                entry.update(hits=0, last_used=stat.st_mtime)
+            entry["size"] = stat.st_size
+            entries[key] = entry
+        self._entries = entries
+        self.enabled = True
+        self._evict(0)
+        self._dirty = True
+        self.save()
+        return len(entries)
+
+    def save(self) -> None:
+        """Атомарно записує index.json, якщо індекс змінився."""
+        if not self._dirty or not self.enabled:
+            return
+        path = os.path.join(self.directory, _INDEX_FILE)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Could not save audio cache index: {e}")
+
+    def seed(self, tracks: Iterable[Dict[str, Any]]) -> None:
+        """Стартові лічильники прослуховувань (рядки get_popular_tracks)."""
+        for track in tracks:
+            key = cache_key(track.get("url") or "")
+            if key is not None:
+                self._plays[key] = max(self._plays.get(key, 0), int(track.get("play_count") or 0))
+        self._trim_plays()
+
+    def _trim_plays(self) -> None:
+        while len(self._plays) > consts.AUDIO_CACHE_TRACKED_MAX:
+            self._plays.popitem(last=False)
+
+    # ── Пошук ────────────────────────────────────────────────────
+
+    def lookup(self, page_url: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(шлях до файла, метадані) для треку в кеші або None; рахує влучання й промахи."""
+        key = cache_key(page_url) if self.enabled else None
+        if key is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and not os.path.exists(self._file(key)):
+            self._entries.pop(key, None)
+            self._dirty = True
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        entry["hits"] += 1
+        entry["last_used"] = time.time()
+        self._dirty = True
+        self.hits += 1
+        return self._file(key), {k: entry[k] for k in _META_KEYS if entry.get(k) is not None}
+
+    def discard(self, page_url: str) -> None:
+        """Видаляє трек із кешу (наприклад, файл не відкрився в ffmpeg)."""
+        key = cache_key(page_url)
+        if key is not None and self._entries.pop(key, None) is not None:
+            self._remove(self._file(key))
+            self._dirty = True
+            self.save()
+            logger.info(f"Audio cache entry {key} discarded")
+
+    # ── Транскодування ───────────────────────────────────────────
+
+    def note_play(self, track: Dict[str, Any], stream_url: Optional[str]) -> bool:
+        """Рахує прослуховування; True — якщо трек поставлено на фонове транскодування."""
+        url = track.get("url") or track.get("webpage_url")
+        key = cache_key(url) if self.enabled and isinstance(url, str) else None
+        if key is None or not _SAFE_KEY_RE.match(key):
+            return False
+        plays = self._plays.pop(key, 0) + 1
+        self._plays[key] = plays
+        self._trim_plays()
+        if plays < self.min_plays or key in self._entries or key in self._pending:
+            return False
+        if not isinstance(stream_url, str) or not stream_url or is_local(stream_url):
+            return False
+        duration = track.get("duration")
+        if not isinstance(duration, (int, float)) or not 0 < duration <= consts.AUDIO_CACHE_MAX_TRACK_SECONDS:
+            return False
+        if len(self._pending) >= self.max_pending:
+            return False
+        self._pending.add(key)
+        task = asyncio.get_running_loop().create_task(self._transcode(key, dict(track), stream_url))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _transcode(self, key: str, track: Dict[str, Any], stream_url: str) -> None:
+        partial = self._file(key) + ".part"
+        try:
+            async with self._slot:
+                ok = await self._run_ffmpeg(stream_url, partial)
+            size = os.path.getsize(partial) if ok else 0
+            if not ok or not 0 < size <= self.max_bytes:
+                self.failed += 1
+                self._remove(partial)
+                return
+            self._evict(size)
+            os.replace(partial, self._file(key))
+            entry = {k: track[k] for k in _META_KEYS if track.get(k) is not None}
+            entry.update(size=size, hits=0, last_used=time.time())
+            self._entries[key] = entry
+            self.transcoded += 1
+            self._dirty = True
+            self.save()
+            logger.info(f"Audio cached: {track.get('title', key)} ({size / 1048576:.1f} MB)")
+        except asyncio.CancelledError:
+            self._remove(partial)
+            raise
+        except Exception as e:
+            self.failed += 1
+            self._remove(partial)
+            logger.warning(f"Audio cache transcode failed for {key}: {e}")
+        finally:
+            self._pending.discard(key)
+
+    async def _run_ffmpeg(self, stream_url: str, output: str) -> bool:
+        """Транскод media URL в Opus/Ogg під наглядом process_supervisor."""
+        cmd = (
+            ["ffmpeg", "-nostats", "-loglevel", "error", "-y"]
+            + shlex.split(FFMPEG_OPTIONS["before_options"])
+            + ["-i", stream_url, "-vn", "-map_metadata", "-1", "-ar", "48000", "-ac", "2"]
+            + ["-c:a", "libopus", "-b:a", consts.OPUS_BITRATE, "-f", "ogg", output]
+        )
+        process = await asyncio.to_thread(
+            subprocess.Popen,
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            **process_supervisor.popen_kwargs(),
+        )
+        process_supervisor.register(process, kind="ffmpeg-cache")
+        try:
+            _, stderr = await asyncio.to_thread(process.communicate, timeout=consts.AUDIO_CACHE_TRANSCODE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Audio cache transcode timed out after {consts.AUDIO_CACHE_TRANSCODE_TIMEOUT}s")
+            process_supervisor.kill(process)
+            await asyncio.to_thread(process.communicate)
+            return False
+        except asyncio.CancelledError:
+            process_supervisor.kill(process)
+            raise
+        if process.returncode != 0:
+            text = (stderr or b"").decode("utf-8", errors="replace").strip()
+            if "libopus" in text or "Unknown encoder" in text:
+                logger.warning("ffmpeg has no libopus encoder — audio cache disabled")
+                self.enabled = False
+            logger.warning(f"Audio cache ffmpeg exit {process.returncode}: {text[-500:]}")
+            return False
+        return True
+
+    def _evict(self, incoming: int) -> None:
+        """Звільняє місце під `incoming` байт: LFU, серед рівних — LRU."""
+        total = self.total_bytes()
+        if total + incoming <= self.max_bytes:
+            return
+        for key, entry in sorted(self._entries.items(), key=lambda item: (item[1]["hits"], item[1]["last_used"])):
+            if total + incoming <= self.max_bytes:
+                break
+            self._remove(self._file(key))
+            del self._entries[key]
+            total -= entry["size"]
+            self.evictions += 1
+            self._dirty = True
+            logger.info(f"Audio cache evicted {entry.get('title', key)} ({entry['hits']} hits)")
+
+    # ── Звіт ─────────────────────────────────────────────────────
+
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "files": len(self._entries),
+            "bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "pending": len(self._pending),
+            "transcoded": self.transcoded,
+            "failed": self.failed,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        self.save()
+
+
+audio_cache = AudioCache()
@@ -0,0 +1,234 @@
+"""
+Аудіоознаки треку для контентного Automix (стратегія similar_sound).
+
+ffmpeg декодує короткий фрагмент (моно, низька частота дискретизації), з якого
+рахуються:
+
+- bpm — темп з автокореляції огинаючої онсетів (зростання енергії кадрів);
+- loudness — середня гучність фрагмента, dBFS;
+- centroid — спектральний центроїд, Гц (яскравість звучання);
+- chroma / key — 12 класів висоти тону й тональність (профілі Крумгансла).
+
+Функції модуля чисті й не залежать від event loop: `analyze` виконується у
+процесі з пулу AudioFeatureService, тож важкі обчислення не забирають GIL у
+event loop чи потоку відтворення. numpy не потрібен — фрагмент невеликий,
+а FFT рахується лише для кількох десятків вікон.
+"""
+
+import cmath
+import itertools
+import logging
+import math
+import operator
+import shlex
+import subprocess
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+from discord_music_bot import consts
+from discord_music_bot.config import FFMPEG_OPTIONS
+
+logger = logging.getLogger('MusicBot.AudioFeatures')
+
+PITCH_CLASSES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+
+# Профілі тональностей Крумгансла–Кесслер (C major / C minor)
+_MAJOR_PROFILE = (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88)
+_MINOR_PROFILE = (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17)
+
+_ONSET_FPS = 86  # кадрів огинаючої за секунду
+_ONSET_OVERLAP = 4
+_FFT_SIZE = 4096
+_FFT_FRAMES = 32
+_MIN_BPM, _MAX_BPM = 60.0, 200.0
+_CHROMA_MIN_HZ, _CHROMA_MAX_HZ = 55.0, 2000.0
+
+
+def key_name(key: int) -> str:
+    """0..11 — мажор, 12..23 — мінор."""
+    return f"{PITCH_CLASSES[key % 12]} {'major' if key < 12 else 'minor'}"
+
+
+def _fft(values: List[complex]) -> List[complex]:
+    """Ітеративне radix-2 FFT (довжина — степінь двійки)."""
+    n = len(values)
+    out = list(values)
+    j = 0
+    for i in range(1, n):
+        bit = n >> 1
+        while j & bit:
+            j ^= bit
+            bit >>= 1
+        j |= bit
+        if i < j:
+            out[i], out[j] = out[j], out[i]
+    size = 2
+    while size <= n:
+        half = size // 2
+        step = cmath.exp(-2j * math.pi / size)
+        twiddles = [step ** k for k in range(half)]
+        for start in range(0, n, size):
+            for k in range(half):
+                a = out[start + k]
+                b = out[start + k + half] * twiddles[k]
+                out[start + k] = a + b
+                out[start + k + half] = a - b
+        size *= 2
+    return out
+
+
+def _estimate_bpm(samples: Sequence[int], sample_rate: int) -> Optional[float]:
+    hop = max(1, sample_rate // _ONSET_FPS)
+    fps = sample_rate / hop
+    # Вікно енергії довше за крок (перекриття): биття близьких частот усередині
+    # кадру не дає хибних онсетів
+    frame = hop * _ONSET_OVERLAP
+    power = [0.0]
+    power.extend(itertools.accumulate(map(operator.mul, samples, samples)))
+    energy = [
+        math.log1p((power[start + frame] - power[start]) / frame)
+        for start in range(0, len(samples) - frame, hop)
+    ]
+    onset = [max(0.0, b - a) for a, b in zip(energy, energy[1:])]
+    if len(onset) < fps * 4:
+        return None
+    mean = sum(onset) / len(onset)
+    onset = [v - mean for v in onset]
+
+    min_lag = max(1, int(fps * 60.0 / _MAX_BPM))
+    max_lag = int(fps * 60.0 / _MIN_BPM) + 1
+    scores = {}
+    for lag in range(min_lag, max_lag + 1):
+        corr = sum(map(operator.mul, onset[:-lag], onset[lag:])) / (len(onset) - lag)
+        bpm = 60.0 * fps / lag
+        # Лог-гаусівський пріоритет навколо 120 BPM зменшує помилки «пів/подвійного» темпу
+        scores[lag] = corr * math.exp(-0.5 * (math.log2(bpm / 120.0) / 1.0) ** 2)
+    best = max(scores, key=scores.get)
+    if scores[best] <= 0:
+        return None
+    # Параболічне уточнення між сусідніми лагами
+    left, right = scores.get(best - 1), scores.get(best + 1)
+    lag = float(best)
+    if left is not None and right is not None:
+        denom = left - 2 * scores[best] + right
+        if denom < 0:
+            lag += 0.5 * (left - right) / denom
+    return 60.0 * fps / lag
+
+
+def _estimate_key(chroma: Sequence[float]) -> int:
+    def correlation(profile: Sequence[float], shift: int) -> float:
+        rotated = [profile[(i - shift) % 12] for i in range(12)]
+        mean_c, mean_p = sum(chroma) / 12, sum(rotated) / 12
+        num = sum((c - mean_c) * (p - mean_p) for c, p in zip(chroma, rotated))
+        den = math.sqrt(sum((c - mean_c) ** 2 for c in chroma) * sum((p - mean_p) ** 2 for p in rotated))
+        return num / den if den else 0.0
+
+    candidates = [(correlation(_MAJOR_PROFILE, k), k) for k in range(12)]
+    candidates += [(correlation(_MINOR_PROFILE, k), 12 + k) for k in range(12)]
+    return max(candidates)[1]
+
+
+def compute_features(samples: Sequence[int], sample_rate: int) -> Optional[Dict[str, Any]]:
+    """Ознаки моно-фрагмента s16; None — якщо фрагмент закороткий або тиша."""
+    n = len(samples)
+    if n < max(_FFT_SIZE, sample_rate * 3):
+        return None
+    mean_square = math.fsum(map(operator.mul, samples, samples)) / n
+    if mean_square <= 0:
+        return None
+    loudness = 10.0 * math.log10(mean_square / (32768.0 ** 2))
+
+    window = [0.5 - 0.5 * math.cos(2 * math.pi * i / (_FFT_SIZE - 1)) for i in range(_FFT_SIZE)]
+    bin_hz = sample_rate / _FFT_SIZE
+    chroma_bins = []
+    for k in range(1, _FFT_SIZE // 2):
+        freq = k * bin_hz
+        if _CHROMA_MIN_HZ <= freq <= _CHROMA_MAX_HZ:
+            chroma_bins.append((k, (round(12 * math.log2(freq / 440.0)) + 9) % 12))
+
+    chroma = [0.0] * 12
+    weighted_freq = total_mag = 0.0
+    frames = min(_FFT_FRAMES, n // _FFT_SIZE)
+    stride = (n - _FFT_SIZE) // max(1, frames - 1)
+    for f in range(frames):
+        start = f * stride
+        spectrum = _fft([samples[start + i] * window[i] for i in range(_FFT_SIZE)])
+        mags = [abs(c) for c in spectrum[:_FFT_SIZE // 2]]
+        for k in range(1, len(mags)):
+            weighted_freq += k * bin_hz * mags[k]
+            total_mag += mags[k]
+        for k, pitch in chroma_bins:
+            chroma[pitch] += mags[k] * mags[k]
+    if total_mag <= 0:
+        return None
+    peak = max(chroma) or 1.0
+    chroma = [c / peak for c in chroma]
+
+    return {
+        "bpm": _estimate_bpm(samples, sample_rate),
+        "loudness": loudness,
+        "centroid": weighted_freq / total_mag,
+        "key": _estimate_key(chroma),
+        "chroma": chroma,
+    }
+
+
+def decode_segment(stream_url: str, offset: float, seconds: float, sample_rate: int, timeout: float) -> array:
+    """Декодує фрагмент у моно s16 через ffmpeg; порожній масив — якщо не вдалося."""
+    cmd = (
+        ["ffmpeg", "-nostdin", "-nostats", "-v", "error"]
+        + shlex.split(FFMPEG_OPTIONS["before_options"])
+        + (["-ss", f"{offset:.3f}"] if offset > 0 else [])
+        + ["-t", f"{seconds:.3f}", "-i", stream_url, "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "pipe:1"]
+    )
+    samples = array("h")
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout, check=False)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"Feature decode failed: {e}")
+        return samples
+    data = proc.stdout
+    samples.frombytes(data[:len(data) - len(data) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples
+
+
+def segment_offset(duration: Optional[float], seconds: float) -> float:
+    """Початок фрагмента: ~третина треку (оминає інтро), щоб фрагмент вміщався."""
+    if not duration or duration <= seconds:
+        return 0.0
+    return max(0.0, min(duration * 0.3, duration - seconds))
+
+
+def analyze(
+    stream_url: str,
+    duration: Optional[float] = None,
+    seconds: float = consts.AUDIO_FEATURES_SEGMENT_SECONDS,
+    sample_rate: int = consts.AUDIO_FEATURES_SAMPLE_RATE,
+    timeout: float = consts.AUDIO_FEATURES_TIMEOUT,
+) -> Optional[Dict[str, Any]]:
+    """Повний цикл для процесу з пулу: декодування фрагмента й ознаки."""
+    samples = decode_segment(stream_url, segment_offset(duration, seconds), seconds, sample_rate, timeout)
+    return compute_features(samples, sample_rate)
+
+
+def distance(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """
+    Відстань між векторами ознак (0 — однакове звучання). Темп порівнюється
+    з точністю до октави (90 і 180 BPM близькі), центроїд — у логарифмі,
+    хрома — косинусною відстанню.
+    """
+    parts = []
+    if a.get("bpm") and b.get("bpm"):
+        octaves = abs(math.log2(a["bpm"] / b["bpm"])) % 1.0
+        parts.append(min(octaves, 1.0 - octaves) / 0.15)
+    parts.append((a["loudness"] - b["loudness"]) / 6.0)
+    if a["centroid"] > 0 and b["centroid"] > 0:
+        parts.append(math.log2(a["centroid"] / b["centroid"]) / 0.5)
+    dot = sum(x * y for x, y in zip(a["chroma"], b["chroma"]))
+    norm = math.sqrt(sum(x * x for x in a["chroma"]) * sum(y * y for y in b["chroma"]))
+    parts.append((1.0 - (dot / norm if norm else 0.0)) / 0.3)
+    return math.sqrt(sum(p * p for p in parts))
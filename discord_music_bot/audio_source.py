@@ -1,36 +1,166 @@
 import discord
 import asyncio
+import audioop
+import math
 import subprocess
 import logging
 import shlex
+import threading
 import time
+from collections import deque
+from discord.oggparse import OggStream
+from discord.opus import OPUS_SILENCE
+from discord_music_bot import consts
+from discord_music_bot.audio_cache import audio_cache, is_local
 from discord_music_bot.config import FFMPEG_OPTIONS
+from discord_music_bot.instrumentation import (
+    FRAME_END,
+    FRAME_OK,
+    FRAME_SHORT,
+    FRAME_STARTUP,
+    FRAME_UNDERRUN,
+)
+from discord_music_bot.loudness_cache import loudness_cache
+from discord_music_bot.process_supervisor import process_supervisor
+from discord_music_bot.services.extraction_scheduler import PRIORITY_PLAYBACK, current_guild, extraction_scheduler
+from discord_music_bot.stream_cache import stream_url_cache
 from discord_music_bot.ytdlp_config import extract_stream_url
 
 
-class YTDLPPipeSource(discord.AudioSource):
+class StderrTail:
+    """Потік, що постійно вичитує stderr ffmpeg у кільцевий буфер останніх рядків.
+
+    Pipe stderr не переповнюється (ffmpeg не блокується на записі), а текст
+    помилки чи вимірів loudnorm доступний будь-коли, а не лише після падіння."""
+
+    MAX_LINE = 2000
+
+    def __init__(self, stream, max_lines: int = consts.FFMPEG_STDERR_TAIL_LINES):
+        self._lines = deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._drain, args=(stream,), name="ffmpeg-stderr", daemon=True)
+        self._thread.start()
+
+    def _drain(self, stream) -> None:
+        try:
+            for line in iter(stream.readline, b""):
+                if not isinstance(line, bytes):
+                    break
+                with self._lock:
+                    self._lines.append(line[:self.MAX_LINE])
+        except (OSError, ValueError):
+            pass
+
+    def text(self, wait: float = 0.0) -> str:
+        """Останні рядки stderr; `wait` — скільки чекати, поки ffmpeg допише (після виходу)."""
+        if wait > 0:
+            self._thread.join(wait)
+        with self._lock:
+            raw = b"".join(self._lines)
+        return raw.decode("utf-8", errors="replace").strip()
+
+
+class _PipeReadiness:
+    """Готовність pipe-джерела: потік-читач сигналізує про перший кадр або кінець потоку,
+    а event loop чекає на це без опитування й без фіксованих пауз."""
+
+    def _init_readiness(self) -> None:
+        self._ready = threading.Event()
+        self._ready_lock = threading.Lock()
+        self._ready_waiters = []
+
+    def _signal_ready(self) -> None:
+        with self._ready_lock:
+            if self._ready.is_set():
+                return
+            self._ready.set()
+            waiters, self._ready_waiters = self._ready_waiters, []
+        for wake in waiters:
+            wake()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Чекає першого кадру не довше `timeout`. False — потік закінчився без жодного
+        кадру або дедлайн минув."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+            except RuntimeError:
+                pass  # event loop уже закрито
+
+        with self._ready_lock:
+            ready = self._ready.is_set()
+            if not ready:
+                self._ready_waiters.append(wake)
+        if not ready:
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.buffered_frames > 0
+
+
+class YTDLPPipeSource(_PipeReadiness, discord.AudioSource):
     """Аудіо source: FFmpeg читає прямий media URL і віддає PCM у Discord.
-    Буферизує дані щоб уникнути передчасного закінчення треку
-    при тимчасових мережевих затримках."""
+
+    Окремий потік-читач заповнює кільцевий буфер (`readinto` у memoryview
+    заздалегідь виділеного bytearray), тож `read()` у потоці плеєра discord.py
+    ніколи не блокується: є повний кадр — віддаємо його, немає — тиша
+    (underrun), і лише після MAX_UNDERRUN_FRAMES поспіль трек вважається
+    завершеним."""
 
     FRAME_SIZE = 3840  # 20ms of 48kHz 16-bit stereo PCM
-    MAX_READ_RETRIES = 150  # ~15s толерантність на порожні читання
+    RING_FRAMES = 250  # ~5s PCM у кільцевому буфері
+    MAX_UNDERRUN_FRAMES = 750  # ~15s толерантність на відсутність даних
+    READ_CHUNK = 64 * 1024
+    SILENCE = b"\x00" * FRAME_SIZE
 
     def __init__(self, ytdlp_process, ffmpeg_process):
         self._ytdlp = ytdlp_process  # legacy slot; None when streaming via direct URL
         self._ffmpeg = ffmpeg_process
-        self._buffer = b""
         self._logged_failure = False
+        self.stderr_text = ""  # stderr ffmpeg після завершення (виміри loudnorm)
+        self._ring = bytearray(self.RING_FRAMES * self.FRAME_SIZE)
+        self._view = memoryview(self._ring)
+        self._frame = bytearray(self.FRAME_SIZE)  # для кадру, що перетинає кінець кільця
+        self._head = 0
+        self._size = 0
+        self._cond = threading.Condition()
+        self._eof = threading.Event()
+        self._closed = False
+        self._init_readiness()
+        # Метрики
+        self.frames = 0
+        self.underruns = 0  # кадри тиші через брак даних (після першого кадру)
+        self.underrun_events = 0  # скільки разів потік «пересихав»
+        self.startup_frames = 0  # кадри тиші до першого кадру
+        self.short_frames = 0  # неповні кадри (доповнені тишею) наприкінці потоку
+        self.first_frame_at = None  # time.perf_counter() першого кадру з даними
+        self.frame_timer = None  # instrumentation.FrameTimer гільдії (див. instrumentation.attach)
+        self.last_read_at = None  # time.monotonic() останнього read() — активність для process_supervisor
+        self._consecutive_underruns = 0
+        self._reader = threading.Thread(
+            target=self._fill, name=f"ffmpeg-reader-{getattr(ffmpeg_process, 'pid', '?')}", daemon=True
+        )
+        self._reader.start()
+        process_supervisor.adopt(ffmpeg_process, self)
 
     @staticmethod
     def _read_stderr(process, name: str) -> str:
-        if not process or not process.stderr:
+        """stderr процесу: з StderrTail, якщо його вичитує потік, інакше — read() до кінця."""
+        if not process:
             return ""
         try:
-            raw = process.stderr.read()
-            if not raw:
+            tail = getattr(process, "stderr_tail", None)
+            if isinstance(tail, StderrTail):
+                text = tail.text(wait=1.0 if process.poll() is not None else 0.0)
+            elif process.stderr:
+                raw = process.stderr.read()
+                text = raw.decode("utf-8", errors="replace").strip() if raw else ""
+            else:
                 return ""
-            text = raw.decode("utf-8", errors="replace").strip()
             if text:
                 logging.error(f"{name} stderr: {text[:4000]}")
             return text
@@ -46,48 +176,144 @@ class YTDLPPipeSource(discord.AudioSource):
         if self._ytdlp and self._ytdlp.poll() is not None:
             self._read_stderr(self._ytdlp, "yt-dlp")
         if self._ffmpeg and self._ffmpeg.poll() is not None:
-            self._read_stderr(self._ffmpeg, "ffmpeg")
+            self.stderr_text = self._read_stderr(self._ffmpeg, "ffmpeg")
+
+    def _fill(self) -> None:
+        """Потік-читач: ffmpeg stdout → вільна частина кільцевого буфера."""
+        capacity = len(self._ring)
+        stdout = getattr(self._ffmpeg, "stdout", None)
+        readinto = getattr(stdout, "readinto1", None) or getattr(stdout, "readinto", None)
+        try:
+            while not self._closed and readinto is not None:
+                with self._cond:
+                    while self._size == capacity and not self._closed:
+                        self._cond.wait(0.5)
+                    if self._closed:
+                        break
+                    tail = (self._head + self._size) % capacity
+                    free = capacity - self._size
+                # Пишемо лише у вільну область — споживач її не читає
+                end = min(capacity, tail + free, tail + self.READ_CHUNK)
+                n = readinto(self._view[tail:end])
+                if not isinstance(n, int) or n <= 0:
+                    break
+                with self._cond:
+                    self._size += n
+                    ready = self._size >= self.FRAME_SIZE
+                if ready and not self._ready.is_set():
+                    self._signal_ready()
+        except Exception as exc:
+            if not self._closed:
+                logging.warning(f"ffmpeg reader stopped: {exc}")
+        finally:
+            self._eof.set()
+            self._signal_ready()
 
     def read(self):
-        retries = 0
-        while len(self._buffer) < self.FRAME_SIZE:
-            chunk = self._ffmpeg.stdout.read(self.FRAME_SIZE - len(self._buffer))
-            if chunk:
-                self._buffer += chunk
-                retries = 0
+        self.last_read_at = time.monotonic()
+        timer = self.frame_timer
+        if timer is None:
+            return self._next_frame()[0]
+        started = time.perf_counter()
+        frame, kind = self._next_frame()
+        timer.record(started, time.perf_counter(), kind)
+        return frame
+
+    def _next_frame(self):
+        """(кадр, вид) — вид для instrumentation: кадр, underrun, стартова тиша, неповний, кінець."""
+        with self._cond:
+            if self._size >= self.FRAME_SIZE:
+                frame = self._take(self.FRAME_SIZE)
+                self._cond.notify()
             else:
-                if self._ffmpeg.poll() is not None:
-                    self._log_pipeline_failure(
-                        f"ffmpeg exited with code {self._ffmpeg.returncode}"
-                    )
-                    if self._buffer:
-                        frame = self._buffer.ljust(self.FRAME_SIZE, b"\x00")
-                        self._buffer = b""
-                        return frame
-                    return b""
+                frame = None
+        if frame is not None:
+            self.frames += 1
+            if self.first_frame_at is None:
+                self.first_frame_at = time.perf_counter()
+            self._consecutive_underruns = 0
+            return frame, FRAME_OK
 
-                retries += 1
-                if retries >= self.MAX_READ_RETRIES:
-                    if self._buffer:
-                        frame = self._buffer.ljust(self.FRAME_SIZE, b"\x00")
-                        self._buffer = b""
-                        return frame
-                    return b""
-                time.sleep(0.1)
+        if self._eof.is_set():
+            with self._cond:
+                rest = self._take(self._size) if self._size else b""
+            if self._ffmpeg.poll() is not None:
+                self._log_pipeline_failure(f"ffmpeg exited with code {self._ffmpeg.returncode}")
+            else:
+                self._log_pipeline_failure("ffmpeg closed stdout")
+            if rest:
+                self.short_frames += 1
+                return rest.ljust(self.FRAME_SIZE, b"\x00"), FRAME_SHORT
+            return b"", FRAME_END
 
-        frame = self._buffer[: self.FRAME_SIZE]
-        self._buffer = self._buffer[self.FRAME_SIZE :]
-        return frame
+        # Underrun: даних ще немає, але потік живий — тиша замість блокування
+        if self.frames == 0:
+            self.startup_frames += 1
+            kind = FRAME_STARTUP
+        else:
+            if self._consecutive_underruns == 0:
+                self.underrun_events += 1
+            self.underruns += 1
+            kind = FRAME_UNDERRUN
+        self._consecutive_underruns += 1
+        if self._consecutive_underruns >= self.MAX_UNDERRUN_FRAMES:
+            self._log_pipeline_failure("no audio data from ffmpeg")
+            return b"", FRAME_END
+        return self.SILENCE, kind
+
+    def _take(self, count: int) -> bytes:
+        """Забирає count байт з голови кільця (викликається під self._cond)."""
+        capacity = len(self._ring)
+        head = self._head
+        first = min(count, capacity - head)
+        if first == count:
+            data = bytes(self._view[head:head + count])
+        else:
+            self._frame[:first] = self._view[head:capacity]
+            self._frame[first:count] = self._view[:count - first]
+            data = bytes(self._frame[:count]) if count != self.FRAME_SIZE else bytes(self._frame)
+        self._head = (head + count) % capacity
+        self._size -= count
+        return data
+
+    @property
+    def buffered_frames(self) -> int:
+        return self._size // self.FRAME_SIZE
+
+    def discard(self, frames: int) -> None:
+        """Відкидає до `frames` буферизованих кадрів (не рахуються як відтворені)."""
+        with self._cond:
+            count = min(max(frames, 0), self.buffered_frames) * self.FRAME_SIZE
+            self._head = (self._head + count) % len(self._ring)
+            self._size -= count
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "buffered_frames": self.buffered_frames,
+            "underruns": self.underruns,
+            "underrun_events": self.underrun_events,
+            "startup_frames": self.startup_frames,
+            "short_frames": self.short_frames,
+        }
+
+    def is_alive(self) -> bool:
+        """ffmpeg ще працює (для заздалегідь запущених джерел)."""
+        return bool(self._ffmpeg) and self._ffmpeg.poll() is None
 
     def cleanup(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
         try:
             if self._ffmpeg and self._ffmpeg.poll() is None:
-                self._ffmpeg.kill()
+                process_supervisor.kill(self._ffmpeg)
         except Exception:
             pass
         try:
             if self._ytdlp and self._ytdlp.poll() is None:
-                self._ytdlp.kill()
+                process_supervisor.kill(self._ytdlp)
         except Exception:
             pass
 
@@ -95,10 +321,386 @@ class YTDLPPipeSource(discord.AudioSource):
         return False
 
 
-class YTDLSource(discord.PCMVolumeTransformer):
-    """Клас для представлення джерела аудіо з yt-dlp."""
+class OpusPipeSource(_PipeReadiness, discord.AudioSource):
+    """Аудіо source: FFmpeg сам кодує Opus (Ogg), бот лише пересилає готові пакети.
+
+    Без PCM у процесі бота немає ні PCMVolumeTransformer, ні libopus-кодування
+    на кожну гільдію. Потік-читач розбирає Ogg-сторінки у чергу пакетів, тож
+    `read()` так само не блокується: бракує пакета — OPUS_SILENCE (underrun)."""
+
+    MAX_PACKETS = 250  # ~5s пакетів по 20 мс
+    MAX_UNDERRUN_FRAMES = YTDLPPipeSource.MAX_UNDERRUN_FRAMES
+
+    def __init__(self, ffmpeg_process):
+        self._ffmpeg = ffmpeg_process
+        self._packets = deque()
+        self._cond = threading.Condition()
+        self._eof = threading.Event()
+        self._closed = False
+        self._init_readiness()
+        self._logged_failure = False
+        self.stderr_text = ""
+        self.frames = 0
+        self.underruns = 0
+        self.underrun_events = 0
+        self.startup_frames = 0
+        self.first_frame_at = None
+        self.frame_timer = None
+        self.last_read_at = None
+        self._consecutive_underruns = 0
+        self._reader = threading.Thread(
+            target=self._fill, name=f"ffmpeg-opus-reader-{getattr(ffmpeg_process, 'pid', '?')}", daemon=True
+        )
+        self._reader.start()
+        process_supervisor.adopt(ffmpeg_process, self)
+
+    def _fill(self) -> None:
+        try:
+            for packet in OggStream(self._ffmpeg.stdout).iter_packets():
+                if packet.startswith((b"OpusHead", b"OpusTags")):
+                    continue  # заголовки Ogg Opus — не аудіо
+                with self._cond:
+                    while len(self._packets) >= self.MAX_PACKETS and not self._closed:
+                        self._cond.wait(0.5)
+                    if self._closed:
+                        break
+                    self._packets.append(packet)
+                if not self._ready.is_set():
+                    self._signal_ready()
+        except Exception as exc:
+            if not self._closed:
+                logging.warning(f"ffmpeg opus reader stopped: {exc}")
+        finally:
+            self._eof.set()
+            self._signal_ready()
+
+    def read(self):
+        self.last_read_at = time.monotonic()
+        timer = self.frame_timer
+        if timer is None:
+            return self._next_frame()[0]
+        started = time.perf_counter()
+        frame, kind = self._next_frame()
+        timer.record(started, time.perf_counter(), kind)
+        return frame
+
+    def _next_frame(self):
+        with self._cond:
+            packet = self._packets.popleft() if self._packets else None
+            if packet is not None:
+                self._cond.notify()
+        if packet is not None:
+            self.frames += 1
+            if self.first_frame_at is None:
+                self.first_frame_at = time.perf_counter()
+            self._consecutive_underruns = 0
+            return packet, FRAME_OK
+        if self._eof.is_set():
+            if not self._logged_failure:
+                self._logged_failure = True
+                logging.error(f"Audio pipeline stopped: ffmpeg (opus) exited with code {self._ffmpeg.poll()}")
+                if self._ffmpeg.poll() is not None:
+                    self.stderr_text = YTDLPPipeSource._read_stderr(self._ffmpeg, "ffmpeg (opus)")
+            return b"", FRAME_END
+        if self.frames == 0:
+            self.startup_frames += 1
+            kind = FRAME_STARTUP
+        else:
+            if self._consecutive_underruns == 0:
+                self.underrun_events += 1
+            self.underruns += 1
+            kind = FRAME_UNDERRUN
+        self._consecutive_underruns += 1
+        if self._consecutive_underruns >= self.MAX_UNDERRUN_FRAMES:
+            return b"", FRAME_END
+        return OPUS_SILENCE, kind
+
+    @property
+    def buffered_frames(self) -> int:
+        return len(self._packets)
+
+    def discard(self, frames: int) -> None:
+        """Відкидає до `frames` буферизованих пакетів (по 20 мс кожен)."""
+        with self._cond:
+            for _ in range(min(max(frames, 0), len(self._packets))):
+                self._packets.popleft()
+            self._cond.notify()
+
+    def is_alive(self) -> bool:
+        return bool(self._ffmpeg) and self._ffmpeg.poll() is None
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "buffered_frames": len(self._packets),
+            "underruns": self.underruns,
+            "underrun_events": self.underrun_events,
+            "startup_frames": self.startup_frames,
+        }
+
+    def cleanup(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        try:
+            if self._ffmpeg and self._ffmpeg.poll() is None:
+                process_supervisor.kill(self._ffmpeg)
+        except Exception:
+            pass
+
+    def is_opus(self):
+        return True
+
+
+class FFmpegPipeline:
+    """Параметри запуску ffmpeg для треку: фільтри (fade, loudnorm, гучність) і
+    media URL. Дозволяють перезапустити ffmpeg з будь-якої позиції з новою
+    гучністю без повторної екстракції."""
+
+    FRAMES_PER_SECOND = 50
+
+    def __init__(
+        self,
+        page_url: str,
+        stream_url: str,
+        *,
+        duration=None,
+        fade_seconds: float = 0.0,
+        fade_in: bool = False,
+        fade_out: bool = False,
+        guild_id=None,
+    ):
+        self.page_url = page_url
+        self.stream_url = stream_url
+        self.duration = duration
+        self.fade_seconds = fade_seconds
+        self.fade_in = fade_in
+        self.fade_out = fade_out
+        self.guild_id = guild_id  # для process_supervisor: перезапуски йдуть поза задачею гільдії
+        # Вимірювальний прохід loudnorm (немає кешованих вимірів на старті)
+        self.measuring = consts.LOUDNORM_ENABLED and loudness_cache.get(page_url) is None
+
+    def audio_filter(self, volume: float, start_at: float = 0.0) -> str:
+        audio_filter = "aresample=async=1:first_pts=0,asetpts=N/SR/TB"
+        if consts.LOUDNORM_ENABLED:
+            audio_filter += "," + loudness_cache.filter_for(self.page_url)
+        fade_s = self.fade_seconds
+        if fade_s > 0:
+            if self.fade_in and start_at <= 0:
+                audio_filter += f",afade=t=in:st=0:d={fade_s}"
+            if self.fade_out:
+                dur = self.duration
+                if isinstance(dur, (int, float)) and dur and dur > fade_s:
+                    st = max(0.0, float(dur) - fade_s - start_at)
+                    audio_filter += f",afade=t=out:st={st}:d={fade_s}"
+        volume = max(0.0, min(float(volume), consts.VOLUME_MAX))
+        if abs(volume - 1.0) >= 0.0005:
+            audio_filter += f",volume={volume:.3f}"
+        return audio_filter
+
+    async def spawn(self, volume: float, start_frames: int, *, opus: bool = False):
+        """Перезапуск ffmpeg з позиції `start_frames`; None — якщо він не дав першого кадру."""
+        start_at = start_frames / self.FRAMES_PER_SECOND
+        source, ffmpeg_process = await YTDLSource._start_pipe(
+            self.stream_url, self.audio_filter(volume, start_at), opus=opus, start_at=start_at, guild_id=self.guild_id
+        )
+        if source is None:
+            YTDLPPipeSource._read_stderr(ffmpeg_process, f"ffmpeg restart (exit {ffmpeg_process.poll()})")
+        return source
+
+
+class _FFmpegVolumeControl:
+    """Гучність у фільтрі ffmpeg замість множення кожного кадру в Python.
+
+    Зміна `volume` під час треку запускає ffmpeg з поточної позиції з новим
+    фільтром (seek-restart). Потік плеєра підміняє `original` на новий процес,
+    щойно той буферизував потрібний кадр, тож відтворення не переривається.
+    `seek()` — той самий перезапуск, але з довільної позиції (`-ss` перед `-i`)."""
+
+    @property
+    def stream_url(self):
+        """Media URL поточного треку (None — джерело без FFmpegPipeline)."""
+        return self._pipeline.stream_url if self._pipeline is not None else None
+
+    def _init_volume_control(self, pipeline, volume: float) -> None:
+        self._pipeline = pipeline
+        self._volume = max(volume, 0.0)
+        self._applied_volume = self._volume  # гучність ffmpeg, який зараз грає
+        self._spawned_volume = self._volume  # гучність останнього запущеного (можливо, ще не підміненого)
+        self._base_frames = 0  # позиція треку (у кадрах), з якої стартував поточний ffmpeg
+        self._pending = None  # (source, start_frames, jump, volume) — перезапущений ffmpeg до підміни
+        self._seek_to = None  # позиція (кадри) для наступного перезапуску — запит seek()
+        self._pending_lock = threading.Lock()
+        self._restart_task = None
+        self._closed = False
+        self._loudness_recorded = False
+        self.restarts = 0
+
+    @property
+    def volume(self) -> float:
+        return self._volume
+
+    @volume.setter
+    def volume(self, value: float) -> None:
+        self._volume = max(value, 0.0)
+        if self._pipeline is not None and self._volume != self._spawned_volume:
+            self._schedule_restart()
+
+    def position_frames(self) -> int:
+        """Позиція треку в кадрах (20 мс): старт поточного ffmpeg + віддані ним кадри."""
+        pending = self._pending
+        if pending is not None and pending[2]:
+            return pending[1]  # seek, який потік плеєра ще не підхопив
+        return self._base_frames + getattr(self.original, "frames", 0)
+
+    def position_seconds(self) -> float:
+        return self.position_frames() / FFmpegPipeline.FRAMES_PER_SECOND
+
+    async def seek(self, seconds: float) -> bool:
+        """Перемотує трек: ffmpeg перезапускається з `seconds` на тому самому media URL.
+        False — без FFmpegPipeline або якщо новий ffmpeg не дав аудіо."""
+        if self._pipeline is None or self._closed:
+            return False
+        self._seek_to = max(0, int(seconds * FFmpegPipeline.FRAMES_PER_SECOND))
+        task = self._schedule_restart()
+        if task is None:
+            return False
+        return await asyncio.shield(task)
+
+    def _schedule_restart(self):
+        if self._restart_task is not None and not self._restart_task.done():
+            return self._restart_task  # поточний перезапуск підхопить нове значення
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logging.warning("Volume change outside the event loop — it applies from the next track")
+            return None
+        self._restart_task = loop.create_task(self._restart_ffmpeg())
+        return self._restart_task
 
-    def __init__(self, source, *, data, volume=0.5):
+    async def _restart_ffmpeg(self) -> bool:
+        while not self._closed and (self._volume != self._spawned_volume or self._seek_to is not None):
+            volume = self._volume
+            jump = self._seek_to is not None
+            start = self._seek_to if jump else self.position_frames()
+            self._seek_to = None
+            reason = "seek" if jump else "volume change"
+            try:
+                source = await self._pipeline.spawn(volume, start, opus=self.is_opus())
+            except Exception as e:
+                logging.error(f"ffmpeg restart for {reason} failed: {e}")
+                return False
+            if source is None:
+                logging.warning(f"ffmpeg restart for {reason} failed — keeping the current stream")
+                return False
+            with self._pending_lock:
+                if self._closed:
+                    source.cleanup()
+                    return False
+                stale, self._pending = self._pending, None
+                # Перезапуск поверх ще не підхопленого seek стартував з його позиції
+                self._pending = (source, start, jump or (stale is not None and stale[2]), volume)
+                self._spawned_volume = volume
+            if stale is not None:
+                stale[0].cleanup()
+            self.restarts += 1
+        return True
+
+    def _swap_restarted(self) -> None:
+        """Потік плеєра: переходить на перезапущений ffmpeg, коли той наздогнав позицію."""
+        with self._pending_lock:
+            if self._pending is None:
+                return
+            source, start, jump, volume = self._pending
+            skip = self.position_frames() - start  # після seek — 0
+            if source.buffered_frames <= skip:
+                if not source._eof.is_set():
+                    # Ще позаду — граємо старий потік. Уже пройдені кадри відкидаються,
+                    # інакше при старті довшому за кільцевий буфер ffmpeg стане на повній трубі
+                    behind = source.buffered_frames
+                    if behind:
+                        source.discard(behind)
+                        self._pending = (source, start + behind, jump, volume)
+                    return
+                self._pending = None
+                # Гучність не застосувалась — наступна зміна знову перезапустить ffmpeg
+                self._spawned_volume = self._applied_volume
+                dead = source
+            else:
+                self._pending = None
+                dead = None
+        if dead is not None:
+            logging.warning("Restarted ffmpeg ended before catching up — keeping the current stream")
+            dead.cleanup()
+            return
+        source.discard(skip)
+        # Той самий логічний потік — таймінг кадрів гільдії продовжується
+        source.frame_timer = getattr(self.original, "frame_timer", None)
+        old, self.original = self.original, source
+        self._base_frames = start + skip
+        self._applied_volume = volume
+        old.cleanup()
+
+    def _read_live(self) -> bytes:
+        if self._pending is not None:
+            self._swap_restarted()
+        frame = self.original.read()
+        if not frame:
+            self._record_loudness()
+        return frame
+
+    def _record_loudness(self) -> None:
+        """Зберігає виміри loudnorm, якщо цей ffmpeg пройшов трек від початку до кінця."""
+        pipeline = self._pipeline
+        if self._loudness_recorded or pipeline is None or not pipeline.measuring or self._base_frames:
+            return
+        self._loudness_recorded = True
+        loudness_cache.record(pipeline.page_url, getattr(self.original, "stderr_text", ""))
+
+    def _close_volume_control(self) -> None:
+        with self._pending_lock:
+            self._closed = True
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            pending[0].cleanup()
+        if self._restart_task is not None and not self._restart_task.done():
+            self._restart_task.cancel()
+
+
+class YTDLOpusSource(_FFmpegVolumeControl, discord.AudioSource):
+    """Метадані треку поверх OpusPipeSource (аналог YTDLSource без PCM).
+    Гучність — у фільтрі ffmpeg; без `pipeline` її не змінити до наступного треку."""
+
+    def __init__(self, source: OpusPipeSource, *, data, volume=0.5, pipeline: FFmpegPipeline = None):
+        self.original = source
+        self.data = data
+        self.title = data.get("title")
+        self.url = data.get("webpage_url")
+        self.duration = data.get("duration")
+        self.thumbnail = data.get("thumbnail")
+        self._init_volume_control(pipeline, volume)
+
+    def read(self):
+        return self._read_live()
+
+    def cleanup(self):
+        self._close_volume_control()
+        self.original.cleanup()
+
+    def is_opus(self):
+        return True
+
+
+class YTDLSource(_FFmpegVolumeControl, discord.PCMVolumeTransformer):
+    """Клас для представлення джерела аудіо з yt-dlp.
+    З `pipeline` гучність застосовує ffmpeg, і `read()` віддає кадри без
+    `audioop.mul`; без нього — звичайний PCMVolumeTransformer."""
+
+    # Скидається, якщо ffmpeg не вміє libopus — далі лише PCM
+    _opus_available = consts.OPUS_ENCODE_IN_FFMPEG
+
+    def __init__(self, source, *, data, volume=0.5, pipeline: FFmpegPipeline = None):
+        self._init_volume_control(pipeline, volume)
         super().__init__(source, volume)
         self.data = data
         self.title = data.get("title")
@@ -106,6 +708,15 @@ class YTDLSource(discord.PCMVolumeTransformer):
         self.duration = data.get("duration")
         self.thumbnail = data.get("thumbnail")
 
+    def read(self):
+        if self._pipeline is None:
+            return super().read()
+        return self._read_live()
+
+    def cleanup(self):
+        self._close_volume_control()
+        super().cleanup()
+
     @classmethod
     async def from_track_dict(
         cls,
@@ -115,8 +726,15 @@ class YTDLSource(discord.PCMVolumeTransformer):
         fade_seconds: float = 0.0,
         fade_in: bool = False,
         fade_out: bool = False,
+        opus: bool = False,
+        volume: float = 0.5,
     ):
-        """Створює YTDLSource: yt-dlp API → direct URL → FFmpeg PCM pipe."""
+        """Створює YTDLSource: yt-dlp API → direct URL → FFmpeg PCM pipe.
+        Трек з дискового аудіокешу грає з локального файла, без екстракції.
+        `start_at` у track_dict (секунди) — старт з позиції (auto-resume).
+        З FFMPEG_VOLUME гучність `volume` застосовує фільтр ffmpeg.
+        З `opus=True` ffmpeg кодує Opus сам (YTDLOpusSource); якщо це не вдалося —
+        автоматичний відкат на PCM."""
         if not track_dict:
             logging.error("No track metadata provided")
             return None
@@ -131,81 +749,355 @@ class YTDLSource(discord.PCMVolumeTransformer):
         logging.info(f"Creating audio pipeline for: {track_dict.get('title', 'Unknown')}")
 
         try:
-            stream_url, info = await loop.run_in_executor(
-                None, lambda: extract_stream_url(url)
-            )
-            if not stream_url:
-                raise RuntimeError(f"Could not resolve stream URL for {url}")
+            # Етапи старту для instrumentation (resolve / ffmpeg_spawn), секунди
+            timings = {"resolve": 0.0, "ffmpeg_spawn": 0.0}
+            started = time.perf_counter()
+            local = audio_cache.lookup(url)
+            if local:
+                stream_url, info = local
+                from_cache = True
+                logging.info(f"Audio cache hit for: {url}")
+            else:
+                stream_url, info, from_cache = await cls.resolve_stream_url(url, loop)
+            timings["resolve"] += time.perf_counter() - started
 
             merged = dict(track_dict)
             if info:
                 merged.setdefault("title", info.get("title"))
                 merged.setdefault("webpage_url", info.get("webpage_url") or url)
-                merged.setdefault("duration", info.get("duration"))
-                merged.setdefault("thumbnail", info.get("thumbnail"))
-
-            ffmpeg_opts_list = shlex.split(FFMPEG_OPTIONS["options"])
-            before_opts_list = shlex.split(FFMPEG_OPTIONS["before_options"])
-
-            audio_filter = "aresample=async=1:first_pts=0,asetpts=N/SR/TB"
+                # Записи плейлиста можуть прийти без тривалості/обкладинки
+                for key in ("duration", "thumbnail"):
+                    if merged.get(key) is None:
+                        merged[key] = info.get(key)
 
             try:
                 fade_s = float(fade_seconds or 0.0)
             except Exception:
                 fade_s = 0.0
-            if fade_s > 0:
-                if fade_in:
-                    audio_filter += f",afade=t=in:st=0:d={fade_s}"
-                if fade_out:
-                    dur = merged.get("duration")
-                    if isinstance(dur, (int, float)) and dur and dur > fade_s:
-                        st = max(0.0, float(dur) - fade_s)
-                        audio_filter += f",afade=t=out:st={st}:d={fade_s}"
-
-            ffmpeg_cmd = (
-                [
-                    "ffmpeg",
-                    "-fflags",
-                    "+discardcorrupt",
-                    "-nostdin",
-                ]
-                + before_opts_list
-                + [
-                    "-i",
-                    stream_url,
-                    "-f",
-                    "s16le",
-                    "-af",
-                    audio_filter,
-                ]
-                + ffmpeg_opts_list
-                + ["pipe:1"]
+            try:
+                start_at = max(0.0, float(track_dict.get("start_at") or 0.0))
+            except (TypeError, ValueError):
+                start_at = 0.0
+            pipeline = FFmpegPipeline(
+                url,
+                stream_url,
+                duration=merged.get("duration"),
+                fade_seconds=fade_s,
+                fade_in=fade_in,
+                fade_out=fade_out,
+                guild_id=current_guild(),
             )
 
-            ffmpeg_process = subprocess.Popen(
-                ffmpeg_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                bufsize=4 * 1024 * 1024,
-            )
+            if opus and cls._opus_available:
+                started = time.perf_counter()
+                player = await cls._start_opus(pipeline, merged, volume, start_at)
+                timings["ffmpeg_spawn"] += time.perf_counter() - started
+                if player is not None:
+                    player.start_timings = timings
+                    return player
 
-            await asyncio.sleep(0.3)
-            if ffmpeg_process.poll() is not None:
+            audio_filter = pipeline.audio_filter(volume if consts.FFMPEG_VOLUME else 1.0, start_at)
+            started = time.perf_counter()
+            source, ffmpeg_process = await cls._start_pipe(stream_url, audio_filter, start_at=start_at)
+            timings["ffmpeg_spawn"] += time.perf_counter() - started
+            if source is None and from_cache:
+                # Кешований URL відкликано раніше за expire (або файл кешу зіпсований) — резолвимо заново
+                YTDLPPipeSource._read_stderr(ffmpeg_process, "ffmpeg (cached URL)")
+                logging.warning(f"Cached stream URL rejected by ffmpeg, re-resolving: {url}")
+                if is_local(stream_url):
+                    audio_cache.discard(url)
+                else:
+                    stream_url_cache.invalidate(url)
+                started = time.perf_counter()
+                stream_url, _, _ = await cls.resolve_stream_url(url, loop, use_cache=not is_local(stream_url))
+                timings["resolve"] += time.perf_counter() - started
+                pipeline.stream_url = stream_url
+                started = time.perf_counter()
+                source, ffmpeg_process = await cls._start_pipe(stream_url, audio_filter, start_at=start_at)
+                timings["ffmpeg_spawn"] += time.perf_counter() - started
+
+            if source is None:
                 YTDLPPipeSource._read_stderr(
                     ffmpeg_process,
-                    f"ffmpeg (exit {ffmpeg_process.returncode})",
+                    f"ffmpeg (exit {ffmpeg_process.poll()})",
                 )
                 raise RuntimeError(
-                    f"ffmpeg exited immediately with code {ffmpeg_process.returncode}"
+                    f"ffmpeg produced no audio within {consts.FFMPEG_READY_TIMEOUT}s "
+                    f"(exit code {ffmpeg_process.poll()})"
                 )
 
-            source = YTDLPPipeSource(None, ffmpeg_process)
             logging.info(
                 f"Audio pipeline started for: {merged.get('title', 'Unknown')} "
                 f"(ffmpeg pid={ffmpeg_process.pid})"
             )
-            return cls(source, data=merged)
+            if consts.FFMPEG_VOLUME:
+                player = cls(source, data=merged, volume=volume, pipeline=pipeline)
+            else:
+                player = cls(source, data=merged, volume=volume)
+            player._base_frames = int(start_at * FFmpegPipeline.FRAMES_PER_SECOND)
+            player.start_timings = timings
+            return player
 
         except Exception as e:
             logging.error(f"Error in from_track_dict: {str(e)}", exc_info=True)
             return None
+
+    @staticmethod
+    async def resolve_stream_url(url: str, loop, *, use_cache: bool = True, priority: int = PRIORITY_PLAYBACK):
+        """Повертає (stream_url, info, from_cache); екстракція лише при промаху кешу.
+        Екстракція йде через extraction_scheduler з пріоритетом `priority`."""
+        if use_cache:
+            cached = stream_url_cache.get(url)
+            if cached:
+                logging.info(f"Stream URL cache hit for: {url}")
+                return cached[0], cached[1], True
+        stream_url, info = await extraction_scheduler.run(extract_stream_url, url, priority=priority)
+        if not stream_url:
+            raise RuntimeError(f"Could not resolve stream URL for {url}")
+        stream_url_cache.put(url, stream_url, info)
+        return stream_url, info, False
+
+    @classmethod
+    async def _start_opus(cls, pipeline: FFmpegPipeline, data: dict, volume: float, start_at: float = 0.0):
+        """Opus-шлях; None — якщо ffmpeg не дав першого пакета (відкат на PCM)."""
+        source, ffmpeg_process = await cls._start_pipe(
+            pipeline.stream_url, pipeline.audio_filter(volume, start_at), opus=True, start_at=start_at
+        )
+        if source is None:
+            stderr = YTDLPPipeSource._read_stderr(ffmpeg_process, "ffmpeg (opus)")
+            if "libopus" in stderr or "Unknown encoder" in stderr:
+                logging.warning("ffmpeg has no libopus encoder — Opus mode disabled, using PCM")
+                cls._opus_available = False
+            return None
+        logging.info(
+            f"Opus pipeline started for: {data.get('title', 'Unknown')} (ffmpeg pid={ffmpeg_process.pid})"
+        )
+        player = YTDLOpusSource(source, data=data, volume=volume, pipeline=pipeline)
+        player._base_frames = int(start_at * FFmpegPipeline.FRAMES_PER_SECOND)
+        return player
+
+    @staticmethod
+    async def _start_ffmpeg(
+        stream_url: str, audio_filter: str, *, opus: bool = False, start_at: float = 0.0, guild_id=None
+    ):
+        """Запускає ffmpeg під наглядом process_supervisor (гільдія — `guild_id` або bind_guild())."""
+        ffmpeg_opts_list = shlex.split(FFMPEG_OPTIONS["options"])
+        # -reconnect* — опції HTTP; файл з аудіокешу відкривається без них
+        before_opts_list = [] if is_local(stream_url) else shlex.split(FFMPEG_OPTIONS["before_options"])
+        ffmpeg_cmd = (
+            [
+                "ffmpeg",
+                "-fflags",
+                "+discardcorrupt",
+                "-nostdin",
+                # Без рядків прогресу stderr лишається малим і не заповнює pipe
+                "-nostats",
+            ]
+            + before_opts_list
+            + (["-ss", f"{start_at:.3f}"] if start_at > 0 else [])
+            + [
+                "-i",
+                stream_url,
+            ]
+            + (
+                ["-f", "opus", "-c:a", "libopus", "-b:a", consts.OPUS_BITRATE]
+                if opus
+                else ["-f", "s16le"]
+            )
+            + [
+                "-af",
+                audio_filter,
+            ]
+            + ffmpeg_opts_list
+            + ["pipe:1"]
+        )
+
+        # fork/exec у потоці: великий процес бота не блокує event loop на час spawn
+        ffmpeg_process = await asyncio.to_thread(
+            subprocess.Popen,
+            ffmpeg_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=4 * 1024 * 1024,
+            **process_supervisor.popen_kwargs(),
+        )
+        if ffmpeg_process.stderr:
+            ffmpeg_process.stderr_tail = StderrTail(ffmpeg_process.stderr)
+        process_supervisor.register(ffmpeg_process, guild_id=guild_id)
+        return ffmpeg_process
+
+    @staticmethod
+    async def _start_pipe(
+        stream_url: str, audio_filter: str, *, opus: bool = False, start_at: float = 0.0, guild_id=None
+    ):
+        """ffmpeg + pipe-джерело, готове до відтворення: (source, process).
+
+        Готовність — перший кадр PCM (пакет Opus) у буфері, а не фіксована пауза.
+        source=None — ffmpeg завершився без жодного кадру або не дав його за
+        FFMPEG_READY_TIMEOUT (тоді процес уже зупинено); stderr — у `process.stderr_tail`."""
+        ffmpeg_process = await YTDLSource._start_ffmpeg(
+            stream_url, audio_filter, opus=opus, start_at=start_at, guild_id=guild_id
+        )
+        source = OpusPipeSource(ffmpeg_process) if opus else YTDLPPipeSource(None, ffmpeg_process)
+        if await source.wait_ready(consts.FFMPEG_READY_TIMEOUT):
+            return source, ffmpeg_process
+        if not source._eof.is_set():
+            logging.warning(f"ffmpeg gave no audio within {consts.FFMPEG_READY_TIMEOUT}s — stopping it")
+        source.cleanup()
+        return None, ffmpeg_process
+
+
+class CrossfadeSource(discord.AudioSource):
+    """Мікшер для безшовних переходів: останні `fade_seconds` треку N
+    накладаються на початок треку N+1 з рівнопотужною кривою (cos/sin).
+
+    Читається з потоку AudioPlayer discord.py (кадр 20 мс), тому мікшування —
+    це два `audioop.mul` і один `audioop.add` над цілим кадром у C. Наступний
+    трек додається з event loop через `queue_next`; доки перехід не відбувся,
+    ним володіє викликач (cleanup мікшера його не закриває).
+    """
+
+    FRAME_SIZE = YTDLPPipeSource.FRAME_SIZE
+    FRAMES_PER_SECOND = 50
+
+    def __init__(self, current, *, fade_seconds: float = 0.0):
+        self._lock = threading.Lock()
+        self._current = current
+        self._current_frames = 0
+        self._next = None
+        self._next_frames = 0
+        self._on_switch = None
+        self._fade_frames = max(0, int(float(fade_seconds or 0.0) * self.FRAMES_PER_SECOND))
+        self._fade_pos = None  # номер кадру переходу, None — переходу немає
+        self._fade_in_pos = None  # догравання fade-in після раннього кінця треку N
+        self._silence = b"\x00" * self.FRAME_SIZE
+
+    # ── Control (event loop) ─────────────────────────────────────
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def volume(self) -> float:
+        return getattr(self._current, "volume", 1.0)
+
+    @volume.setter
+    def volume(self, value: float) -> None:
+        with self._lock:
+            for source in (self._current, self._next):
+                if source is not None and hasattr(source, "volume"):
+                    source.volume = value
+
+    def remaining_seconds(self):
+        """Скільки лишилось грати поточному треку (за метаданими) або None."""
+        duration = getattr(self._current, "duration", None)
+        if not isinstance(duration, (int, float)) or duration <= 0:
+            return None
+        # Позиція джерела враховує seek; без неї — кадри, прочитані мікшером
+        position = getattr(self._current, "position_frames", None)
+        played = position() if callable(position) else None
+        if not isinstance(played, int):
+            played = self._current_frames
+        return max(0.0, float(duration) - played / self.FRAMES_PER_SECOND)
+
+    def queue_next(self, source, on_switch=None) -> bool:
+        """Ставить наступний трек; on_switch() викликається з потоку плеєра при переході."""
+        with self._lock:
+            if self._current is None or self._next is not None:
+                return False
+            self._next = source
+            self._next_frames = 0
+            self._on_switch = on_switch
+            return True
+
+    def cancel_next(self):
+        """Знімає ще не розпочатий наступний трек (повертає його викликачу)."""
+        with self._lock:
+            source, self._next, self._on_switch = self._next, None, None
+            return source
+
+    # ── Playback (player thread) ─────────────────────────────────
+
+    def _gains(self, pos: int):
+        t = min(1.0, pos / self._fade_frames) * (math.pi / 2)
+        return math.cos(t), math.sin(t)
+
+    def _pad(self, frame: bytes) -> bytes:
+        if len(frame) < self.FRAME_SIZE:
+            return frame.ljust(self.FRAME_SIZE, b"\x00")
+        return frame
+
+    def _switch(self) -> None:
+        self._current.cleanup()
+        self._current = self._next
+        self._next = None
+        on_switch, self._on_switch = self._on_switch, None
+        if self._fade_pos is not None and self._fade_pos < self._fade_frames:
+            self._fade_in_pos = self._fade_pos
+        self._fade_pos = None
+        self._current_frames = self._next_frames
+        if on_switch is not None:
+            try:
+                on_switch()
+            except Exception as e:
+                logging.error(f"Crossfade switch callback failed: {e}")
+
+    def read(self) -> bytes:
+        with self._lock:
+            if self._current is None:
+                return b""
+            if self._fade_pos is None and self._fade_frames:
+                remaining = self.remaining_seconds()
+                if remaining is not None and remaining * self.FRAMES_PER_SECOND <= self._fade_frames:
+                    self._fade_pos = 0
+
+            frame = self._current.read()
+            self._current_frames += 1
+
+            if self._fade_pos is None:
+                if not frame and self._next is not None:
+                    # Трек закінчився раніше за метадані — переходимо без паузи
+                    self._switch()
+                    frame = self._current.read()
+                    self._current_frames += 1
+                if frame and self._fade_in_pos is not None:
+                    frame = self._apply_fade_in(frame)
+                return frame
+
+            if self._next is None:
+                # Наступного треку немає — лише fade-out у тишу
+                if not frame or self._fade_pos >= self._fade_frames:
+                    return b""
+                out_gain, _ = self._gains(self._fade_pos)
+                self._fade_pos += 1
+                return audioop.mul(self._pad(frame), 2, out_gain)
+
+            incoming = self._next.read()
+            self._next_frames += 1
+            out_gain, in_gain = self._gains(self._fade_pos)
+            self._fade_pos += 1
+            if not frame or self._fade_pos >= self._fade_frames:
+                self._switch()
+            if not incoming:
+                return audioop.mul(self._pad(frame), 2, out_gain) if frame else b""
+            mixed = audioop.mul(self._pad(incoming), 2, in_gain)
+            if frame:
+                mixed = audioop.add(audioop.mul(self._pad(frame), 2, out_gain), mixed, 2)
+            return mixed
+
+    def _apply_fade_in(self, frame: bytes) -> bytes:
+        _, in_gain = self._gains(self._fade_in_pos)
+        self._fade_in_pos += 1
+        if self._fade_in_pos >= self._fade_frames:
+            self._fade_in_pos = None
+        return audioop.mul(self._pad(frame), 2, in_gain)
+
+    def cleanup(self) -> None:
+        with self._lock:
+            if self._current is not None:
+                self._current.cleanup()
+                self._current = None
+
+    def is_opus(self):
+        return False
@@ -0,0 +1,209 @@
+"""
+In-memory індекс кандидатів Automix для однієї гільдії.
+
+Раніше кожен вибір Automix робив SQL-запити топу та історії, розбирав URL
+кожного рядка й обирав трек лінійним проходом. Тепер AutomixService тримає
+для гільдії індекс: канонічні ключі треків (див. track_catalog), лічильники
+прослуховувань і штрафи за пропуски — у паралельних масивах, а ваги обох
+стратегій — у деревах Фенвіка. Вибір і оновлення ваги — O(log n), без БД.
+
+Індекс будується ліниво з SQLite при першому виборі й далі оновлюється
+подіями історії (HistoryService) та пропусками.
+"""
+
+import heapq
+import random
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from discord_music_bot.track_catalog import canonical_track_key, track_url
+
+POPULAR = "popular"
+EXPLORE = "explore"
+
+# Множник ваги за кожен пропуск (як і до індексу)
+PENALTY_FACTOR = 0.6
+
+
+class FenwickSampler:
+    """Зважена вибірка індексу за O(log n); ваги змінюються за O(log n)."""
+
+    def __init__(self):
+        self._tree: List[float] = [0.0]  # 1-based
+        self._weights: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def _prefix(self, i: int) -> float:
+        total = 0.0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def append(self, weight: float) -> int:
+        """Додає елемент у кінець і повертає його індекс."""
+        i = len(self._weights) + 1
+        weight = max(0.0, weight)
+        self._weights.append(weight)
+        # Вузол i покриває (i - lowbit(i), i]
+        self._tree.append(weight + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+        return i - 1
+
+    def set(self, index: int, weight: float) -> None:
+        weight = max(0.0, weight)
+        delta = weight - self._weights[index]
+        if delta == 0.0:
+            return
+        self._weights[index] = weight
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def weight(self, index: int) -> float:
+        return self._weights[index]
+
+    def total(self) -> float:
+        return self._prefix(len(self._weights))
+
+    def sample(self, rng: random.Random) -> Optional[int]:
+        """Індекс з імовірністю weight / total або None, якщо всі ваги нульові."""
+        n = len(self._weights)
+        for _ in range(4):
+            total = self.total()
+            if total <= 0.0:
+                return None
+            target = (1.0 - rng.random()) * total  # (0, total]
+            pos = 0
+            step = 1 << n.bit_length()
+            while step:
+                nxt = pos + step
+                if nxt <= n and self._tree[nxt] < target:
+                    target -= self._tree[nxt]
+                    pos = nxt
+                step >>= 1
+            # Похибка float може вказати на нульовий елемент — пробуємо ще раз
+            if pos < n and self._weights[pos] > 0.0:
+                return pos
+        return None
+
+
+class GuildCandidateIndex:
+    """Кандидати Automix гільдії: ключі, лічильники, штрафи й два семплери."""
+
+    def __init__(self, max_penalty: int, rng: Optional[random.Random] = None):
+        self.max_penalty = max_penalty
+        self._rng = rng or random.Random()
+        self.keys: List[str] = []
+        self.tracks: List[Dict[str, Any]] = []
+        self.play_counts: List[int] = []
+        self.penalties: List[int] = []
+        self._slots: Dict[str, int] = {}
+        self._samplers = {POPULAR: FenwickSampler(), EXPLORE: FenwickSampler()}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def decay(self, slot: int) -> float:
+        return PENALTY_FACTOR ** min(self.penalties[slot], self.max_penalty)
+
+    def _weights(self, slot: int) -> Dict[str, float]:
+        count = self.play_counts[slot]
+        if count <= 0:
+            return {POPULAR: 0.0, EXPLORE: 0.0}
+        decay = self.decay(slot)
+        return {
+            # top_weighted: популярність
+            POPULAR: max(0.1, count * decay),
+            # history_explore: менше програні треки отримують більшу вагу
+            EXPLORE: max(0.05, decay / (1.0 + count)),
+        }
+
+    def _refresh(self, slot: int) -> None:
+        for kind, weight in self._weights(slot).items():
+            self._samplers[kind].set(slot, weight)
+
+    def _slot(self, track: Dict[str, Any]) -> Optional[int]:
+        url = track_url(track)
+        if not url:
+            return None
+        key = canonical_track_key(url)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self.keys)
+            self._slots[key] = slot
+            self.keys.append(key)
+            self.tracks.append({})
+            self.play_counts.append(0)
+            self.penalties.append(0)
+            for sampler in self._samplers.values():
+                sampler.append(0.0)
+        stored = self.tracks[slot]
+        stored.setdefault("url", url)
+        for field in ("title", "duration", "thumbnail"):
+            if track.get(field) is not None:
+                stored[field] = track[field]
+            else:
+                stored.setdefault(field, None)
+        return slot
+
+    def add(self, track: Dict[str, Any], play_count: int) -> None:
+        """Початкове заповнення: трек з відомим лічильником (не менше наявного)."""
+        slot = self._slot(track)
+        if slot is None:
+            return
+        self.play_counts[slot] = max(self.play_counts[slot], int(play_count))
+        self._refresh(slot)
+
+    def record_play(self, track: Dict[str, Any], delta: int = 1) -> None:
+        slot = self._slot(track)
+        if slot is None:
+            return
+        self.play_counts[slot] = max(0, self.play_counts[slot] + delta)
+        self._refresh(slot)
+
+    def set_penalty(self, url: str, skips: int) -> None:
+        slot = self._slots.get(canonical_track_key(url))
+        if slot is None:
+            return
+        self.penalties[slot] = int(skips)
+        self._refresh(slot)
+
+    def set_penalties(self, penalties: Dict[str, int]) -> None:
+        for url, skips in penalties.items():
+            self.set_penalty(url, skips)
+
+    def sample(self, kind: str, blocked_urls: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """Зважений вибір трека стратегії `kind`, оминаючи заблоковані (недавні) URL."""
+        sampler = self._samplers[kind]
+        hidden = []
+        for url in blocked_urls:
+            slot = self._slots.get(canonical_track_key(url)) if url else None
+            if slot is not None and sampler.weight(slot) > 0.0:
+                hidden.append((slot, sampler.weight(slot)))
+                sampler.set(slot, 0.0)
+        try:
+            slot = sampler.sample(self._rng)
+        finally:
+            for hidden_slot, weight in hidden:
+                sampler.set(hidden_slot, weight)
+        return dict(self.tracks[slot]) if slot is not None else None
+
+    def nearest(
+        self,
+        distance_to: Callable[[str], Optional[float]],
+        k: int,
+        blocked_urls: Iterable[str] = (),
+    ) -> List[Tuple[Dict[str, Any], float, float]]:
+        """k найближчих треків як (трек, відстань, множник штрафу); distance_to(key) → None
+        означає, що для треку немає ознак."""
+        blocked = {canonical_track_key(url) for url in blocked_urls if url}
+        scored = []
+        for slot, key in enumerate(self.keys):
+            if self.play_counts[slot] <= 0 or key in blocked:
+                continue
+            dist = distance_to(key)
+            if dist is not None:
+                scored.append((dist, slot))
+        return [(dict(self.tracks[slot]), dist, self.decay(slot)) for dist, slot in heapq.nsmallest(k, scored)]
@@ -2,20 +2,29 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import asyncio
+import datetime
 import logging
 import random
+import time
 from discord_music_bot.services.queue_service import QueueService
 from discord_music_bot.services.history_service import HistoryService
 from discord_music_bot.services.player_service import PlayerService
+from discord_music_bot.services.prefetch_service import PrefetchService
 from discord_music_bot.services.automix_service import AutomixService, AutomixConfig
 from discord_music_bot.services.dj_service import DJService
+from discord_music_bot.services.extraction_scheduler import bind_guild
+from discord_music_bot.services.feature_service import AudioFeatureService
+from discord_music_bot.audio_cache import audio_cache
 from discord_music_bot.audio_source import YTDLSource
-from discord_music_bot.utils import format_duration
-from discord_music_bot.utils import format_duration
-from discord_music_bot.database import init_db
+from discord_music_bot.utils import format_duration, parse_timestamp
+from discord_music_bot.database import init_db, close_db
+from discord_music_bot.instrumentation import instrumentation
+from discord_music_bot.profile_selector import profile_selector
+from discord_music_bot.search_cache import search_cache
 from discord_music_bot.repository import MusicRepository
 from discord_music_bot.services.auto_resume import auto_resume
 from discord_music_bot.services.source_service import SourceService
+from discord_music_bot.services.write_buffer import WriteBehindBuffer
 from discord_music_bot.views.dismiss_view import DismissView
 from discord_music_bot.views.history_view import HistoryView
 from discord_music_bot.views.music_controls import MusicControls
@@ -29,13 +38,22 @@ class MusicCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.repository = MusicRepository()
-        self.queue_service = QueueService(self.repository)
-        self.history_service = HistoryService(self.repository)
+        # Усі фонові записи в БД йдуть через один буфер: порядок, коалесценція, пакетний commit
+        self.write_buffer = WriteBehindBuffer(self.repository)
+        self.queue_service = QueueService(self.repository, self.write_buffer)
+        self.history_service = HistoryService(self.repository, self.write_buffer)
         self.player_service = PlayerService()
+        # Розв'язує URL наступного треку, поки грає поточний
+        self.prefetch_service = PrefetchService(self.queue_service)
+        self.queue_service.add_listener(self._on_queue_changed)
+        # Аудіоознаки треків для Automix similar_sound (аналіз у пулі процесів)
+        self.feature_service = AudioFeatureService(self.repository)
         self.automix_service = AutomixService(
             self.repository,
             config=AutomixConfig(recent_window=consts.AUTOMIX_RECENT_WINDOW),
+            features=self.feature_service,
         )
+        self.history_service.add_listener(self.automix_service.on_history_event)
         self.dj_service = DJService()
         self.source_service = SourceService()
         self.current_song = {}
@@ -50,7 +68,11 @@ class MusicCog(commands.Cog):
         self._automix_settings_cache = {}  # {guild_id: {"enabled": bool, "strategy": str}}
         self._automix_strategy_mode = {}  # {guild_id: str} — дзеркало cache після load
         self._automix_recent_picks = {}  # {guild_id: [url, ...]} — diversity у сесії
-        self._fade_seconds = {}  # {guild_id: float} — per-track fade in/out (MVP)
+        self._fade_seconds = {}  # {guild_id: float} — тривалість кросфейду між треками
+        self._crossfade_tasks = {}  # {guild_id: Task} — підготовка наступного треку до перекриття
+        self._crossfade_pending = {}  # {guild_id: dict} — трек, уже переданий мікшеру
+        self._metadata_tasks = set()  # фонові доповнення метаданих плейлистів
+        self._position_timer = None  # TimerHandle періодичного збереження позиції треку
         self._dj_settings_cache = {}  # {guild_id: {"enabled": bool, "persona": str}}
         self._dj_tracks_since_comment = {}  # {guild_id: int}
         self.logger = logging.getLogger('MusicBot')
@@ -62,10 +84,42 @@ class MusicCog(commands.Cog):
     async def cog_load(self):
         """Викликається при завантаженні когу — ініціалізує БД та запускає auto-resume."""
         await init_db()
+        try:
+            profile_selector.load(await self.repository.get_extraction_profile_stats())
+        except Exception as e:
+            self.logger.warning(f"Не вдалося завантажити статистику профілів екстракції: {e}")
+        try:
+            await self.repository.prune_search_cache(consts.SEARCH_CACHE_MAX_ENTRIES)
+            restored = search_cache.load(await self.repository.get_search_cache(consts.SEARCH_CACHE_MAX_ENTRIES))
+            self.logger.info(f"Кеш пошуку відновлено: {restored} запитів")
+        except Exception as e:
+            self.logger.warning(f"Не вдалося завантажити кеш пошуку: {e}")
+        search_cache.add_listener(self._on_search_cached)
+        self._schedule_position_save()
+        self.logger.info(f"Аудіоознаки треків завантажено: {await self.feature_service.load()}")
+        try:
+            cached = await asyncio.to_thread(audio_cache.load)
+            audio_cache.seed(await self.repository.get_popular_tracks(consts.AUDIO_CACHE_SEED_TRACKS))
+            self.logger.info(f"Аудіокеш: {cached} треків на диску")
+        except Exception as e:
+            self.logger.warning(f"Не вдалося завантажити аудіокеш: {e}")
         self.logger.info("БД ініціалізована, ког MusicCog завантажений.")
         # Auto-resume запускається після готовності бота (чекаємо on_ready)
         self.bot.add_listener(self._on_ready_auto_resume, 'on_ready')
 
+    async def cog_unload(self):
+        """Викликається при вивантаженні когу — скидає буфер записів і закриває пул з'єднань з БД."""
+        self.prefetch_service.close()
+        self.feature_service.close()
+        audio_cache.close()
+        if self._position_timer is not None:
+            self._position_timer.cancel()
+            self._position_timer = None
+        search_cache.remove_listener(self._on_search_cached)
+        await self.write_buffer.close()
+        await close_db()
+        self.logger.info("Пул з'єднань з БД закрито, ког MusicCog вивантажений.")
+
     async def _ensure_automix_state_loaded(self, guild_id: int) -> None:
         """Lazy-load Automix settings + penalties from DB once per guild."""
         if guild_id not in self._automix_settings_cache:
@@ -124,11 +178,13 @@ class MusicCog(commands.Cog):
             return
         gpen = self._automix_skip_penalties.setdefault(guild_id, {})
         gpen[url] = int(gpen.get(url, 0)) + 1
+        self.automix_service.skip_recorded(guild_id, url, gpen[url])
         strat = song.get("automix_strategy")
-        asyncio.ensure_future(self.repository.increment_automix_skip(guild_id, url))
-        asyncio.ensure_future(
-            self.repository.add_automix_feedback_event(guild_id, "skipped", url, strategy=strat)
+        self.write_buffer.append(None, self.repository.increment_automix_skip(guild_id, url))
+        self.write_buffer.append(
+            None, self.repository.add_automix_feedback_event(guild_id, "skipped", url, strategy=strat)
         )
+        await self.write_buffer.backpressure()
 
     async def _on_ready_auto_resume(self):
         """Запускає auto-resume після повної готовності бота."""
@@ -200,14 +256,15 @@ class MusicCog(commands.Cog):
         )
         try:
             await channel.send(f"🎙️ {comment}")
-            asyncio.ensure_future(
+            self.write_buffer.append(
+                None,
                 self.repository.add_dj_event(
                     guild_id,
                     "comment",
                     persona=dj.get("persona"),
                     track_url=song.get("url"),
                     message=comment,
-                )
+                ),
             )
         except Exception as e:
             self.logger.warning(f"DJ comment send failed for {guild_id}: {e}")
@@ -308,22 +365,49 @@ class MusicCog(commands.Cog):
         
         return None
 
+    def _archive_current_song(self, guild_id: int) -> None:
+        if guild_id in self.current_song:
+            # Додаємо в історію через HistoryService (зберігає і в пам'ять, і в БД)
+            song = self.current_song[guild_id]
+            # Нормалізуємо дані трека — гарантуємо url і webpage_url
+            history_track = {
+                'title': song.get('title', 'Unknown'),
+                'url': song.get('url') or song.get('webpage_url', ''),
+                'webpage_url': song.get('webpage_url') or song.get('url', ''),
+                'duration': song.get('duration'),
+                'thumbnail': song.get('thumbnail'),
+                'requester': song.get('requester'),
+            }
+            self.history_service.add_to_history(guild_id, history_track)
+
+    def _source_kwargs(self, guild_id: int) -> dict:
+        fade_s = float(self._fade_seconds.get(guild_id, consts.DEFAULT_FADE_SECONDS))
+        if fade_s < consts.FADE_SECONDS_MIN:
+            fade_s = consts.FADE_SECONDS_MIN
+        if fade_s > consts.FADE_SECONDS_MAX:
+            fade_s = consts.FADE_SECONDS_MAX
+        kwargs = dict(
+            fade_seconds=fade_s,
+            # Important: fade-in from silence feels like the track "starts later".
+            # Перехід між треками робить CrossfadeSource, тож afade у ffmpeg не потрібен.
+            fade_in=False,
+            fade_out=False,
+        )
+        if consts.FFMPEG_VOLUME or consts.OPUS_ENCODE_IN_FFMPEG:
+            # Гучність застосовує фільтр ffmpeg
+            kwargs["volume"] = self._guild_volumes.get(guild_id, consts.DEFAULT_VOLUME)
+        if consts.OPUS_ENCODE_IN_FFMPEG and fade_s <= 0:
+            # Без кросфейду PCM у процесі не потрібен — ffmpeg сам кодує Opus
+            kwargs["opus"] = True
+        return kwargs
+
     async def play_next_song(self, guild, voice_client):
         try:
+            started_at = time.perf_counter()
             guild_id = guild.id
-            if guild_id in self.current_song:
-                # Додаємо в історію через HistoryService (зберігає і в пам'ять, і в БД)
-                song = self.current_song[guild_id]
-                # Нормалізуємо дані трека — гарантуємо url і webpage_url
-                history_track = {
-                    'title': song.get('title', 'Unknown'),
-                    'url': song.get('url') or song.get('webpage_url', ''),
-                    'webpage_url': song.get('webpage_url') or song.get('url', ''),
-                    'duration': song.get('duration'),
-                    'thumbnail': song.get('thumbnail'),
-                    'requester': song.get('requester'),
-                }
-                self.history_service.add_to_history(guild_id, history_track)
+            bind_guild(guild_id)
+            pending = self._take_crossfade_pending(guild_id)
+            self._archive_current_song(guild_id)
             
             queue = self.queue_service.get_queue(guild_id)
             if queue:
@@ -331,6 +415,8 @@ class MusicCog(commands.Cog):
                 voice_client = await self._ensure_voice_connected(voice_client, guild)
                 if not voice_client:
                     self.logger.error(f"Cannot play: voice not connected for guild {guild.name}")
+                    if pending:
+                        pending["player"].cleanup()
                     if guild_id in self.player_channels:
                         channel = self.bot.get_channel(self.player_channels[guild_id])
                         if channel:
@@ -338,67 +424,31 @@ class MusicCog(commands.Cog):
                     return
                 
                 item = self.queue_service.get_next_track(guild_id)
+                prepared = None
+                if pending:
+                    # Skip під час кросфейду: вже запущений наступний трек грає далі
+                    if pending["item"] is item:
+                        prepared = pending["player"]
+                    else:
+                        pending["player"].cleanup()
                 if not item:
                     return
                 try:
-                    fade_s = float(self._fade_seconds.get(guild_id, consts.DEFAULT_FADE_SECONDS))
-                    if fade_s < consts.FADE_SECONDS_MIN:
-                        fade_s = consts.FADE_SECONDS_MIN
-                    if fade_s > consts.FADE_SECONDS_MAX:
-                        fade_s = consts.FADE_SECONDS_MAX
-
+                    source_kwargs = self._source_kwargs(guild_id)
+                    if prepared is None:
+                        prepared = await self.prefetch_service.take(guild_id, item, **source_kwargs)
+                    prefetched = prepared is not None
                     player = await self.player_service.play_stream(
                         voice_client, 
                         item, 
                         self.bot.loop, 
                         lambda e: self.bot.loop.create_task(self.check_after_play(guild, voice_client, e)),
-                        fade_seconds=fade_s,
-                        # Important: fade-in from silence feels like the track "starts later".
-                        # MVP: only fade-out previous track (fade-in stays normal).
-                        fade_in=False,
-                        fade_out=(fade_s > 0),
+                        source=prepared,
+                        crossfade_seconds=source_kwargs["fade_seconds"],
+                        **source_kwargs,
                     )
-                    
-                    # Застосовуємо збережену гучність
-                    if guild_id in self._guild_volumes:
-                        player.volume = self._guild_volumes[guild_id]
-                    
-                    self.current_song[guild_id] = {
-                        'title': player.title, 'url': player.url, 'thumbnail': player.thumbnail,
-                        'duration': player.duration, 'requester': item.get('requester'), 'player': player
-                    }
-                    # Mark recommendation source (user queue vs automix)
-                    if item and isinstance(item, dict) and item.get("source"):
-                        self.current_song[guild_id]["source"] = item.get("source")
-                    if item and isinstance(item, dict) and item.get("automix_strategy"):
-                        self.current_song[guild_id]["automix_strategy"] = item.get("automix_strategy")
-                    
-                    # Зберігаємо трек у сесійну статистику
-                    if guild_id not in self._session_tracks:
-                        self._session_tracks[guild_id] = []
-                    self._session_tracks[guild_id].append({
-                        'title': player.title, 'url': player.url,
-                        'duration': player.duration,
-                    })
-                    
-                    # Зберігаємо стан у БД для auto-resume
-                    voice_channel_id = voice_client.channel.id if voice_client.channel else None
-                    text_channel_id = self.player_channels.get(guild_id)
-                    asyncio.ensure_future(self.repository.save_guild_state(
-                        guild_id=guild_id,
-                        voice_channel_id=voice_channel_id,
-                        text_channel_id=text_channel_id,
-                        track_url=player.url,
-                        track_title=player.title,
-                        track_duration=player.duration,
-                        track_thumbnail=player.thumbnail,
-                        is_paused=False,
-                    ))
-                    
-                    if guild_id in self.player_channels:
-                        channel = self.bot.get_channel(self.player_channels[guild_id])
-                        if channel: await self.update_player(guild, channel)
-                    await self._maybe_send_dj_comment(guild, item)
+                    instrumentation.track_started(guild_id, player, started_at, prefetched=prefetched)
+                    await self._on_track_started(guild, voice_client, item, player, source_kwargs)
                     
                 except Exception as track_error:
                     self.logger.error(f"Failed to play track '{item.get('title', 'Unknown')}': {track_error}")
@@ -407,8 +457,11 @@ class MusicCog(commands.Cog):
                         await self.play_next_song(guild, voice_client)
             else:
                 # Queue is empty — try Automix before disconnecting.
+                if pending:
+                    pending["player"].cleanup()
                 if guild_id in self.current_song:
                     del self.current_song[guild_id]
+                self.prefetch_service.forget(guild_id)
 
                 # Load persisted Automix settings before checking enabled flag.
                 await self._ensure_automix_state_loaded(guild_id)
@@ -418,10 +471,11 @@ class MusicCog(commands.Cog):
                     vc_channel = voice_client.channel
                     humans = [m for m in (vc_channel.members if vc_channel else []) if not m.bot]
                     if humans:
-                        asyncio.ensure_future(
+                        self.write_buffer.append(
+                            None,
                             self.repository.add_automix_feedback_event(
                                 guild_id, "queue_empty_checked", None, strategy=None
-                            )
+                            ),
                         )
                         recent = []
                         if guild_id in self._session_tracks:
@@ -451,29 +505,34 @@ class MusicCog(commands.Cog):
                             self.queue_service.add_track(guild_id, rec)
                             strat = rec.get("automix_strategy")
                             self._note_automix_pick(guild_id, rec.get("url", ""))
-                            asyncio.ensure_future(
+                            self.write_buffer.append(
+                                None,
                                 self.repository.add_automix_feedback_event(
                                     guild_id, "recommended", rec.get("url"), strategy=strat
-                                )
+                                ),
                             )
                             if guild_id in self.player_channels:
                                 channel = self.bot.get_channel(self.player_channels[guild_id])
                                 if channel:
-                                    tag = "топ" if strat == consts.AUTOMIX_STRATEGY_TOP else "explore"
+                                    tag = {
+                                        consts.AUTOMIX_STRATEGY_TOP: "топ",
+                                        consts.AUTOMIX_STRATEGY_SIMILAR: "схоже звучання",
+                                    }.get(strat, "explore")
                                     await channel.send(
                                         f"🎛️ **Automix** ({tag}): додаю **{rec.get('title', 'Unknown')}**"
                                     )
                             # Try playing immediately.
                             await self.play_next_song(guild, voice_client)
                             return
-                        asyncio.ensure_future(
+                        self.write_buffer.append(
+                            None,
                             self.repository.add_automix_feedback_event(
                                 guild_id, "no_recommendation", None, strategy=effective
-                            )
+                            ),
                         )
 
                 # Automix is off or no recommendation — clear state & disconnect later.
-                asyncio.ensure_future(self.repository.clear_guild_state(guild_id))
+                self.write_buffer.write(("guild_state", guild_id), self.repository.clear_guild_state(guild_id))
                 if guild_id in self.player_channels:
                     channel = self.bot.get_channel(self.player_channels[guild_id])
                     if channel:
@@ -484,6 +543,222 @@ class MusicCog(commands.Cog):
         except Exception as e:
             self.logger.error(f"Play next error: {e}")
 
+    async def _on_track_started(self, guild, voice_client, item, player, source_kwargs):
+        """Облік нового треку: стан, історія сесії, БД, плеєр, prefetch і кросфейд."""
+        guild_id = guild.id
+        self.prefetch_service.track_started(guild_id, player.duration, **source_kwargs)
+        self._schedule_crossfade(guild, voice_client, source_kwargs)
+        
+        # Застосовуємо збережену гучність
+        if guild_id in self._guild_volumes:
+            player.volume = self._guild_volumes[guild_id]
+        
+        self.current_song[guild_id] = {
+            'title': player.title, 'url': player.url, 'thumbnail': player.thumbnail,
+            'duration': player.duration, 'requester': item.get('requester'), 'player': player
+        }
+        # Mark recommendation source (user queue vs automix)
+        if item and isinstance(item, dict) and item.get("source"):
+            self.current_song[guild_id]["source"] = item.get("source")
+        if item and isinstance(item, dict) and item.get("automix_strategy"):
+            self.current_song[guild_id]["automix_strategy"] = item.get("automix_strategy")
+        
+        # Зберігаємо трек у сесійну статистику
+        if guild_id not in self._session_tracks:
+            self._session_tracks[guild_id] = []
+        self._session_tracks[guild_id].append({
+            'title': player.title, 'url': player.url,
+            'duration': player.duration,
+        })
+        
+        # Зберігаємо стан у БД для auto-resume
+        voice_channel_id = voice_client.channel.id if voice_client.channel else None
+        text_channel_id = self.player_channels.get(guild_id)
+        self.write_buffer.write(("guild_state", guild_id), self.repository.save_guild_state(
+            guild_id=guild_id,
+            voice_channel_id=voice_channel_id,
+            text_channel_id=text_channel_id,
+            track_url=player.url,
+            track_title=player.title,
+            track_duration=player.duration,
+            track_thumbnail=player.thumbnail,
+            is_paused=False,
+        ))
+        if player.url:
+            # Метадані з повної екстракції уточнюють каталог (oEmbed-шлях не знає тривалості)
+            self.write_buffer.append(None, self.repository.enrich_tracks([self.current_song[guild_id]]))
+            # Аудіоознаки для similar_sound — фоном, лише для ще не проаналізованих треків
+            self.feature_service.schedule(self.current_song[guild_id], getattr(player, "stream_url", None))
+            # Популярний трек — у дисковий аудіокеш, щоб наступні відтворення йшли з файла
+            audio_cache.note_play(self.current_song[guild_id], getattr(player, "stream_url", None))
+        if profile_selector.dirty:
+            # Статистика профілів екстракції спільна для всіх гільдій — один коалесцентний запис
+            self.write_buffer.write(
+                ("extraction_profiles",),
+                self.repository.save_extraction_profile_stats(profile_selector.snapshot()),
+            )
+        
+        if guild_id in self.player_channels:
+            channel = self.bot.get_channel(self.player_channels[guild_id])
+            if channel: await self.update_player(guild, channel)
+        await self._maybe_send_dj_comment(guild, item)
+
+    # ── Crossfade ────────────────────────────────────────────────
+
+    def _schedule_crossfade(self, guild, voice_client, source_kwargs):
+        """Планує підготовку наступного треку до початку перекриття."""
+        task = self._crossfade_tasks.pop(guild.id, None)
+        if task is not None:
+            task.cancel()
+        if source_kwargs["fade_seconds"] <= 0 or self.player_service.remaining_seconds(voice_client) is None:
+            return
+        self._crossfade_tasks[guild.id] = asyncio.get_running_loop().create_task(
+            self._crossfade_into_next(guild, voice_client, source_kwargs)
+        )
+
+    async def _crossfade_into_next(self, guild, voice_client, source_kwargs):
+        guild_id = guild.id
+        lead = source_kwargs["fade_seconds"] + consts.CROSSFADE_PREPARE_LEAD_SECONDS
+        try:
+            while True:
+                remaining = self.player_service.remaining_seconds(voice_client)
+                if remaining is None:
+                    return
+                if remaining > lead:
+                    await asyncio.sleep(remaining - lead)
+                    continue
+                item = self.queue_service.peek_next(guild_id)
+                if not item:
+                    return
+                started_at = time.perf_counter()
+                prepared = await self.prefetch_service.take(guild_id, item, **source_kwargs)
+                player = await self.player_service.queue_next(
+                    voice_client,
+                    item,
+                    self.bot.loop,
+                    lambda: self.bot.loop.call_soon_threadsafe(self._crossfade_switched, guild, voice_client),
+                    source=prepared,
+                    **source_kwargs,
+                )
+                if player is None:
+                    return
+                if (
+                    self.queue_service.peek_next(guild_id) is not item
+                    and self.player_service.cancel_next(voice_client) is player
+                ):
+                    # Черга змінилась, поки готували трек — пробуємо з новою головою
+                    player.cleanup()
+                    continue
+                if guild_id in self._guild_volumes:
+                    player.volume = self._guild_volumes[guild_id]
+                # Кадри наступного треку читаються ще під час перекриття
+                instrumentation.attach(guild_id, player)
+                self._crossfade_pending[guild_id] = {
+                    "item": item, "player": player, "guild": guild,
+                    "voice_client": voice_client, "source_kwargs": source_kwargs,
+                    "started_at": started_at, "prefetched": prepared is not None,
+                }
+                return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Crossfade preparation failed for guild {guild_id}: {e}")
+        finally:
+            if self._crossfade_tasks.get(guild_id) is asyncio.current_task():
+                del self._crossfade_tasks[guild_id]
+
+    def _crossfade_switched(self, guild, voice_client):
+        """Мікшер перейшов на наступний трек (викликається в event loop)."""
+        pending = self._crossfade_pending.pop(guild.id, None)
+        if pending is None:
+            return
+        item = pending["item"]
+        if self.queue_service.peek_next(guild.id) is item:
+            self.queue_service.get_next_track(guild.id)
+        self._archive_current_song(guild.id)
+        instrumentation.track_started(
+            guild.id, pending["player"], pending.get("started_at", 0.0),
+            prefetched=pending.get("prefetched", False), crossfade=True,
+        )
+        self.bot.loop.create_task(
+            self._on_track_started(guild, voice_client, item, pending["player"], pending["source_kwargs"])
+        )
+
+    def _rearm_crossfade(self, guild, voice_client):
+        """Після seek: наступний трек, поставлений у мікшер від старої позиції, знімається,
+        а підготовка кросфейду планується заново."""
+        pending = self._crossfade_pending.get(guild.id)
+        if pending is not None and self.player_service.cancel_next(voice_client) is pending["player"]:
+            del self._crossfade_pending[guild.id]
+            pending["player"].cleanup()
+        self._schedule_crossfade(guild, voice_client, self._source_kwargs(guild.id))
+
+    def _take_crossfade_pending(self, guild_id: int):
+        """Скасовує підготовку кросфейду; повертає ще не розпочатий наступний трек (або None)."""
+        task = self._crossfade_tasks.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
+        pending = self._crossfade_pending.pop(guild_id, None)
+        if pending is not None:
+            self.player_service.cancel_next(pending["voice_client"])
+        return pending
+
+    # ── Playback position ────────────────────────────────────────
+
+    @staticmethod
+    def _playback_position(player):
+        """Позиція треку в секундах (кадри, віддані pipe-джерелом, з урахуванням seek) або None."""
+        position = getattr(player, "position_seconds", None)
+        value = position() if callable(position) else None
+        return value if isinstance(value, float) else None
+
+    def _save_position(self, guild_id: int) -> None:
+        """Ставить у write-behind буфер позицію поточного треку гільдії, якщо вона змінилась.
+        Запис коалесціюється за ключем, тож між flush у БД потрапляє лише остання позиція."""
+        song = self.current_song.get(guild_id)
+        position = self._playback_position(song.get('player')) if song else None
+        if position is None or not song.get('url'):
+            return
+        if abs(position - song.get('saved_position', 0.0)) < 1.0:
+            return  # пауза або щойно збережено
+        song['saved_position'] = position
+        self.write_buffer.write(
+            ("guild_position", guild_id),
+            self.repository.save_playback_position(guild_id, song['url'], round(position, 1)),
+        )
+
+    def _schedule_position_save(self) -> None:
+        """Таймер event loop (не asyncio.sleep-цикл): раз на POSITION_SAVE_INTERVAL зберігає позиції."""
+        self._position_timer = asyncio.get_running_loop().call_later(
+            consts.POSITION_SAVE_INTERVAL, self._save_positions
+        )
+
+    def _save_positions(self) -> None:
+        try:
+            for guild_id in list(self.current_song):
+                self._save_position(guild_id)
+        except Exception as e:
+            self.logger.warning(f"Playback position save failed: {e}")
+        finally:
+            self._schedule_position_save()
+
+    def _on_search_cached(self, key: str, results, fetched_at: float) -> None:
+        """Слухач кешу пошуку: нові результати переживають рестарт (запис коалесціюється за ключем)."""
+        self.write_buffer.write(
+            ("search_cache", key), self.repository.save_search_results(key, results, fetched_at)
+        )
+
+    def _on_queue_changed(self, guild_id: int) -> None:
+        """Слухач черги: якщо голова змінилась, підготовлений для кросфейду трек знімається."""
+        pending = self._crossfade_pending.get(guild_id)
+        if pending is None or self.queue_service.peek_next(guild_id) is pending["item"]:
+            return
+        if self.player_service.cancel_next(pending["voice_client"]) is not pending["player"]:
+            return  # перехід уже відбувся — решту зробить _crossfade_switched
+        del self._crossfade_pending[guild_id]
+        pending["player"].cleanup()
+        self._schedule_crossfade(pending["guild"], pending["voice_client"], pending["source_kwargs"])
+
     async def check_after_play(self, guild, voice_client, error):
         if error:
             self.logger.error(f"Playback error in guild {guild.id}: {error}")
@@ -500,8 +775,9 @@ class MusicCog(commands.Cog):
         if voice_client:
             self.queue_service.clear(guild.id)
             if guild.id in self.current_song: del self.current_song[guild.id]
-            # Очищаємо стан у БД
-            await self.repository.clear_guild_state(guild.id)
+            # Очищаємо стан у БД — через буфер, щоб відкладений save_guild_state не перезаписав його
+            self.write_buffer.write(("guild_state", guild.id), self.repository.clear_guild_state(guild.id))
+            await self.write_buffer.flush()
             await voice_client.disconnect()
 
     @commands.Cog.listener()
@@ -510,7 +786,9 @@ class MusicCog(commands.Cog):
         if member.id == self.bot.user.id and after.channel is None:
              self.queue_service.clear(member.guild.id)
              if member.guild.id in self.current_song: del self.current_song[member.guild.id]
-             asyncio.ensure_future(self.repository.clear_guild_state(member.guild.id))
+             self.write_buffer.write(
+                 ("guild_state", member.guild.id), self.repository.clear_guild_state(member.guild.id)
+             )
              return
 
         # 2. Someone left the bot's channel
@@ -584,42 +862,40 @@ class MusicCog(commands.Cog):
                 return
         
         self.player_channels[interaction.guild.id] = interaction.channel.id # Save channel for notifications
+        bind_guild(interaction.guild.id)
+        # Після закінчення токена interaction відповісти вже не вийде — екстракції скасовуються
+        deadline = self._interaction_deadline(interaction)
         is_playlist = 'list=' in query or '/sets/' in query or '/playlist' in query
         if is_playlist:
-            playlist_title, tracks = await self.source_service.extract_playlist(query)
-            if not tracks:
-                await interaction.followup.send("❌ Не вдалося завантажити плейлист або він порожній.")
-                return
-
-            # Обмежуємо розмір плейлиста
-            tracks = tracks[:consts.MAX_PLAYLIST_SIZE]
-            for t in tracks:
-                t['requester'] = interaction.user
-
-            self.queue_service.add_tracks(interaction.guild.id, tracks)
-            await interaction.followup.send(
-                f"{consts.EMOJI_PLAYLIST} Плейлист **{playlist_title}** — додано **{len(tracks)}** треків у чергу!"
-            )
-
-            await self.update_player(interaction.guild, interaction.channel)
-            if not self.player_service.is_playing(voice_client) and not self.player_service.is_paused(voice_client):
-                await self.play_next_song(interaction.guild, voice_client)
+            await self._enqueue_playlist(interaction, voice_client, query, deadline=deadline)
             return
 
         is_url = query.startswith('http') or any(x in query.lower() for x in ['youtube.com', 'youtu.be', 'soundcloud.com'])
         
         if is_url:
             # Пряме посилання — додаємо одразу
-            info = await self.source_service.get_video_info(query)
+            try:
+                async with asyncio.timeout_at(deadline):
+                    info = await self.source_service.get_video_info(query)
+            except TimeoutError:
+                self.logger.warning(f"Interaction expired while resolving {query}")
+                return
             if not info:
                 await interaction.followup.send("❌ Не вдалося знайти трек.")
                 return
+            if info.get('duration') is None:
+                await self._fill_from_catalog(info)
             info['requester'] = interaction.user
             self.queue_service.add_track(interaction.guild.id, info)
             await interaction.followup.send(f"✅ Додано: **{info['title']}**")
         else:
             # Текстовий запит — показуємо меню вибору
-            results = await self.source_service.search_videos(query)
+            try:
+                async with asyncio.timeout_at(deadline):
+                    results = await self.source_service.search_videos(query)
+            except TimeoutError:
+                self.logger.warning(f"Interaction expired while searching for {query}")
+                return
             if not results:
                 await interaction.followup.send("❌ Не вдалося знайти треки за запитом.")
                 return
@@ -643,6 +919,82 @@ class MusicCog(commands.Cog):
         if not self.player_service.is_playing(voice_client) and not self.player_service.is_paused(voice_client):
             await self.play_next_song(interaction.guild, voice_client)
 
+    async def _enqueue_playlist(self, interaction: discord.Interaction, voice_client, query: str, *, deadline=None):
+        """Потокове завантаження плейлиста: перший трек починає грати, поки решта
+        додається в чергу пачками, а метадані записів доповнюються у фоні."""
+        guild = interaction.guild
+        playlist_title, added, play_task = None, 0, None
+        try:
+            async with asyncio.timeout_at(deadline):
+                async for playlist_title, batch in self.source_service.iter_playlist(
+                    query, limit=consts.MAX_PLAYLIST_SIZE
+                ):
+                    for t in batch:
+                        t['requester'] = interaction.user
+                    self.queue_service.add_tracks(guild.id, batch)
+                    self._schedule_playlist_metadata(guild.id, batch)
+                    first_batch = added == 0
+                    added += len(batch)
+                    if not first_batch:
+                        continue
+
+                    await interaction.followup.send(
+                        f"{consts.EMOJI_PLAYLIST} Плейлист **{playlist_title}** — перший трек у черзі, решта завантажується…"
+                    )
+                    await self.update_player(guild, interaction.channel)
+                    if not self.player_service.is_playing(voice_client) and not self.player_service.is_paused(voice_client):
+                        # Старт відтворення не чекає на наступні сторінки плейлиста
+                        play_task = asyncio.get_running_loop().create_task(self.play_next_song(guild, voice_client))
+        except TimeoutError:
+            self.logger.warning(f"Interaction expired while loading playlist {query} ({added} tracks added)")
+            if play_task is not None:
+                await play_task
+            return
+
+        if not added:
+            await interaction.followup.send("❌ Не вдалося завантажити плейлист або він порожній.")
+            return
+        if play_task is not None:
+            await play_task
+        await interaction.followup.send(
+            f"{consts.EMOJI_PLAYLIST} Плейлист **{playlist_title}** — додано **{added}** треків у чергу!"
+        )
+        await self.update_player(guild, interaction.channel)
+
+    @staticmethod
+    def _interaction_deadline(interaction) -> "float | None":
+        """loop.time(), після якого токен interaction недійсний (None — невідомо)."""
+        expires_at = getattr(interaction, "expires_at", None)
+        if not isinstance(expires_at, datetime.datetime):
+            return None
+        remaining = (expires_at - discord.utils.utcnow()).total_seconds()
+        return asyncio.get_running_loop().time() + remaining
+
+    async def _fill_from_catalog(self, info: dict) -> None:
+        """Тривалість/обкладинка вже відтворених треків — з каталогу (oEmbed їх не повертає)."""
+        try:
+            known = await self.repository.get_catalog_track(info.get('url') or info.get('webpage_url') or '')
+        except Exception as e:
+            self.logger.warning(f"Track catalog lookup failed: {e}")
+            return
+        if known:
+            info['duration'] = known['duration']
+            info['thumbnail'] = info.get('thumbnail') or known['thumbnail']
+
+    def _schedule_playlist_metadata(self, guild_id: int, tracks):
+        """Фонове доповнення назв/тривалостей; після нього знімок черги перезаписується в БД."""
+        async def fill():
+            try:
+                if await self.source_service.fill_playlist_metadata(tracks):
+                    self.write_buffer.append(None, self.repository.enrich_tracks(tracks))
+                    self.queue_service.tracks_updated(guild_id)
+            except Exception as e:
+                self.logger.warning(f"Playlist metadata fill failed for guild {guild_id}: {e}")
+
+        task = asyncio.get_running_loop().create_task(fill())
+        self._metadata_tasks.add(task)
+        task.add_done_callback(self._metadata_tasks.discard)
+
     @app_commands.command(name="skip", description="Пропустити трек")
     async def skip(self, interaction: discord.Interaction):
         voice_client = interaction.guild.voice_client
@@ -654,6 +1006,40 @@ class MusicCog(commands.Cog):
         else:
             await interaction.response.send_message("Нічого пропускати.", ephemeral=True)
 
+    @app_commands.command(name="seek", description="Перемотати поточний трек на позицію")
+    @app_commands.describe(position="Позиція: 90, 1:30 або 1:02:03")
+    async def seek(self, interaction: discord.Interaction, position: str):
+        guild = interaction.guild
+        voice_client = guild.voice_client
+        song = self.current_song.get(guild.id)
+        player = song.get('player') if song else None
+        if (
+            not voice_client
+            or not (voice_client.is_playing() or voice_client.is_paused())
+            or not callable(getattr(player, "seek", None))
+        ):
+            await interaction.response.send_message("Зараз нічого не грає.", ephemeral=True)
+            return
+        seconds = parse_timestamp(position)
+        if seconds is None:
+            await interaction.response.send_message("Вкажіть позицію як `90`, `1:30` або `1:02:03`.", ephemeral=True)
+            return
+        duration = player.duration
+        if isinstance(duration, (int, float)) and duration > 0 and seconds >= duration:
+            await interaction.response.send_message(
+                f"Трек триває лише {format_duration(duration)}.", ephemeral=True
+            )
+            return
+
+        await interaction.response.defer()
+        if not await player.seek(seconds):
+            await interaction.followup.send("❌ Не вдалося перемотати цей трек.", ephemeral=True)
+            return
+        self._rearm_crossfade(guild, voice_client)
+        self._save_position(guild.id)
+        shown = format_duration(seconds) if seconds else "00:00"
+        await interaction.followup.send(f"⏩ Перемотано на **{shown}** {interaction.user.mention}.")
+
     @app_commands.command(name="automix", description="Увімкнути/вимкнути Automix (коли черга закінчується)")
     @app_commands.describe(enabled="on/off")
     async def automix(self, interaction: discord.Interaction, enabled: str):
@@ -674,7 +1060,7 @@ class MusicCog(commands.Cog):
         )
         self._automix_settings_cache[guild_id]["enabled"] = is_on
         self._automix_strategy_mode[guild_id] = self._automix_settings_cache[guild_id]["strategy"]
-        asyncio.ensure_future(self.repository.set_automix_enabled(guild_id, is_on))
+        self.write_buffer.write(("automix_enabled", guild_id), self.repository.set_automix_enabled(guild_id, is_on))
         msg = "🎛️ Automix **увімкнено**: коли черга закінчиться, я підбиратиму треки сам." if is_on else \
               "🎛️ Automix **вимкнено**: коли черга порожня — я зупинюся й відключусь."
         await interaction.response.send_message(msg, ephemeral=True)
@@ -710,6 +1096,7 @@ class MusicCog(commands.Cog):
             for label_key, title in (
                 (consts.AUTOMIX_STRATEGY_TOP, "top_weighted"),
                 (consts.AUTOMIX_STRATEGY_HISTORY, "history_explore"),
+                (consts.AUTOMIX_STRATEGY_SIMILAR, "similar_sound"),
             ):
                 if label_key not in by_strat:
                     continue
@@ -753,16 +1140,18 @@ class MusicCog(commands.Cog):
 
     @app_commands.command(
         name="automix_mode",
-        description="Режим Automix: A/B, лише топ, або explore з історії",
+        description="Режим Automix: A/B, лише топ, explore з історії або схоже звучання",
     )
     @app_commands.describe(
-        strategy="ab_split — 50/50; top_weighted — популярні; history_explore — рідше програні",
+        strategy="ab_split — 50/50; top_weighted — популярні; history_explore — рідше програні; "
+                 "similar_sound — схожі за темпом і тембром",
     )
     @app_commands.choices(
         strategy=[
             app_commands.Choice(name="A/B: 50% топ / 50% explore", value="ab_split"),
             app_commands.Choice(name="Лише зважені топ-треки", value="top_weighted"),
             app_commands.Choice(name="Explore: менш програні з історії", value="history_explore"),
+            app_commands.Choice(name="Схоже звучання (темп, тембр, тональність)", value="similar_sound"),
         ]
     )
     async def automix_mode(
@@ -784,11 +1173,12 @@ class MusicCog(commands.Cog):
         )
         self._automix_settings_cache[guild_id]["strategy"] = val
         self._automix_strategy_mode[guild_id] = val
-        asyncio.ensure_future(self.repository.set_automix_strategy(guild_id, val))
+        self.write_buffer.write(("automix_strategy", guild_id), self.repository.set_automix_strategy(guild_id, val))
         labels = {
             "ab_split": "A/B (50% топ / 50% explore)",
             "top_weighted": "зважені топ-треки",
             "history_explore": "explore з історії (рідше програні)",
+            "similar_sound": "схоже звучання",
         }
         await interaction.response.send_message(
             f"🎛️ Режим Automix: **{labels.get(val, val)}**",
@@ -806,7 +1196,7 @@ class MusicCog(commands.Cog):
         is_on = value == "on"
         await self._ensure_dj_state_loaded(guild_id)
         self._dj_settings_cache[guild_id]["enabled"] = is_on
-        asyncio.ensure_future(self.repository.set_dj_enabled(guild_id, is_on))
+        self.write_buffer.write(("dj_enabled", guild_id), self.repository.set_dj_enabled(guild_id, is_on))
         if is_on:
             await interaction.response.send_message("🎙️ DJ **увімкнено**.", ephemeral=True)
         else:
@@ -832,12 +1222,12 @@ class MusicCog(commands.Cog):
             return
         await self._ensure_dj_state_loaded(guild_id)
         self._dj_settings_cache[guild_id]["persona"] = val
-        asyncio.ensure_future(self.repository.set_dj_persona(guild_id, val))
+        self.write_buffer.write(("dj_persona", guild_id), self.repository.set_dj_persona(guild_id, val))
         await interaction.response.send_message(f"🎙️ Персона DJ: **{val}**", ephemeral=True)
 
     @app_commands.command(
         name="crossfade",
-        description="Плавний кінець треку (fade-out), секунди 0–15",
+        description="Плавний перехід між треками (crossfade), секунди 0–15",
     )
     @app_commands.describe(seconds="0 вимикає; 3–8 зазвичай комфортно")
     async def crossfade(self, interaction: discord.Interaction, seconds: float):
@@ -850,9 +1240,9 @@ class MusicCog(commands.Cog):
         s = max(consts.FADE_SECONDS_MIN, min(consts.FADE_SECONDS_MAX, s))
         self._fade_seconds[interaction.guild.id] = s
         if s <= 0:
-            await interaction.response.send_message("🔇 Fade-out вимкнено.", ephemeral=True)
+            await interaction.response.send_message("🔇 Crossfade вимкнено.", ephemeral=True)
         else:
-            await interaction.response.send_message(f"🎚️ Fade-out: **{s:.1f}с**.", ephemeral=True)
+            await interaction.response.send_message(f"🎚️ Crossfade: **{s:.1f}с**.", ephemeral=True)
 
     @app_commands.command(name="pause", description="Поставити на паузу")
     async def pause(self, interaction: discord.Interaction):
@@ -1011,6 +1401,19 @@ class MusicCog(commands.Cog):
             else:
                 embed.add_field(name="🏆 Топ треки", value="Поки немає даних", inline=False)
 
+            cache = audio_cache.stats()
+            if cache["enabled"]:
+                lookups = cache["hits"] + cache["misses"]
+                embed.add_field(
+                    name="💾 Аудіокеш",
+                    value=(
+                        f"📁 Треків: **{cache['files']}** — "
+                        f"{cache['bytes'] / 1048576:.0f} / {cache['max_bytes'] / 1048576:.0f} МБ\n"
+                        f"🎯 Влучання: **{cache['hit_ratio']:.0%}** ({cache['hits']}/{lookups})"
+                    ),
+                    inline=False
+                )
+
             await interaction.followup.send(embed=embed, view=DismissView(), ephemeral=True)
         except Exception as e:
             self.logger.error(f"Stats error: {e}", exc_info=True)
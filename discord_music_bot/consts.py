@@ -9,25 +9,92 @@ MAX_PLAYLIST_SIZE = 100
 PREVIEW_QUEUE_SIZE = 5
 EMOJI_PLAYLIST = "📋"
 
+# --- Queue persistence ---
+# Крок між позиціями треків у queue_tracks: вставка між сусідами не зсуває решту рядків
+QUEUE_POSITION_GAP = 1024
+# Після скількох інкрементальних операцій черга перезаписується з рівними проміжками
+QUEUE_COMPACTION_INTERVAL = 256
+
+# --- Write-behind buffer ---
+# Як часто фонові записи в БД скидаються однією транзакцією (секунди)
+WRITE_BUFFER_FLUSH_INTERVAL = 0.25
+# Поріг черги записів: при досягненні — негайний flush, а async-виклики чекають
+WRITE_BUFFER_MAX_PENDING = 500
+
+# --- Stream URL cache ---
+# Скільки розв'язаних media URL тримати в пам'яті (LRU)
+STREAM_CACHE_MAX_ENTRIES = 256
+# Запас до `expire=` з URL: запис вважається простроченим раніше (секунди)
+STREAM_CACHE_SAFETY_MARGIN = 600
+# TTL для URL без параметра `expire=` (секунди)
+STREAM_CACHE_DEFAULT_TTL = 1800
+
+# --- ffmpeg start ---
+FFMPEG_READY_TIMEOUT = 10.0  # секунд на перший кадр після запуску ffmpeg
+FFMPEG_STDERR_TAIL_LINES = 200  # рядків stderr у кільцевому буфері на процес
+
+# --- Opus ---
+# Кодувати Opus у ffmpeg (без PCM у процесі бота), коли немає кросфейду
+OPUS_ENCODE_IN_FFMPEG = True
+OPUS_BITRATE = "128k"
+
+# --- Audio cache (Opus/Ogg on disk) ---
+# Популярні треки транскодуються у фоні в DB_DATA_DIR/audio_cache і далі грають з диска
+AUDIO_CACHE_ENABLED = True
+AUDIO_CACHE_MAX_BYTES = 2 * 1024 ** 3
+# Скільки прослуховувань (сума по гільдіях) робить трек кандидатом у кеш
+AUDIO_CACHE_MIN_PLAYS = 3
+# Довші треки (мікси, стріми) не кешуються
+AUDIO_CACHE_MAX_TRACK_SECONDS = 900
+AUDIO_CACHE_MAX_PENDING = 8
+AUDIO_CACHE_TRANSCODE_TIMEOUT = 900.0
+# Скільки найпопулярніших треків із БД задають стартові лічильники
+AUDIO_CACHE_SEED_TRACKS = 500
+# Скільки лічильників прослуховувань тримати в пам'яті (LRU)
+AUDIO_CACHE_TRACKED_MAX = 5000
+
+# --- Prefetch ---
+# За скільки секунд до кінця поточного треку розв'язувати URL наступного
+PREFETCH_RESOLVE_LEAD_SECONDS = 60
+# Запускати ffmpeg для наступного треку заздалегідь (тримає зайвий процес і з'єднання)
+PREFETCH_WARM_FFMPEG = False
+# За скільки секунд до кінця поточного треку прогрівати ffmpeg
+PREFETCH_WARM_LEAD_SECONDS = 10
+
 # --- Automix ---
 AUTOMIX_DEFAULT_ENABLED = False
 AUTOMIX_RECENT_WINDOW = 15
-# Режим рекомендацій: ab_split (50/50 A/B), top_weighted, history_explore
+# Режим рекомендацій: ab_split (50/50 A/B), top_weighted, history_explore, similar_sound
 AUTOMIX_STRATEGY_DEFAULT = "ab_split"
 AUTOMIX_STRATEGY_AB_SPLIT = "ab_split"
 AUTOMIX_STRATEGY_TOP = "top_weighted"
 AUTOMIX_STRATEGY_HISTORY = "history_explore"
+AUTOMIX_STRATEGY_SIMILAR = "similar_sound"
 AUTOMIX_VALID_STRATEGIES = frozenset(
-    {AUTOMIX_STRATEGY_AB_SPLIT, AUTOMIX_STRATEGY_TOP, AUTOMIX_STRATEGY_HISTORY}
+    {AUTOMIX_STRATEGY_AB_SPLIT, AUTOMIX_STRATEGY_TOP, AUTOMIX_STRATEGY_HISTORY, AUTOMIX_STRATEGY_SIMILAR}
 )
+# similar_sound: з кількох найближчих за звучанням треків обирається один
+AUTOMIX_SIMILAR_NEIGHBOURS = 5
 # Скільки останніх Automix-підборів уникати (diversity у межах сесії)
 AUTOMIX_DIVERSITY_RECENT_PICKS = 10
 
-# --- Playback transitions (MVP AutoMix-style fades) ---
-# 0 disables fades. This is per-track fade-in/out; true crossfade (overlap) would be a later step.
+# --- Audio features (content-based Automix) ---
+# Фоновий аналіз фрагмента кожного нового треку (ffmpeg + DSP у пулі процесів)
+AUDIO_FEATURES_ENABLED = True
+AUDIO_FEATURES_WORKERS = 1
+AUDIO_FEATURES_SEGMENT_SECONDS = 30.0
+AUDIO_FEATURES_SAMPLE_RATE = 11025
+AUDIO_FEATURES_TIMEOUT = 60.0
+# Скільки треків можуть чекати на аналіз (решта відкидається до наступного відтворення)
+AUDIO_FEATURES_MAX_PENDING = 20
+
+# --- Playback transitions (crossfade) ---
+# 0 disables crossfade. Останні N секунд треку накладаються на початок наступного (CrossfadeSource).
 DEFAULT_FADE_SECONDS = 6.0
 FADE_SECONDS_MIN = 0.0
 FADE_SECONDS_MAX = 15.0
+# За скільки секунд до початку перекриття запускати наступний трек (екстракція + ffmpeg)
+CROSSFADE_PREPARE_LEAD_SECONDS = 15
 
 # --- DJ (MVP) ---
 DJ_DEFAULT_ENABLED = False
@@ -80,11 +147,82 @@ EMOJI_SHUFFLE = "🔀"
 EMOJI_MOVE = "↕️"
 EMOJI_CLEAR = "🗑️"
 
+# --- Extraction scheduler ---
+# Власний пул потоків для yt-dlp / Piped / oEmbed (не спільний пул процесу)
+EXTRACTION_WORKERS = 8
+
+# --- yt-dlp instance pool ---
+# Скільки вільних YoutubeDL тримати для одного набору опцій
+YTDLP_POOL_MAX_IDLE = 4
+# Скільки різних наборів опцій (профіль × формат × cookies) пам'ятати (LRU)
+YTDLP_POOL_MAX_KEYS = 32
+# Після скількох викликів екземпляр перестворюється (cookie jar, кеші екстракторів)
+YTDLP_POOL_MAX_USES = 200
+
+# --- Piped client ---
+# Таймаут одного HTTP-запиту до інстансу та загальний бюджет запиту з усіма hedge (секунди)
+PIPED_REQUEST_TIMEOUT = 5.0
+PIPED_REQUEST_BUDGET = 8.0
+# Другий інстанс запускається, якщо перший мовчить довше за свою медіану (у цих межах)
+PIPED_HEDGE_MIN_DELAY = 0.15
+PIPED_HEDGE_MAX_DELAY = 2.0
+PIPED_HEDGE_DEFAULT_DELAY = 0.5
+# Скільки інстансів може бути в польоті одночасно для одного запиту
+PIPED_HEDGE_MAX_INFLIGHT = 2
+PIPED_HEDGE_WORKERS = 8
+# Згладжування EWMA затримки/помилок і кількість затримок для медіани
+PIPED_EWMA_ALPHA = 0.3
+PIPED_LATENCY_SAMPLES = 32
+# Circuit breaker: помилок поспіль до відкриття і час «відпочинку» інстансу (секунди)
+PIPED_BREAKER_FAILURES = 3
+PIPED_BREAKER_COOLDOWN = 120
+# Keep-alive з'єднань на інстанс
+PIPED_MAX_IDLE_CONNECTIONS = 4
+
+# --- Extraction profiles (adaptive ordering) ---
+# Множник для старої статистики (профіль, формат) при кожній новій спробі
+PROFILE_STATS_DECAY = 0.98
+# Скільки секунд профіль з бот-чеком стоїть у кінці черги спроб
+PROFILE_BOT_CHECK_COOLDOWN = 600
+
+# --- Search cache ---
+# Скільки нормалізованих запитів пам'ятати (LRU; стільки ж рядків лишається в БД)
+SEARCH_CACHE_MAX_ENTRIES = 1000
+# Скільки результати вважаються свіжими і скільки ще віддаються з фоновим оновленням (секунди)
+SEARCH_CACHE_TTL = 6 * 3600
+SEARCH_CACHE_MAX_STALE = 7 * 24 * 3600
+
+# --- Playlist loading ---
+# Перша пачка — один трек, щоб відтворення почалося до завантаження решти
+PLAYLIST_FIRST_BATCH = 1
+PLAYLIST_BATCH_SIZE = 25
+# Скільки екстракцій метаданих записів плейлиста йде одночасно (на весь бот)
+PLAYLIST_METADATA_WORKERS = 4
+
 # --- Volume ---
 DEFAULT_VOLUME = 0.5
 VOLUME_STEP = 0.1
 VOLUME_MIN = 0.0
 VOLUME_MAX = 2.0
+# Гучність застосовує фільтр ffmpeg (без audioop.mul на кожен кадр);
+# зміна під час треку — швидкий перезапуск ffmpeg з поточної позиції
+FFMPEG_VOLUME = True
+
+# --- Loudness normalization (EBU R128) ---
+LOUDNORM_ENABLED = False
+LOUDNORM_TARGET_I = -16.0
+LOUDNORM_TARGET_TP = -1.5
+LOUDNORM_TARGET_LRA = 11.0
+LOUDNORM_CACHE_MAX_ENTRIES = 2000
+
+# --- Process supervisor (ffmpeg) ---
+SUPERVISOR_MAX_PER_GUILD = 6  # поточний + prefetch + кросфейд + перезапуски гучності
+SUPERVISOR_IDLE_TIMEOUT = 1800.0  # секунд без читання джерела (довга пауза теж)
+SUPERVISOR_CHECK_INTERVAL = 30.0
+
+# --- Instrumentation (/metrics) ---
+LOOP_LAG_PROBE_INTERVAL = 0.5  # секунд між пробами лагу event loop
+LOOP_LAG_WARN_SECONDS = 0.25  # лаг, від якого проба пише warning у лог
 
 # --- YTDL Options ---
 YTDL_OPTIONS_LIGHT = {
@@ -101,6 +239,18 @@ YTDL_OPTIONS_LIGHT = {
 
 # --- Auto-Resume ---
 AUTO_RESUME_STALENESS_THRESHOLD = 24 * 3600  # 24 hours in seconds
+# Позиція треку зберігається в guild_state не частіше ніж раз на стільки секунд
+POSITION_SAVE_INTERVAL = 10.0
+# Відновлення стартує трохи раніше збереженої позиції (запис міг відстати на інтервал)
+AUTO_RESUME_REWIND_SECONDS = 3.0
+# Скільки серверів відновлюються одночасно (підключення + екстракція першого треку)
+AUTO_RESUME_CONCURRENCY = 8
+# Голосові підключення на шард: кожне — gateway-подія (ліміт Discord — 120 подій за 60 с
+# на всі команди шарда, тож лишаємо запас для heartbeat і presence)
+AUTO_RESUME_CONNECTS_PER_MINUTE = 60
+AUTO_RESUME_CONNECT_BURST = 10
+# Пауза між перевірками, поки gateway шарда впирається в ліміт
+AUTO_RESUME_RATELIMIT_BACKOFF = 1.0
 
 # --- Messages ---
 MSG_NOT_IN_VOICE = "Ви не в голосовому каналі!"
@@ -4,8 +4,14 @@
 """
 
 import aiosqlite
+import asyncio
 import os
 import logging
+import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from discord_music_bot.track_catalog import canonical_track_key, catalog_row
 
 logger = logging.getLogger('MusicBot.Database')
 
@@ -13,6 +19,9 @@ logger = logging.getLogger('MusicBot.Database')
 DB_DIR = os.environ.get('DB_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
 DB_PATH = os.path.join(DB_DIR, 'music_bot.db')
 
+# Кількість read-only з'єднань у пулі (WAL дозволяє паралельні читання поруч з одним writer)
+DB_READER_POOL_SIZE = max(1, int(os.environ.get('DB_READER_POOL_SIZE', 3)))
+
 # SQL для створення таблиць
 _CREATE_TABLES_SQL = """
 -- Стан бота для кожного сервера (guild)
@@ -24,21 +33,30 @@ CREATE TABLE IF NOT EXISTS guild_state (
     current_track_title TEXT,
     current_track_duration INTEGER,
     current_track_thumbnail TEXT,
+    current_track_position REAL DEFAULT 0,  -- секунди від початку треку (auto-resume)
     is_paused       INTEGER DEFAULT 0,
     updated_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Каталог треків: метадані зберігаються один раз, решта таблиць посилається на track_id
+CREATE TABLE IF NOT EXISTS tracks (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    canonical   TEXT NOT NULL UNIQUE,  -- youtube:<video id> або URL (див. track_catalog)
+    url         TEXT NOT NULL,
+    title       TEXT,
+    duration    INTEGER,
+    thumbnail   TEXT
+);
+
 -- Черга треків
 CREATE TABLE IF NOT EXISTS queue_tracks (
     id          INTEGER PRIMARY KEY AUTOINCREMENT,
     guild_id    INTEGER NOT NULL,
     position    INTEGER NOT NULL,
-    url         TEXT NOT NULL,
-    title       TEXT,
-    duration    INTEGER,
-    thumbnail   TEXT,
+    track_id    INTEGER NOT NULL,
     added_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (guild_id) REFERENCES guild_state(guild_id)
+    FOREIGN KEY (guild_id) REFERENCES guild_state(guild_id),
+    FOREIGN KEY (track_id) REFERENCES tracks(id)
 );
 
 -- Індекс для швидкого отримання черги по guild_id
@@ -48,17 +66,41 @@ CREATE INDEX IF NOT EXISTS idx_queue_guild_position ON queue_tracks(guild_id, po
 CREATE TABLE IF NOT EXISTS history_tracks (
     id          INTEGER PRIMARY KEY AUTOINCREMENT,
     guild_id    INTEGER NOT NULL,
-    url         TEXT NOT NULL,
-    title       TEXT,
-    duration    INTEGER,
-    thumbnail   TEXT,
+    track_id    INTEGER NOT NULL,
     played_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (guild_id) REFERENCES guild_state(guild_id)
+    FOREIGN KEY (guild_id) REFERENCES guild_state(guild_id),
+    FOREIGN KEY (track_id) REFERENCES tracks(id)
 );
 
 -- Індекс для швидкого отримання історії по guild_id
 CREATE INDEX IF NOT EXISTS idx_history_guild_played ON history_tracks(guild_id, played_at DESC);
 
+-- Лічильники прослуховувань: підтримуються в тій же транзакції, що й history_tracks,
+-- тож топ треків читається з індексу без GROUP BY по всій історії
+CREATE TABLE IF NOT EXISTS track_play_counts (
+    guild_id        INTEGER NOT NULL,
+    track_id        INTEGER NOT NULL,
+    play_count      INTEGER NOT NULL DEFAULT 0,
+    last_played_at  TIMESTAMP,
+    PRIMARY KEY (guild_id, track_id),
+    FOREIGN KEY (track_id) REFERENCES tracks(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_play_counts_top
+    ON track_play_counts(guild_id, play_count DESC, last_played_at DESC);
+
+-- Аудіоознаки треків для Automix similar_sound (див. audio_features)
+CREATE TABLE IF NOT EXISTS track_features (
+    track_id    INTEGER PRIMARY KEY,
+    bpm         REAL,
+    loudness    REAL NOT NULL,
+    centroid    REAL NOT NULL,
+    key         INTEGER NOT NULL,
+    chroma      TEXT NOT NULL,  -- JSON-список з 12 значень
+    analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (track_id) REFERENCES tracks(id)
+);
+
 -- Automix settings (per guild)
 CREATE TABLE IF NOT EXISTS automix_settings (
     guild_id    INTEGER PRIMARY KEY,
@@ -115,11 +157,33 @@ CREATE TABLE IF NOT EXISTS dj_events (
 );
 
 CREATE INDEX IF NOT EXISTS idx_dj_events_guild_time ON dj_events(guild_id, created_at DESC);
+
+-- Статистика спроб екстракції (профіль yt-dlp × формат) для адаптивного порядку
+CREATE TABLE IF NOT EXISTS extraction_profile_stats (
+    profile     TEXT NOT NULL,
+    format      TEXT NOT NULL,
+    successes   REAL NOT NULL DEFAULT 0,
+    failures    REAL NOT NULL DEFAULT 0,
+    bot_checks  INTEGER NOT NULL DEFAULT 0,
+    latency_avg REAL NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (profile, format)
+);
+
+-- Кеш результатів текстового пошуку (ключ — нормалізований запит)
+CREATE TABLE IF NOT EXISTS search_cache (
+    query_key   TEXT PRIMARY KEY,
+    results     TEXT NOT NULL,  -- JSON-список треків
+    fetched_at  REAL NOT NULL   -- unix time отримання результатів
+);
+
+CREATE INDEX IF NOT EXISTS idx_search_cache_fetched ON search_cache(fetched_at DESC);
 """
 
 
 async def _migrate_automix_schema(conn: aiosqlite.Connection) -> None:
-    """Додає колонки strategy для існуючих БД (CREATE IF NOT EXISTS їх не оновлює)."""
+    """Додає нові колонки в існуючих БД (CREATE IF NOT EXISTS їх не оновлює):
+    strategy в automix-таблицях і current_track_position у guild_state."""
     async def column_names(table: str) -> set:
         cur = await conn.execute(f"PRAGMA table_info({table})")
         rows = await cur.fetchall()
@@ -143,11 +207,145 @@ async def _migrate_automix_schema(conn: aiosqlite.Connection) -> None:
     except Exception as e:
         logger.warning(f"Міграція automix_feedback_events.strategy: {e}")
 
+    try:
+        names = await column_names("guild_state")
+        if "current_track_position" not in names:
+            await conn.execute(
+                "ALTER TABLE guild_state ADD COLUMN current_track_position REAL DEFAULT 0"
+            )
+    except Exception as e:
+        logger.warning(f"Міграція guild_state.current_track_position: {e}")
+
     await conn.commit()
 
 
+# Індекси по track_id: створюються після міграції, бо у старих БД колонки ще немає
+_TRACK_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_history_guild_track ON history_tracks(guild_id, track_id);
+CREATE INDEX IF NOT EXISTS idx_queue_track ON queue_tracks(track_id);
+"""
+
+
+# Колонки, що переносяться при перебудові таблиць під каталог, та їхні індекси
+_CATALOG_REBUILD = {
+    "history_tracks": ("id, guild_id, played_at", "idx_history_guild_played", "guild_id, played_at DESC"),
+    "queue_tracks": ("id, guild_id, position, added_at", "idx_queue_guild_position", "guild_id, position"),
+}
+
+
+# Час появи рядка у старих таблицях — для вибору найсвіжіших метаданих
+_LEGACY_TIME_COLUMNS = {"history_tracks": "played_at", "queue_tracks": "added_at"}
+
+
+def _rebuild_sql(table: str) -> List[str]:
+    """Перебудова таблиці за актуальним визначенням з _CREATE_TABLES_SQL (url → track_id)."""
+    columns, index_name, index_columns = _CATALOG_REBUILD[table]
+    definition = re.search(
+        rf"CREATE TABLE IF NOT EXISTS {table} (\(.*?\));", _CREATE_TABLES_SQL, re.DOTALL
+    ).group(1)
+    selected = ", ".join(f"old.{c.strip()}" for c in columns.split(","))
+    return [
+        f"CREATE TABLE {table}_new {definition}",
+        f"""
+        INSERT INTO {table}_new ({columns}, track_id)
+        SELECT {selected}, m.track_id
+        FROM {table} old JOIN track_url_map m ON m.url = old.url
+        """,
+        f"DROP TABLE {table}",
+        f"ALTER TABLE {table}_new RENAME TO {table}",
+        f"CREATE INDEX IF NOT EXISTS {index_name} ON {table}({index_columns})",
+    ]
+
+
+async def _migrate_track_catalog(conn: aiosqlite.Connection) -> None:
+    """
+    Переносить метадані з history_tracks / queue_tracks старого формату
+    (url, title, duration, thumbnail у кожному рядку) в каталог `tracks`
+    і перебудовує обидві таблиці з посиланням track_id.
+    Кожне поле каталогу береться з найсвіжішого рядка, де воно відоме.
+    """
+    async def column_names(table: str) -> set:
+        cur = await conn.execute(f"PRAGMA table_info({table})")
+        rows = await cur.fetchall()
+        return {r[1] for r in rows}
+
+    legacy = [t for t in ("history_tracks", "queue_tracks") if "url" in await column_names(t)]
+    if not legacy:
+        return
+
+    # Для кожного URL і кожного поля — значення з найсвіжішого рядка, де воно відоме
+    # (час played_at / added_at, далі id; 'Unknown' і порожні рядки — невідоме значення).
+    # URL впорядковані від нещодавніх, тож при злитті форм одного відео в канонічний
+    # ключ перевагу мають метадані посилання, яке бачили останнім.
+    union = " UNION ALL ".join(
+        f"SELECT url, title, duration, thumbnail, {_LEGACY_TIME_COLUMNS[table]} AS ts, id AS seq FROM {table}"
+        for table in legacy
+    )
+    cur = await conn.execute(
+        f"""
+        WITH legacy AS (
+            SELECT url, NULLIF(NULLIF(title, 'Unknown'), '') AS title, duration,
+                   NULLIF(thumbnail, '') AS thumbnail, ts, seq
+            FROM ({union})
+        )
+        SELECT DISTINCT url,
+            FIRST_VALUE(title) OVER (PARTITION BY url ORDER BY title IS NULL, ts DESC, seq DESC) AS title,
+            FIRST_VALUE(duration) OVER (PARTITION BY url ORDER BY duration IS NULL, ts DESC, seq DESC) AS duration,
+            FIRST_VALUE(thumbnail) OVER (PARTITION BY url ORDER BY thumbnail IS NULL, ts DESC, seq DESC) AS thumbnail,
+            MAX(ts) OVER (PARTITION BY url) AS last_seen
+        FROM legacy
+        ORDER BY last_seen DESC, url
+        """
+    )
+    rows = await cur.fetchall()
+    await conn.executemany(
+        """
+        INSERT INTO tracks (canonical, url, title, duration, thumbnail)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(canonical) DO UPDATE SET
+            title = COALESCE(tracks.title, excluded.title),
+            duration = COALESCE(tracks.duration, excluded.duration),
+            thumbnail = COALESCE(tracks.thumbnail, excluded.thumbnail)
+        """,
+        [catalog_row(dict(r)) for r in rows],
+    )
+    await conn.execute("CREATE TEMP TABLE track_url_map (url TEXT PRIMARY KEY, track_id INTEGER NOT NULL)")
+    await conn.executemany(
+        """
+        INSERT INTO track_url_map (url, track_id)
+        SELECT ?, id FROM tracks WHERE canonical = ?
+        """,
+        [(r["url"], canonical_track_key(r["url"])) for r in rows],
+    )
+
+    for table in legacy:
+        for statement in _rebuild_sql(table):
+            await conn.execute(statement)
+    await conn.execute("DROP TABLE track_url_map")
+    logger.info(f"Каталог треків: перенесено {len(rows)} URL з {', '.join(legacy)}")
+
+
+async def _backfill_play_counts(conn: aiosqlite.Connection) -> None:
+    """Заповнює track_play_counts з наявної історії (перший запуск після оновлення)."""
+    cursor = await conn.execute(
+        "SELECT EXISTS(SELECT 1 FROM track_play_counts), EXISTS(SELECT 1 FROM history_tracks)"
+    )
+    has_counts, has_history = await cursor.fetchone()
+    if has_counts or not has_history:
+        return
+    await conn.execute(
+        """
+        INSERT INTO track_play_counts (guild_id, track_id, play_count, last_played_at)
+        SELECT guild_id, track_id, COUNT(*), MAX(played_at)
+        FROM history_tracks
+        GROUP BY guild_id, track_id
+        """
+    )
+    logger.info("Лічильники прослуховувань заповнено з історії")
+
+
 async def get_connection() -> aiosqlite.Connection:
-    """Створює та повертає з'єднання з БД."""
+    """Створює та повертає нове з'єднання з БД (поза пулом)."""
     os.makedirs(DB_DIR, exist_ok=True)
     conn = await aiosqlite.connect(DB_PATH)
     conn.row_factory = aiosqlite.Row
@@ -158,13 +356,203 @@ async def get_connection() -> aiosqlite.Connection:
     return conn
 
 
+class ConnectionPool:
+    """
+    Довгоживучі з'єднання з SQLite: один writer і невеликий пул readers.
+
+    Writer серіалізується asyncio.Lock — кожен блок `writer()` є однією транзакцією
+    (commit при успіху, rollback при помилці). Усередині `batch()` вкладені блоки
+    `writer()` тієї ж задачі стають SAVEPOINT-ами спільної транзакції.
+    Readers працюють паралельно завдяки WAL.
+    З'єднання відкриваються один раз і перевикористовуються всіма методами репозиторію.
+    """
+
+    def __init__(self, path: str, reader_count: int = DB_READER_POOL_SIZE):
+        self.path = path
+        self.reader_count = max(1, reader_count)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._batch_owner: Optional[asyncio.Task] = None
+        self._savepoint_seq = 0
+        self._closed = True
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def open(self) -> None:
+        """Відкриває writer та readers. Повторний виклик нічого не робить."""
+        if not self._closed:
+            return
+        self.loop = asyncio.get_running_loop()
+        self._write_lock = asyncio.Lock()
+        self._idle_readers = asyncio.Queue()
+        try:
+            self._writer = await get_connection()
+            for _ in range(self.reader_count):
+                reader = await get_connection()
+                await reader.execute("PRAGMA query_only=ON")
+                self._readers.append(reader)
+                self._idle_readers.put_nowait(reader)
+        except BaseException:
+            await asyncio.gather(
+                *(c.close() for c in self._take_connections()), return_exceptions=True
+            )
+            raise
+        self._closed = False
+        logger.info(
+            f"Пул з'єднань відкрито: {self.path} (1 writer, {self.reader_count} readers)"
+        )
+
+    async def close(self) -> None:
+        """Закриває всі з'єднання пулу. Writer чекає завершення поточної транзакції."""
+        if self._closed:
+            return
+        self._closed = True
+        if asyncio.get_running_loop() is self.loop:
+            # Будимо тих, хто чекає на reader — вони отримають помилку замість вічного очікування
+            self._idle_readers.put_nowait(None)
+            async with self._write_lock:
+                conns = self._take_connections()
+                results = await asyncio.gather(*(c.close() for c in conns), return_exceptions=True)
+                for result in results:
+                    if isinstance(result, Exception):
+                        logger.warning(f"Помилка закриття з'єднання з БД: {result!r}")
+        else:
+            # Пул з іншого (можливо, вже закритого) event loop: потік з'єднання міг
+            # завершитися разом з ним, тому лише надсилаємо stop() без очікування
+            for conn in self._take_connections():
+                conn.stop()
+        logger.info(f"Пул з'єднань закрито: {self.path}")
+
+    def _take_connections(self) -> List[aiosqlite.Connection]:
+        conns = ([self._writer] if self._writer else []) + self._readers
+        self._writer = None
+        self._readers = []
+        return conns
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Ексклюзивний доступ до writer-з'єднання в межах однієї транзакції."""
+        if self._batch_owner is not None and self._batch_owner is asyncio.current_task():
+            async with self._savepoint() as conn:
+                yield conn
+            return
+        async with self._write_lock:
+            if self._writer is None:
+                raise RuntimeError("Пул з'єднань закрито")
+            try:
+                yield self._writer
+            except BaseException:
+                await self._rollback()
+                raise
+            else:
+                try:
+                    await self._writer.commit()
+                except BaseException:
+                    # Інакше з'єднання лишиться у відкритій транзакції і наступний BEGIN впаде
+                    await self._rollback()
+                    raise
+
+    async def _rollback(self) -> None:
+        try:
+            await self._writer.rollback()
+        except Exception as e:
+            logger.warning(f"Rollback не вдався: {e}")
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Одна транзакція для багатьох записів: вкладені `writer()` цієї задачі
+        не комітять окремо, а помилка в одному з них відкочує лише його SAVEPOINT.
+        """
+        async with self.writer() as conn:
+            await conn.execute("BEGIN")
+            self._batch_owner = asyncio.current_task()
+            try:
+                yield conn
+            finally:
+                self._batch_owner = None
+
+    @asynccontextmanager
+    async def _savepoint(self) -> AsyncIterator[aiosqlite.Connection]:
+        self._savepoint_seq += 1
+        name = f"sp_{self._savepoint_seq}"
+        await self._writer.execute(f"SAVEPOINT {name}")
+        try:
+            yield self._writer
+        except BaseException:
+            await self._writer.execute(f"ROLLBACK TO {name}")
+            await self._writer.execute(f"RELEASE {name}")
+            raise
+        else:
+            await self._writer.execute(f"RELEASE {name}")
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Позичає read-only з'єднання з пулу та повертає його після використання."""
+        if self._closed:
+            raise RuntimeError("Пул з'єднань закрито")
+        conn = await self._idle_readers.get()
+        if conn is None:
+            self._idle_readers.put_nowait(None)
+            raise RuntimeError("Пул з'єднань закрито")
+        try:
+            yield conn
+        finally:
+            if conn in self._readers:
+                self._idle_readers.put_nowait(conn)
+
+
+_pool: Optional[ConnectionPool] = None
+
+
+async def get_pool() -> ConnectionPool:
+    """
+    Повертає відкритий пул для поточного DB_PATH.
+    Пул перевідкривається, якщо змінився шлях до БД або event loop (тести).
+    """
+    global _pool
+    loop = asyncio.get_running_loop()
+    if _is_current(_pool, loop):
+        return _pool
+    pool = ConnectionPool(DB_PATH)
+    await pool.open()
+    if _is_current(_pool, loop):
+        # Інша корутина встигла відкрити пул, поки ми чекали
+        await pool.close()
+        return _pool
+    old, _pool = _pool, pool
+    if old is not None:
+        await old.close()
+    return pool
+
+
+def _is_current(pool: Optional[ConnectionPool], loop: asyncio.AbstractEventLoop) -> bool:
+    return pool is not None and not pool.closed and pool.path == DB_PATH and pool.loop is loop
+
+
+async def close_db() -> None:
+    """Закриває глобальний пул з'єднань (викликається при вивантаженні кога)."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.close()
+
+
 async def init_db() -> None:
-    """Ініціалізує БД: створює таблиці якщо їх немає."""
-    conn = await get_connection()
-    try:
+    """Ініціалізує БД: відкриває пул та створює таблиці якщо їх немає."""
+    pool = await get_pool()
+    async with pool.writer() as conn:
         await conn.executescript(_CREATE_TABLES_SQL)
-        await conn.commit()
+    async with pool.writer() as conn:
         await _migrate_automix_schema(conn)
-        logger.info(f"База даних ініціалізована: {DB_PATH}")
-    finally:
-        await conn.close()
+    async with pool.writer() as conn:
+        await _migrate_track_catalog(conn)
+        await conn.executescript(_TRACK_INDEXES_SQL)
+    async with pool.writer() as conn:
+        await _backfill_play_counts(conn)
+    logger.info(f"База даних ініціалізована: {DB_PATH}")
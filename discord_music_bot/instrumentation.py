@@ -0,0 +1,321 @@
+"""
+Інструментація відтворення: лаг event loop, таймінг аудіокадрів і етапи старту треку.
+
+Заїкання звуку має дві різні причини: «голодний» event loop (блокуючий виклик
+у корутині) або потік плеєра discord.py, якому бракує даних від ffmpeg. Тут
+зібрано метрики, що їх розрізняють:
+
+- лаг event loop — фонова задача спить LOOP_LAG_PROBE_INTERVAL і міряє, наскільки
+  пізніше прокинулась;
+- кадри по гільдіях — `read()` pipe-джерел (YTDLPPipeSource/OpusPipeSource):
+  латентність виклику, інтервал між викликами (джиттер потоку плеєра),
+  underrun-и, стартова тиша й неповні кадри;
+- етапи старту треку в `play_next_song` і при переході кросфейдом: resolve
+  (stream URL), ffmpeg_spawn, first_frame (від запуску до першого кадру з даними)
+  і total.
+
+Усе віддається текстом Prometheus на `/metrics` health-сервера (main.py).
+Запис іде з потоків плеєра, читання — з потоку HTTP, тож гістограми мають
+власні блокування.
+"""
+
+import asyncio
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from discord_music_bot import consts
+
+logger = logging.getLogger('MusicBot.Instrumentation')
+
+# Межі бакетів гістограм, секунди
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+READ_LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.02)
+FRAME_INTERVAL_BUCKETS = (0.01, 0.018, 0.019, 0.021, 0.022, 0.025, 0.03, 0.04, 0.06, 0.1, 0.25)
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0)
+
+STAGE_RESOLVE = "resolve"
+STAGE_FFMPEG_SPAWN = "ffmpeg_spawn"
+STAGE_FIRST_FRAME = "first_frame"
+STAGE_TOTAL = "total"
+STAGES = (STAGE_RESOLVE, STAGE_FFMPEG_SPAWN, STAGE_FIRST_FRAME, STAGE_TOTAL)
+
+# Результати read() pipe-джерела
+FRAME_OK = "frame"
+FRAME_UNDERRUN = "underrun"
+FRAME_STARTUP = "startup"
+FRAME_SHORT = "short"
+FRAME_END = "end"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    body = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    return "{" + body + "}"
+
+
+class Histogram:
+    """Кумулятивна гістограма Prometheus з фіксованими межами."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """(кумулятивні лічильники по межах + +Inf, сума, кількість)."""
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+    def render(self, name: str, labels: Optional[Dict[str, str]] = None) -> List[str]:
+        labels = labels or {}
+        cumulative, total, count = self.snapshot()
+        lines = []
+        for bound, value in zip(self.buckets + (float("inf"),), cumulative):
+            le = dict(labels, le=_format_value(bound))
+            lines.append(f"{name}_bucket{_labels(le)} {value}")
+        lines.append(f"{name}_sum{_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+        return lines
+
+
+class GuildAudioStats:
+    """Таймінг кадрів однієї гільдії (спільний для всіх її pipe-джерел)."""
+
+    def __init__(self):
+        self.read_latency = Histogram(READ_LATENCY_BUCKETS)
+        self.frame_interval = Histogram(FRAME_INTERVAL_BUCKETS)
+        self.counts: Dict[str, int] = {kind: 0 for kind in (FRAME_OK, FRAME_UNDERRUN, FRAME_STARTUP, FRAME_SHORT)}
+
+
+class FrameTimer:
+    """Таймер кадрів одного логічного потоку (переходить на перезапущений ffmpeg).
+
+    Інтервал рахується між викликами read() саме цього потоку, тож під час
+    кросфейду два джерела однієї гільдії не «ламають» джиттер одне одному."""
+
+    __slots__ = ("stats", "_last", "_marks", "_marks_lock", "_on_first_frame")
+
+    def __init__(self, stats: GuildAudioStats, on_first_frame):
+        self.stats = stats
+        self._last: Optional[float] = None
+        self._marks: Optional[Tuple[float, float]] = None  # (старт play_next_song, voice_client.play)
+        self._marks_lock = threading.Lock()
+        self._on_first_frame = on_first_frame
+
+    def expect_first_frame(self, started_at: float, played_at: float) -> None:
+        with self._marks_lock:
+            self._marks = (started_at, played_at)
+
+    def resolve_first_frame(self, first_frame_at: float) -> None:
+        """Закриває етапи first_frame/total, якщо їх ще чекають (з будь-якого потоку)."""
+        with self._marks_lock:
+            marks, self._marks = self._marks, None
+        if marks is not None:
+            self._on_first_frame(marks[0], marks[1], first_frame_at)
+
+    def record(self, started: float, finished: float, kind: str) -> None:
+        """Викликається з потоку плеєра після кожного read()."""
+        stats = self.stats
+        if kind == FRAME_END:
+            self._last = None
+            return
+        stats.read_latency.observe(finished - started)
+        if self._last is not None:
+            stats.frame_interval.observe(started - self._last)
+        self._last = started
+        stats.counts[kind] += 1
+        if kind == FRAME_OK and self._marks is not None:
+            self.resolve_first_frame(finished)
+
+
+class Instrumentation:
+    """Реєстр метрик процесу: лаг event loop, кадри по гільдіях, етапи старту треку."""
+
+    def __init__(self):
+        self.loop_lag = Histogram(LOOP_LAG_BUCKETS)
+        self.loop_lag_last = 0.0
+        self.loop_lag_max = 0.0
+        self.stages = {stage: Histogram(STAGE_BUCKETS) for stage in STAGES}
+        self.track_starts = {"cold": 0, "prefetched": 0, "crossfade": 0}
+        self._guilds: Dict[int, GuildAudioStats] = {}
+        self._lock = threading.Lock()
+        self._probe: Optional[asyncio.Task] = None
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    # ── Event loop ───────────────────────────────────────────────
+
+    def start_loop_probe(self, interval: float = consts.LOOP_LAG_PROBE_INTERVAL) -> None:
+        """Запускає фонову задачу проби в поточному event loop (повторний виклик — no-op)."""
+        if self._probe is not None and not self._probe.done():
+            return
+        self._probe = asyncio.get_running_loop().create_task(self._probe_loop(interval))
+
+    def stop_loop_probe(self) -> None:
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+
+    async def _probe_loop(self, interval: float) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.observe_loop_lag(max(0.0, loop.time() - expected))
+
+    def observe_loop_lag(self, lag: float) -> None:
+        self.loop_lag.observe(lag)
+        self.loop_lag_last = lag
+        self.loop_lag_max = max(self.loop_lag_max, lag)
+        if lag >= consts.LOOP_LAG_WARN_SECONDS:
+            logger.warning(f"Event loop lag {lag * 1000:.0f} ms")
+
+    # ── Аудіокадри ───────────────────────────────────────────────
+
+    def guild_audio(self, guild_id: int) -> GuildAudioStats:
+        with self._lock:
+            stats = self._guilds.get(guild_id)
+            if stats is None:
+                stats = self._guilds[guild_id] = GuildAudioStats()
+            return stats
+
+    def attach(self, guild_id: int, player) -> Optional[FrameTimer]:
+        """Під'єднує таймер кадрів до pipe-джерела плеєра (якщо його ще немає)."""
+        source = getattr(player, "original", None)
+        if source is None or not hasattr(source, "frame_timer"):
+            return None
+        if source.frame_timer is None:
+            source.frame_timer = FrameTimer(self.guild_audio(guild_id), self._first_frame)
+        return source.frame_timer
+
+    # ── Старт треку ──────────────────────────────────────────────
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        self.stages[stage].observe(max(0.0, seconds))
+
+    def _first_frame(self, started_at: float, played_at: float, first_frame_at: float) -> None:
+        self.observe_stage(STAGE_FIRST_FRAME, first_frame_at - played_at)
+        self.observe_stage(STAGE_TOTAL, first_frame_at - started_at)
+
+    def track_started(self, guild_id: int, player, started_at: float, *, prefetched: bool,
+                      crossfade: bool = False) -> None:
+        """Облік старту треку з `play_next_song` (`started_at` — time.perf_counter() на вході).
+
+        resolve/ffmpeg_spawn беруться з `player.start_timings` (їх заповнює
+        YTDLSource.from_track_dict); для заздалегідь підготовлених джерел ці
+        етапи вже минули, тож рахуються лише first_frame і total. Джерело, що
+        заграло ще до `voice_client.play` (кросфейд), first_frame не має.
+
+        Перехід кросфейдом (`crossfade=True`) рахується окремим шляхом: трек
+        звучить у мікшері ще під час перекриття, тож first_frame/total для нього
+        не визначені — лишаються resolve/ffmpeg_spawn холодного старту."""
+        path = "crossfade" if crossfade else "prefetched" if prefetched else "cold"
+        self.track_starts[path] += 1
+        timings = getattr(player, "start_timings", None)
+        if not prefetched and isinstance(timings, dict):
+            for stage in (STAGE_RESOLVE, STAGE_FFMPEG_SPAWN):
+                if isinstance(timings.get(stage), (int, float)):
+                    self.observe_stage(stage, timings[stage])
+        timer = self.attach(guild_id, player)
+        if crossfade:
+            return
+        played_at = getattr(player, "played_at", None)
+        if timer is None or not isinstance(played_at, float):
+            return
+        first_frame_at = getattr(player.original, "first_frame_at", None)
+        if first_frame_at is not None and first_frame_at < played_at:
+            return
+        timer.expect_first_frame(started_at, played_at)
+        # Потік плеєра міг отримати перший кадр ще до під'єднання таймера
+        first_frame_at = getattr(player.original, "first_frame_at", None)
+        if first_frame_at is not None:
+            timer.resolve_first_frame(first_frame_at)
+
+    # ── Експорт ──────────────────────────────────────────────────
+
+    def register_collector(self, collector: Callable[[], List[str]]) -> None:
+        """Додає джерело рядків Prometheus інших модулів (напр. process_supervisor)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Усі метрики у текстовому форматі Prometheus 0.0.4."""
+        lines = [
+            "# HELP musicbot_event_loop_lag_seconds Delay of the event loop lag probe wake-up.",
+            "# TYPE musicbot_event_loop_lag_seconds histogram",
+            *self.loop_lag.render("musicbot_event_loop_lag_seconds"),
+            "# HELP musicbot_event_loop_lag_last_seconds Last measured event loop lag.",
+            "# TYPE musicbot_event_loop_lag_last_seconds gauge",
+            f"musicbot_event_loop_lag_last_seconds {_format_value(self.loop_lag_last)}",
+            "# HELP musicbot_event_loop_lag_max_seconds Maximum event loop lag since start.",
+            "# TYPE musicbot_event_loop_lag_max_seconds gauge",
+            f"musicbot_event_loop_lag_max_seconds {_format_value(self.loop_lag_max)}",
+            "# HELP musicbot_track_start_stage_seconds Track start stage durations in play_next_song and crossfade switches.",
+            "# TYPE musicbot_track_start_stage_seconds histogram",
+        ]
+        for stage, histogram in self.stages.items():
+            lines += histogram.render("musicbot_track_start_stage_seconds", {"stage": stage})
+        lines += [
+            "# HELP musicbot_track_starts_total Track starts by source path.",
+            "# TYPE musicbot_track_starts_total counter",
+        ]
+        lines += [
+            f"musicbot_track_starts_total{_labels({'path': path})} {count}"
+            for path, count in self.track_starts.items()
+        ]
+
+        with self._lock:
+            guilds = sorted(self._guilds.items())
+        lines += [
+            "# HELP musicbot_audio_read_seconds Latency of audio source read() calls.",
+            "# TYPE musicbot_audio_read_seconds histogram",
+        ]
+        for guild_id, stats in guilds:
+            lines += stats.read_latency.render("musicbot_audio_read_seconds", {"guild": str(guild_id)})
+        lines += [
+            "# HELP musicbot_audio_frame_interval_seconds Interval between read() calls of the player thread.",
+            "# TYPE musicbot_audio_frame_interval_seconds histogram",
+        ]
+        for guild_id, stats in guilds:
+            lines += stats.frame_interval.render("musicbot_audio_frame_interval_seconds", {"guild": str(guild_id)})
+        lines += [
+            "# HELP musicbot_audio_frames_total Frames returned by read() by outcome.",
+            "# TYPE musicbot_audio_frames_total counter",
+        ]
+        for guild_id, stats in guilds:
+            for kind, count in list(stats.counts.items()):
+                lines.append(f"musicbot_audio_frames_total{_labels({'guild': str(guild_id), 'kind': kind})} {count}")
+        for collector in self._collectors:
+            try:
+                lines += collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector!r} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,116 @@
+"""
+Кеш вимірів гучності (EBU R128) за YouTube video ID для фільтра loudnorm.
+
+Перше відтворення треку проходить через однопрохідний (динамічний) loudnorm
+з `print_format=json`: наприкінці потоку ffmpeg друкує виміри в stderr. Вони
+зберігаються тут, і наступні відтворення того самого треку йдуть у лінійному
+режимі (`measured_*`, `linear=true`), який не «стискає» динаміку.
+"""
+
+import json
+import logging
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from discord_music_bot import consts
+from discord_music_bot.stream_cache import cache_key
+
+logger = logging.getLogger('MusicBot.LoudnessCache')
+
+_MEASURED_KEYS = ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")
+
+
+def parse_loudnorm_stats(stderr_text: str) -> Optional[Dict[str, float]]:
+    """Дістає останній JSON-блок loudnorm зі stderr ffmpeg; None — якщо його немає
+    або виміри невалідні (наприклад, -inf для тиші)."""
+    if not stderr_text or "input_i" not in stderr_text:
+        return None
+    end = stderr_text.rfind("}")
+    start = stderr_text.rfind("{", 0, end)
+    if start < 0 or end < 0:
+        return None
+    try:
+        raw = json.loads(stderr_text[start:end + 1])
+        stats = {key: float(raw[key]) for key in _MEASURED_KEYS}
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not all(math.isfinite(value) for value in stats.values()):
+        return None
+    return stats
+
+
+def _target() -> str:
+    return (
+        f"I={consts.LOUDNORM_TARGET_I}:TP={consts.LOUDNORM_TARGET_TP}"
+        f":LRA={consts.LOUDNORM_TARGET_LRA}"
+    )
+
+
+class LoudnessCache:
+    """LRU-кеш вимірів loudnorm."""
+
+    def __init__(self, max_entries: int = consts.LOUDNORM_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, page_url: str) -> Optional[Dict[str, float]]:
+        key = cache_key(page_url)
+        if key is None:
+            return None
+        with self._lock:
+            stats = self._entries.get(key)
+            if stats is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(stats)
+
+    def put(self, page_url: str, stats: Dict[str, float]) -> None:
+        key = cache_key(page_url)
+        if key is None or not stats:
+            return
+        with self._lock:
+            self._entries[key] = dict(stats)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record(self, page_url: str, stderr_text: str) -> bool:
+        """Зберігає виміри з stderr завершеного ffmpeg; True — якщо їх знайдено."""
+        stats = parse_loudnorm_stats(stderr_text)
+        if stats is None:
+            return False
+        self.put(page_url, stats)
+        logger.info(f"Loudness measured for {cache_key(page_url)}: {stats['input_i']} LUFS")
+        return True
+
+    def filter_for(self, page_url: str) -> str:
+        """Фільтр loudnorm: лінійний з кешованими вимірами або вимірювальний прохід."""
+        stats = self.get(page_url)
+        if stats is None:
+            return f"loudnorm={_target()}:print_format=json"
+        return (
+            f"loudnorm={_target()}"
+            f":measured_I={stats['input_i']}:measured_TP={stats['input_tp']}"
+            f":measured_LRA={stats['input_lra']}:measured_thresh={stats['input_thresh']}"
+            f":offset={stats['target_offset']}:linear=true"
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+loudness_cache = LoudnessCache()
@@ -0,0 +1,300 @@
+"""
+Клієнт публічних Piped API зі станом здоров'я інстансів і hedged-запитами.
+
+Раніше `fetch_piped_stream` / `fetch_piped_search` перебирали PIPED_INSTANCES
+по черзі з 5-секундним таймаутом кожен: пара мертвих інстансів на початку
+списку додавала 10+ секунд. Тепер:
+
+- для кожного інстансу ведеться EWMA затримки й частки помилок, а також
+  останні затримки для медіани (p50);
+- інстанси впорядковуються за здоров'ям; після PIPED_BREAKER_FAILURES
+  помилок поспіль спрацьовує circuit breaker — інстанс пропускається
+  PIPED_BREAKER_COOLDOWN секунд (далі одна пробна спроба, half-open);
+- запит іде на найкращий інстанс, а якщо відповіді немає довше за його p50
+  (у межах PIPED_HEDGE_MIN_DELAY..PIPED_HEDGE_MAX_DELAY) — паралельно на
+  наступний; береться перша придатна відповідь;
+- HTTP-з'єднання (keep-alive) перевикористовуються між запитами.
+"""
+
+import http.client
+import json
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from discord_music_bot import consts
+
+logger = logging.getLogger('MusicBot.PipedClient')
+
+USER_AGENT = "Mozilla/5.0 (compatible; discord-music-bot/1.0)"
+
+
+class InstanceHealth:
+    """Здоров'я одного інстансу: EWMA затримки/помилок і circuit breaker."""
+
+    __slots__ = ("latency_ewma", "error_ewma", "consecutive_failures", "open_until", "recent", "requests")
+
+    def __init__(self):
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.recent: Deque[float] = deque(maxlen=consts.PIPED_LATENCY_SAMPLES)
+        self.requests = 0
+
+    def score(self) -> float:
+        """Менше — краще: очікувана затримка з поправкою на частку помилок."""
+        latency = self.latency_ewma if self.latency_ewma is not None else consts.PIPED_HEDGE_DEFAULT_DELAY
+        return latency * (1.0 + 4.0 * self.error_ewma)
+
+    def p50(self) -> Optional[float]:
+        return statistics.median(self.recent) if self.recent else None
+
+
+class _ConnectionPool:
+    """Keep-alive з'єднання http.client, згруповані за (scheme, host, port)."""
+
+    # Так виглядає запит у keep-alive з'єднання, яке сервер уже закрив, поки воно простоювало
+    STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+    def __init__(self, max_idle: int = consts.PIPED_MAX_IDLE_CONNECTIONS):
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple[str, str, Optional[int]], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.stale = 0
+
+    def get_json(self, url: str, timeout: float) -> Any:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname or "", parts.port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        conn, reused = self._checkout(key, timeout)
+        while True:
+            try:
+                conn.request("GET", path, headers={"User-Agent": USER_AGENT, "Accept": "application/json"})
+                resp = conn.getresponse()
+                break
+            except self.STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # Відповіді ще не було — одна повторна спроба на новому з'єднанні,
+                # інстанс при цьому не вважається таким, що відмовив
+                with self._lock:
+                    self.stale += 1
+                conn, reused = self._connect(key, timeout), False
+            except Exception:
+                conn.close()
+                raise
+        try:
+            body = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+        if resp.status != 200:
+            raise http.client.HTTPException(f"HTTP {resp.status}")
+        return json.loads(body.decode("utf-8"))
+
+    def _checkout(self, key, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """Простояне з'єднання (True) або нове (False)."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        return self._connect(key, timeout), False
+
+    def _connect(self, key, timeout: float) -> http.client.HTTPConnection:
+        with self._lock:
+            self.created += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout)
+
+    def _checkin(self, key, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+
+class PipedClient:
+    """Hedged GET-запити JSON до найздоровіших Piped інстансів."""
+
+    def __init__(
+        self,
+        timeout: float = consts.PIPED_REQUEST_TIMEOUT,
+        budget: float = consts.PIPED_REQUEST_BUDGET,
+        max_inflight: int = consts.PIPED_HEDGE_MAX_INFLIGHT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.timeout = timeout
+        self.budget = budget
+        self.max_inflight = max(1, max_inflight)
+        self._clock = clock
+        self._health: Dict[str, InstanceHealth] = {}
+        self._lock = threading.Lock()
+        self._http = _ConnectionPool()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.hedges = 0
+
+    def health(self, base: str) -> InstanceHealth:
+        with self._lock:
+            return self._health.setdefault(base, InstanceHealth())
+
+    def ordered(self, instances: Sequence[str]) -> List[str]:
+        """Інстанси з закритим breaker за здоров'ям; інстанси з відкритим — відкинуто."""
+        now = self._clock()
+        candidates = []
+        for position, base in enumerate(dict.fromkeys(instances)):
+            health = self.health(base)
+            if health.open_until > now:
+                continue
+            candidates.append((health.score(), position, base))
+        candidates.sort()
+        return [base for _, _, base in candidates]
+
+    def hedge_delay(self, base: str) -> float:
+        p50 = self.health(base).p50()
+        delay = consts.PIPED_HEDGE_DEFAULT_DELAY if p50 is None else p50
+        return min(max(delay, consts.PIPED_HEDGE_MIN_DELAY), consts.PIPED_HEDGE_MAX_DELAY)
+
+    def get_json(
+        self,
+        instances: Sequence[str],
+        path: str,
+        accept: Callable[[Any], bool] = bool,
+    ) -> Tuple[Optional[str], Any]:
+        """Повертає (інстанс, JSON) першої відповіді, яку приймає `accept`, або (None, None)."""
+        order = self.ordered(instances)
+        if not order:
+            logger.warning("All Piped instances are circuit-broken")
+            return None, None
+        executor = self._get_executor()
+        pending: Dict[Future, str] = {}
+        next_index = 0
+        deadline = self._clock() + self.budget
+
+        def launch() -> None:
+            nonlocal next_index
+            base = order[next_index]
+            next_index += 1
+            pending[executor.submit(self._fetch, base, path)] = base
+
+        launch()
+        while pending:
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                break
+            can_hedge = next_index < len(order) and len(pending) < self.max_inflight
+            wait_for = min(self.hedge_delay(order[next_index - 1]), remaining) if can_hedge else remaining
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+            if not done:
+                if can_hedge:
+                    self.hedges += 1
+                    logger.info(f"Piped {order[next_index - 1]} is slow — hedging to {order[next_index]}")
+                    launch()
+                continue
+            for future in done:
+                base = pending.pop(future)
+                data = future.result()
+                if data is not None and accept(data):
+                    return base, data
+            # Відмова (або непридатна відповідь) — наступний інстанс одразу, без очікування
+            if not pending and next_index < len(order):
+                launch()
+        return None, None
+
+    def _fetch(self, base: str, path: str) -> Any:
+        started = self._clock()
+        try:
+            data = self._http.get_json(base + path, self.timeout)
+        except Exception as exc:
+            self._record(base, None)
+            logger.warning(f"Piped instance {base} failed: {exc}")
+            return None
+        self._record(base, self._clock() - started)
+        return data
+
+    def _record(self, base: str, latency: Optional[float]) -> None:
+        alpha = consts.PIPED_EWMA_ALPHA
+        health = self.health(base)
+        with self._lock:
+            health.requests += 1
+            if latency is None:
+                health.error_ewma = (1 - alpha) * health.error_ewma + alpha
+                health.consecutive_failures += 1
+                if health.consecutive_failures >= consts.PIPED_BREAKER_FAILURES:
+                    health.open_until = self._clock() + consts.PIPED_BREAKER_COOLDOWN
+                    logger.warning(f"Piped instance {base} circuit opened for {consts.PIPED_BREAKER_COOLDOWN}s")
+                return
+            health.error_ewma = (1 - alpha) * health.error_ewma
+            health.consecutive_failures = 0
+            health.open_until = 0.0
+            health.recent.append(latency)
+            if health.latency_ewma is None:
+                health.latency_ewma = latency
+            else:
+                health.latency_ewma = (1 - alpha) * health.latency_ewma + alpha * latency
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=consts.PIPED_HEDGE_WORKERS, thread_name_prefix="piped"
+                )
+            return self._executor
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            instances = {
+                base: {
+                    "latency_ewma_ms": (h.latency_ewma or 0.0) * 1000,
+                    "p50_ms": (h.p50() or 0.0) * 1000,
+                    "error_rate": h.error_ewma,
+                    "open": h.open_until > now,
+                    "requests": h.requests,
+                }
+                for base, h in self._health.items()
+            }
+        return {
+            "hedges": self.hedges,
+            "connections_created": self._http.created,
+            "connections_reused": self._http.reused,
+            "connections_stale": self._http.stale,
+            "instances": instances,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._http.close()
+
+
+piped_client = PipedClient()
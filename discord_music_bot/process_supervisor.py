@@ -0,0 +1,268 @@
+"""
+Нагляд за дочірніми процесами ffmpeg.
+
+Замість періодичного `ps`-сканування, яке не відрізняло наші процеси від
+чужих і лишало «протеклі» ffmpeg жити до п'яти хвилин, кожен ffmpeg, який
+запускає YTDLSource, реєструється тут:
+
+- завершення дитини видно одразу через pidfd (Linux ≥ 5.3) у event loop —
+  процес reap-иться без зомбі; де pidfd немає, watchdog опитує `poll()`
+  кожні SUPERVISOR_CHECK_INTERVAL секунд;
+- ffmpeg стартує у власній сесії (групі процесів), тож `kill()` завершує
+  всю групу;
+- понад SUPERVISOR_MAX_PER_GUILD процесів гільдії завершуються ті, що
+  найдовше не читалися;
+- процес, чиє джерело не читалося SUPERVISOR_IDLE_TIMEOUT секунд (загублений
+  prefetch, джерело без cleanup), завершується;
+- кількість живих процесів і RSS по гільдіях — у `stats()` і на /metrics.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+from discord_music_bot import consts
+from discord_music_bot.instrumentation import instrumentation
+from discord_music_bot.services.extraction_scheduler import current_guild
+
+logger = logging.getLogger('MusicBot.ProcessSupervisor')
+
+
+class _Child:
+    __slots__ = ("process", "guild_id", "kind", "started_at", "owner", "pidfd", "loop")
+
+    def __init__(self, process, guild_id: Optional[int], kind: str):
+        self.process = process
+        self.guild_id = guild_id
+        self.kind = kind
+        self.started_at = time.monotonic()
+        self.owner = None  # weakref на аудіоджерело, що читає stdout
+        self.pidfd: Optional[int] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def last_active(self) -> float:
+        """Останнє читання джерела (time.monotonic), або час запуску."""
+        owner = self.owner() if self.owner is not None else None
+        last_read = getattr(owner, "last_read_at", None)
+        return max(self.started_at, last_read) if isinstance(last_read, float) else self.started_at
+
+
+class ProcessSupervisor:
+    """Реєстр дочірніх процесів: reap, ліміти на гільдію, idle timeout, RSS."""
+
+    def __init__(
+        self,
+        max_per_guild: int = consts.SUPERVISOR_MAX_PER_GUILD,
+        idle_timeout: float = consts.SUPERVISOR_IDLE_TIMEOUT,
+    ):
+        self.max_per_guild = max(1, max_per_guild)
+        self.idle_timeout = idle_timeout
+        self._children: Dict[int, _Child] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.spawned = 0
+        self.exited = 0
+        self.killed_idle = 0
+        self.killed_limit = 0
+
+    @staticmethod
+    def popen_kwargs() -> Dict[str, Any]:
+        """Аргументи Popen: власна сесія, щоб kill() зачіпав усю групу процесів."""
+        return {"start_new_session": True} if os.name == "posix" else {}
+
+    # ── Реєстрація ───────────────────────────────────────────────
+
+    def register(self, process, *, guild_id: Optional[int] = None, kind: str = "ffmpeg") -> None:
+        """Бере процес під нагляд; гільдія за замовчуванням — з bind_guild() поточної задачі."""
+        pid = getattr(process, "pid", None)
+        if not isinstance(pid, int):
+            return
+        if guild_id is None:
+            guild_id = current_guild()
+        child = _Child(process, guild_id, kind)
+        with self._lock:
+            self._children[pid] = child
+            self.spawned += 1
+        self._watch(pid, child)
+        self._enforce_limit(guild_id, keep=pid)
+
+    def adopt(self, process, owner) -> None:
+        """Прив'язує процес до джерела: його `last_read_at` — ознака активності."""
+        child = self._children.get(getattr(process, "pid", None))
+        if child is not None and child.process is process:
+            child.owner = weakref.ref(owner)
+
+    def _watch(self, pid: int, child: _Child) -> None:
+        pidfd_open = getattr(os, "pidfd_open", None)
+        if pidfd_open is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # поза event loop — завершення підхопить watchdog
+        try:
+            fd = pidfd_open(pid)
+        except OSError:
+            return  # процес уже завершився й reap-нутий
+        child.pidfd, child.loop = fd, loop
+        loop.add_reader(fd, self._on_exit, pid)
+
+    def _on_exit(self, pid: int) -> None:
+        """pidfd став читабельним — процес завершився: reap і зняття з обліку."""
+        child = self._children.get(pid)
+        if child is None:
+            return
+        child.process.poll()
+        self._forget(pid)
+
+    def _forget(self, pid: int) -> None:
+        with self._lock:
+            child = self._children.pop(pid, None)
+            if child is None:
+                return
+            self.exited += 1
+        if child.pidfd is not None:
+            try:
+                child.loop.remove_reader(child.pidfd)
+            except Exception:
+                pass
+            os.close(child.pidfd)
+        logger.debug(f"{child.kind} pid={pid} (guild {child.guild_id}) exited with {child.process.returncode}")
+
+    # ── Завершення ───────────────────────────────────────────────
+
+    def kill(self, process) -> None:
+        """SIGKILL для групи процесу (або просто процесу, якщо він не під наглядом)."""
+        pid = getattr(process, "pid", None)
+        child = self._children.get(pid) if isinstance(pid, int) else None
+        if child is not None and child.process is process and os.name == "posix" and process.poll() is None:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+                return
+            except (ProcessLookupError, PermissionError):
+                pass
+        process.kill()
+
+    def _enforce_limit(self, guild_id: Optional[int], keep: int) -> None:
+        if guild_id is None:
+            return
+        with self._lock:
+            others = [
+                (child.last_active(), pid, child)
+                for pid, child in self._children.items()
+                if child.guild_id == guild_id and pid != keep and child.process.returncode is None
+            ]
+        excess = len(others) + 1 - self.max_per_guild
+        for _, pid, child in sorted(others, key=lambda item: item[0])[:max(0, excess)]:
+            logger.warning(f"Guild {guild_id} exceeds {self.max_per_guild} processes — killing idle {child.kind} pid={pid}")
+            self.killed_limit += 1
+            self.kill(child.process)
+
+    def check(self) -> int:
+        """Один прохід watchdog: reap завершених і kill неактивних; повертає кількість вбитих."""
+        now = time.monotonic()
+        killed = 0
+        with self._lock:
+            children = list(self._children.items())
+        for pid, child in children:
+            if child.process.poll() is not None:
+                self._forget(pid)
+            elif now - child.last_active() > self.idle_timeout:
+                logger.warning(
+                    f"Idle {child.kind} pid={pid} (guild {child.guild_id}) not read for "
+                    f"{now - child.last_active():.0f}s — killing"
+                )
+                self.killed_idle += 1
+                self.kill(child.process)
+                killed += 1
+        return killed
+
+    async def _watchdog(self, interval: float) -> None:
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                self.check()
+            except asyncio.CancelledError:
+                logger.info("Process supervisor watchdog cancelled.")
+                break
+            except Exception as e:
+                logger.error(f"Process supervisor watchdog error: {e}")
+
+    def start(self, interval: float = consts.SUPERVISOR_CHECK_INTERVAL) -> None:
+        """Запускає watchdog у поточному event loop (повторний виклик — no-op)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._watchdog(interval))
+        logger.info(f"Process supervisor started (check every {interval}s, idle timeout {self.idle_timeout}s)")
+
+    def shutdown(self) -> None:
+        """Завершує всі процеси під наглядом (вихід бота)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        with self._lock:
+            children = list(self._children.values())
+        for child in children:
+            if child.process.poll() is None:
+                self.kill(child.process)
+
+    # ── Звіт ─────────────────────────────────────────────────────
+
+    @staticmethod
+    def _rss(pid: int) -> Optional[int]:
+        """RSS процесу в байтах з /proc (None — якщо недоступно)."""
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            children = list(self._children.items())
+        guilds: Dict[Optional[int], Dict[str, int]] = {}
+        for pid, child in children:
+            entry = guilds.setdefault(child.guild_id, {"processes": 0, "rss_bytes": 0})
+            entry["processes"] += 1
+            entry["rss_bytes"] += self._rss(pid) or 0
+        return {
+            "live": len(children),
+            "spawned": self.spawned,
+            "exited": self.exited,
+            "killed_idle": self.killed_idle,
+            "killed_limit": self.killed_limit,
+            "guilds": guilds,
+        }
+
+    def metrics_lines(self) -> List[str]:
+        """Метрики Prometheus для /metrics (колектор instrumentation)."""
+        stats = self.stats()
+        lines = [
+            "# HELP musicbot_subprocesses Live supervised ffmpeg processes per guild.",
+            "# TYPE musicbot_subprocesses gauge",
+        ]
+        per_guild = sorted(stats["guilds"].items(), key=lambda item: str(item[0]))
+        lines += [f'musicbot_subprocesses{{guild="{guild}"}} {entry["processes"]}' for guild, entry in per_guild]
+        lines += [
+            "# HELP musicbot_subprocess_rss_bytes Resident memory of supervised processes per guild.",
+            "# TYPE musicbot_subprocess_rss_bytes gauge",
+        ]
+        lines += [f'musicbot_subprocess_rss_bytes{{guild="{guild}"}} {entry["rss_bytes"]}' for guild, entry in per_guild]
+        lines += [
+            "# HELP musicbot_subprocess_events_total Supervised process lifecycle events.",
+            "# TYPE musicbot_subprocess_events_total counter",
+        ]
+        lines += [
+            f'musicbot_subprocess_events_total{{event="{event}"}} {stats[event]}'
+            for event in ("spawned", "exited", "killed_idle", "killed_limit")
+        ]
+        return lines
+
+
+process_supervisor = ProcessSupervisor()
+instrumentation.register_collector(process_supervisor.metrics_lines)
@@ -0,0 +1,179 @@
+"""
+Адаптивний порядок спроб екстракції (профіль yt-dlp × формат).
+
+Раніше `extract_stream_url` завжди перебирав EXTRACTION_PROFILES у
+фіксованому порядку й кожен YTDLP_FORMAT_FALLBACKS для кожного профілю, тож
+коли, наприклад, android-клієнт отримував бот-чек, кожен трек спершу платив
+за кілька невдалих екстракцій.
+
+ProfileSelector веде для кожної пари (профіль, формат) дисконтовану
+статистику успіхів і середню затримку та впорядковує спроби семплюванням
+Томпсона (Beta(успіхи + 1, невдачі + 1)): пари, що працюють, ідуть першими,
+а решта час від часу все одно пробуються (exploration). Профіль, що отримав
+бот-чек, до кінця поточної екстракції пропускається, а на
+PROFILE_BOT_CHECK_COOLDOWN секунд ставиться в кінець черги.
+
+Статистика живе в пам'яті; `snapshot()`/`load()` зберігають і відновлюють її
+через таблицю extraction_profile_stats.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from discord_music_bot import consts
+
+logger = logging.getLogger('MusicBot.ProfileSelector')
+
+# (ім'я профілю, з cookies, player clients, формат або None)
+Attempt = Tuple[str, bool, List[str], Optional[str]]
+
+
+def format_label(fmt: Optional[str]) -> str:
+    return fmt or "manual-pick"
+
+
+class _ArmStats:
+    __slots__ = ("successes", "failures", "bot_checks", "latency_avg")
+
+    def __init__(self, successes=0.0, failures=0.0, bot_checks=0, latency_avg=0.0):
+        self.successes = float(successes)
+        self.failures = float(failures)
+        self.bot_checks = int(bot_checks)
+        self.latency_avg = float(latency_avg)
+
+
+class ProfileSelector:
+    """Bandit-порядок спроб екстракції з карантином профілів після бот-чеку."""
+
+    def __init__(
+        self,
+        decay: float = consts.PROFILE_STATS_DECAY,
+        cooldown: float = consts.PROFILE_BOT_CHECK_COOLDOWN,
+        rng: Optional[random.Random] = None,
+        clock=time.monotonic,
+    ):
+        self.decay = decay
+        self.cooldown = cooldown
+        self._rng = rng or random.Random()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._arms: Dict[Tuple[str, str], _ArmStats] = {}
+        self._cooldown_until: Dict[str, float] = {}
+        self.dirty = False
+        # Скільки спроб знадобилось на трек (середнє — головна метрика)
+        self.tracks = 0
+        self.track_attempts = 0
+
+    def plan(
+        self,
+        profiles: Iterable[Tuple[str, bool, List[str]]],
+        formats: Sequence[Optional[str]],
+    ) -> List[Attempt]:
+        """Порядок спроб: профілі на карантині — в кінці, решта — за вибіркою Томпсона."""
+        now = self._clock()
+        scored = []
+        with self._lock:
+            for name, use_cookies, clients in profiles:
+                cooling = self._cooldown_until.get(name, 0.0) > now
+                for fmt in formats:
+                    arm = self._arms.get((name, format_label(fmt)))
+                    wins, losses = (arm.successes, arm.failures) if arm else (0.0, 0.0)
+                    sample = self._rng.betavariate(wins + 1.0, losses + 1.0)
+                    latency = arm.latency_avg if arm else 0.0
+                    scored.append(((cooling, -sample, latency), (name, use_cookies, clients, fmt)))
+        scored.sort(key=lambda item: item[0])
+        return [attempt for _, attempt in scored]
+
+    def record(
+        self,
+        profile: str,
+        fmt: Optional[str],
+        success: bool,
+        latency: float,
+        *,
+        bot_check: bool = False,
+    ) -> None:
+        """Результат однієї спроби; бот-чек відправляє профіль на карантин."""
+        key = (profile, format_label(fmt))
+        with self._lock:
+            arm = self._arms.setdefault(key, _ArmStats())
+            arm.successes *= self.decay
+            arm.failures *= self.decay
+            if success:
+                arm.successes += 1.0
+                # Затримка — експоненційне середнє лише для успішних спроб
+                arm.latency_avg = latency if arm.latency_avg == 0.0 else 0.8 * arm.latency_avg + 0.2 * latency
+            else:
+                arm.failures += 1.0
+            if bot_check:
+                arm.bot_checks += 1
+                self._cooldown_until[profile] = self._clock() + self.cooldown
+            self.dirty = True
+        if bot_check:
+            logger.warning(f"Profile '{profile}' hit a bot check — deprioritized for {self.cooldown:.0f}s")
+
+    def record_track(self, attempts: int) -> None:
+        """Кількість спроб yt-dlp, витрачених на один трек."""
+        with self._lock:
+            self.tracks += 1
+            self.track_attempts += attempts
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Рядки для extraction_profile_stats; скидає прапорець dirty."""
+        with self._lock:
+            self.dirty = False
+            return [
+                {
+                    "profile": profile,
+                    "format": fmt,
+                    "successes": arm.successes,
+                    "failures": arm.failures,
+                    "bot_checks": arm.bot_checks,
+                    "latency_avg": arm.latency_avg,
+                }
+                for (profile, fmt), arm in self._arms.items()
+            ]
+
+    def load(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Відновлює статистику зі збережених рядків (карантини не переживають рестарт)."""
+        with self._lock:
+            for row in rows:
+                self._arms[(row["profile"], row["format"])] = _ArmStats(
+                    row.get("successes") or 0.0,
+                    row.get("failures") or 0.0,
+                    row.get("bot_checks") or 0,
+                    row.get("latency_avg") or 0.0,
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            arms = {}
+            for (profile, fmt), arm in self._arms.items():
+                total = arm.successes + arm.failures
+                arms[f"{profile}/{fmt}"] = {
+                    "success_rate": arm.successes / total if total else 0.0,
+                    "weight": total,
+                    "bot_checks": arm.bot_checks,
+                    "latency_ms": arm.latency_avg * 1000,
+                }
+            return {
+                "tracks": self.tracks,
+                "attempts_per_track": self.track_attempts / self.tracks if self.tracks else 0.0,
+                "cooling_down": sorted(p for p, until in self._cooldown_until.items() if until > now),
+                "arms": arms,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._arms.clear()
+            self._cooldown_until.clear()
+            self.tracks = 0
+            self.track_attempts = 0
+            self.dirty = False
+
+
+profile_selector = ProfileSelector()
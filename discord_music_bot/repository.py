@@ -3,9 +3,40 @@ Repository pattern для абстрагування роботи з базою
 Відділяє бізнес-логіку від деталей зберігання даних.
 """
 
+import json
 import logging
-from typing import List, Dict, Optional, Any
-from discord_music_bot.database import get_connection
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Optional, Any, Sequence, Tuple
+from discord_music_bot import consts
+from discord_music_bot.database import get_pool
+from discord_music_bot.track_catalog import UNKNOWN_TITLE, canonical_track_key, catalog_row
+
+# Поля треку з каталогу для JOIN-запитів (ключі словників як і до каталогу)
+_TRACK_COLUMNS = (
+    f"t.url AS url, COALESCE(t.title, '{UNKNOWN_TITLE}') AS title, "
+    "t.duration AS duration, t.thumbnail AS thumbnail"
+)
+
+# Звичайний запис лише доповнює порожні поля; збагачення (повна екстракція) перезаписує
+_UPSERT_TRACK_SQL = """
+    INSERT INTO tracks (canonical, url, title, duration, thumbnail)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(canonical) DO UPDATE SET
+        title = COALESCE(tracks.title, excluded.title),
+        duration = COALESCE(tracks.duration, excluded.duration),
+        thumbnail = COALESCE(tracks.thumbnail, excluded.thumbnail)
+"""
+_ENRICH_TRACK_SQL = """
+    INSERT INTO tracks (canonical, url, title, duration, thumbnail)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(canonical) DO UPDATE SET
+        title = COALESCE(excluded.title, tracks.title),
+        duration = COALESCE(excluded.duration, tracks.duration),
+        thumbnail = COALESCE(excluded.thumbnail, tracks.thumbnail)
+"""
+
+# Ліміт параметрів одного IN (...) у SQLite
+_IN_CHUNK = 500
 
 logger = logging.getLogger('MusicBot.Repository')
 
@@ -13,6 +44,13 @@ logger = logging.getLogger('MusicBot.Repository')
 class MusicRepository:
     """Асинхронний репозиторій для роботи з музичними даними."""
 
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        """Виконує всі записи всередині блоку однією транзакцією (write-behind flush)."""
+        pool = await get_pool()
+        async with pool.batch():
+            yield
+
     # ── Guild State ──────────────────────────────────────────────
 
     async def save_guild_state(
@@ -25,17 +63,18 @@ class MusicRepository:
         track_duration: Optional[int] = None,
         track_thumbnail: Optional[str] = None,
         is_paused: bool = False,
+        track_position: float = 0.0,
     ) -> None:
         """Зберігає або оновлює стан бота для конкретного сервера."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 """
                 INSERT INTO guild_state 
                     (guild_id, voice_channel_id, text_channel_id,
                      current_track_url, current_track_title, current_track_duration,
-                     current_track_thumbnail, is_paused, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                     current_track_thumbnail, current_track_position, is_paused, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
                 ON CONFLICT(guild_id) DO UPDATE SET
                     voice_channel_id = excluded.voice_channel_id,
                     text_channel_id = excluded.text_channel_id,
@@ -43,35 +82,46 @@ class MusicRepository:
                     current_track_title = excluded.current_track_title,
                     current_track_duration = excluded.current_track_duration,
                     current_track_thumbnail = excluded.current_track_thumbnail,
+                    current_track_position = excluded.current_track_position,
                     is_paused = excluded.is_paused,
                     updated_at = CURRENT_TIMESTAMP
                 """,
                 (guild_id, voice_channel_id, text_channel_id,
                  track_url, track_title, track_duration,
-                 track_thumbnail, int(is_paused)),
+                 track_thumbnail, float(track_position), int(is_paused)),
+            )
+
+    async def save_playback_position(self, guild_id: int, track_url: str, position: float) -> None:
+        """Оновлює позицію поточного треку; запис для вже зміненого треку нічого не робить."""
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            await conn.execute(
+                """
+                UPDATE guild_state SET
+                    current_track_position = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE guild_id = ? AND current_track_url = ?
+                """,
+                (float(position), guild_id, track_url),
             )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     async def load_guild_state(self, guild_id: int) -> Optional[Dict[str, Any]]:
         """Завантажує збережений стан для сервера."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 "SELECT * FROM guild_state WHERE guild_id = ?", (guild_id,)
             )
             row = await cursor.fetchone()
             if row is None:
                 return None
-            return dict(row)
-        finally:
-            await conn.close()
+            (state,) = await self._fill_from_catalog(conn, [dict(row)])
+            return state
 
     async def get_all_active_guilds(self) -> List[Dict[str, Any]]:
         """Повертає всі guild з активним voice_channel (для auto-resume)."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM guild_state 
@@ -80,14 +130,106 @@ class MusicRepository:
                 """
             )
             rows = await cursor.fetchall()
-            return [dict(r) for r in rows]
-        finally:
-            await conn.close()
+            return await self._fill_from_catalog(conn, [dict(r) for r in rows])
+
+    async def get_resume_snapshots(
+        self, max_age_seconds: float, history_limit: int = consts.MAX_HISTORY_SIZE
+    ) -> List[Dict[str, Any]]:
+        """
+        Стан, черга та історія всіх активних guild для auto-resume одним читанням:
+        три запити на одному з'єднанні замість окремих викликів на кожен сервер.
+        Сесії, старші за max_age_seconds, відсікаються вже в SQL.
+        Кожен стан доповнюється ключами "queue" та "history" (історія — від найстаріших).
+        """
+        pool = await get_pool()
+        async with pool.reader() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT * FROM guild_state
+                WHERE voice_channel_id IS NOT NULL
+                  AND current_track_url IS NOT NULL
+                  AND (updated_at IS NULL OR updated_at >= datetime('now', ?))
+                """,
+                (f"-{int(max_age_seconds)} seconds",),
+            )
+            states = await self._fill_from_catalog(conn, [dict(r) for r in await cursor.fetchall()])
+            by_guild = {s["guild_id"]: s for s in states}
+            for state in states:
+                state["queue"], state["history"] = [], []
+
+            guild_ids = list(by_guild)
+            for start in range(0, len(guild_ids), _IN_CHUNK):
+                chunk = guild_ids[start:start + _IN_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                cursor = await conn.execute(
+                    f"""
+                    SELECT q.guild_id AS guild_id, {_TRACK_COLUMNS}
+                    FROM queue_tracks q
+                    JOIN tracks t ON t.id = q.track_id
+                    WHERE q.guild_id IN ({marks})
+                    ORDER BY q.guild_id, q.position ASC, q.id ASC
+                    """,
+                    chunk,
+                )
+                for r in await cursor.fetchall():
+                    by_guild[r["guild_id"]]["queue"].append({
+                        "url": r["url"],
+                        "webpage_url": r["url"],
+                        "title": r["title"],
+                        "duration": r["duration"],
+                        "thumbnail": r["thumbnail"],
+                    })
+                # Останні history_limit записів кожного сервера одним запитом
+                cursor = await conn.execute(
+                    f"""
+                    SELECT h.guild_id AS guild_id, {_TRACK_COLUMNS}, h.played_at AS played_at
+                    FROM (
+                        SELECT guild_id, track_id, played_at, id, ROW_NUMBER() OVER (
+                            PARTITION BY guild_id ORDER BY played_at DESC, id DESC
+                        ) AS rn
+                        FROM history_tracks
+                        WHERE guild_id IN ({marks})
+                    ) h
+                    JOIN tracks t ON t.id = h.track_id
+                    WHERE h.rn <= ?
+                    ORDER BY h.guild_id, h.played_at ASC, h.id ASC
+                    """,
+                    (*chunk, history_limit),
+                )
+                for r in await cursor.fetchall():
+                    track = dict(r)
+                    del track["guild_id"]
+                    track["webpage_url"] = track["url"]
+                    by_guild[r["guild_id"]]["history"].append(track)
+            return states
+
+    async def clear_stale_guild_states(self, max_age_seconds: float) -> int:
+        """Очищає активні стани, не оновлювані довше за max_age_seconds. Повертає їх кількість."""
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            cursor = await conn.execute(
+                """
+                UPDATE guild_state SET
+                    voice_channel_id = NULL,
+                    text_channel_id = NULL,
+                    current_track_url = NULL,
+                    current_track_title = NULL,
+                    current_track_duration = NULL,
+                    current_track_thumbnail = NULL,
+                    current_track_position = 0,
+                    is_paused = 0,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE voice_channel_id IS NOT NULL
+                  AND updated_at < datetime('now', ?)
+                """,
+                (f"-{int(max_age_seconds)} seconds",),
+            )
+            return cursor.rowcount
 
     async def clear_guild_state(self, guild_id: int) -> None:
         """Очищає стан сервера (бот відключився)."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 """
                 UPDATE guild_state SET
@@ -97,25 +239,30 @@ class MusicRepository:
                     current_track_title = NULL,
                     current_track_duration = NULL,
                     current_track_thumbnail = NULL,
+                    current_track_position = 0,
                     is_paused = 0,
                     updated_at = CURRENT_TIMESTAMP
                 WHERE guild_id = ?
                 """,
                 (guild_id,),
             )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     # ── Queue ────────────────────────────────────────────────────
 
-    async def save_queue(self, guild_id: int, tracks: List[Dict[str, Any]]) -> None:
+    async def save_queue(
+        self,
+        guild_id: int,
+        tracks: List[Dict[str, Any]],
+        positions: Optional[Sequence[int]] = None,
+    ) -> None:
         """
-        Атомарно зберігає чергу — видаляє стару і записує нову.
-        Використовує транзакцію та executemany для ефективності.
+        Атомарно зберігає чергу — видаляє стару і записує нову (компакція).
+        Без positions треки нумеруються з кроком QUEUE_POSITION_GAP.
         """
-        conn = await get_connection()
-        try:
+        if positions is None:
+            positions = [(i + 1) * consts.QUEUE_POSITION_GAP for i in range(len(tracks))]
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 "INSERT OR IGNORE INTO guild_state (guild_id) VALUES (?)",
                 (guild_id,),
@@ -124,38 +271,68 @@ class MusicRepository:
                 "DELETE FROM queue_tracks WHERE guild_id = ?", (guild_id,)
             )
             if tracks:
+                track_ids = await self._upsert_tracks(conn, tracks)
                 await conn.executemany(
                     """
-                    INSERT INTO queue_tracks 
-                        (guild_id, position, url, title, duration, thumbnail)
-                    VALUES (?, ?, ?, ?, ?, ?)
+                    INSERT INTO queue_tracks (guild_id, position, track_id)
+                    VALUES (?, ?, ?)
                     """,
                     [
-                        (
-                            guild_id,
-                            pos,
-                            track.get("url") or track.get("webpage_url", ""),
-                            track.get("title", "Unknown"),
-                            track.get("duration"),
-                            track.get("thumbnail"),
-                        )
-                        for pos, track in enumerate(tracks)
+                        (guild_id, pos, track_id)
+                        for pos, track_id in zip(positions, track_ids)
                     ],
                 )
-            await conn.commit()
-        finally:
-            await conn.close()
+
+    async def insert_queue_tracks(
+        self, guild_id: int, entries: Sequence[Tuple[int, Dict[str, Any]]]
+    ) -> None:
+        """Вставляє треки на задані позиції, не чіпаючи решту черги."""
+        if not entries:
+            return
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            await conn.execute(
+                "INSERT OR IGNORE INTO guild_state (guild_id) VALUES (?)",
+                (guild_id,),
+            )
+            track_ids = await self._upsert_tracks(conn, [track for _, track in entries])
+            await conn.executemany(
+                """
+                INSERT INTO queue_tracks (guild_id, position, track_id)
+                VALUES (?, ?, ?)
+                """,
+                [(guild_id, pos, track_id) for (pos, _), track_id in zip(entries, track_ids)],
+            )
+
+    async def delete_queue_track(self, guild_id: int, position: int) -> None:
+        """Видаляє один трек черги за позицією (pop з початку/середини)."""
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            await conn.execute(
+                "DELETE FROM queue_tracks WHERE guild_id = ? AND position = ?",
+                (guild_id, position),
+            )
+
+    async def move_queue_track(self, guild_id: int, old_position: int, new_position: int) -> None:
+        """Переносить трек черги на нову позицію одним UPDATE."""
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            await conn.execute(
+                "UPDATE queue_tracks SET position = ? WHERE guild_id = ? AND position = ?",
+                (new_position, guild_id, old_position),
+            )
 
     async def load_queue(self, guild_id: int) -> List[Dict[str, Any]]:
         """Завантажує чергу для сервера з БД."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
-                """
-                SELECT url, title, duration, thumbnail 
-                FROM queue_tracks 
-                WHERE guild_id = ? 
-                ORDER BY position ASC
+                f"""
+                SELECT {_TRACK_COLUMNS}
+                FROM queue_tracks q
+                JOIN tracks t ON t.id = q.track_id
+                WHERE q.guild_id = ?
+                ORDER BY q.position ASC, q.id ASC
                 """,
                 (guild_id,),
             )
@@ -170,86 +347,79 @@ class MusicRepository:
                 }
                 for r in rows
             ]
-        finally:
-            await conn.close()
 
     async def clear_queue(self, guild_id: int) -> None:
         """Видаляє чергу для сервера."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 "DELETE FROM queue_tracks WHERE guild_id = ?", (guild_id,)
             )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     async def clear_history(self, guild_id: int) -> None:
         """Видаляє всю історію прослуховувань для сервера."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 "DELETE FROM history_tracks WHERE guild_id = ?", (guild_id,)
             )
-            await conn.commit()
-        finally:
-            await conn.close()
+            await conn.execute(
+                "DELETE FROM track_play_counts WHERE guild_id = ?", (guild_id,)
+            )
 
     # ── History ──────────────────────────────────────────────────
 
     async def add_history_track(self, guild_id: int, track: Dict[str, Any]) -> None:
         """Додає трек в історію прослуховувань."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            (track_id,) = await self._upsert_tracks(conn, [track])
+            await conn.execute(
+                "INSERT INTO history_tracks (guild_id, track_id) VALUES (?, ?)",
+                (guild_id, track_id),
+            )
             await conn.execute(
                 """
-                INSERT INTO history_tracks 
-                    (guild_id, url, title, duration, thumbnail)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO track_play_counts (guild_id, track_id, play_count, last_played_at)
+                VALUES (?, ?, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT(guild_id, track_id) DO UPDATE SET
+                    play_count = play_count + 1,
+                    last_played_at = CURRENT_TIMESTAMP
                 """,
-                (
-                    guild_id,
-                    track.get("url") or track.get("webpage_url", ""),
-                    track.get("title", "Unknown"),
-                    track.get("duration"),
-                    track.get("thumbnail"),
-                ),
+                (guild_id, track_id),
             )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     async def get_history(
         self, guild_id: int, limit: int = 50
     ) -> List[Dict[str, Any]]:
         """Повертає історію прослуховувань (від найновіших)."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
-                """
-                SELECT url, title, duration, thumbnail, played_at
-                FROM history_tracks
-                WHERE guild_id = ?
-                ORDER BY played_at DESC, id DESC
+                f"""
+                SELECT {_TRACK_COLUMNS}, h.played_at AS played_at
+                FROM history_tracks h
+                JOIN tracks t ON t.id = h.track_id
+                WHERE h.guild_id = ?
+                ORDER BY h.played_at DESC, h.id DESC
                 LIMIT ?
                 """,
                 (guild_id, limit),
             )
             rows = await cursor.fetchall()
             return [dict(r) for r in rows]
-        finally:
-            await conn.close()
 
     async def pop_last_history_track(self, guild_id: int) -> Optional[Dict[str, Any]]:
         """Повертає та видаляє останній трек з історії (для кнопки Previous)."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             cursor = await conn.execute(
-                """
-                SELECT id, url, title, duration, thumbnail
-                FROM history_tracks
-                WHERE guild_id = ?
-                ORDER BY played_at DESC, id DESC
+                f"""
+                SELECT h.id AS id, h.track_id AS track_id, {_TRACK_COLUMNS}
+                FROM history_tracks h
+                JOIN tracks t ON t.id = h.track_id
+                WHERE h.guild_id = ?
+                ORDER BY h.played_at DESC, h.id DESC
                 LIMIT 1
                 """,
                 (guild_id,),
@@ -267,68 +437,99 @@ class MusicRepository:
             await conn.execute(
                 "DELETE FROM history_tracks WHERE id = ?", (row["id"],)
             )
-            await conn.commit()
+            await conn.execute(
+                """
+                UPDATE track_play_counts SET
+                    play_count = play_count - 1,
+                    last_played_at = (
+                        SELECT MAX(played_at) FROM history_tracks
+                        WHERE guild_id = ?1 AND track_id = ?2
+                    )
+                WHERE guild_id = ?1 AND track_id = ?2
+                """,
+                (guild_id, row["track_id"]),
+            )
+            await conn.execute(
+                """
+                DELETE FROM track_play_counts
+                WHERE guild_id = ? AND track_id = ? AND play_count <= 0
+                """,
+                (guild_id, row["track_id"]),
+            )
             return track
-        finally:
-            await conn.close()
 
     # ── Analytics (Етап 5) ───────────────────────────────────────
 
     async def get_top_tracks(
         self, guild_id: int, limit: int = 10
     ) -> List[Dict[str, Any]]:
-        """Найчастіше прослуховувані треки."""
-        conn = await get_connection()
-        try:
+        """Найчастіше прослуховувані треки (з track_play_counts, без сканування історії)."""
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
-                """
-                SELECT url, title, duration, thumbnail, 
-                       COUNT(*) as play_count
-                FROM history_tracks
-                WHERE guild_id = ?
-                GROUP BY url
-                ORDER BY play_count DESC
+                f"""
+                SELECT {_TRACK_COLUMNS}, c.play_count AS play_count
+                FROM track_play_counts c
+                JOIN tracks t ON t.id = c.track_id
+                WHERE c.guild_id = ?
+                ORDER BY c.play_count DESC, c.last_played_at DESC
                 LIMIT ?
                 """,
                 (guild_id, limit),
             )
             rows = await cursor.fetchall()
             return [dict(r) for r in rows]
-        finally:
-            await conn.close()
+
+    async def get_popular_tracks(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Найпопулярніші треки всіх гільдій (сума track_play_counts) — для аудіокешу."""
+        pool = await get_pool()
+        async with pool.reader() as conn:
+            cursor = await conn.execute(
+                f"""
+                SELECT {_TRACK_COLUMNS}, SUM(c.play_count) AS play_count
+                FROM track_play_counts c
+                JOIN tracks t ON t.id = c.track_id
+                GROUP BY c.track_id
+                ORDER BY play_count DESC, MAX(c.last_played_at) DESC
+                LIMIT ?
+                """,
+                (limit,),
+            )
+            rows = await cursor.fetchall()
+            return [dict(r) for r in rows]
 
     async def get_total_listening_time(self, guild_id: int) -> int:
         """Загальний час прослуховування (секунди)."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 """
-                SELECT COALESCE(SUM(duration), 0) as total_seconds
-                FROM history_tracks
-                WHERE guild_id = ? AND duration IS NOT NULL
+                SELECT COALESCE(SUM(t.duration), 0) as total_seconds
+                FROM history_tracks h
+                JOIN tracks t ON t.id = h.track_id
+                WHERE h.guild_id = ? AND t.duration IS NOT NULL
                 """,
                 (guild_id,),
             )
             row = await cursor.fetchone()
             return row["total_seconds"] if row else 0
-        finally:
-            await conn.close()
 
     async def get_listening_stats(
         self, guild_id: int, days: int = 30
     ) -> Dict[str, Any]:
         """Статистика прослуховування за N днів."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 """
                 SELECT 
                     COUNT(*) as total_tracks,
-                    COUNT(DISTINCT url) as unique_tracks,
-                    COALESCE(SUM(duration), 0) as total_seconds
-                FROM history_tracks
-                WHERE guild_id = ?
-                  AND played_at >= datetime('now', ? || ' days')
+                    COUNT(DISTINCT h.track_id) as unique_tracks,
+                    COALESCE(SUM(t.duration), 0) as total_seconds
+                FROM history_tracks h
+                JOIN tracks t ON t.id = h.track_id
+                WHERE h.guild_id = ?
+                  AND h.played_at >= datetime('now', ? || ' days')
                 """,
                 (guild_id, -days),
             )
@@ -338,36 +539,155 @@ class MusicRepository:
                 "unique_tracks": 0,
                 "total_seconds": 0,
             }
-        finally:
-            await conn.close()
 
     async def search_history(
         self, guild_id: int, query: str, limit: int = 20
     ) -> List[Dict[str, Any]]:
         """Пошук в історії прослуховувань по назві."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
-                """
-                SELECT url, title, duration, thumbnail, played_at
-                FROM history_tracks
-                WHERE guild_id = ? AND title LIKE ?
-                ORDER BY played_at DESC
+                f"""
+                SELECT {_TRACK_COLUMNS}, h.played_at AS played_at
+                FROM history_tracks h
+                JOIN tracks t ON t.id = h.track_id
+                WHERE h.guild_id = ? AND t.title LIKE ?
+                ORDER BY h.played_at DESC
                 LIMIT ?
                 """,
                 (guild_id, f"%{query}%", limit),
             )
             rows = await cursor.fetchall()
             return [dict(r) for r in rows]
-        finally:
-            await conn.close()
+
+    # ── Track catalog ────────────────────────────────────────────
+
+    @staticmethod
+    async def _upsert_tracks(
+        conn, tracks: Sequence[Dict[str, Any]], enrich: bool = False
+    ) -> List[int]:
+        """Записує треки в каталог і повертає їхні track_id у порядку `tracks`."""
+        rows = [catalog_row(track) for track in tracks]
+        await conn.executemany(_ENRICH_TRACK_SQL if enrich else _UPSERT_TRACK_SQL, rows)
+        keys = list(dict.fromkeys(row[0] for row in rows))
+        ids: Dict[str, int] = {}
+        for start in range(0, len(keys), _IN_CHUNK):
+            chunk = keys[start:start + _IN_CHUNK]
+            cursor = await conn.execute(
+                f"SELECT id, canonical FROM tracks WHERE canonical IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            ids.update({r["canonical"]: r["id"] for r in await cursor.fetchall()})
+        return [ids[row[0]] for row in rows]
+
+    @staticmethod
+    async def _fill_from_catalog(conn, states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Доповнює порожні current_track_duration / thumbnail станів гільдій з каталогу (пакетно)."""
+        missing: Dict[str, List[Dict[str, Any]]] = {}
+        for state in states:
+            if not state.get("current_track_url"):
+                continue
+            if state.get("current_track_duration") is not None and state.get("current_track_thumbnail"):
+                continue
+            missing.setdefault(canonical_track_key(state["current_track_url"]), []).append(state)
+        keys = list(missing)
+        for start in range(0, len(keys), _IN_CHUNK):
+            chunk = keys[start:start + _IN_CHUNK]
+            cursor = await conn.execute(
+                f"SELECT canonical, duration, thumbnail FROM tracks WHERE canonical IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for row in await cursor.fetchall():
+                for state in missing[row["canonical"]]:
+                    if state.get("current_track_duration") is None:
+                        state["current_track_duration"] = row["duration"]
+                    if not state.get("current_track_thumbnail"):
+                        state["current_track_thumbnail"] = row["thumbnail"]
+        return states
+
+    async def enrich_tracks(self, tracks: Sequence[Dict[str, Any]]) -> None:
+        """
+        Оновлює каталог метаданими з повної екстракції (yt-dlp / плеєр):
+        непорожні поля перезаписують збережені, решта лишається як є.
+        """
+        tracks = [t for t in tracks if t.get("url") or t.get("webpage_url")]
+        if not tracks:
+            return
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            await self._upsert_tracks(conn, tracks, enrich=True)
+
+    async def get_catalog_track(self, url: str) -> Optional[Dict[str, Any]]:
+        """Метадані треку з каталогу за будь-якою формою його URL."""
+        pool = await get_pool()
+        async with pool.reader() as conn:
+            cursor = await conn.execute(
+                f"SELECT {_TRACK_COLUMNS} FROM tracks t WHERE t.canonical = ?",
+                (canonical_track_key(url),),
+            )
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+
+    async def save_track_features(self, track: Dict[str, Any], features: Dict[str, Any]) -> None:
+        """Зберігає аудіоознаки треку (трек додається в каталог, якщо його там немає)."""
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            (track_id,) = await self._upsert_tracks(conn, [track])
+            await conn.execute(
+                """
+                INSERT INTO track_features (track_id, bpm, loudness, centroid, key, chroma)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(track_id) DO UPDATE SET
+                    bpm = excluded.bpm,
+                    loudness = excluded.loudness,
+                    centroid = excluded.centroid,
+                    key = excluded.key,
+                    chroma = excluded.chroma,
+                    analyzed_at = CURRENT_TIMESTAMP
+                """,
+                (
+                    track_id,
+                    features.get("bpm"),
+                    features["loudness"],
+                    features["centroid"],
+                    features["key"],
+                    json.dumps(features["chroma"]),
+                ),
+            )
+
+    async def get_track_features(self) -> Dict[str, Dict[str, Any]]:
+        """Усі збережені аудіоознаки: {канонічний ключ треку: ознаки}."""
+        pool = await get_pool()
+        async with pool.reader() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT t.canonical, f.bpm, f.loudness, f.centroid, f.key, f.chroma
+                FROM track_features f
+                JOIN tracks t ON t.id = f.track_id
+                """
+            )
+            rows = await cursor.fetchall()
+        out: Dict[str, Dict[str, Any]] = {}
+        for r in rows:
+            try:
+                chroma = json.loads(r["chroma"])
+            except (TypeError, ValueError):
+                continue
+            out[r["canonical"]] = {
+                "bpm": r["bpm"],
+                "loudness": r["loudness"],
+                "centroid": r["centroid"],
+                "key": r["key"],
+                "chroma": chroma,
+            }
+        return out
 
     # ── Automix (Diploma Extensions) ─────────────────────────────
 
     async def get_automix_settings(self, guild_id: int) -> Optional[Dict[str, Any]]:
         """Returns None if no row; else {enabled: bool, strategy: str}."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 "SELECT enabled, strategy FROM automix_settings WHERE guild_id = ?",
                 (guild_id,),
@@ -381,8 +701,6 @@ class MusicRepository:
                 "enabled": bool(d["enabled"]),
                 "strategy": strat if strat else "ab_split",
             }
-        finally:
-            await conn.close()
 
     async def get_automix_enabled(self, guild_id: int) -> Optional[bool]:
         """Returns None if no explicit setting exists yet."""
@@ -392,8 +710,8 @@ class MusicRepository:
         return s["enabled"]
 
     async def set_automix_enabled(self, guild_id: int, enabled: bool) -> None:
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 """
                 INSERT INTO automix_settings (guild_id, enabled, strategy, updated_at)
@@ -404,13 +722,10 @@ class MusicRepository:
                 """,
                 (guild_id, int(enabled)),
             )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     async def set_automix_strategy(self, guild_id: int, strategy: str) -> None:
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             cur = await conn.execute(
                 """
                 UPDATE automix_settings
@@ -427,13 +742,10 @@ class MusicRepository:
                     """,
                     (guild_id, strategy),
                 )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     async def increment_automix_skip(self, guild_id: int, track_url: str) -> None:
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 """
                 INSERT INTO automix_penalties (guild_id, track_url, skip_count, last_skipped_at)
@@ -444,13 +756,10 @@ class MusicRepository:
                 """,
                 (guild_id, track_url),
             )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     async def get_automix_skip_penalties(self, guild_id: int, limit: int = 500) -> Dict[str, int]:
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 """
                 SELECT track_url, skip_count
@@ -463,8 +772,6 @@ class MusicRepository:
             )
             rows = await cursor.fetchall()
             return {r["track_url"]: int(r["skip_count"] or 0) for r in rows}
-        finally:
-            await conn.close()
 
     async def add_automix_feedback_event(
         self,
@@ -473,8 +780,8 @@ class MusicRepository:
         track_url: Optional[str] = None,
         strategy: Optional[str] = None,
     ) -> None:
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 """
                 INSERT INTO automix_feedback_events (guild_id, track_url, action, strategy)
@@ -482,14 +789,11 @@ class MusicRepository:
                 """,
                 (guild_id, track_url, action, strategy),
             )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     async def get_automix_feedback_counts(self, guild_id: int, days: int = 30) -> Dict[str, int]:
         """Returns counts by action in last N days."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 """
                 SELECT action, COUNT(*) as cnt
@@ -505,13 +809,11 @@ class MusicRepository:
             for r in rows:
                 out[str(r["action"])] = int(r["cnt"] or 0)
             return out
-        finally:
-            await conn.close()
 
     async def get_automix_ab_comparison(self, guild_id: int, days: int = 30) -> List[Dict[str, Any]]:
         """Порівняння A/B: recommended/skips по strategy (для диплому)."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 """
                 SELECT COALESCE(strategy, '') AS strat, action, COUNT(*) AS cnt
@@ -527,13 +829,11 @@ class MusicRepository:
             )
             rows = await cursor.fetchall()
             return [dict(r) for r in rows]
-        finally:
-            await conn.close()
 
     async def get_automix_diversity_stats(self, guild_id: int, days: int = 30) -> Dict[str, int]:
         """Унікальність рекомендацій: distinct URLs / total recommended."""
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 """
                 SELECT
@@ -553,14 +853,12 @@ class MusicRepository:
                 "rec_total": int(row["rec_total"] or 0),
                 "rec_distinct": int(row["rec_distinct"] or 0),
             }
-        finally:
-            await conn.close()
 
     # ── DJ (MVP) ──────────────────────────────────────────────────
 
     async def get_dj_settings(self, guild_id: int) -> Optional[Dict[str, Any]]:
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.reader() as conn:
             cursor = await conn.execute(
                 "SELECT enabled, persona FROM dj_settings WHERE guild_id = ?",
                 (guild_id,),
@@ -573,12 +871,10 @@ class MusicRepository:
                 "enabled": bool(d.get("enabled", 0)),
                 "persona": d.get("persona") or "chill",
             }
-        finally:
-            await conn.close()
 
     async def set_dj_enabled(self, guild_id: int, enabled: bool) -> None:
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 """
                 INSERT INTO dj_settings (guild_id, enabled, persona, updated_at)
@@ -589,13 +885,10 @@ class MusicRepository:
                 """,
                 (guild_id, int(enabled)),
             )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     async def set_dj_persona(self, guild_id: int, persona: str) -> None:
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             cur = await conn.execute(
                 """
                 UPDATE dj_settings
@@ -612,9 +905,6 @@ class MusicRepository:
                     """,
                     (guild_id, persona),
                 )
-            await conn.commit()
-        finally:
-            await conn.close()
 
     async def add_dj_event(
         self,
@@ -625,8 +915,8 @@ class MusicRepository:
         track_url: Optional[str] = None,
         message: Optional[str] = None,
     ) -> None:
-        conn = await get_connection()
-        try:
+        pool = await get_pool()
+        async with pool.writer() as conn:
             await conn.execute(
                 """
                 INSERT INTO dj_events (guild_id, action, persona, track_url, message)
@@ -634,6 +924,96 @@ class MusicRepository:
                 """,
                 (guild_id, action, persona, track_url, message),
             )
-            await conn.commit()
-        finally:
-            await conn.close()
+
+    # ── Extraction profile stats ─────────────────────────────────
+
+    async def save_extraction_profile_stats(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Upsert статистики (профіль, формат) зі знімка ProfileSelector."""
+        if not rows:
+            return
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            await conn.executemany(
+                """
+                INSERT INTO extraction_profile_stats
+                    (profile, format, successes, failures, bot_checks, latency_avg, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(profile, format) DO UPDATE SET
+                    successes = excluded.successes,
+                    failures = excluded.failures,
+                    bot_checks = excluded.bot_checks,
+                    latency_avg = excluded.latency_avg,
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                [
+                    (r["profile"], r["format"], r["successes"], r["failures"],
+                     r["bot_checks"], r["latency_avg"])
+                    for r in rows
+                ],
+            )
+
+    async def get_extraction_profile_stats(self) -> List[Dict[str, Any]]:
+        pool = await get_pool()
+        async with pool.reader() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT profile, format, successes, failures, bot_checks, latency_avg
+                FROM extraction_profile_stats
+                """
+            )
+            rows = await cursor.fetchall()
+            return [dict(r) for r in rows]
+
+    # ── Search cache ─────────────────────────────────────────────
+
+    async def save_search_results(
+        self, query_key: str, results: Sequence[Dict[str, Any]], fetched_at: float
+    ) -> None:
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            await conn.execute(
+                """
+                INSERT INTO search_cache (query_key, results, fetched_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(query_key) DO UPDATE SET
+                    results = excluded.results,
+                    fetched_at = excluded.fetched_at
+                """,
+                (query_key, json.dumps(list(results), ensure_ascii=False), fetched_at),
+            )
+
+    async def get_search_cache(self, limit: int) -> List[Tuple[str, List[Dict[str, Any]], float]]:
+        """Найсвіжіші записи кешу пошуку: (ключ, результати, fetched_at)."""
+        pool = await get_pool()
+        async with pool.reader() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT query_key, results, fetched_at
+                FROM search_cache
+                ORDER BY fetched_at DESC
+                LIMIT ?
+                """,
+                (limit,),
+            )
+            rows = await cursor.fetchall()
+        entries = []
+        for r in rows:
+            try:
+                entries.append((r["query_key"], json.loads(r["results"]), float(r["fetched_at"])))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Пошкоджений запис кешу пошуку {r['query_key']!r}: {e}")
+        return entries
+
+    async def prune_search_cache(self, keep: int) -> None:
+        """Залишає в таблиці лише `keep` найсвіжіших записів."""
+        pool = await get_pool()
+        async with pool.writer() as conn:
+            await conn.execute(
+                """
+                DELETE FROM search_cache
+                WHERE query_key NOT IN (
+                    SELECT query_key FROM search_cache ORDER BY fetched_at DESC LIMIT ?
+                )
+                """,
+                (keep,),
+            )
@@ -0,0 +1,137 @@
+"""
+Кеш результатів текстового пошуку (/play <текст> → SearchResultsView).
+
+Ключ — нормалізований запит (Unicode NFKC, casefold, згорнуті пробіли) разом
+із кількістю результатів. Запис свіжий SEARCH_CACHE_TTL секунд; після цього
+він ще SEARCH_CACHE_MAX_STALE секунд віддається одразу, а SourceService
+оновлює його у фоні (stale-while-revalidate). Розмір обмежений LRU.
+
+Слухачі (`add_listener`) отримують кожен новий запис — ког зберігає їх у
+таблицю search_cache, а при старті `load()` відновлює кеш з БД.
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from discord_music_bot import consts
+
+logger = logging.getLogger('MusicBot.SearchCache')
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+SearchResults = List[Dict[str, Any]]
+
+
+def normalize_query(query: str) -> str:
+    """«  Imagine   DRAGONS » і «imagine dragons» дають один ключ."""
+    text = unicodedata.normalize("NFKC", query or "")
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
+
+def search_key(query: str, max_results: int) -> str:
+    return f"{max_results}:{normalize_query(query)}"
+
+
+class SearchCache:
+    """LRU-кеш результатів пошуку з TTL і вікном stale-while-revalidate."""
+
+    def __init__(
+        self,
+        max_entries: int = consts.SEARCH_CACHE_MAX_ENTRIES,
+        ttl: float = consts.SEARCH_CACHE_TTL,
+        max_stale: float = consts.SEARCH_CACHE_MAX_STALE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[SearchResults, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str, SearchResults, float], None]] = []
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_listener(self, callback: Callable[[str, SearchResults, float], None]) -> None:
+        """Реєструє callback(key, results, fetched_at) для кожного збереженого запису."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, SearchResults, float], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def get(self, key: str) -> Optional[Tuple[SearchResults, bool]]:
+        """(копія результатів, чи свіжі) або None, якщо запису немає чи він надто старий."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] > self.ttl + self.max_stale:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            results, fetched_at = entry
+            fresh = now - fetched_at <= self.ttl
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+        # Копії: виклики додають до треку requester тощо
+        return [dict(r) for r in results], fresh
+
+    def put(self, key: str, results: SearchResults, fetched_at: Optional[float] = None) -> None:
+        if not results:
+            return
+        fetched_at = self._clock() if fetched_at is None else fetched_at
+        stored = [dict(r) for r in results]
+        with self._lock:
+            self._entries[key] = (stored, fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        for callback in self._listeners:
+            try:
+                callback(key, stored, fetched_at)
+            except Exception as e:
+                logger.error(f"Помилка слухача кешу пошуку: {e}")
+
+    def load(self, rows: Iterable[Tuple[str, SearchResults, float]]) -> int:
+        """Відновлює записи з БД (без сповіщення слухачів); повертає кількість завантажених."""
+        now = self._clock()
+        loaded = 0
+        with self._lock:
+            for key, results, fetched_at in sorted(rows, key=lambda row: row[2]):
+                if not results or now - fetched_at > self.ttl + self.max_stale:
+                    continue
+                self._entries[key] = (results, fetched_at)
+                self._entries.move_to_end(key)
+                loaded += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return loaded
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
+
+
+search_cache = SearchCache()
@@ -1,121 +1,200 @@
 import asyncio
 import logging
-from datetime import datetime, timezone
+import time
+from typing import Any, Dict, Optional, Tuple
 from discord_music_bot.repository import MusicRepository
 from discord_music_bot import consts
+from discord_music_bot.utils import format_duration
 
 logger = logging.getLogger('MusicBot.AutoResume')
 
 
+class ConnectLimiter:
+    """
+    Token bucket голосових підключень окремо для кожного шарда.
+    Кожен виклик одразу резервує свій слот, тож конкурентні підключення
+    одного шарда розходяться в часі, а різні шарди не чекають одне одного.
+    """
+
+    def __init__(self, per_minute: float, burst: int, clock=time.monotonic):
+        self._rate = per_minute / 60.0
+        self._burst = float(burst)
+        self._clock = clock
+        self._buckets: Dict[Any, Tuple[float, float]] = {}  # shard -> (токени, час оновлення)
+
+    def reserve(self, shard_id: Any) -> float:
+        """Забирає токен шарда (можливо, в борг) і повертає, скільки чекати до підключення."""
+        now = self._clock()
+        tokens, updated = self._buckets.get(shard_id, (self._burst, now))
+        tokens = min(self._burst, tokens + (now - updated) * self._rate) - 1
+        self._buckets[shard_id] = (tokens, now)
+        return -tokens / self._rate if tokens < 0 else 0.0
+
+    async def acquire(self, shard_id: Any) -> float:
+        delay = self.reserve(shard_id)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+async def _wait_gateway(bot) -> float:
+    """Чекає, поки gateway виходить з ліміту подій (discord.py інакше тримав би запит у себе)."""
+    waited = 0.0
+    is_ratelimited = getattr(bot, "is_ws_ratelimited", None)
+    while callable(is_ratelimited) and is_ratelimited() is True and waited < consts.TIMEOUT_VOICE_CONNECT:
+        await asyncio.sleep(consts.AUTO_RESUME_RATELIMIT_BACKOFF)
+        waited += consts.AUTO_RESUME_RATELIMIT_BACKOFF
+    return waited
+
+
 async def auto_resume(bot, cog) -> int:
     """
     Відновлює стан бота для всіх серверів де він був активний.
-    
+
     Перевіряє:
-    1. Наявність активних сесій у БД.
-    2. Політику застарілості (staleness policy).
-    3. Присутність людей у голосовому каналі.
-    
+    1. Наявність активних сесій у БД (застарілі відсікаються в SQL).
+    2. Присутність людей у голосовому каналі.
+
+    Стан, черги та історія всіх серверів читаються одним запитом до БД,
+    а самі сервери відновлюються паралельно: не більше AUTO_RESUME_CONCURRENCY
+    одночасно і з лімітом голосових підключень на шард.
+
     Повертає кількість відновлених серверів.
     """
     repository: MusicRepository = cog.repository
-    resumed_count = 0
 
     try:
-        active_guilds = await repository.get_all_active_guilds()
-        if not active_guilds:
+        try:
+            cleared = await repository.clear_stale_guild_states(consts.AUTO_RESUME_STALENESS_THRESHOLD)
+            if cleared:
+                logger.info(f"Auto-Resume: очищено {cleared} застарілих сесій.")
+        except Exception as e:
+            logger.warning(f"Auto-Resume: не вдалося очистити застарілі сесії: {e}")
+
+        snapshots = await repository.get_resume_snapshots(consts.AUTO_RESUME_STALENESS_THRESHOLD)
+        if not snapshots:
             logger.info("Auto-Resume: немає активних серверів для відновлення.")
             return 0
 
-        logger.info(f"Auto-Resume: знайдено {len(active_guilds)} сесій у БД.")
-
-        now = datetime.now(timezone.utc)
-
-        for guild_state in active_guilds:
-            guild_id = guild_state['guild_id']
-            updated_at_str = guild_state.get('updated_at')
-            
-            # 1. Staleness Policy
-            if updated_at_str:
-                try:
-                    # SQLite CURRENT_TIMESTAMP returns UTC time in format 'YYYY-MM-DD HH:MM:SS'
-                    # We append ' +0000' to make it offset-aware for comparison
-                    updated_at = datetime.strptime(updated_at_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-                    diff = (now - updated_at).total_seconds()
-                    
-                    if diff > consts.AUTO_RESUME_STALENESS_THRESHOLD:
-                        logger.info(f"Auto-Resume: сесія {guild_id} застаріла ({int(diff/3600)}г тому). Очищаємо.")
-                        await repository.clear_guild_state(guild_id)
-                        continue
-                except Exception as e:
-                    logger.warning(f"Auto-Resume: не вдалося розпарсити дату {updated_at_str}: {e}")
-
-            voice_channel_id = guild_state['voice_channel_id']
-            text_channel_id = guild_state['text_channel_id']
-            track_url = guild_state['current_track_url']
-            track_title = guild_state.get('current_track_title', 'Unknown')
-
-            try:
-                guild = bot.get_guild(guild_id)
-                if not guild:
-                    logger.warning(f"Auto-Resume: Guild {guild_id} не знайдено. Очищаємо стан.")
-                    await repository.clear_guild_state(guild_id)
-                    continue
-
-                voice_channel = guild.get_channel(voice_channel_id)
-                if not voice_channel:
-                    logger.warning(f"Auto-Resume: Voice channel {voice_channel_id} не знайдено у {guild.name}. Очищаємо стан.")
-                    await repository.clear_guild_state(guild_id)
-                    continue
-
-                # 2. Human presence check
-                human_members = [m for m in voice_channel.members if not m.bot]
-                if not human_members:
-                    logger.info(f"Auto-Resume: Канал {voice_channel.name} ({guild.name}) порожній. Очищаємо стан.")
-                    await repository.clear_guild_state(guild_id)
-                    continue
-
-                # 3. Reconnect
-                logger.info(f"Auto-Resume: Відновлення {voice_channel.name} ({guild.name})...")
-                voice_client = await voice_channel.connect(timeout=consts.TIMEOUT_VOICE_CONNECT, reconnect=True)
-
-                await cog.queue_service.load_from_db(guild_id)
-
-                if text_channel_id:
-                    cog.player_channels[guild_id] = text_channel_id
-
-                cog.queue_service.push_front(guild_id, {
-                    'url': track_url,
-                    'webpage_url': track_url,
-                    'title': track_title,
-                    'duration': guild_state.get('current_track_duration'),
-                    'thumbnail': guild_state.get('current_track_thumbnail'),
-                    'requester': None,
-                })
-
-                await cog.play_next_song(guild, voice_client)
-
-                if text_channel_id:
-                    text_channel = guild.get_channel(text_channel_id)
-                    if text_channel:
-                        queue = cog.queue_service.get_queue(guild_id)
-                        queue_info = f" (ще {len(queue)} в черзі)" if queue else ""
-                        await text_channel.send(
-                            f"🔄 **Auto-Resume:** Бот повернувся!\n"
-                            f"▶️ Продовжую з: **{track_title}**{queue_info}"
-                        )
-                        await asyncio.sleep(1)
-                        await cog.update_player(guild, text_channel)
-
-                resumed_count += 1
-                await asyncio.sleep(1)
-
-            except Exception as e:
-                logger.error(f"Auto-Resume failure for {guild_id}: {e}")
-                await repository.clear_guild_state(guild_id)
-                continue
+        logger.info(f"Auto-Resume: знайдено {len(snapshots)} сесій у БД.")
+
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(consts.AUTO_RESUME_CONCURRENCY)
+        limiter = ConnectLimiter(consts.AUTO_RESUME_CONNECTS_PER_MINUTE, consts.AUTO_RESUME_CONNECT_BURST)
+
+        async def run(guild_state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            queued_at = time.perf_counter()
+            async with semaphore:
+                return await _resume_guild(bot, cog, guild_state, limiter, queued_at)
+
+        results = await asyncio.gather(*(run(state) for state in snapshots), return_exceptions=True)
+        timings = [t for t in results if isinstance(t, dict)]
+        if timings:
+            slowest = max(timings, key=lambda t: t["total"])
+            logger.info(
+                f"Auto-Resume: відновлено {len(timings)}/{len(snapshots)} за "
+                f"{time.perf_counter() - started:.1f}s (найдовше — {slowest['guild']}: {slowest['total']:.1f}s)"
+            )
+        return len(timings)
 
     except Exception as e:
         logger.error(f"Auto-Resume critical error: {e}")
+        return 0
+
+
+async def _resume_guild(bot, cog, guild_state: Dict[str, Any], limiter: ConnectLimiter,
+                        queued_at: float) -> Optional[Dict[str, Any]]:
+    """Відновлює один сервер; повертає тривалість етапів або None, якщо сервер не відновлено."""
+    repository: MusicRepository = cog.repository
+    guild_id = guild_state['guild_id']
+    voice_channel_id = guild_state['voice_channel_id']
+    text_channel_id = guild_state['text_channel_id']
+    track_url = guild_state['current_track_url']
+    track_title = guild_state.get('current_track_title', 'Unknown')
+    # Позиція зберігається раз на POSITION_SAVE_INTERVAL — стартуємо трохи раніше
+    position = guild_state.get('current_track_position')
+    position = float(position) if isinstance(position, (int, float)) else 0.0
+    start_at = max(0.0, position - consts.AUTO_RESUME_REWIND_SECONDS)
+
+    try:
+        guild = bot.get_guild(guild_id)
+        if not guild:
+            logger.warning(f"Auto-Resume: Guild {guild_id} не знайдено. Очищаємо стан.")
+            await repository.clear_guild_state(guild_id)
+            return None
+
+        voice_channel = guild.get_channel(voice_channel_id)
+        if not voice_channel:
+            logger.warning(f"Auto-Resume: Voice channel {voice_channel_id} не знайдено у {guild.name}. Очищаємо стан.")
+            await repository.clear_guild_state(guild_id)
+            return None
+
+        # Human presence check
+        human_members = [m for m in voice_channel.members if not m.bot]
+        if not human_members:
+            logger.info(f"Auto-Resume: Канал {voice_channel.name} ({guild.name}) порожній. Очищаємо стан.")
+            await repository.clear_guild_state(guild_id)
+            return None
+
+        # Reconnect: спершу слот шарда, потім — вихід gateway з ліміту
+        begin = time.perf_counter()
+        await limiter.acquire(getattr(guild, "shard_id", None))
+        await _wait_gateway(bot)
+        connect_at = time.perf_counter()
+        logger.info(f"Auto-Resume: Відновлення {voice_channel.name} ({guild.name})...")
+        voice_client = await voice_channel.connect(timeout=consts.TIMEOUT_VOICE_CONNECT, reconnect=True)
+
+        play_at = time.perf_counter()
+        cog.queue_service.restore(guild_id, guild_state.get('queue') or [])
+        cog.history_service.restore(guild_id, guild_state.get('history') or [])
+
+        if text_channel_id:
+            cog.player_channels[guild_id] = text_channel_id
+
+        cog.queue_service.push_front(guild_id, {
+            'url': track_url,
+            'webpage_url': track_url,
+            'title': track_title,
+            'duration': guild_state.get('current_track_duration'),
+            'thumbnail': guild_state.get('current_track_thumbnail'),
+            'requester': None,
+            'start_at': start_at,
+        })
+
+        await cog.play_next_song(guild, voice_client)
+
+        notify_at = time.perf_counter()
+        if text_channel_id:
+            text_channel = guild.get_channel(text_channel_id)
+            if text_channel:
+                queue = cog.queue_service.get_queue(guild_id)
+                queue_info = f" (ще {len(queue)} в черзі)" if queue else ""
+                position_info = f" (з {format_duration(start_at)})" if start_at >= 1 else ""
+                await text_channel.send(
+                    f"🔄 **Auto-Resume:** Бот повернувся!\n"
+                    f"▶️ Продовжую з: **{track_title}**{position_info}{queue_info}"
+                )
+                await cog.update_player(guild, text_channel)
+
+        done = time.perf_counter()
+        timing = {
+            "guild": guild.name,
+            "queued": begin - queued_at,
+            "ratelimit": connect_at - begin,
+            "connect": play_at - connect_at,
+            "play": notify_at - play_at,
+            "notify": done - notify_at,
+            "total": done - queued_at,
+        }
+        logger.info(
+            f"Auto-Resume: {guild.name} відновлено за {timing['total']:.2f}s "
+            f"(черга {timing['queued']:.2f}s, ліміт {timing['ratelimit']:.2f}s, "
+            f"підключення {timing['connect']:.2f}s, старт треку {timing['play']:.2f}s, "
+            f"повідомлення {timing['notify']:.2f}s)"
+        )
+        return timing
 
-    return resumed_count
+    except Exception as e:
+        logger.error(f"Auto-Resume failure for {guild_id}: {e}")
+        await repository.clear_guild_state(guild_id)
+        return None
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any
 import random
 import logging
 
-from discord_music_bot import consts
+from discord_music_bot import audio_features, consts
+from discord_music_bot.automix_index import EXPLORE, POPULAR, GuildCandidateIndex
 from discord_music_bot.repository import MusicRepository
+from discord_music_bot.services.feature_service import AudioFeatureService
 
 
 logger = logging.getLogger("MusicBot.AutomixService")
@@ -15,22 +18,38 @@ logger = logging.getLogger("MusicBot.AutomixService")
 @dataclass(frozen=True)
 class AutomixConfig:
     recent_window: int = 15  # don't repeat very recent session plays
-    top_limit: int = 50
+    index_limit: int = 5000  # скільки треків топу завантажується в індекс
     history_limit: int = 100
     max_penalty: int = 5
-    top_map_limit: int = 300  # for history_explore play-count weights
+    similar_neighbours: int = consts.AUTOMIX_SIMILAR_NEIGHBOURS
 
 
 class AutomixService:
     """
     Automix: два алгоритми + diversity (виключення недавніх automix-підборів).
-    - top_weighted: зважена вибірка з топу історії (популярність), fallback у history.
-    - history_explore: зважена вибірка з історії з ухилом у менш програні треки.
+    - top_weighted: зважена вибірка за популярністю (кількістю прослуховувань).
+    - history_explore: зважена вибірка з ухилом у менш програні треки.
+    - similar_sound: найближчі за аудіоознаками (темп, гучність, тембр, тональність)
+      до останнього зіграного треку; без ознак — history_explore.
+
+    Кандидати гільдії тримаються в GuildCandidateIndex: він будується з БД при
+    першому виборі, далі оновлюється подіями історії та пропусками.
     """
 
-    def __init__(self, repository: MusicRepository, config: AutomixConfig | None = None):
+    def __init__(
+        self,
+        repository: MusicRepository,
+        config: AutomixConfig | None = None,
+        rng: random.Random | None = None,
+        features: AudioFeatureService | None = None,
+    ):
         self._repo = repository
+        self._features = features
         self._cfg = config or AutomixConfig()
+        self._rng = rng or random.Random()
+        self._indexes: Dict[int, GuildCandidateIndex] = {}
+        self._build_locks: Dict[int, asyncio.Lock] = {}
+        self.index_builds = 0
 
     async def recommend_for_strategy(
         self,
@@ -43,7 +62,26 @@ class AutomixService:
     ) -> Optional[Dict[str, Any]]:
         """
         Повертає трек з полями source=automix та automix_strategy (ефективний алгоритм A/B).
+        skip_penalties застосовуються при побудові індексу; далі — skip_recorded().
         """
+        if strategy == consts.AUTOMIX_STRATEGY_SIMILAR:
+            track = await self._recommend_similar(
+                guild_id,
+                recent_urls=recent_urls,
+                automix_recent_urls=automix_recent_urls,
+                skip_penalties=skip_penalties,
+            )
+            if not track:
+                track = await self._recommend_history_explore(
+                    guild_id,
+                    recent_urls=recent_urls,
+                    automix_recent_urls=automix_recent_urls,
+                    skip_penalties=skip_penalties,
+                )
+            if track:
+                return self._tag(track, consts.AUTOMIX_STRATEGY_SIMILAR)
+            return None
+
         if strategy == consts.AUTOMIX_STRATEGY_HISTORY:
             track = await self._recommend_history_explore(
                 guild_id,
@@ -89,38 +127,81 @@ class AutomixService:
         out["automix_strategy"] = effective_strategy
         return out
 
-    def _clean_url(self, url: str) -> str:
-        if not url:
-            return ""
-        import urllib.parse as urlparse
-        if "youtube.com" in url or "youtu.be" in url:
-            try:
-                parsed = urlparse.urlparse(url)
-                qs = urlparse.parse_qs(parsed.query)
-                if "v" in qs:
-                    return f"https://www.youtube.com/watch?v={qs['v'][0]}"
-                elif "youtu.be" in parsed.netloc:
-                    vid = parsed.path.lstrip('/')
-                    return f"https://www.youtube.com/watch?v={vid}"
-            except Exception:
-                pass
-        return url
-
-    def _blocked_urls(self, recent_urls: List[str], automix_recent_urls: List[str]) -> set:
-        return {self._clean_url(u) for u in (recent_urls + automix_recent_urls) if u}
-
-    async def _playcount_by_url(self, guild_id: int) -> Dict[str, int]:
+    # ── Candidate index ──────────────────────────────────────────
+
+    def on_history_event(self, event: str, guild_id: int, track: Optional[Dict[str, Any]]) -> None:
+        """Слухач HistoryService: played / removed / cleared."""
+        if event == "cleared":
+            self.forget(guild_id)
+            return
+        index = self._indexes.get(guild_id)
+        if index is None or not track:
+            return  # індекс ще не побудований — збудується з БД при першому виборі
+        index.record_play(track, 1 if event == "played" else -1)
+
+    def skip_recorded(self, guild_id: int, url: str, skips: int) -> None:
+        """Оновлює штраф треку після пропуску Automix-підбору."""
+        index = self._indexes.get(guild_id)
+        if index is not None and url:
+            index.set_penalty(url, skips)
+
+    def forget(self, guild_id: int) -> None:
+        self._indexes.pop(guild_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "guilds": len(self._indexes),
+            "tracks": sum(len(index) for index in self._indexes.values()),
+            "builds": self.index_builds,
+        }
+
+    async def _index(self, guild_id: int, skip_penalties: Dict[str, int]) -> GuildCandidateIndex:
+        index = self._indexes.get(guild_id)
+        if index is not None:
+            return index
+        lock = self._build_locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(guild_id)
+            if index is None:
+                index, complete = await self._build_index(guild_id, skip_penalties)
+                # Після помилки БД індекс не кешується — наступний вибір спробує знову
+                if complete:
+                    self._indexes[guild_id] = index
+                    self.index_builds += 1
+        return index
+
+    async def _build_index(
+        self, guild_id: int, skip_penalties: Dict[str, int]
+    ) -> "tuple[GuildCandidateIndex, bool]":
+        index = GuildCandidateIndex(self._cfg.max_penalty, rng=self._rng)
+        complete = True
         try:
-            top = await self._repo.get_top_tracks(guild_id, limit=self._cfg.top_map_limit)
+            for t in await self._repo.get_top_tracks(guild_id, limit=self._cfg.index_limit):
+                index.add(t, int(t.get("play_count") or 0))
         except Exception as e:
-            logger.warning(f"playcount map failed for {guild_id}: {e}")
-            return {}
-        out: Dict[str, int] = {}
-        for t in top:
-            u = t.get("url") or ""
-            if u:
-                out[u] = int(t.get("play_count") or 0)
-        return out
+            logger.warning(f"Top tracks query failed for {guild_id}: {e}")
+            complete = False
+        try:
+            # Нещодавні треки поза топом теж кандидати — їх програли щонайменше раз
+            for t in await self._repo.get_history(guild_id, limit=self._cfg.history_limit):
+                index.add(t, 1)
+        except Exception as e:
+            logger.warning(f"History query failed for {guild_id}: {e}")
+            complete = False
+        index.set_penalties(skip_penalties or {})
+        return index, complete
+
+    async def _recommend(
+        self,
+        kind: str,
+        guild_id: int,
+        recent_urls: List[str],
+        automix_recent_urls: List[str],
+        skip_penalties: Dict[str, int],
+    ) -> Optional[Dict[str, Any]]:
+        index = await self._index(guild_id, skip_penalties)
+        picked = index.sample(kind, blocked_urls=recent_urls + automix_recent_urls)
+        return self._normalize_track(picked) if picked else None
 
     async def _recommend_top_weighted(
         self,
@@ -130,39 +211,7 @@ class AutomixService:
         automix_recent_urls: List[str],
         skip_penalties: Dict[str, int],
     ) -> Optional[Dict[str, Any]]:
-        blocked = self._blocked_urls(recent_urls, automix_recent_urls)
-        try:
-            top = await self._repo.get_top_tracks(guild_id, limit=self._cfg.top_limit)
-        except Exception as e:
-            logger.warning(f"Top tracks query failed for {guild_id}: {e}")
-            top = []
-
-        candidates: List[Tuple[Dict[str, Any], float]] = []
-        for t in top:
-            url = self._clean_url(t.get("url") or "")
-            if not url or url in blocked:
-                continue
-            play_count = int(t.get("play_count") or 0)
-            if play_count <= 0:
-                continue
-            penalty = min(int(skip_penalties.get(t.get("url") or "", 0)), self._cfg.max_penalty)
-            weight = max(0.1, float(play_count) * (0.6**penalty))
-            candidates.append((t, weight))
-
-        picked = self._weighted_pick(candidates)
-        if picked:
-            return self._normalize_track(picked)
-
-        try:
-            history = await self._repo.get_history(guild_id, limit=self._cfg.history_limit)
-        except Exception as e:
-            logger.warning(f"History query failed for {guild_id}: {e}")
-            history = []
-
-        pool = self._unique_history_pool(history, blocked)
-        if not pool:
-            return None
-        return self._normalize_track(random.choice(pool))
+        return await self._recommend(POPULAR, guild_id, recent_urls, automix_recent_urls, skip_penalties)
 
     async def _recommend_history_explore(
         self,
@@ -172,71 +221,45 @@ class AutomixService:
         automix_recent_urls: List[str],
         skip_penalties: Dict[str, int],
     ) -> Optional[Dict[str, Any]]:
-        blocked = self._blocked_urls(recent_urls, automix_recent_urls)
-        play_map = await self._playcount_by_url(guild_id)
-
-        try:
-            history = await self._repo.get_history(guild_id, limit=self._cfg.history_limit)
-        except Exception as e:
-            logger.warning(f"History query failed for {guild_id}: {e}")
-            history = []
+        return await self._recommend(EXPLORE, guild_id, recent_urls, automix_recent_urls, skip_penalties)
 
-        pool = self._unique_history_pool(history, blocked)
-        if not pool:
+    async def _recommend_similar(
+        self,
+        guild_id: int,
+        *,
+        recent_urls: List[str],
+        automix_recent_urls: List[str],
+        skip_penalties: Dict[str, int],
+    ) -> Optional[Dict[str, Any]]:
+        if self._features is None:
             return None
+        # Опорний трек — останній зіграний, для якого вже є ознаки
+        seed = next((f for f in map(self._features.get, reversed(recent_urls)) if f), None)
+        if seed is None:
+            return None
+        index = await self._index(guild_id, skip_penalties)
+
+        def distance_to(key: str) -> Optional[float]:
+            features = self._features.get_by_key(key)
+            return audio_features.distance(seed, features) if features else None
 
-        candidates: List[Tuple[Dict[str, Any], float]] = []
-        for t in pool:
-            raw_url = t.get("url") or t.get("webpage_url") or ""
-            url = self._clean_url(raw_url)
-            pc = int(play_map.get(raw_url, 0))
-            penalty = min(int(skip_penalties.get(raw_url, 0)), self._cfg.max_penalty)
-            # Менше програні треки отримують більшу вагу (explore)
-            explore = 1.0 / (1.0 + float(pc))
-            weight = max(0.05, explore * (0.6**penalty))
-            candidates.append((t, weight))
-
-        picked = self._weighted_pick(candidates)
-        if picked:
-            return self._normalize_track(picked)
-        return self._normalize_track(random.choice(pool))
-
-    def _unique_history_pool(
-        self, history: List[Dict[str, Any]], blocked: set
-    ) -> List[Dict[str, Any]]:
-        pool: List[Dict[str, Any]] = []
-        seen: set = set()
-        for t in history:
-            url = self._clean_url(t.get("url") or "")
-            if not url or url in blocked or url in seen:
-                continue
-            seen.add(url)
-            pool.append(t)
-        return pool
+        neighbours = index.nearest(
+            distance_to, self._cfg.similar_neighbours, blocked_urls=recent_urls + automix_recent_urls
+        )
+        if not neighbours:
+            return None
+        # Ближчі й не пропущені треки — імовірніші, але не завжди один і той самий
+        weights = [decay / (0.25 + dist) for _, dist, decay in neighbours]
+        track = self._rng.choices([t for t, _, _ in neighbours], weights=weights)[0]
+        return self._normalize_track(track)
 
     def _normalize_track(self, t: Dict[str, Any]) -> Dict[str, Any]:
         url = t.get("url") or t.get("webpage_url") or ""
         return {
-            "title": t.get("title", "Unknown"),
+            "title": t.get("title") or "Unknown",
             "url": url,
             "webpage_url": url,
             "duration": t.get("duration"),
             "thumbnail": t.get("thumbnail"),
             "requester": None,
         }
-
-    def _weighted_pick(self, items: List[Tuple[Dict[str, Any], float]]) -> Optional[Dict[str, Any]]:
-        if not items:
-            return None
-        total = sum(w for _, w in items if w > 0)
-        if total <= 0:
-            return None
-        r = random.random() * total
-        upto = 0.0
-        for item, w in items:
-            if w <= 0:
-                continue
-            upto += w
-            if upto >= r:
-                return item
-        return items[-1][0]
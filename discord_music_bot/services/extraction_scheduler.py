@@ -0,0 +1,213 @@
+"""
+Окремий пул для блокуючих екстракцій (yt-dlp, Piped, oEmbed).
+
+Раніше всі вони йшли в `run_in_executor(None, …)` — спільний пул процесу,
+тож плейлист SoundCloud однієї гільдії міг затримати розв'язання stream URL
+для всіх інших. ExtractionScheduler має власний пул з EXTRACTION_WORKERS
+потоків і чергу з пріоритетами:
+
+- PRIORITY_PLAYBACK — stream URL для треку, що має заграти зараз;
+- PRIORITY_PREFETCH — підготовка наступного треку;
+- PRIORITY_INTERACTIVE — пошук і одиночні URL з команд;
+- PRIORITY_BACKGROUND — сторінки й метадані плейлистів.
+
+У межах пріоритету гільдії обслуговуються по колу (по одному завданню), тож
+довга черга однієї гільдії не блокує інші. Гільдію задає `guild_id` або
+`bind_guild()` у поточній задачі asyncio. Якщо очікувач скасований (напр.
+interaction вичерпав час), ще не розпочате завдання просто відкидається.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from discord_music_bot import consts
+
+logger = logging.getLogger('MusicBot.ExtractionScheduler')
+
+PRIORITY_PLAYBACK = 0
+PRIORITY_PREFETCH = 1
+PRIORITY_INTERACTIVE = 2
+PRIORITY_BACKGROUND = 3
+PRIORITY_NAMES = {
+    PRIORITY_PLAYBACK: "playback",
+    PRIORITY_PREFETCH: "prefetch",
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BACKGROUND: "background",
+}
+
+_current_guild: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "extraction_guild", default=None
+)
+
+
+def bind_guild(guild_id: Optional[int]) -> None:
+    """Прив'язує екстракції поточної задачі (і створених з неї) до гільдії."""
+    _current_guild.set(guild_id)
+
+
+def current_guild() -> Optional[int]:
+    """Гільдія, прив'язана до поточної задачі через bind_guild() (або None)."""
+    return _current_guild.get()
+
+
+class _Job:
+    __slots__ = ("fn", "args", "priority", "guild_id", "loop", "future", "queued_at")
+
+    def __init__(self, fn, args, priority, guild_id, loop):
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.guild_id = guild_id
+        self.loop = loop
+        self.future = loop.create_future()
+        self.queued_at = time.monotonic()
+
+
+class _Metrics:
+    __slots__ = ("submitted", "completed", "failed", "cancelled", "wait_total", "wait_max", "service_total")
+
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.service_total = 0.0
+
+
+class ExtractionScheduler:
+    """Пріоритетна черга з чесним обслуговуванням гільдій перед власним пулом потоків."""
+
+    def __init__(self, workers: int = consts.EXTRACTION_WORKERS):
+        self.workers = max(1, workers)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # priority -> guild_id -> FIFO завдань; priority -> черговість гільдій (round-robin)
+        self._queues: Dict[int, Dict[Optional[int], Deque[_Job]]] = {p: {} for p in PRIORITY_NAMES}
+        self._rotation: Dict[int, Deque[Optional[int]]] = {p: deque() for p in PRIORITY_NAMES}
+        self._running = 0
+        self._metrics: Dict[int, _Metrics] = {p: _Metrics() for p in PRIORITY_NAMES}
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: int = PRIORITY_INTERACTIVE,
+        guild_id: Optional[int] = None,
+    ) -> Any:
+        """Виконує fn(*args) у пулі екстракцій і повертає результат."""
+        if priority not in PRIORITY_NAMES:
+            raise ValueError(f"Unknown extraction priority: {priority}")
+        if guild_id is None:
+            guild_id = _current_guild.get()
+        job = _Job(fn, args, priority, guild_id, asyncio.get_running_loop())
+        with self._lock:
+            self._metrics[priority].submitted += 1
+            queue = self._queues[priority].get(guild_id)
+            if queue is None:
+                queue = self._queues[priority][guild_id] = deque()
+                self._rotation[priority].append(guild_id)
+            queue.append(job)
+        self._dispatch()
+        return await job.future
+
+    def _next_job(self) -> Optional[_Job]:
+        """Наступне завдання: найвищий пріоритет, гільдії по колу (під self._lock)."""
+        for priority in sorted(self._rotation):
+            rotation = self._rotation[priority]
+            queues = self._queues[priority]
+            while rotation:
+                guild_id = rotation.popleft()
+                queue = queues[guild_id]
+                job = queue.popleft()
+                if queue:
+                    rotation.append(guild_id)
+                else:
+                    del queues[guild_id]
+                if job.future.cancelled():
+                    self._metrics[priority].cancelled += 1
+                    continue
+                return job
+        return None
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._lock:
+                if self._running >= self.workers:
+                    return
+                job = self._next_job()
+                if job is None:
+                    return
+                self._running += 1
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+                pool = self._pool
+            pool.submit(self._execute, job)
+
+    def _execute(self, job: _Job) -> None:
+        started = time.monotonic()
+        result, error = None, None
+        try:
+            result = job.fn(*job.args)
+        except BaseException as exc:
+            error = exc
+        finished = time.monotonic()
+        with self._lock:
+            self._running -= 1
+            metrics = self._metrics[job.priority]
+            wait = started - job.queued_at
+            metrics.wait_total += wait
+            metrics.wait_max = max(metrics.wait_max, wait)
+            metrics.service_total += finished - started
+            if error is None:
+                metrics.completed += 1
+            else:
+                metrics.failed += 1
+        try:
+            job.loop.call_soon_threadsafe(self._resolve, job.future, result, error)
+        except RuntimeError:
+            pass  # цикл подій уже закрито — результат нікому не потрібен
+        self._dispatch()
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {"workers": self.workers, "running": self._running}
+            for priority, name in PRIORITY_NAMES.items():
+                m = self._metrics[priority]
+                finished = m.completed + m.failed
+                out[name] = {
+                    "queued": sum(len(q) for q in self._queues[priority].values()),
+                    "submitted": m.submitted,
+                    "completed": m.completed,
+                    "failed": m.failed,
+                    "cancelled": m.cancelled,
+                    "wait_avg_ms": m.wait_total / finished * 1000 if finished else 0.0,
+                    "wait_max_ms": m.wait_max * 1000,
+                    "service_avg_ms": m.service_total / finished * 1000 if finished else 0.0,
+                }
+            return out
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+extraction_scheduler = ExtractionScheduler()
@@ -0,0 +1,140 @@
+"""
+Фоновий аналіз аудіоознак треків для Automix similar_sound.
+
+Коли трек починає грати, AudioFeatureService (якщо ознак ще немає) передає
+його media URL у пул процесів: ffmpeg декодує фрагмент, а `audio_features.analyze`
+рахує BPM, гучність, спектральний центроїд і хрому. Окремий процес зі зниженим
+пріоритетом (nice) не конкурує за GIL з event loop і потоком відтворення.
+Результати зберігаються в SQLite (track_features) і тримаються в пам'яті за
+канонічним ключем треку.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Optional, Set
+
+from discord_music_bot import audio_features, consts
+from discord_music_bot.repository import MusicRepository
+from discord_music_bot.track_catalog import canonical_track_key
+
+logger = logging.getLogger('MusicBot.FeatureService')
+
+
+def _lower_priority() -> None:
+    """Ініціалізатор процесу пулу: аналіз поступається відтворенню."""
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+class AudioFeatureService:
+    """Черга фонового аналізу й кеш ознак за канонічним ключем треку."""
+
+    def __init__(
+        self,
+        repository: MusicRepository,
+        executor: Optional[Executor] = None,
+        max_pending: int = consts.AUDIO_FEATURES_MAX_PENDING,
+    ):
+        self._repo = repository
+        self._executor = executor
+        self._owns_executor = executor is None
+        self.max_pending = max_pending
+        self._features: Dict[str, Dict[str, Any]] = {}
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._slot = asyncio.Semaphore(consts.AUDIO_FEATURES_WORKERS)
+        self.analyzed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def load(self) -> int:
+        """Завантажує збережені ознаки з БД; повертає їхню кількість."""
+        try:
+            self._features.update(await self._repo.get_track_features())
+        except Exception as e:
+            logger.warning(f"Track features load failed: {e}")
+        return len(self._features)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self._features.get(canonical_track_key(url)) if url else None
+
+    def get_by_key(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._features.get(key)
+
+    def schedule(self, track: Dict[str, Any], stream_url: Optional[str]) -> bool:
+        """Ставить трек на аналіз, якщо ознак ще немає; False — якщо не поставлено."""
+        url = track.get("url") or track.get("webpage_url") or ""
+        if not consts.AUDIO_FEATURES_ENABLED or not isinstance(url, str) or not isinstance(stream_url, str):
+            return False
+        if not url or not stream_url:
+            return False
+        key = canonical_track_key(url)
+        if key in self._features or key in self._pending:
+            return False
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending.add(key)
+        task = asyncio.get_running_loop().create_task(self._analyze(key, dict(track), stream_url))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _analyze(self, key: str, track: Dict[str, Any], stream_url: str) -> None:
+        try:
+            async with self._slot:
+                loop = asyncio.get_running_loop()
+                features = await loop.run_in_executor(
+                    self._get_executor(), audio_features.analyze, stream_url, track.get("duration")
+                )
+            if not features:
+                self.failed += 1
+                logger.info(f"No audio features for {track.get('title', key)}")
+                return
+            self._features[key] = features
+            self.analyzed += 1
+            await self._repo.save_track_features(track, features)
+            logger.info(
+                f"Audio features for {track.get('title', key)}: {features['bpm'] or 0:.0f} BPM, "
+                f"{audio_features.key_name(features['key'])}, {features['loudness']:.1f} dBFS"
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Audio feature analysis failed for {key}: {e}")
+        finally:
+            self._pending.discard(key)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # Не fork: у процесі бота вже працюють потоки (плеєр, пули екстракції, health),
+            # і форкнута дитина може успадкувати захоплений ними lock
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(
+                max_workers=consts.AUDIO_FEATURES_WORKERS,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_lower_priority,
+            )
+        return self._executor
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "known": len(self._features),
+            "pending": len(self._pending),
+            "analyzed": self.analyzed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+    def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -3,11 +3,11 @@
 Керує in-memory історією та async-персистентністю в SQLite.
 """
 
-from typing import List, Dict, Optional, Any
-import asyncio
+from typing import Callable, List, Dict, Optional, Any
 import logging
 from discord_music_bot import consts
 from discord_music_bot.repository import MusicRepository
+from discord_music_bot.services.write_buffer import WriteBehindBuffer
 
 logger = logging.getLogger('MusicBot.HistoryService')
 
@@ -15,9 +15,22 @@ logger = logging.getLogger('MusicBot.HistoryService')
 class HistoryService:
     """Сервіс історії з in-memory кешем та async-персистентністю в SQLite."""
 
-    def __init__(self, repository: MusicRepository):
+    def __init__(self, repository: MusicRepository, write_buffer: Optional[WriteBehindBuffer] = None):
         self._history: Dict[int, List[Dict[str, Any]]] = {}
         self._repo = repository
+        self._writes = write_buffer if write_buffer is not None else WriteBehindBuffer(repository)
+        self._listeners: List[Callable[[str, int, Optional[Dict[str, Any]]], None]] = []
+
+    def add_listener(self, callback: Callable[[str, int, Optional[Dict[str, Any]]], None]) -> None:
+        """Реєструє callback(event, guild_id, track); event — played, removed або cleared."""
+        self._listeners.append(callback)
+
+    def _notify(self, event: str, guild_id: int, track: Optional[Dict[str, Any]] = None) -> None:
+        for callback in self._listeners:
+            try:
+                callback(event, guild_id, track)
+            except Exception as e:
+                logger.error(f"Помилка слухача історії для {guild_id}: {e}")
 
     def add_to_history(self, guild_id: int, track: Dict[str, Any]) -> None:
         if guild_id not in self._history:
@@ -27,14 +40,16 @@ class HistoryService:
         if len(self._history[guild_id]) > consts.MAX_HISTORY_SIZE:
             self._history[guild_id].pop(0)
         # Зберігаємо в БД
-        asyncio.ensure_future(self._repo.add_history_track(guild_id, track))
+        self._writes.append(("history", guild_id), self._repo.add_history_track(guild_id, track))
+        self._notify("played", guild_id, track)
 
     def get_last_track(self, guild_id: int) -> Optional[Dict[str, Any]]:
         """Returns the last played track and removes it from history."""
         if guild_id in self._history and self._history[guild_id]:
             track = self._history[guild_id].pop()
             # Видаляємо й з БД
-            asyncio.ensure_future(self._repo.pop_last_history_track(guild_id))
+            self._writes.append(("history", guild_id), self._repo.pop_last_history_track(guild_id))
+            self._notify("removed", guild_id, track)
             return track
         return None
 
@@ -42,20 +57,24 @@ class HistoryService:
         """Очищає всю історію прослуховувань (in-memory + БД)."""
         if guild_id in self._history:
             self._history[guild_id].clear()
-        asyncio.ensure_future(self._repo.clear_history(guild_id))
+        self._writes.write(("history", guild_id), self._repo.clear_history(guild_id))
+        self._notify("cleared", guild_id)
+
+    def restore(self, guild_id: int, tracks: List[Dict[str, Any]]) -> None:
+        """Встановлює історію, вже прочитану з БД (auto-resume читає всі сервери одним запитом)."""
+        # Нормалізуємо записи — додаємо webpage_url якщо відсутній
+        for track in tracks:
+            if 'webpage_url' not in track:
+                track['webpage_url'] = track.get('url', '')
+        self._history[guild_id] = tracks[-consts.MAX_HISTORY_SIZE:]
+        logger.info(
+            f"Guild {guild_id}: завантажено {len(self._history[guild_id])} з історії"
+        )
 
     async def load_from_db(self, guild_id: int) -> None:
         """Завантажує історію з БД в пам'ять (для recovery)."""
         try:
-            db_history = await self._repo.get_history(guild_id, consts.MAX_HISTORY_SIZE)
-            # Нормалізуємо записи — додаємо webpage_url якщо відсутній
-            for track in db_history:
-                if 'webpage_url' not in track:
-                    track['webpage_url'] = track.get('url', '')
-            self._history[guild_id] = db_history
-            logger.info(
-                f"Guild {guild_id}: завантажено {len(self._history[guild_id])} з історії"
-            )
+            self.restore(guild_id, await self._repo.get_history(guild_id, consts.MAX_HISTORY_SIZE))
         except Exception as e:
             logger.error(f"Помилка завантаження історії з БД для {guild_id}: {e}")
             self._history[guild_id] = []
@@ -1,6 +1,7 @@
 import discord
 import asyncio
-from discord_music_bot.audio_source import YTDLSource
+import time
+from discord_music_bot.audio_source import CrossfadeSource, YTDLSource
 import logging
 
 class PlayerService:
@@ -17,19 +18,35 @@ class PlayerService:
         fade_seconds: float = 0.0,
         fade_in: bool = False,
         fade_out: bool = False,
+        source: YTDLSource = None,
+        crossfade_seconds: float = 0.0,
+        opus: bool = False,
+        volume: float = None,
     ) -> YTDLSource:
-        """Creates a player and starts playing on the voice client."""
+        """Creates a player and starts playing on the voice client.
+        A pre-warmed ``source`` (see PrefetchService) skips URL extraction and FFmpeg start.
+        With ``crossfade_seconds`` > 0 the player is wrapped in a CrossfadeSource so the
+        next track can be overlapped via ``queue_next``.
+        ``volume`` is applied by the FFmpeg filter (see consts.FFMPEG_VOLUME).
+        ``opus=True`` asks FFmpeg to encode Opus itself; YTDLSource falls back to PCM
+        when that is not possible."""
         try:
             # Check voice connection before attempting playback
             if not voice_client or not voice_client.is_connected():
                 raise discord.errors.ClientException("Voice client is not connected — cannot start playback.")
             
-            player = await YTDLSource.from_track_dict(
+            extra_kwargs = {}
+            if opus:
+                extra_kwargs["opus"] = True
+            if volume is not None:
+                extra_kwargs["volume"] = volume
+            player = source or await YTDLSource.from_track_dict(
                 track_dict,
                 loop=loop,
                 fade_seconds=fade_seconds,
                 fade_in=fade_in,
                 fade_out=fade_out,
+                **extra_kwargs,
             )
             if player is None:
                 url = track_dict.get('webpage_url') or track_dict.get('url') or 'Unknown URL'
@@ -46,7 +63,12 @@ class PlayerService:
                     self.logger.info("Track finished")
                 after_callback(error)
 
-            voice_client.play(player, after=_after_playback)
+            audio = player
+            if crossfade_seconds and crossfade_seconds > 0:
+                audio = CrossfadeSource(player, fade_seconds=crossfade_seconds)
+            # Початок етапу first_frame (instrumentation): потік плеєра стартує в play()
+            player.played_at = time.perf_counter()
+            voice_client.play(audio, after=_after_playback)
 
             self.logger.info(f"Voice client connected: {voice_client.is_connected()}")
             self.logger.info(f"Voice client playing: {voice_client.is_playing()}")
@@ -62,6 +84,46 @@ class PlayerService:
             self.logger.error(f"Error creating stream: {e}", exc_info=True)
             raise e
 
+    async def queue_next(
+        self,
+        voice_client: discord.VoiceClient,
+        track_dict: dict,
+        loop: asyncio.AbstractEventLoop,
+        on_switch,
+        *,
+        source: YTDLSource = None,
+        **source_kwargs,
+    ):
+        """Prepares the next track and hands it to the active CrossfadeSource.
+        Returns the queued player, or None if there is no mixer or preparation failed."""
+        if self._mixer(voice_client) is None:
+            if source is not None:
+                source.cleanup()
+            return None
+        player = source or await YTDLSource.from_track_dict(track_dict, loop=loop, **source_kwargs)
+        if player is None:
+            return None
+        mixer = self._mixer(voice_client)
+        if mixer is None or not mixer.queue_next(player, on_switch):
+            player.cleanup()
+            return None
+        return player
+
+    def cancel_next(self, voice_client: discord.VoiceClient):
+        """Removes a not-yet-started next track from the mixer and returns it."""
+        mixer = self._mixer(voice_client)
+        return mixer.cancel_next() if mixer is not None else None
+
+    def remaining_seconds(self, voice_client: discord.VoiceClient):
+        """Seconds left in the current crossfaded track, or None without a mixer."""
+        mixer = self._mixer(voice_client)
+        return mixer.remaining_seconds() if mixer is not None else None
+
+    @staticmethod
+    def _mixer(voice_client):
+        source = getattr(voice_client, "source", None) if voice_client else None
+        return source if isinstance(source, CrossfadeSource) else None
+
     def pause(self, voice_client: discord.VoiceClient):
         if voice_client and voice_client.is_playing():
             voice_client.pause()
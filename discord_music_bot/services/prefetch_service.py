@@ -0,0 +1,212 @@
+"""
+Попередня підготовка наступного треку черги.
+
+Поки грає поточний трек, PrefetchService бере `QueueService.peek_next` і
+за PREFETCH_RESOLVE_LEAD_SECONDS до кінця розв'язує stream URL (результат
+потрапляє в stream_url_cache). Опційно (PREFETCH_WARM_FFMPEG) за
+PREFETCH_WARM_LEAD_SECONDS запускається і сам ffmpeg — тоді перехід між
+треками не чекає ні екстракції, ні старту процесу.
+
+Зміни черги (shuffle, move, clear, push_front, нові треки) приходять через
+слухача QueueService: якщо голова черги змінилась, попередня підготовка
+скасовується і планується заново.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from discord_music_bot import consts
+from discord_music_bot.audio_source import YTDLSource
+from discord_music_bot.services.extraction_scheduler import PRIORITY_PREFETCH, bind_guild
+from discord_music_bot.services.queue_service import QueueService
+from discord_music_bot.stream_cache import cache_key
+
+logger = logging.getLogger('MusicBot.PrefetchService')
+
+
+class _PrefetchJob:
+    """Підготовка одного треку: pending → resolve → wait → warm → done."""
+
+    def __init__(self, track: Dict[str, Any], source_kwargs: Dict[str, Any]):
+        self.track = track
+        self.source_kwargs = source_kwargs
+        self.phase = "pending"
+        self.stale = False
+        self.source: Optional[YTDLSource] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class PrefetchService:
+    """Розв'язує (і за бажанням прогріває) наступний трек до кінця поточного."""
+
+    def __init__(
+        self,
+        queue_service: QueueService,
+        resolve_lead: float = consts.PREFETCH_RESOLVE_LEAD_SECONDS,
+        warm_ffmpeg: bool = consts.PREFETCH_WARM_FFMPEG,
+        warm_lead: float = consts.PREFETCH_WARM_LEAD_SECONDS,
+    ):
+        self._queue = queue_service
+        self.resolve_lead = resolve_lead
+        self.warm_ffmpeg = warm_ffmpeg
+        self.warm_lead = warm_lead
+        self._jobs: Dict[int, _PrefetchJob] = {}
+        # guild_id -> (loop.time() кінця поточного треку або None, параметри джерела)
+        self._playing: Dict[int, tuple] = {}
+        # Трек, підготовку якого вже забрали, але ще не вийняли з черги (кросфейд)
+        self._taken: Dict[int, Dict[str, Any]] = {}
+        # Метрики
+        self.resolved = 0
+        self.warmed = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.failed = 0
+        queue_service.add_listener(self.on_queue_changed)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._jobs),
+            "resolved": self.resolved,
+            "warmed": self.warmed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+        }
+
+    # ── Playback hooks ───────────────────────────────────────────
+
+    def track_started(self, guild_id: int, duration: Any, **source_kwargs: Any) -> None:
+        """Поточний трек почав грати — плануємо підготовку наступного."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        ends_at = None
+        if isinstance(duration, (int, float)) and duration > 0:
+            ends_at = loop.time() + float(duration)
+        self._playing[guild_id] = (ends_at, source_kwargs)
+        self._taken.pop(guild_id, None)
+        self._reschedule(guild_id, force=True)
+
+    def on_queue_changed(self, guild_id: int) -> None:
+        """Слухач QueueService: перепланувати, якщо змінилась голова черги."""
+        self._reschedule(guild_id)
+
+    async def take(self, guild_id: int, track: Dict[str, Any], **source_kwargs: Any) -> Optional[YTDLSource]:
+        """
+        Забирає підготовку для треку, який щойно вийнято з черги.
+        Повертає прогріте джерело або None (тоді URL, найімовірніше, вже в кеші).
+        """
+        self._taken[guild_id] = track
+        job = self._jobs.pop(guild_id, None)
+        if job is None:
+            return None
+        if job.track is not track or job.phase in ("pending", "wait"):
+            # Інший трек, розв'язання ще не почалось, або URL уже в кеші — прогрів не чекаємо
+            if job.track is track and job.phase == "wait":
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._discard(job)
+            return None
+        if job.phase != "done" and job.task is not None:
+            await asyncio.wait({job.task})
+        self.hits += 1
+        source = job.source
+        job.source = None
+        if source is not None and (
+            job.source_kwargs != source_kwargs or not source.original.is_alive()
+        ):
+            source.cleanup()
+            return None
+        return source
+
+    def forget(self, guild_id: int) -> None:
+        """Гільдія більше не грає: скасувати підготовку."""
+        self._playing.pop(guild_id, None)
+        self._taken.pop(guild_id, None)
+        job = self._jobs.pop(guild_id, None)
+        if job is not None:
+            self._discard(job)
+            self.cancelled += 1
+
+    def close(self) -> None:
+        for guild_id in list(self._jobs):
+            self.forget(guild_id)
+        self._playing.clear()
+        self._taken.clear()
+
+    # ── Internals ────────────────────────────────────────────────
+
+    def _reschedule(self, guild_id: int, force: bool = False) -> None:
+        head = self._queue.peek_next(guild_id)
+        job = self._jobs.get(guild_id)
+        if job is not None and job.track is head and not (force and job.phase in ("pending", "wait")):
+            return
+        if job is not None:
+            self._discard(self._jobs.pop(guild_id))
+            if job.track is not head:
+                self.cancelled += 1
+        if head is None or guild_id not in self._playing or head is self._taken.get(guild_id):
+            return
+        url = head.get("webpage_url") or head.get("url")
+        # Кешуються лише YouTube URL — без прогріву решту готувати немає сенсу
+        if not url or (cache_key(url) is None and not self.warm_ffmpeg):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        ends_at, source_kwargs = self._playing[guild_id]
+        job = _PrefetchJob(head, source_kwargs)
+        job.task = loop.create_task(self._run(guild_id, job, url, ends_at))
+        self._jobs[guild_id] = job
+
+    async def _run(self, guild_id: int, job: _PrefetchJob, url: str, ends_at: Optional[float]) -> None:
+        loop = asyncio.get_running_loop()
+        bind_guild(guild_id)  # у власному контексті задачі — для чесної черги екстракцій
+        try:
+            if ends_at is not None:
+                await self._sleep_until(ends_at - self.resolve_lead)
+            job.phase = "resolve"
+            await YTDLSource.resolve_stream_url(url, loop, priority=PRIORITY_PREFETCH)
+            self.resolved += 1
+            if job.stale or not self.warm_ffmpeg or ends_at is None:
+                return
+            job.phase = "wait"
+            await self._sleep_until(ends_at - self.warm_lead)
+            job.phase = "warm"
+            job.source = await YTDLSource.from_track_dict(job.track, loop=loop, **job.source_kwargs)
+            if job.source is not None:
+                self.warmed += 1
+            if job.stale:
+                self._release(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Не вдалося підготувати наступний трек {url}: {e}")
+        finally:
+            job.phase = "done"
+
+    @staticmethod
+    async def _sleep_until(deadline: float) -> None:
+        delay = deadline - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _discard(self, job: _PrefetchJob) -> None:
+        """Скасовує підготовку; розв'язання і старт ffmpeg не перериваються посередині."""
+        job.stale = True
+        if job.phase in ("pending", "wait") and job.task is not None:
+            job.task.cancel()
+        self._release(job)
+
+    @staticmethod
+    def _release(job: _PrefetchJob) -> None:
+        if job.source is not None:
+            job.source.cleanup()
+            job.source = None
@@ -1,13 +1,20 @@
 """
 Сервіс черги з in-memory кешем та async-персистентністю в SQLite.
 Дані зберігаються в пам'яті для швидкості, а БД слугує для recovery.
+
+Персистентність інкрементальна: кожен трек у БД має розріджену позицію
+(крок QUEUE_POSITION_GAP), тож append / pop / push_front / move — це
+одна операція над одним рядком. Повний перезапис (компакція) робиться
+лише після shuffle, при вичерпанні проміжку між позиціями, кожні
+QUEUE_COMPACTION_INTERVAL операцій або якщо стан БД невідомий.
 """
 
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Callable, Awaitable, Set
 import random
-import asyncio
 import logging
+from discord_music_bot import consts
 from discord_music_bot.repository import MusicRepository
+from discord_music_bot.services.write_buffer import WriteBehindBuffer
 
 logger = logging.getLogger('MusicBot.QueueService')
 
@@ -15,9 +22,30 @@ logger = logging.getLogger('MusicBot.QueueService')
 class QueueService:
     """Сервіс черги (тільки queue-операції, без історії — ISP)."""
 
-    def __init__(self, repository: MusicRepository):
+    def __init__(self, repository: MusicRepository, write_buffer: Optional[WriteBehindBuffer] = None):
         self._queues: Dict[int, List[Dict[str, Any]]] = {}
         self._repo = repository
+        self._writes = write_buffer if write_buffer is not None else WriteBehindBuffer(repository)
+        # Позиції рядків queue_tracks паралельно до self._queues (відомі лише після компакції)
+        self._positions: Dict[int, List[int]] = {}
+        self._ops_since_compaction: Dict[int, int] = {}
+        # Гільдії, де інкрементальна операція впала — наступна зміна перезапише чергу
+        self._dirty: Set[int] = set()
+        # Слухачі змін черги (напр. PrefetchService); get_next_track їх не викликає —
+        # вийнятий трек забирає сам шлях відтворення
+        self._listeners: List[Callable[[int], None]] = []
+        self._writes.add_failure_listener(self._on_write_lost)
+
+    def add_listener(self, callback: Callable[[int], None]) -> None:
+        """Реєструє callback(guild_id), який викликається після зміни черги."""
+        self._listeners.append(callback)
+
+    def _notify(self, guild_id: int) -> None:
+        for callback in self._listeners:
+            try:
+                callback(guild_id)
+            except Exception as e:
+                logger.error(f"Помилка слухача черги для {guild_id}: {e}")
 
     # ── Queue Operations ─────────────────────────────────────────
 
@@ -27,43 +55,63 @@ class QueueService:
         return self._queues[guild_id]
 
     def add_track(self, guild_id: int, track: Dict[str, Any]) -> None:
-        if guild_id not in self._queues:
-            self._queues[guild_id] = []
-        self._queues[guild_id].append(track)
-        # Фонове збереження в БД
-        asyncio.ensure_future(self._persist_queue(guild_id))
+        self.add_tracks(guild_id, [track])
 
     def add_tracks(self, guild_id: int, tracks: List[Dict[str, Any]]) -> None:
         """Додає список треків у чергу (для плейлистів)."""
-        if guild_id not in self._queues:
-            self._queues[guild_id] = []
-        self._queues[guild_id].extend(tracks)
-        asyncio.ensure_future(self._persist_queue(guild_id))
+        positions = self._tracked_positions(guild_id)
+        queue = self.get_queue(guild_id)
+        queue.extend(tracks)
+        self._notify(guild_id)
+        if positions is None:
+            self._schedule_compaction(guild_id)
+            return
+        last = positions[-1] if positions else 0
+        new_positions = [last + (i + 1) * consts.QUEUE_POSITION_GAP for i in range(len(tracks))]
+        positions.extend(new_positions)
+        # Фонове збереження в БД
+        self._schedule_op(
+            guild_id, self._repo.insert_queue_tracks, guild_id, list(zip(new_positions, tracks))
+        )
 
     def get_next_track(self, guild_id: int) -> Optional[Dict[str, Any]]:
         """Returns the next track and removes it from the queue."""
         if guild_id in self._queues and self._queues[guild_id]:
+            positions = self._tracked_positions(guild_id)
             track = self._queues[guild_id].pop(0)
-            asyncio.ensure_future(self._persist_queue(guild_id))
+            if positions is None:
+                self._schedule_compaction(guild_id)
+            else:
+                self._schedule_op(guild_id, self._repo.delete_queue_track, guild_id, positions.pop(0))
             return track
         return None
 
     def clear(self, guild_id: int) -> None:
         if guild_id in self._queues:
             self._queues[guild_id].clear()
-        asyncio.ensure_future(self._repo.clear_queue(guild_id))
+        self._positions[guild_id] = []
+        self._ops_since_compaction[guild_id] = 0
+        self._dirty.discard(guild_id)
+        self._writes.write(("queue", guild_id), self._persist_op(guild_id, self._repo.clear_queue, guild_id))
+        self._notify(guild_id)
 
     def shuffle(self, guild_id: int) -> None:
         if guild_id in self._queues:
             random.shuffle(self._queues[guild_id])
-            asyncio.ensure_future(self._persist_queue(guild_id))
+            self._schedule_compaction(guild_id)
+            self._notify(guild_id)
 
     def push_front(self, guild_id: int, track: Dict[str, Any]) -> None:
         """Adds a track to the front of the queue (priority)."""
-        if guild_id not in self._queues:
-            self._queues[guild_id] = []
-        self._queues[guild_id].insert(0, track)
-        asyncio.ensure_future(self._persist_queue(guild_id))
+        positions = self._tracked_positions(guild_id)
+        self.get_queue(guild_id).insert(0, track)
+        self._notify(guild_id)
+        if positions is None:
+            self._schedule_compaction(guild_id)
+            return
+        position = positions[0] - consts.QUEUE_POSITION_GAP if positions else consts.QUEUE_POSITION_GAP
+        positions.insert(0, position)
+        self._schedule_op(guild_id, self._repo.insert_queue_tracks, guild_id, [(position, track)])
 
     def move_track(self, guild_id: int, from_pos: int, to_pos: int) -> Optional[Dict[str, Any]]:
         """Переміщує трек з позиції from_pos на позицію to_pos (1-indexed).
@@ -78,11 +126,38 @@ class QueueService:
             return None
         if from_idx == to_idx:
             return queue[from_idx]
+        positions = self._tracked_positions(guild_id)
         track = queue.pop(from_idx)
         queue.insert(to_idx, track)
-        asyncio.ensure_future(self._persist_queue(guild_id))
+        self._notify(guild_id)
+        if positions is None:
+            self._schedule_compaction(guild_id)
+            return track
+
+        old_position = positions.pop(from_idx)
+        before = positions[to_idx - 1] if to_idx > 0 else None
+        after = positions[to_idx] if to_idx < len(positions) else None
+        if before is None:
+            new_position = after - consts.QUEUE_POSITION_GAP
+        elif after is None:
+            new_position = before + consts.QUEUE_POSITION_GAP
+        elif after - before >= 2:
+            new_position = (before + after) // 2
+        else:
+            # Проміжок між сусідами вичерпано — перенумеровуємо всю чергу
+            positions.insert(to_idx, old_position)
+            self._schedule_compaction(guild_id)
+            return track
+        positions.insert(to_idx, new_position)
+        self._schedule_op(guild_id, self._repo.move_queue_track, guild_id, old_position, new_position)
         return track
 
+    def tracks_updated(self, guild_id: int) -> None:
+        """Метадані треків у черзі доповнено на місці (напр. плейлист) — перезаписуємо знімок у БД.
+        Порядок не змінився, тож слухачів не викликаємо."""
+        if self._queues.get(guild_id):
+            self._schedule_compaction(guild_id)
+
     def peek_next(self, guild_id: int) -> Optional[Dict[str, Any]]:
         """Returns the next track WITHOUT removing it from the queue."""
         if guild_id in self._queues and self._queues[guild_id]:
@@ -91,21 +166,77 @@ class QueueService:
 
     # ── Persistence ──────────────────────────────────────────────
 
-    async def _persist_queue(self, guild_id: int) -> None:
-        """Фонове збереження черги в БД."""
+    def _tracked_positions(self, guild_id: int) -> Optional[List[int]]:
+        """
+        Позиції рядків у БД для поточної (ще не зміненої) черги.
+        None — інкрементальна операція неможлива, потрібна компакція.
+        """
+        positions = self._positions.get(guild_id)
+        if (
+            positions is None
+            or guild_id in self._dirty
+            or len(positions) != len(self.get_queue(guild_id))
+            or self._ops_since_compaction.get(guild_id, 0) >= consts.QUEUE_COMPACTION_INTERVAL
+        ):
+            return None
+        return positions
+
+    def _schedule_op(self, guild_id: int, op: Callable[..., Awaitable[None]], *args: Any) -> None:
+        self._ops_since_compaction[guild_id] = self._ops_since_compaction.get(guild_id, 0) + 1
+        # Дельта: її поглине наступний знімок черги, якщо той встигне раніше flush
+        self._writes.append(("queue", guild_id), self._persist_op(guild_id, op, *args))
+
+    def _schedule_compaction(self, guild_id: int) -> None:
+        """Перенумеровує позиції та планує повний перезапис черги в БД."""
+        queue = self.get_queue(guild_id)
+        positions = [(i + 1) * consts.QUEUE_POSITION_GAP for i in range(len(queue))]
+        self._positions[guild_id] = positions
+        self._ops_since_compaction[guild_id] = 0
+        self._dirty.discard(guild_id)
+        # Знімок фіксується зараз: наступні операції вже розраховані на ці позиції
+        self._writes.write(("queue", guild_id), self._persist_queue(guild_id, list(queue), list(positions)))
+
+    def _on_write_lost(self, key: Any) -> None:
+        """Пакет з записами черги відкочено — її стан у БД невідомий, наступна зміна перезапише чергу."""
+        if isinstance(key, tuple) and len(key) == 2 and key[0] == "queue":
+            self._dirty.add(key[1])
+
+    async def _persist_op(self, guild_id: int, op: Callable[..., Awaitable[None]], *args: Any) -> None:
+        """Фонове виконання однієї інкрементальної операції над чергою в БД."""
         try:
-            queue = self.get_queue(guild_id)
-            await self._repo.save_queue(guild_id, queue)
+            await op(*args)
         except Exception as e:
+            self._dirty.add(guild_id)
             logger.error(f"Помилка збереження черги для {guild_id}: {e}")
 
+    async def _persist_queue(
+        self,
+        guild_id: int,
+        tracks: Optional[List[Dict[str, Any]]] = None,
+        positions: Optional[List[int]] = None,
+    ) -> None:
+        """Фонове збереження черги в БД (повний перезапис)."""
+        try:
+            if tracks is None:
+                tracks = self.get_queue(guild_id)
+            await self._repo.save_queue(guild_id, tracks, positions)
+        except Exception as e:
+            self._dirty.add(guild_id)
+            logger.error(f"Помилка збереження черги для {guild_id}: {e}")
+
+    def restore(self, guild_id: int, tracks: List[Dict[str, Any]]) -> None:
+        """Встановлює чергу, вже прочитану з БД (auto-resume читає всі черги одним запитом)."""
+        # Позиції з БД не відомі — перша зміна черги перезапише її з рівними проміжками
+        self._positions.pop(guild_id, None)
+        self._queues[guild_id] = list(tracks)
+        self._notify(guild_id)
+        logger.info(f"Guild {guild_id}: завантажено {len(tracks)} треків з черги")
+
     async def load_from_db(self, guild_id: int) -> None:
         """Завантажує чергу з БД в пам'ять (для recovery)."""
+        self._positions.pop(guild_id, None)
         try:
-            self._queues[guild_id] = await self._repo.load_queue(guild_id)
-            logger.info(
-                f"Guild {guild_id}: завантажено {len(self._queues[guild_id])} треків з черги"
-            )
+            self.restore(guild_id, await self._repo.load_queue(guild_id))
         except Exception as e:
             logger.error(f"Помилка завантаження черги з БД для {guild_id}: {e}")
             self._queues[guild_id] = []
@@ -1,7 +1,14 @@
-import yt_dlp
 import logging
 import asyncio
+import itertools
+from urllib.parse import urlparse
 from discord_music_bot import consts
+from discord_music_bot.services.extraction_scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    ExtractionScheduler,
+    extraction_scheduler,
+)
 from discord_music_bot.ytdlp_config import (
     apply_ytdlp_python_opts,
     fetch_piped_search,
@@ -9,23 +16,26 @@ from discord_music_bot.ytdlp_config import (
     fetch_youtube_oembed,
     _piped_first_enabled,
 )
-from typing import List, Dict, Optional, Tuple, Any
+from discord_music_bot.track_catalog import youtube_video_id
+from discord_music_bot.search_cache import SearchCache, search_cache, search_key
+from discord_music_bot.ytdlp_pool import ydl_pool
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Any
 
 class SourceService:
     """Сервіс для отримання метаданих пісень та плейлистів за допомогою yt-dlp."""
 
-    def __init__(self, loop=None):
+    def __init__(
+        self,
+        scheduler: Optional[ExtractionScheduler] = None,
+        cache: Optional[SearchCache] = None,
+    ):
         self.logger = logging.getLogger('MusicBot.SourceService')
         self.light_ydl_opts = consts.YTDL_OPTIONS_LIGHT
-        self._loop = loop
-
-    def _get_loop(self):
-        if self._loop:
-            return self._loop
-        try:
-            return asyncio.get_running_loop()
-        except RuntimeError:
-            return asyncio.get_event_loop()
+        # Блокуючі виклики йдуть у пул екстракцій, а не в спільний пул процесу
+        self._scheduler = scheduler or extraction_scheduler
+        self._search_cache = cache if cache is not None else search_cache
+        self._revalidating: Dict[str, asyncio.Task] = {}
+        self._metadata_slots = asyncio.Semaphore(consts.PLAYLIST_METADATA_WORKERS)
 
     async def get_video_info(self, url: str) -> Optional[Dict[str, Any]]:
         """Отримує метадані для одного відео/треку за URL або запитом."""
@@ -34,9 +44,7 @@ class SourceService:
         # Для YouTube посилань: спочатку пробуємо oEmbed (ніколи не блокується на cloud IP, працює за 0.1с)
         if is_youtube:
             try:
-                title = await self._get_loop().run_in_executor(
-                    None, lambda: fetch_youtube_oembed(url)
-                )
+                title = await self._scheduler.run(fetch_youtube_oembed, url)
                 if title:
                     self.logger.info(f"oEmbed metadata resolved for YouTube URL: '{title}'")
                     return {
@@ -59,36 +67,64 @@ class SourceService:
 
         try:
             # Виконуємо синхронний код yt_dlp в окремому потоці
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = await self._get_loop().run_in_executor(None, lambda: ydl.extract_info(search_url, download=False))
-                if not info:
+            info = await self._scheduler.run(self._extract_info, ydl_opts, search_url)
+            if not info:
+                return None
+
+            # Якщо це пошук, беремо перший результат
+            if 'entries' in info:
+                if not info['entries']:
                     return None
+                info = info['entries'][0]
 
-                # Якщо це пошук, беремо перший результат
-                if 'entries' in info:
-                    if not info['entries']:
-                        return None
-                    info = info['entries'][0]
-
-                return {
-                    'title': info.get('title') or info.get('fulltitle') or 'Unknown',
-                    'url': info.get('webpage_url', url) or info.get('url', url),
-                    'duration': info.get('duration'),
-                    'thumbnail': info.get('thumbnail')
-                }
+            return {
+                'title': info.get('title') or info.get('fulltitle') or 'Unknown',
+                'url': info.get('webpage_url', url) or info.get('url', url),
+                'duration': info.get('duration'),
+                'thumbnail': info.get('thumbnail')
+            }
         except Exception as e:
             self.logger.error(f"Error extracting info for {url}: {e}")
             return None
 
 
     async def search_videos(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
-        """Шукає кілька відео за текстовим запитом (для меню вибору)."""
+        """Шукає кілька відео за текстовим запитом (для меню вибору).
+        Повторні запити віддаються з кешу; застарілий запис оновлюється у фоні."""
+        key = search_key(query, max_results)
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            results, fresh = cached
+            if not fresh:
+                self._revalidate(key, query, max_results)
+            return results
+
+        results = await self._search_uncached(query, max_results)
+        self._search_cache.put(key, results)
+        return results
 
+    def _revalidate(self, key: str, query: str, max_results: int) -> None:
+        """Фонове оновлення застарілого запису (одне на ключ)."""
+        if key in self._revalidating:
+            return
+
+        async def refresh():
+            try:
+                results = await self._search_uncached(query, max_results, priority=PRIORITY_BACKGROUND)
+                self._search_cache.put(key, results)
+            finally:
+                self._revalidating.pop(key, None)
+
+        self._revalidating[key] = asyncio.get_running_loop().create_task(refresh())
+
+    async def _search_uncached(
+        self, query: str, max_results: int, priority: int = PRIORITY_INTERACTIVE
+    ) -> List[Dict[str, Any]]:
         # Спочатку пробуємо Piped /search — обхід блокування YouTube datacenter IP
         if _piped_first_enabled():
             try:
-                piped_results = await self._get_loop().run_in_executor(
-                    None, lambda: fetch_piped_search(query, max_results)
+                piped_results = await self._scheduler.run(
+                    fetch_piped_search, query, max_results, priority=priority
                 )
                 if piped_results:
                     return piped_results
@@ -100,23 +136,22 @@ class SourceService:
         search_url = f"ytsearch{max_results}:{query}"
         try:
             ydl_opts = apply_ytdlp_python_opts(self.light_ydl_opts.copy())
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = await self._get_loop().run_in_executor(None, lambda: ydl.extract_info(search_url, download=False))
-                
-                if not info or 'entries' not in info:
-                    return []
-                    
-                results = []
-                for entry in info['entries']:
-                    if entry:
-                        results.append({
-                            'title': entry.get('title', 'Unknown'),
-                            'url': entry.get('webpage_url', entry.get('url', '')),
-                            'webpage_url': entry.get('webpage_url', entry.get('url', '')),
-                            'duration': entry.get('duration'),
-                            'thumbnail': entry.get('thumbnail')
-                        })
-                return results
+            info = await self._scheduler.run(self._extract_info, ydl_opts, search_url, priority=priority)
+
+            if not info or 'entries' not in info:
+                return []
+
+            results = []
+            for entry in info['entries']:
+                if entry:
+                    results.append({
+                        'title': entry.get('title', 'Unknown'),
+                        'url': entry.get('webpage_url', entry.get('url', '')),
+                        'webpage_url': entry.get('webpage_url', entry.get('url', '')),
+                        'duration': entry.get('duration'),
+                        'thumbnail': entry.get('thumbnail')
+                    })
+            return results
         except Exception as e:
             self.logger.error(f"Error searching videos for {query}: {e}")
             return []
@@ -125,48 +160,139 @@ class SourceService:
 
     async def extract_playlist(self, url: str) -> Tuple[Optional[str], List[Dict[str, Any]]]:
         """Витягує список треків з плейлиста (тільки метадані, швидко)."""
-        # SoundCloud не підтримує extract_flat — використовуємо повну екстракцію
-        is_soundcloud = 'soundcloud.com' in url.lower()
-        
+        playlist_title, tracks = None, []
+        async for title, batch in self.iter_playlist(url):
+            playlist_title = title
+            tracks.extend(batch)
+        return playlist_title, tracks
+
+    async def iter_playlist(
+        self, url: str, *, limit: Optional[int] = None
+    ) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Потоково віддає (назва плейлиста, пачка треків).
+
+        Записи не розв'язуються (process=False): yt-dlp підтягує наступну сторінку
+        плейлиста лише тоді, коли ітерація до неї доходить. Перша пачка —
+        PLAYLIST_FIRST_BATCH треків, щоб відтворення почалося якнайшвидше, далі —
+        по PLAYLIST_BATCH_SIZE. Назви й тривалості, яких бракує (SoundCloud),
+        доповнює fill_playlist_metadata."""
         ydl_opts = {
             'quiet': True,
             'no_warnings': True,
-            'extract_flat': False if is_soundcloud else 'in_playlist',
+            'extract_flat': 'in_playlist',
             'skip_download': True,
             'ignoreerrors': True,
         }
-        
         try:
             ydl_opts = apply_ytdlp_python_opts(ydl_opts)
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = await self._get_loop().run_in_executor(None, lambda: ydl.extract_info(url, download=False))
-                
-                if not info or 'entries' not in info:
-                    return None, []
-
-                playlist_title = info.get('title', 'Плейлист')
-                tracks = []
-                
-                for entry in info['entries']:
-                    if not entry:
-                        continue
-                        
-                    track_url = entry.get('url') or entry.get('webpage_url', '')
-                    if not track_url:
-                        continue
-                        
-                    # Для flat extraction URL може бути ID — конвертуємо у повний URL
-                    if not track_url.startswith('http'):
-                        track_url = f"https://www.youtube.com/watch?v={track_url}"
-                        
-                    tracks.append({
-                        'title': entry.get('title', 'Unknown'),
-                        'url': track_url,
-                        'duration': entry.get('duration'),
-                        'thumbnail': None,
-                    })
-                    
-                return playlist_title, tracks
+            # Екземпляр зайнятий до кінця ітерації: записи тягнуться з нього ліниво
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                info = await self._scheduler.run(self._playlist_info, ydl, url)
+                if not info or not info.get('entries'):
+                    return
+
+                playlist_title = info.get('title') or 'Плейлист'
+                entries = iter(info['entries'])
+                remaining = limit if limit is not None else float('inf')
+                batch_size = consts.PLAYLIST_FIRST_BATCH
+                # Перша пачка потрібна для відтворення; решта — фонове завантаження
+                priority = PRIORITY_INTERACTIVE
+                while remaining > 0:
+                    raw = await self._scheduler.run(
+                        lambda n=batch_size: list(itertools.islice(entries, n)), priority=priority
+                    )
+                    if not raw:
+                        return
+                    tracks = [t for t in map(self._playlist_track, raw) if t]
+                    if len(tracks) > remaining:
+                        tracks = tracks[:int(remaining)]
+                    if tracks:
+                        remaining -= len(tracks)
+                        yield playlist_title, tracks
+                    batch_size = consts.PLAYLIST_BATCH_SIZE
+                    priority = PRIORITY_BACKGROUND
         except Exception as e:
             self.logger.error(f"Error extracting playlist {url}: {e}")
-            return None, []
+
+    @staticmethod
+    def _extract_info(ydl_opts: Dict[str, Any], url: str) -> Optional[Dict[str, Any]]:
+        with ydl_pool.checkout(ydl_opts) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    @staticmethod
+    def _playlist_info(ydl, url: str) -> Optional[Dict[str, Any]]:
+        """Плейлист без обробки записів; посилання-перенаправлення (watch?v=…&list=…) розкриваються."""
+        info = ydl.extract_info(url, download=False, process=False)
+        for _ in range(3):
+            if not info or info.get('_type') not in ('url', 'url_transparent') or not info.get('url'):
+                break
+            info = ydl.extract_info(info['url'], download=False, ie_key=info.get('ie_key'), process=False)
+        return info
+
+    @staticmethod
+    def _playlist_track(entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if not entry:
+            return None
+        track_url = entry.get('url') or entry.get('webpage_url', '')
+        if not track_url:
+            return None
+
+        # Для flat extraction URL може бути ID — конвертуємо у повний URL
+        if not track_url.startswith('http'):
+            track_url = f"https://www.youtube.com/watch?v={track_url}"
+
+        video_id = youtube_video_id(track_url)
+        thumbnail = entry.get('thumbnail')
+        if not thumbnail and video_id:
+            thumbnail = f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+        return {
+            'title': entry.get('title') or _title_from_url(track_url),
+            'url': track_url,
+            'duration': entry.get('duration'),
+            'thumbnail': thumbnail,
+        }
+
+    async def fill_playlist_metadata(self, tracks: List[Dict[str, Any]]) -> int:
+        """Доповнює (in place) треки плейлиста без тривалості: назва, тривалість, обкладинка.
+        Одночасно йде не більше PLAYLIST_METADATA_WORKERS екстракцій на весь бот.
+        Повертає кількість оновлених треків."""
+        async def fill(track: Dict[str, Any]) -> bool:
+            async with self._metadata_slots:
+                meta = await self._scheduler.run(self._entry_metadata, track['url'], priority=PRIORITY_BACKGROUND)
+            if not meta:
+                return False
+            for key in ('title', 'duration', 'thumbnail'):
+                if meta.get(key):
+                    track[key] = meta[key]
+            return True
+
+        pending = [t for t in tracks if t.get('duration') is None and t.get('url')]
+        if not pending:
+            return 0
+        results = await asyncio.gather(*(fill(t) for t in pending), return_exceptions=True)
+        return sum(1 for result in results if result is True)
+
+    def _entry_metadata(self, url: str) -> Optional[Dict[str, Any]]:
+        ydl_opts = apply_ytdlp_python_opts(self.light_ydl_opts.copy())
+        ydl_opts['extract_flat'] = False
+        ydl_opts['noplaylist'] = True
+        try:
+            info = self._extract_info(ydl_opts, url)
+        except Exception as e:
+            self.logger.warning(f"Playlist entry metadata failed for {url}: {e}")
+            return None
+        if not info:
+            return None
+        return {
+            'title': info.get('title') or info.get('fulltitle'),
+            'duration': info.get('duration'),
+            'thumbnail': info.get('thumbnail'),
+        }
+
+
+def _title_from_url(url: str) -> str:
+    """Тимчасова назва з посилання (soundcloud.com/artist/track-name → «artist — track name»)."""
+    path = [part for part in urlparse(url).path.split('/') if part]
+    if len(path) >= 2 and 'soundcloud.com' in url:
+        return f"{path[0]} — {path[-1].replace('-', ' ')}"
+    return 'Unknown'
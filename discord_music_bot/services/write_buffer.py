@@ -0,0 +1,238 @@
+"""
+Write-behind буфер перед MusicRepository.
+
+Фонові записи (стан гільдії, черга, історія, події Automix/DJ) не запускаються
+окремими задачами, а потрапляють в упорядкований буфер, який кожні
+WRITE_BUFFER_FLUSH_INTERVAL секунд скидається однією транзакцією.
+
+Як і `asyncio.ensure_future`, буфер приймає вже створену корутину репозиторію:
+- `write(key, coro)` — запис зі заміною: усі ще не скинуті записи з тим самим
+  ключем відкидаються, а новий займає місце найстарішого з них.
+- `append(key, coro)` — дельта/подія: завжди виконується, але її може поглинути
+  наступний `write` з тим самим ключем (напр. знімок черги).
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from discord_music_bot import consts
+from discord_music_bot.repository import MusicRepository
+
+logger = logging.getLogger('MusicBot.WriteBuffer')
+
+
+@dataclass
+class _PendingWrite:
+    key: Optional[Hashable]
+    coro: Awaitable[Any]
+    queued_at: float = field(default_factory=time.monotonic)
+
+    def discard(self) -> None:
+        close = getattr(self.coro, "close", None)
+        if close is not None:
+            close()
+
+
+class WriteBehindBuffer:
+    """Коалесціюючий буфер фонових записів з пакетним flush та back-pressure."""
+
+    def __init__(
+        self,
+        repository: MusicRepository,
+        flush_interval: float = consts.WRITE_BUFFER_FLUSH_INTERVAL,
+        max_pending: int = consts.WRITE_BUFFER_MAX_PENDING,
+    ):
+        self._repo = repository
+        self.flush_interval = flush_interval
+        self.max_pending = max(1, max_pending)
+        self._pending: List[_PendingWrite] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._kick: Optional[asyncio.Event] = None
+        self._drained: Optional[asyncio.Event] = None
+        self._closed = False
+        self._failure_listeners: List[Callable[[Hashable], None]] = []
+        # Метрики
+        self.max_depth = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.max_queue_wait = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """Знімок метрик буфера (глибина черги, затримки flush у секундах)."""
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+            "max_queue_wait": self.max_queue_wait,
+        }
+
+    def add_failure_listener(self, callback: Callable[[Hashable], None]) -> None:
+        """
+        Реєструє callback(key) для ключів пакета, транзакцію якого відкочено:
+        записи з цими ключами не потрапили в БД, навіть ті, що вже виконались.
+        """
+        self._failure_listeners.append(callback)
+
+    # ── Submit ───────────────────────────────────────────────────
+
+    def write(self, key: Hashable, coro: Awaitable[Any]) -> None:
+        """Запис зі заміною: залишається лише останній за ключем."""
+        entry = _PendingWrite(key, coro)
+        slot = None
+        kept = []
+        for pending in self._pending:
+            if pending.key == key:
+                if slot is None:
+                    slot = len(kept)
+                    entry.queued_at = pending.queued_at
+                pending.discard()
+                self.coalesced += 1
+                continue
+            kept.append(pending)
+        if slot is None:
+            kept.append(entry)
+        else:
+            kept.insert(slot, entry)
+        self._pending = kept
+        self._submitted()
+
+    def append(self, key: Optional[Hashable], coro: Awaitable[Any]) -> None:
+        """Дельта або подія: виконується в порядку надходження."""
+        self._pending.append(_PendingWrite(key, coro))
+        self._submitted()
+
+    async def backpressure(self) -> None:
+        """Чекає, поки черга записів не опуститься нижче max_pending."""
+        while self.depth >= self.max_pending and self._flush_task is not None:
+            if self._drained is None:
+                self._drained = asyncio.Event()
+            await self._drained.wait()
+
+    def _submitted(self) -> None:
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        if self._closed:
+            logger.warning("Запис у закритий write-behind буфер — буде виконано лише при явному flush()")
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Немає event loop (синхронний код/тести) — запис дочекається наступного flush
+            return
+        if self._flush_task is None or self._flush_task.done() or self._flush_task.get_loop() is not loop:
+            self._kick = asyncio.Event()
+            self._flush_task = loop.create_task(self._flush_later())
+        if self.depth >= self.max_pending and self._kick is not None:
+            self._kick.set()
+
+    # ── Flush ────────────────────────────────────────────────────
+
+    async def _flush_later(self) -> None:
+        try:
+            while self._pending:
+                if self.depth < self.max_pending:
+                    try:
+                        await asyncio.wait_for(self._kick.wait(), timeout=self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                self._kick.clear()
+                await self.flush()
+        finally:
+            self._flush_task = None
+            self._wake_drained()
+
+    async def flush(self) -> None:
+        """Скидає всі накопичені записи в БД однією транзакцією."""
+        # Пакети застосовуються строго по черзі, навіть якщо flush() викликали паралельно
+        async with self._lock():
+            entries, self._pending = self._pending, []
+            if not entries:
+                return
+            self._wake_drained()
+            await self._apply(entries)
+
+    async def _apply(self, entries: List[_PendingWrite]) -> None:
+        start = time.monotonic()
+        self.max_queue_wait = max(self.max_queue_wait, start - min(e.queued_at for e in entries))
+        started = ok = failed = 0
+        try:
+            async with self._repo.batch():
+                for entry in entries:
+                    started += 1
+                    try:
+                        if inspect.isawaitable(entry.coro):
+                            await entry.coro
+                        ok += 1
+                    except Exception as e:
+                        failed += 1
+                        logger.error(f"Помилка фонового запису {entry.key!r}: {e}")
+            self.flushed += ok
+            self.failed += failed
+        except Exception as e:
+            # Транзакція не закомічена — втрачено весь пакет
+            for entry in entries[started:]:
+                entry.discard()
+            self.failed += len(entries)
+            logger.error(f"Не вдалося скинути {len(entries)} записів у БД: {e}")
+            self._notify_lost(dict.fromkeys(entry.key for entry in entries if entry.key is not None))
+        self.batches += 1
+        self.last_flush_latency = time.monotonic() - start
+        self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+
+    def _notify_lost(self, keys) -> None:
+        for key in keys:
+            for callback in self._failure_listeners:
+                try:
+                    callback(key)
+                except Exception as e:
+                    logger.error(f"Помилка слухача втрачених записів для {key!r}: {e}")
+
+    def _lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._flush_lock is None or self._flush_lock_loop is not loop:
+            self._flush_lock = asyncio.Lock()
+            self._flush_lock_loop = loop
+        return self._flush_lock
+
+    async def close(self) -> None:
+        """Зупиняє фоновий flush і скидає все, що залишилося (shutdown)."""
+        self._closed = True
+        task = self._flush_task
+        if (
+            task is not None
+            and task is not asyncio.current_task()
+            and task.get_loop() is asyncio.get_running_loop()
+        ):
+            if self._kick is not None:
+                self._kick.set()
+            try:
+                await task
+            except Exception as e:
+                logger.warning(f"Фоновий flush завершився з помилкою: {e}")
+        await self.flush()
+
+    def _wake_drained(self) -> None:
+        if self._drained is not None:
+            self._drained.set()
+            self._drained = None
@@ -0,0 +1,129 @@
+"""
+Кеш розв'язаних media URL (Piped / googlevideo) за YouTube video ID.
+
+Прямі URL містять `expire=<unix time>` і живуть годинами, тож повторні
+відтворення (історія, Previous, Automix, auto-resume) не потребують нової
+екстракції. Запис вважається простроченим за STREAM_CACHE_SAFETY_MARGIN
+секунд до `expire`; розмір кешу обмежений LRU.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from discord_music_bot import consts
+from discord_music_bot.track_catalog import youtube_video_id
+
+logger = logging.getLogger('MusicBot.StreamCache')
+
+# googlevideo manifest/HLS URL містять expire у шляху: /expire/1700000000/
+_PATH_EXPIRE_RE = re.compile(r"/expire/(\d+)")
+
+
+def cache_key(page_url: str) -> Optional[str]:
+    """Нормалізований ключ: video ID (різні форми youtube.com / youtu.be дають один ключ)."""
+    return youtube_video_id(page_url or "")
+
+
+def parse_expiry(stream_url: str) -> Optional[float]:
+    """Повертає unix-час `expire` з media URL або None, якщо параметра немає."""
+    try:
+        parsed = urlparse(stream_url)
+        values = parse_qs(parsed.query).get("expire")
+        if values:
+            return float(values[0])
+        match = _PATH_EXPIRE_RE.search(parsed.path)
+        if match:
+            return float(match.group(1))
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class StreamUrlCache:
+    """LRU-кеш stream URL з урахуванням часу життя підписаних посилань."""
+
+    def __init__(
+        self,
+        max_entries: int = consts.STREAM_CACHE_MAX_ENTRIES,
+        safety_margin: float = consts.STREAM_CACHE_SAFETY_MARGIN,
+        default_ttl: float = consts.STREAM_CACHE_DEFAULT_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.safety_margin = safety_margin
+        self.default_ttl = default_ttl
+        self._clock = clock
+        # key -> (stream_url, info, valid_until)
+        self._entries: "OrderedDict[str, Tuple[str, Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, page_url: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        key = cache_key(page_url)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stream_url, info, valid_until = entry
+            if valid_until <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return stream_url, dict(info)
+
+    def put(self, page_url: str, stream_url: str, info: Optional[Dict[str, Any]] = None) -> None:
+        key = cache_key(page_url)
+        if key is None or not stream_url:
+            return
+        now = self._clock()
+        expires = parse_expiry(stream_url)
+        valid_until = (expires - self.safety_margin) if expires else (now + self.default_ttl)
+        if valid_until <= now:
+            return
+        with self._lock:
+            self._entries[key] = (stream_url, dict(info or {}), valid_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, page_url: str) -> None:
+        key = cache_key(page_url)
+        if key is None:
+            return
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+                logger.info(f"Stream URL для {key} видалено з кешу")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+stream_url_cache = StreamUrlCache()
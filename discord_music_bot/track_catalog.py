@@ -0,0 +1,51 @@
+"""
+Каталог метаданих треків (таблиця `tracks`).
+
+Назва, тривалість і обкладинка зберігаються один раз на трек, а
+history_tracks / queue_tracks посилаються на нього цілим track_id. Ключ
+каталогу — канонічна форма URL: різні посилання на одне YouTube-відео
+(youtube.com/watch, youtu.be, embed, з таймкодом чи плейлистом) дають
+один рядок, тож історія й топ-треки не дробляться за формою посилання.
+"""
+
+import re
+from typing import Any, Dict, Optional, Tuple
+
+UNKNOWN_TITLE = "Unknown"
+
+_YOUTUBE_ID_RE = re.compile(r"(?:youtube\.com/watch\?.*v=|youtu\.be/|youtube\.com/embed/)([A-Za-z0-9_-]{11})")
+
+
+def youtube_video_id(url: Optional[str]) -> Optional[str]:
+    """11-символьний ID відео з youtube.com/watch, youtu.be або embed-посилання."""
+    if not url:
+        return None
+    match = _YOUTUBE_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def canonical_track_key(url: Optional[str]) -> str:
+    """`youtube:<video id>` для YouTube, інакше URL без фрагмента (#...)."""
+    url = (url or "").strip()
+    video_id = youtube_video_id(url)
+    if video_id:
+        return f"youtube:{video_id}"
+    return url.split("#", 1)[0]
+
+
+def track_url(track: Dict[str, Any]) -> str:
+    return track.get("url") or track.get("webpage_url") or ""
+
+
+def catalog_row(track: Dict[str, Any]) -> Tuple[str, str, Optional[str], Optional[int], Optional[str]]:
+    """(canonical, url, title, duration, thumbnail) для upsert у `tracks`."""
+    url = track_url(track)
+    title = track.get("title")
+    duration = track.get("duration")
+    return (
+        canonical_track_key(url),
+        url,
+        title if title and title != UNKNOWN_TITLE else None,
+        int(duration) if duration is not None else None,
+        track.get("thumbnail") or None,
+    )
@@ -16,4 +16,14 @@ def format_duration(duration_seconds):
         else:
             return f"{minutes:02d}:{seconds:02d}"
     except (ValueError, TypeError):
-        return "∞"
\ No newline at end of file
+        return "∞"
+
+def parse_timestamp(text):
+    """Розбирає позицію `90`, `1:30` або `1:02:03` у секунди; None — невірний формат."""
+    parts = str(text or "").strip().split(":")
+    if not 1 <= len(parts) <= 3 or not all(p.strip().isdigit() for p in parts):
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return seconds
@@ -73,7 +73,7 @@ class _MixSettingsView(discord.ui.View):
             "🎛️ **Mix settings**\n"
             f"• Automix: **{state}**\n"
             f"• Mode: **{mode}**\n"
-            f"• Fade-out: **{fade:.1f}s**\n"
+            f"• Crossfade: **{fade:.1f}s**\n"
             f"• DJ: **{dj_state}** ({dj_persona})"
         )
 
@@ -130,7 +130,9 @@ class _MixSettingsView(discord.ui.View):
             },
         )
         self.cog._automix_settings_cache[guild_id]["enabled"] = new_value
-        asyncio.ensure_future(self.cog.repository.set_automix_enabled(guild_id, new_value))
+        self.cog.write_buffer.write(
+            ("automix_enabled", guild_id), self.cog.repository.set_automix_enabled(guild_id, new_value)
+        )
 
         button.style = discord.ButtonStyle.success if new_value else discord.ButtonStyle.danger
         button.label = "Automix ON" if new_value else "Automix OFF"
@@ -154,7 +156,7 @@ class _MixSettingsView(discord.ui.View):
         cur = self.cog._dj_settings_cache[guild_id]["enabled"]
         new_value = not cur
         self.cog._dj_settings_cache[guild_id]["enabled"] = new_value
-        asyncio.ensure_future(self.cog.repository.set_dj_enabled(guild_id, new_value))
+        self.cog.write_buffer.write(("dj_enabled", guild_id), self.cog.repository.set_dj_enabled(guild_id, new_value))
         button.style = discord.ButtonStyle.success if new_value else discord.ButtonStyle.danger
         button.label = "DJ ON" if new_value else "DJ OFF"
         await i.response.edit_message(content=self._status_text(), view=self)
@@ -190,7 +192,7 @@ class _MixSettingsView(discord.ui.View):
         )
         self.cog._automix_settings_cache[guild_id]["strategy"] = val
         self.cog._automix_strategy_mode[guild_id] = val
-        asyncio.ensure_future(self.cog.repository.set_automix_strategy(guild_id, val))
+        self.cog.write_buffer.write(("automix_strategy", guild_id), self.cog.repository.set_automix_strategy(guild_id, val))
         await i.response.edit_message(content=self._status_text(), view=self)
         await self._bump_player(i)
         await i.followup.send(f"🎛️ Automix режим: **{val}**", ephemeral=True)
@@ -214,13 +216,13 @@ class _MixSettingsView(discord.ui.View):
         guild_id = i.guild.id
         await self.cog._ensure_dj_state_loaded(guild_id)
         self.cog._dj_settings_cache[guild_id]["persona"] = val
-        asyncio.ensure_future(self.cog.repository.set_dj_persona(guild_id, val))
+        self.cog.write_buffer.write(("dj_persona", guild_id), self.cog.repository.set_dj_persona(guild_id, val))
         await i.response.edit_message(content=self._status_text(), view=self)
         await self._bump_player(i)
         await i.followup.send(f"🎙️ DJ персона: **{val}**", ephemeral=True)
 
     @discord.ui.select(
-        placeholder="Fade-out (секунди)",
+        placeholder="Crossfade (секунди)",
         min_values=1,
         max_values=1,
         options=[
@@ -244,9 +246,9 @@ class _MixSettingsView(discord.ui.View):
         await i.response.edit_message(content=self._status_text(), view=self)
         await self._bump_player(i)
         if s <= 0:
-            await i.followup.send("🔇 Fade-out вимкнено.", ephemeral=True)
+            await i.followup.send("🔇 Crossfade вимкнено.", ephemeral=True)
         else:
-            await i.followup.send(f"🎚️ Fade-out: **{s:.1f}с**", ephemeral=True)
+            await i.followup.send(f"🎚️ Crossfade: **{s:.1f}с**", ephemeral=True)
 
     @discord.ui.button(
         label="Закрити",
@@ -396,7 +398,7 @@ class MusicControls(discord.ui.View):
 
     @discord.ui.button(label="Mix", style=discord.ButtonStyle.secondary, emoji="🎛️", custom_id="mix_settings", row=1)
     async def mix_settings_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Швидкі налаштування Automix + fade-out без slash-команд."""
+        """Швидкі налаштування Automix + crossfade без slash-команд."""
         mix_view = _MixSettingsView(self.cog, interaction.guild.id, self)
         await self.cog._ensure_dj_state_loaded(interaction.guild.id)
         await interaction.response.send_message(
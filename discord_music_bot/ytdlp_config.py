@@ -3,17 +3,17 @@
 from __future__ import annotations
 
 import base64
-import json
 import logging
 import os
-import re
 import shutil
+import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
-from urllib.error import URLError
-from urllib.request import Request, urlopen
 
-import yt_dlp
+from discord_music_bot.piped_client import piped_client
+from discord_music_bot.profile_selector import format_label, profile_selector
+from discord_music_bot.track_catalog import youtube_video_id
+from discord_music_bot.ytdlp_pool import ydl_pool
 
 logger = logging.getLogger(__name__)
 
@@ -198,16 +198,6 @@ def apply_ytdlp_python_opts(
     return merged
 
 
-def _youtube_video_id(url: str) -> Optional[str]:
-    if not url:
-        return None
-    match = re.search(
-        r"(?:youtube\.com/watch\?.*v=|youtu\.be/|youtube\.com/embed/)([A-Za-z0-9_-]{11})",
-        url,
-    )
-    return match.group(1) if match else None
-
-
 def _piped_first_enabled() -> bool:
     return os.getenv("YTDLP_PIPED_FIRST", "1").strip().lower() not in ("0", "false", "no")
 
@@ -243,50 +233,66 @@ def _pick_piped_stream_url(data: Dict[str, Any]) -> Optional[str]:
     return None
 
 
-def fetch_piped_stream(page_url: str) -> Tuple[Optional[str], Dict[str, Any]]:
-    """Отримати media URL через Piped API (не залежить від IP Render)."""
-    video_id = _youtube_video_id(page_url)
-    if not video_id:
-        return None, {}
-
+def _piped_instances() -> List[str]:
     instances: List[str] = []
     custom = os.getenv("PIPED_API_URL", "").strip().rstrip("/")
     if custom:
         instances.append(custom)
     instances.extend(PIPED_INSTANCES)
+    return instances
 
-    headers = {"User-Agent": "Mozilla/5.0 (compatible; discord-music-bot/1.0)"}
 
-    for base in instances:
-        api_url = f"{base}/streams/{video_id}"
-        try:
-            req = Request(api_url, headers=headers)
-            with urlopen(req, timeout=5) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
-
-            meta: Dict[str, Any] = {
-                "title": data.get("title"),
-                "webpage_url": page_url,
-                "duration": data.get("duration"),
-                "thumbnail": data.get("thumbnailUrl"),
-            }
-
-            stream_url = _pick_piped_stream_url(data)
-            if stream_url:
-                logger.info(f"Stream URL resolved via Piped ({base})")
-                return stream_url, meta
+def fetch_piped_stream(page_url: str) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Отримати media URL через Piped API (не залежить від IP Render)."""
+    video_id = youtube_video_id(page_url)
+    if not video_id:
+        return None, {}
 
-            logger.warning(
-                f"Piped ({base}): no playable streams for {video_id} "
-                f"(audio={len(data.get('audioStreams') or [])}, "
-                f"video={len(data.get('videoStreams') or [])})"
-            )
-        except (URLError, TimeoutError, json.JSONDecodeError, KeyError) as exc:
-            logger.warning(f"Piped instance {base} failed: {exc}")
-        except Exception as exc:
-            logger.warning(f"Piped instance {base} failed: {exc}")
+    def playable(data: Any) -> bool:
+        if isinstance(data, dict) and _pick_piped_stream_url(data):
+            return True
+        logger.warning(f"Piped: no playable streams for {video_id}")
+        return False
+
+    # Інстанси — за здоров'ям, повільний підстраховується паралельним запитом (див. piped_client)
+    base, data = piped_client.get_json(_piped_instances(), f"/streams/{video_id}", accept=playable)
+    if base is None:
+        return None, {}
+
+    meta: Dict[str, Any] = {
+        "title": data.get("title"),
+        "webpage_url": page_url,
+        "duration": data.get("duration"),
+        "thumbnail": data.get("thumbnailUrl"),
+    }
+    logger.info(f"Stream URL resolved via Piped ({base})")
+    return _pick_piped_stream_url(data), meta
 
-    return None, {}
+
+def _piped_search_results(data: Any, max_results: int) -> List[Dict[str, Any]]:
+    items = (data.get("items") if isinstance(data, dict) else None) or []
+    results: List[Dict[str, Any]] = []
+    for item in items:
+        if item.get("type") != "stream":
+            continue
+        raw_url = item.get("url", "")
+        if raw_url.startswith("/watch"):
+            page_url = f"https://www.youtube.com{raw_url}"
+        elif raw_url.startswith("http"):
+            page_url = raw_url
+        else:
+            continue
+        duration = item.get("duration")
+        results.append({
+            "title": item.get("title", "Unknown"),
+            "url": page_url,
+            "webpage_url": page_url,
+            "duration": duration if isinstance(duration, (int, float)) else None,
+            "thumbnail": item.get("thumbnail"),
+        })
+        if len(results) >= max_results:
+            break
+    return results
 
 
 def fetch_piped_search(
@@ -297,60 +303,21 @@ def fetch_piped_search(
     Повертає список dict з ключами: title, url, duration, thumbnail.
     Порожній список якщо Piped недоступний — caller має fallback на yt-dlp.
     """
-    instances: List[str] = []
-    custom = os.getenv("PIPED_API_URL", "").strip().rstrip("/")
-    if custom:
-        instances.append(custom)
-    instances.extend(PIPED_INSTANCES)
-
-    headers = {"User-Agent": "Mozilla/5.0 (compatible; discord-music-bot/1.0)"}
-
     from urllib.parse import urlencode
     params = urlencode({"q": query, "filter": "videos"})
 
-    for base in instances:
-        api_url = f"{base}/search?{params}"
-        try:
-            req = Request(api_url, headers=headers)
-            with urlopen(req, timeout=5) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
-
-            items = data.get("items") or []
-            results: List[Dict[str, Any]] = []
-            for item in items:
-                if item.get("type") != "stream":
-                    continue
-                raw_url = item.get("url", "")
-                if raw_url.startswith("/watch"):
-                    page_url = f"https://www.youtube.com{raw_url}"
-                elif raw_url.startswith("http"):
-                    page_url = raw_url
-                else:
-                    continue
-                duration = item.get("duration")
-                results.append({
-                    "title": item.get("title", "Unknown"),
-                    "url": page_url,
-                    "webpage_url": page_url,
-                    "duration": duration if isinstance(duration, (int, float)) else None,
-                    "thumbnail": item.get("thumbnail"),
-                })
-                if len(results) >= max_results:
-                    break
-
-            if results:
-                logger.info(
-                    f"Piped search OK ({base}): {len(results)} results for '{query}'"
-                )
-                return results
-
-            logger.warning(f"Piped search ({base}): 0 results for '{query}'")
-        except (URLError, TimeoutError, json.JSONDecodeError, KeyError) as exc:
-            logger.warning(f"Piped search {base} failed: {exc}")
-        except Exception as exc:
-            logger.warning(f"Piped search {base} failed: {exc}")
+    def has_results(data: Any) -> bool:
+        if _piped_search_results(data, 1):
+            return True
+        logger.warning(f"Piped search: 0 results for '{query}'")
+        return False
 
-    return []
+    base, data = piped_client.get_json(_piped_instances(), f"/search?{params}", accept=has_results)
+    if base is None:
+        return []
+    results = _piped_search_results(data, max_results)
+    logger.info(f"Piped search OK ({base}): {len(results)} results for '{query}'")
+    return results
 
 
 def _pick_stream_url(info: Dict[str, Any]) -> Optional[str]:
@@ -404,7 +371,7 @@ def fetch_youtube_oembed(url: str) -> Optional[str]:
 
 def extract_stream_url(page_url: str) -> Tuple[Optional[str], Dict[str, Any]]:
     """Resolve a direct media URL for YouTube using player clients (android/web) and Piped fallback."""
-    video_id = _youtube_video_id(page_url)
+    video_id = youtube_video_id(page_url)
     if video_id and _piped_first_enabled():
         logger.info("Trying Piped API first (cloud-friendly)")
         piped_url, piped_meta = fetch_piped_stream(page_url)
@@ -427,45 +394,59 @@ def extract_stream_url(page_url: str) -> Tuple[Optional[str], Dict[str, Any]]:
     if not get_cookies_path():
         profiles = [p for p in profiles if not p[1]]
 
-    for profile_name, use_cookies, clients in profiles:
-        if use_cookies and not get_cookies_path():
+    # Порядок спроб вивчається з історії успіхів (див. profile_selector)
+    blocked = set()
+    attempts = 0
+    for profile_name, use_cookies, clients, fmt in profile_selector.plan(profiles, YTDLP_FORMAT_FALLBACKS):
+        if profile_name in blocked:
             continue
 
-        for fmt in YTDLP_FORMAT_FALLBACKS:
-            opts = dict(base_opts)
-            if fmt:
-                opts["format"] = fmt
-            ydl_opts = apply_ytdlp_python_opts(
-                opts, use_cookies=use_cookies, player_clients=clients
-            )
-            fmt_label = fmt or "manual-pick"
-            try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(page_url, download=False)
-                    if not info:
-                        continue
-                    if "entries" in info:
-                        entries = info.get("entries") or []
-                        if not entries:
-                            continue
-                        info = entries[0]
-                    last_info = info
-                    stream_url = _pick_stream_url(info)
-                    if stream_url:
-                        logger.info(
-                            f"Stream URL resolved (profile={profile_name}, format={fmt_label})"
-                        )
-                        return stream_url, info
+        opts = dict(base_opts)
+        if fmt:
+            opts["format"] = fmt
+        ydl_opts = apply_ytdlp_python_opts(
+            opts, use_cookies=use_cookies, player_clients=clients
+        )
+        fmt_label = format_label(fmt)
+        attempts += 1
+        started = time.monotonic()
+        stream_url, bot_check = None, False
+        try:
+            with ydl_pool.checkout(ydl_opts) as ydl:
+                info = ydl.extract_info(page_url, download=False)
+            if info and "entries" in info:
+                entries = info.get("entries") or []
+                info = entries[0] if entries else None
+            if info:
+                last_info = info
+                stream_url = _pick_stream_url(info)
+                if not stream_url:
                     n_formats = len(info.get("formats") or [])
                     logger.warning(
                         f"Profile '{profile_name}' / '{fmt_label}': "
                         f"no playable URL ({n_formats} formats)"
                     )
-            except Exception as exc:
-                last_error = exc
-                logger.warning(
-                    f"Profile '{profile_name}' / '{fmt_label}' failed: {exc}"
-                )
+        except Exception as exc:
+            last_error = exc
+            # Бот-чек стосується player client, а не формату — інші формати профілю не допоможуть
+            bot_check = _is_bot_check_error(exc)
+            if bot_check:
+                blocked.add(profile_name)
+            logger.warning(
+                f"Profile '{profile_name}' / '{fmt_label}' failed: {exc}"
+            )
+        profile_selector.record(
+            profile_name, fmt, bool(stream_url), time.monotonic() - started, bot_check=bot_check
+        )
+        if stream_url:
+            profile_selector.record_track(attempts)
+            logger.info(
+                f"Stream URL resolved (profile={profile_name}, format={fmt_label}, attempt={attempts})"
+            )
+            return stream_url, info
+
+    if attempts:
+        profile_selector.record_track(attempts)
 
     if video_id:
         logger.info("yt-dlp exhausted — retrying Piped API")
@@ -0,0 +1,142 @@
+"""
+Пул готових екземплярів `yt_dlp.YoutubeDL`, згрупованих за опціями.
+
+Конструктор YoutubeDL щоразу заново реєструє екстрактори, читає cookie-файл
+і налаштовує JS-runtime, а `extract_stream_url` перебирає до 20 комбінацій
+профіль × формат на трек. Пул видає екземпляр у монопольне
+користування (`checkout`) і повертає його після виклику, тож один YoutubeDL
+ніколи не використовується двома потоками одночасно, а кешовані екстрактори
+(наприклад, розібраний player JS YouTube) переживають виклики.
+
+Екземпляр відкривається (`__enter__`) один раз при створенні й закривається
+(`__exit__` — зберігає cookies) при витісненні: після YTDLP_POOL_MAX_USES
+викликів, коли вільних екземплярів для ключа вже YTDLP_POOL_MAX_IDLE або
+коли ключ витіснено з LRU за YTDLP_POOL_MAX_KEYS.
+"""
+
+import copy
+import json
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+import yt_dlp
+
+from discord_music_bot import consts
+
+logger = logging.getLogger('MusicBot.YoutubeDLPool')
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    return repr(value)
+
+
+def options_key(opts: Dict[str, Any]) -> str:
+    """Стабільний ключ для словника опцій (вкладені dict/list/set враховуються)."""
+    return json.dumps(opts, sort_keys=True, default=_json_default)
+
+
+class _Pooled:
+    __slots__ = ("ydl", "uses")
+
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.uses = 0
+
+
+class YoutubeDLPool:
+    """Потокобезпечний пул YoutubeDL з ключем за опціями."""
+
+    def __init__(
+        self,
+        max_idle: int = consts.YTDLP_POOL_MAX_IDLE,
+        max_keys: int = consts.YTDLP_POOL_MAX_KEYS,
+        max_uses: int = consts.YTDLP_POOL_MAX_USES,
+    ):
+        self.max_idle = max(0, max_idle)
+        self.max_keys = max(1, max_keys)
+        self.max_uses = max(1, max_uses)
+        self._idle: "OrderedDict[str, List[_Pooled]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.closed = 0
+
+    @contextmanager
+    def checkout(self, opts: Dict[str, Any]) -> Iterator[Any]:
+        """Видає YoutubeDL для `opts` у монопольне користування до виходу з блоку."""
+        key = options_key(opts)
+        pooled = self._acquire(key)
+        if pooled is None:
+            pooled = _Pooled(self._create(opts))
+        try:
+            yield pooled.ydl
+        finally:
+            pooled.uses += 1
+            self._release(key, pooled)
+
+    def _acquire(self, key: str):
+        with self._lock:
+            idle = self._idle.get(key)
+            if not idle:
+                return None
+            self._idle.move_to_end(key)
+            self.reused += 1
+            return idle.pop()
+
+    def _create(self, opts: Dict[str, Any]):
+        # YoutubeDL може змінювати params на місці — ключ має відповідати оригіналу
+        ydl = yt_dlp.YoutubeDL(copy.deepcopy(opts)).__enter__()
+        with self._lock:
+            self.created += 1
+        return ydl
+
+    def _release(self, key: str, pooled: _Pooled) -> None:
+        evicted: List[_Pooled] = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if pooled.uses >= self.max_uses or len(idle) >= self.max_idle:
+                evicted.append(pooled)
+            else:
+                idle.append(pooled)
+            while len(self._idle) > self.max_keys:
+                _, stale = self._idle.popitem(last=False)
+                evicted.extend(stale)
+            if not idle and key in self._idle:
+                del self._idle[key]
+        for item in evicted:
+            self._close(item)
+
+    def _close(self, pooled: _Pooled) -> None:
+        try:
+            pooled.ydl.__exit__(None, None, None)
+        except Exception as exc:
+            logger.warning(f"Failed to close pooled YoutubeDL: {exc}")
+        with self._lock:
+            self.closed += 1
+
+    def clear(self) -> None:
+        """Закриває всі вільні екземпляри (видані повернуться й будуть закриті пізніше за лімітами)."""
+        with self._lock:
+            stale = [item for items in self._idle.values() for item in items]
+            self._idle.clear()
+        for item in stale:
+            self._close(item)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "keys": len(self._idle),
+                "idle": sum(len(items) for items in self._idle.values()),
+                "created": self.created,
+                "reused": self.reused,
+                "closed": self.closed,
+            }
+
+
+ydl_pool = YoutubeDLPool()
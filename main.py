@@ -10,14 +10,16 @@ import certifi
 import threading
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from discord_music_bot.config import DISCORD_TOKEN # Імпортуємо токен з конфігурації
-from discord_music_bot.healthcheck import start_zombie_cleanup
+from discord_music_bot.instrumentation import instrumentation
+from discord_music_bot.process_supervisor import process_supervisor
 from discord_music_bot.ytdlp_config import init_ytdlp_cookies
 import atexit
 
 
 # --- HTTP Health-сервер для Render (і будь-якого PaaS) ---
 class _HealthHandler(BaseHTTPRequestHandler):
-    """Мінімальний HTTP-хендлер: GET /health → 200 OK, решта → 404."""
+    """Мінімальний HTTP-хендлер: GET /health → 200 OK, GET /metrics → метрики
+    Prometheus (див. discord_music_bot/instrumentation.py), решта → 404."""
 
     def do_GET(self):
         if self.path in ('/', '/health'):
@@ -25,6 +27,13 @@ class _HealthHandler(BaseHTTPRequestHandler):
             self.send_header('Content-Type', 'text/plain')
             self.end_headers()
             self.wfile.write(b'OK')
+        elif self.path == '/metrics':
+            body = instrumentation.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
         else:
             self.send_response(404)
             self.end_headers()
@@ -77,6 +86,7 @@ def check_single_instance():
     atexit.register(cleanup_lock)
 
 check_single_instance()
+atexit.register(process_supervisor.shutdown)  # ffmpeg не переживає процес бота
 start_health_server()  # Render/PaaS: слухаємо на $PORT перед запуском бота
 init_ytdlp_cookies()
 
@@ -156,8 +166,11 @@ async def on_ready():
     # Встановлення статусу бота
     await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name="/play"))
 
-    # Запуск zombie cleanup
-    start_zombie_cleanup(asyncio.get_event_loop(), interval=300)
+    # Нагляд за ffmpeg: reap, idle timeout і ліміти на гільдію (повторний on_ready не дублює)
+    process_supervisor.start()
+
+    # Проба лагу event loop для /metrics (повторний on_ready її не дублює)
+    instrumentation.start_loop_probe()
 
 @bot.event
 async def on_command_error(ctx, error):
@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from discord_music_bot import database
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _close_db_pool():
+    """Закриває глобальний пул з'єднань після всіх тестів (інакше потоки aiosqlite тримають процес)."""
+    yield
+    if database._pool is not None:
+        asyncio.run(database.close_db())
+
+
+@pytest.fixture(autouse=True)
+def _clear_stream_url_cache():
+    """Кеш stream URL глобальний — тести не повинні бачити URL, розв'язані в інших тестах."""
+    from discord_music_bot.stream_cache import stream_url_cache
+    stream_url_cache.clear()
+    yield
+    stream_url_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _clear_ydl_pool():
+    """Пул YoutubeDL глобальний — інакше тест отримав би екземпляр (mock), створений в іншому тесті."""
+    from discord_music_bot.ytdlp_pool import ydl_pool
+    ydl_pool.clear()
+    yield
+    ydl_pool.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_profile_selector():
+    """Статистика профілів екстракції глобальна — порядок спроб не має залежати від інших тестів."""
+    from discord_music_bot.profile_selector import profile_selector
+    profile_selector.reset()
+    yield
+    profile_selector.reset()
+
+
+@pytest.fixture(autouse=True)
+def _clear_search_cache():
+    """Кеш пошуку глобальний — тест не повинен отримати результати, знайдені в іншому тесті."""
+    from discord_music_bot.search_cache import search_cache
+    search_cache.clear()
+    yield
+    search_cache.clear()
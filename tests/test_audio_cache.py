@@ -0,0 +1,104 @@
+import asyncio
+import io
+import json
+import os
+import subprocess
+from unittest.mock import MagicMock, patch
+import pytest
+from discord_music_bot.audio_cache import AudioCache
+from discord_music_bot.audio_source import YTDLSource
+
+IDS = ("AAAAAAAAAAA", "BBBBBBBBBBB", "CCCCCCCCCCC", "DDDDDDDDDDD")
+_popen = subprocess.Popen
+
+
+def _url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def _put(directory, video_id, size=100, mtime=None):
+    path = os.path.join(directory, f"{video_id}.ogg")
+    with open(path, "wb") as f:
+        f.write(b"\x00" * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def _fake_ffmpeg(size):
+    """Popen, що замість ffmpeg пише `size` байт у вихідний файл (останній аргумент)."""
+    return lambda cmd, **kwargs: _popen(
+        ["sh", "-c", f'head -c {size} /dev/zero > "$1"', "sh", cmd[-1]], **kwargs
+    )
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX shell")
+@pytest.mark.asyncio
+async def test_frequent_track_is_transcoded_and_evicts_least_used(tmp_path):
+    directory = str(tmp_path)
+    _put(directory, IDS[0])
+    _put(directory, IDS[1], mtime=1_000_000)  # давно не використовувався
+    _put(directory, IDS[2], mtime=2_000_000)
+    with open(os.path.join(directory, f"{IDS[3]}.ogg.part"), "wb") as f:
+        f.write(b"\x00" * 10)  # недописаний файл попереднього запуску
+    cache = AudioCache(directory, max_bytes=300, min_plays=2)
+    assert cache.load() == 3
+    assert not os.path.exists(os.path.join(directory, f"{IDS[3]}.ogg.part"))
+    assert cache.lookup(_url(IDS[0]))[0] == os.path.join(directory, f"{IDS[0]}.ogg")
+    assert cache.lookup(_url(IDS[3])) is None
+
+    track = {"url": _url(IDS[3]), "title": "New", "duration": 200}
+    with patch("subprocess.Popen", side_effect=_fake_ffmpeg(100)) as popen:
+        assert cache.note_play(track, "https://media/stream") is False  # перше прослуховування
+        assert cache.note_play(dict(track, duration=99999), "https://media/stream") is False
+        assert cache.note_play(track, "https://media/stream") is True
+        await asyncio.gather(*cache._tasks)
+    cmd = popen.call_args.args[0]
+    assert cmd[cmd.index("-c:a") + 1] == "libopus" and "https://media/stream" in cmd
+
+    # Найменше влучань (0) і найдавніше використаний — IDS[1]
+    assert cache.lookup(_url(IDS[1])) is None
+    path, meta = cache.lookup(_url(IDS[3]))
+    assert os.path.getsize(path) == 100 and meta == {"title": "New", "duration": 200}
+    stats = cache.stats()
+    assert stats["files"] == 3 and stats["bytes"] == 300 and stats["evictions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 2 and stats["hit_ratio"] == 0.5
+
+    # Влучання переживають перезапуск (index.json)
+    cache.close()
+    with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+        assert json.load(f)[IDS[0]]["hits"] == 1
+    reloaded = AudioCache(directory, max_bytes=300)
+    assert reloaded.load() == 3 and reloaded._entries[IDS[3]]["title"] == "New"
+
+
+def test_seed_and_ineligible_plays(tmp_path):
+    cache = AudioCache(str(tmp_path), min_plays=3)
+    assert cache.note_play({"url": _url(IDS[0]), "duration": 100}, "https://media") is False  # не завантажений
+    cache.load()
+    cache.seed([{"url": _url(IDS[0]), "play_count": 5}, {"url": "https://soundcloud.com/x", "play_count": 9}])
+    assert cache._plays == {IDS[0]: 5}
+    # Уже локальний файл або невідома тривалість — не транскодуємо
+    assert cache.note_play({"url": _url(IDS[0]), "duration": 100}, "/cache/x.ogg") is False
+    assert cache.note_play({"url": _url(IDS[0])}, "https://media") is False
+    assert cache._plays[IDS[0]] == 7
+
+
+@pytest.mark.asyncio
+async def test_from_track_dict_plays_cached_file_without_extraction(tmp_path):
+    cache = AudioCache(str(tmp_path))
+    path = _put(str(tmp_path), IDS[0])
+    cache.load()
+    process = MagicMock()
+    process.poll.return_value = None
+    process.stdout = io.BytesIO(b"\x00" * 3840)
+    with patch("discord_music_bot.audio_source.audio_cache", cache), \
+         patch("discord_music_bot.audio_source.extract_stream_url") as extract, \
+         patch("subprocess.Popen", return_value=process) as popen:
+        player = await YTDLSource.from_track_dict({"url": _url(IDS[0]), "title": "Cached"})
+    assert player is not None and player.title == "Cached"
+    extract.assert_not_called()
+    cmd = popen.call_args.args[0]
+    assert cmd[cmd.index("-i") + 1] == path and "-reconnect" not in cmd
+    assert player.stream_url == path
+    player.cleanup()
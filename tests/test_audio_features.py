@@ -0,0 +1,111 @@
+import math
+import random
+from collections import Counter
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from discord_music_bot import audio_features, consts
+from discord_music_bot.services.automix_service import AutomixService
+from discord_music_bot.services.feature_service import AudioFeatureService
+from discord_music_bot.track_catalog import canonical_track_key
+
+SR = 11025
+
+
+def _clip(seconds=8.0, bpm=120.0, amplitude=6000.0, notes=(220.0, 277.18, 329.63)):
+    """Акорд (за замовчуванням A major), що звучить заново на кожну долю."""
+    beat = int(SR * 60.0 / bpm)
+    samples = []
+    for i in range(int(seconds * SR)):
+        t = i / SR
+        envelope = 0.2 + math.exp(-(i % beat) / (SR * 0.08))
+        value = envelope * sum(math.sin(2 * math.pi * f * t) for f in notes) / len(notes)
+        samples.append(int(max(-32767, min(32767, amplitude * value))))
+    return samples
+
+
+def _features(bpm, loudness=-20.0, centroid=800.0, key=9, chroma=None):
+    return {
+        "bpm": bpm,
+        "loudness": loudness,
+        "centroid": centroid,
+        "key": key,
+        "chroma": chroma or [1.0 if i in (1, 4, 9) else 0.1 for i in range(12)],
+    }
+
+
+def test_compute_features_tempo_key_and_loudness():
+    loud = audio_features.compute_features(_clip(), SR)
+    quiet = audio_features.compute_features(_clip(amplitude=1500.0), SR)
+    assert loud["bpm"] == pytest.approx(120.0, rel=0.05)
+    assert audio_features.key_name(loud["key"]) == "A major"
+    assert quiet["loudness"] < loud["loudness"] - 10
+    # Тиша та надто короткий фрагмент не дають ознак
+    assert audio_features.compute_features([0] * SR * 5, SR) is None
+    assert audio_features.compute_features(_clip(seconds=1.0), SR) is None
+
+
+def test_distance_is_symmetric_and_folds_tempo_octaves():
+    a, b = _features(90.0), _features(180.0)
+    assert audio_features.distance(a, a) == pytest.approx(0.0)
+    assert audio_features.distance(a, b) == pytest.approx(0.0, abs=1e-9)
+    c = _features(128.0, loudness=-8.0, centroid=3000.0, key=0, chroma=[1.0 if i in (0, 4, 7) else 0.1 for i in range(12)])
+    assert audio_features.distance(a, c) == pytest.approx(audio_features.distance(c, a))
+    assert audio_features.distance(a, c) > 3
+
+
+@pytest.mark.asyncio
+async def test_similar_sound_prefers_nearest_neighbour():
+    tracks = {
+        "http://seed": _features(120.0),
+        "http://twin": _features(121.0),
+        "http://far": _features(75.0, loudness=-6.0, centroid=4000.0, key=0,
+                                chroma=[1.0 if i in (0, 4, 7) else 0.1 for i in range(12)]),
+    }
+    repo = MagicMock()
+    repo.get_track_features = AsyncMock(return_value={canonical_track_key(u): f for u, f in tracks.items()})
+    repo.get_top_tracks = AsyncMock(return_value=[
+        {"url": url, "title": url, "play_count": 3} for url in tracks
+    ] + [{"url": "http://unknown", "title": "Unknown", "play_count": 40}])
+    repo.get_history = AsyncMock(return_value=[])
+    features = AudioFeatureService(repo)
+    assert await features.load() == 3
+    service = AutomixService(repo, rng=random.Random(5), features=features)
+
+    picks = Counter()
+    for _ in range(200):
+        track = await service.recommend_for_strategy(
+            1, consts.AUTOMIX_STRATEGY_SIMILAR,
+            recent_urls=["http://seed"], automix_recent_urls=[], skip_penalties={},
+        )
+        assert track["automix_strategy"] == consts.AUTOMIX_STRATEGY_SIMILAR
+        picks[track["url"]] += 1
+    # Трек без ознак не кандидат; опорний трек заблокований як недавній
+    assert set(picks) <= {"http://twin", "http://far"}
+    assert picks["http://twin"] > picks["http://far"] * 3
+
+    # Без ознак опорного треку — fallback на history_explore з тим самим тегом
+    track = await service.recommend_for_strategy(
+        1, consts.AUTOMIX_STRATEGY_SIMILAR,
+        recent_urls=["http://unknown"], automix_recent_urls=[], skip_penalties={},
+    )
+    assert track["automix_strategy"] == consts.AUTOMIX_STRATEGY_SIMILAR
+
+
+def test_schedule_ignores_known_and_invalid_tracks():
+    features = AudioFeatureService(MagicMock(), max_pending=0)
+    features._features[canonical_track_key("http://a")] = _features(100.0)
+    assert features.schedule({"url": "http://a"}, "http://stream") is False
+    assert features.schedule({"url": "http://b"}, None) is False
+    assert features.schedule({"url": "http://b"}, MagicMock()) is False
+    assert features.schedule({"url": "http://b"}, "http://stream") is False
+    assert features.stats()["dropped"] == 1
+
+
+def test_analysis_pool_does_not_fork_threaded_bot():
+    service = AudioFeatureService(MagicMock())
+    executor = service._get_executor()
+    try:
+        assert executor._mp_context.get_start_method() in ("forkserver", "spawn")
+        assert executor.submit(audio_features.key_name, 0).result(timeout=60) == audio_features.key_name(0)
+    finally:
+        service.close()
@@ -8,13 +8,12 @@ from discord_music_bot.services import source_service
 # --- audio_source.py tests ---
 def test_ytdlp_pipe_source_retries():
     ffmpeg = Mock()
-    ffmpeg.stdout.read.side_effect = [b'', b'', b'', b'', b'', b'', b'', b'', b'', b'']
+    ffmpeg.stdout = None  # pipe is gone: the reader thread stops immediately
     ffmpeg.poll.return_value = None
     ytdlp = Mock()
     source = audio_source.YTDLPPipeSource(ytdlp, ffmpeg)
-    with patch('time.sleep'):
-        result = source.read()
-        assert result == b''
+    source._eof.wait(1)
+    assert source.read() == b''
 
 def test_ytdlp_pipe_source_cleanup_failures():
     ffmpeg = Mock()
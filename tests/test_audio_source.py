@@ -1,3 +1,4 @@
+import io
 import pytest
 import discord
 from unittest.mock import MagicMock, patch
@@ -8,7 +9,7 @@ def mock_processes():
     ytdlp = MagicMock()
     ytdlp.poll.return_value = None # Still running
     ffmpeg = MagicMock()
-    ffmpeg.stdout.read.return_value = b'\x01' * 3840 # One full frame
+    ffmpeg.stdout = io.BytesIO(b'\x01' * 3840) # One full frame
     ffmpeg.poll.return_value = None # Still running
     return ytdlp, ffmpeg
 
@@ -17,20 +18,21 @@ def test_ytdlp_pipe_source_read(mock_processes):
     source = YTDLPPipeSource(ytdlp, ffmpeg)
     
     # Test reading a full frame
+    source._eof.wait(1)
     frame = source.read()
-    assert len(frame) == 3840
-    ffmpeg.stdout.read.assert_called_with(3840)
+    assert frame == b'\x01' * 3840
+    assert source.stats()["frames"] == 1
 
 def test_ytdlp_pipe_source_end_of_track(mock_processes):
     ytdlp, ffmpeg = mock_processes
     source = YTDLPPipeSource(ytdlp, ffmpeg)
     
     # Mock FFmpeg ending
-    ffmpeg.stdout.read.return_value = b''
     ffmpeg.poll.return_value = 0
+    source._eof.wait(1)
     
-    frame = source.read()
-    assert frame == b''
+    assert source.read() == b'\x01' * 3840
+    assert source.read() == b''
 
 def test_ytdlp_pipe_source_cleanup(mock_processes):
     ytdlp, ffmpeg = mock_processes
@@ -70,6 +72,7 @@ async def test_ytdl_source_from_track_dict_success():
         mock_extract.return_value = ('http://stream.url', {'title': 'Test', 'webpage_url': 'http://test.com'})
         mock_proc = MagicMock()
         mock_proc.poll.return_value = None
+        mock_proc.stdout = io.BytesIO(b'\x01' * 3840)  # перший кадр — ffmpeg готовий
         mock_popen.return_value = mock_proc
 
         res = await YTDLSource.from_track_dict(track)
@@ -1,3 +1,6 @@
+import io
+import os
+import time
 import pytest
 import asyncio
 from unittest.mock import Mock, patch
@@ -6,15 +9,10 @@ from discord_music_bot.audio_source import YTDLPPipeSource, YTDLSource
 class MockProcess:
     def __init__(self, poll_val=None, stdout_data=b''):
         self.poll_val = poll_val
-        self.stdout = Mock()
-        self.stdout.read.side_effect = self._read_side_effect(stdout_data)
+        self.returncode = poll_val
+        self.stdout = io.BytesIO(stdout_data)
+        self.stderr = None
         self.killed = False
-    
-    def _read_side_effect(self, data):
-        # Return data in chunks to simulate pipe behavior
-        yield data
-        while True:
-            yield b''
             
     def poll(self):
         return self.poll_val
@@ -31,13 +29,14 @@ def test_ytdlp_pipe_source_read_branches(scenario):
         # FFmpeg finished, buffer empty
         ffmpeg = MockProcess(poll_val=0, stdout_data=b'')
         source = YTDLPPipeSource(Mock(), ffmpeg)
+        source._eof.wait(1)
         assert source.read() == b''
     
     elif scenario == "padding":
         # FFmpeg finished, buffer has partial data
         ffmpeg = MockProcess(poll_val=0, stdout_data=b'hello')
         source = YTDLPPipeSource(Mock(), ffmpeg)
-        # First read will trigger the while loop, get 'hello', then poll() is not None
+        source._eof.wait(1)
         frame = source.read()
         assert len(frame) == frame_size
         assert frame.startswith(b'hello')
@@ -46,15 +45,61 @@ def test_ytdlp_pipe_source_read_branches(scenario):
         assert source.read() == b''
 
     elif scenario == "retries":
-        # FFmpeg alive, but returning empty chunks
-        ffmpeg = Mock()
-        ffmpeg.stdout.read.return_value = b''
-        ffmpeg.poll.return_value = None # Alive
+        # FFmpeg alive, but no data in the pipe: read() must not block
+        read_fd, write_fd = os.pipe()
+        ffmpeg = MockProcess(poll_val=None)
+        ffmpeg.stdout = os.fdopen(read_fd, "rb")
         source = YTDLPPipeSource(Mock(), ffmpeg)
-        source.MAX_READ_RETRIES = 2
-        with patch('time.sleep'):
-            # Should retry 2 times then return empty if buffer empty
+        source.MAX_UNDERRUN_FRAMES = 2
+        try:
+            assert source.read() == YTDLPPipeSource.SILENCE
             assert source.read() == b''
+            assert source.stats()["startup_frames"] == 2
+        finally:
+            source.cleanup()
+            os.close(write_fd)
+
+
+def test_ytdlp_pipe_source_ring_wraparound():
+    frame_size = YTDLPPipeSource.FRAME_SIZE
+    data = bytes(range(256)) * (frame_size * 7 // 256) + b'\x07' * 100
+    ffmpeg = MockProcess(poll_val=0, stdout_data=data)
+    with patch.object(YTDLPPipeSource, "RING_FRAMES", 2):
+        source = YTDLPPipeSource(Mock(), ffmpeg)
+        out = b''
+        while True:
+            frame = source.read()
+            if not frame:
+                break
+            # Тиша, поки потік-читач не встиг заповнити кільце
+            if frame is YTDLPPipeSource.SILENCE:
+                time.sleep(0.001)
+            else:
+                out += frame
+    assert out.rstrip(b'\x00') == data.rstrip(b'\x00')
+    assert source.stats()["frames"] == 7
+
+
+def test_ytdlp_pipe_source_counts_underruns():
+    read_fd, write_fd = os.pipe()
+    ffmpeg = MockProcess(poll_val=None)
+    ffmpeg.stdout = os.fdopen(read_fd, "rb")
+    source = YTDLPPipeSource(Mock(), ffmpeg)
+    try:
+        os.write(write_fd, b'\x01' * YTDLPPipeSource.FRAME_SIZE)
+        for _ in range(100):
+            if source.buffered_frames:
+                break
+            time.sleep(0.01)
+        assert source.read() == b'\x01' * YTDLPPipeSource.FRAME_SIZE
+        assert source.read() == YTDLPPipeSource.SILENCE
+        assert source.read() == YTDLPPipeSource.SILENCE
+        stats = source.stats()
+        assert stats["underruns"] == 2
+        assert stats["underrun_events"] == 1
+    finally:
+        source.cleanup()
+        os.close(write_fd)
 
 def test_ytdlp_pipe_source_cleanup():
     ytdlp = MockProcess(poll_val=None)
@@ -82,7 +127,7 @@ async def test_ytdl_source_from_track_dict_branches():
          patch('subprocess.Popen') as mock_popen:
         mock_extract.return_value = ('http://stream.url', track)
         mock_p = Mock()
-        mock_p.stdout = Mock()
+        mock_p.stdout = io.BytesIO(b'\x00' * 3840)
         mock_p.poll.return_value = None
         mock_popen.return_value = mock_p
 
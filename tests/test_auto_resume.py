@@ -1,7 +1,8 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
-from datetime import datetime, timezone, timedelta
-from discord_music_bot.services.auto_resume import auto_resume
+from datetime import datetime, timezone
+from discord_music_bot.services.auto_resume import ConnectLimiter, _wait_gateway, auto_resume
 from discord_music_bot import consts
 
 @pytest.fixture
@@ -24,38 +25,30 @@ def mock_cog():
 
 @pytest.mark.asyncio
 async def test_auto_resume_no_active_guilds(mock_bot, mock_cog):
-    mock_cog.repository.get_all_active_guilds.return_value = []
+    mock_cog.repository.get_resume_snapshots.return_value = []
     
     count = await auto_resume(mock_bot, mock_cog)
     
     assert count == 0
-    mock_cog.repository.get_all_active_guilds.assert_called_once()
+    mock_cog.repository.get_resume_snapshots.assert_called_once()
 
 @pytest.mark.asyncio
 async def test_auto_resume_staleness_policy(mock_bot, mock_cog):
-    # Сесія створена 25 годин тому
-    stale_time = (datetime.now(timezone.utc) - timedelta(hours=25)).strftime("%Y-%m-%d %H:%M:%S")
-    
-    mock_cog.repository.get_all_active_guilds.return_value = [
-        {
-            'guild_id': 123,
-            'updated_at': stale_time,
-            'voice_channel_id': 456,
-            'text_channel_id': 789,
-            'current_track_url': 'http://example.com',
-        }
-    ]
-    
+    # Застарілі сесії очищаються й відсікаються в SQL, а не перебором у Python
+    mock_cog.repository.clear_stale_guild_states.return_value = 1
+    mock_cog.repository.get_resume_snapshots.return_value = []
+
     count = await auto_resume(mock_bot, mock_cog)
-    
+
     assert count == 0
-    # Перевірка що стан було очищено через застарілість
-    mock_cog.repository.clear_guild_state.assert_called_with(123)
+    mock_cog.repository.clear_stale_guild_states.assert_called_once_with(consts.AUTO_RESUME_STALENESS_THRESHOLD)
+    mock_cog.repository.get_resume_snapshots.assert_called_once_with(consts.AUTO_RESUME_STALENESS_THRESHOLD)
+    mock_cog.repository.clear_guild_state.assert_not_called()
 
 @pytest.mark.asyncio
 async def test_auto_resume_missing_guild(mock_bot, mock_cog):
     valid_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-    mock_cog.repository.get_all_active_guilds.return_value = [
+    mock_cog.repository.get_resume_snapshots.return_value = [
         {
             'guild_id': 123,
             'updated_at': valid_time,
@@ -75,7 +68,7 @@ async def test_auto_resume_missing_guild(mock_bot, mock_cog):
 @pytest.mark.asyncio
 async def test_auto_resume_empty_channel(mock_bot, mock_cog):
     valid_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-    mock_cog.repository.get_all_active_guilds.return_value = [
+    mock_cog.repository.get_resume_snapshots.return_value = [
         {
             'guild_id': 123,
             'updated_at': valid_time,
@@ -103,7 +96,7 @@ async def test_auto_resume_empty_channel(mock_bot, mock_cog):
 @pytest.mark.asyncio
 async def test_auto_resume_success(mock_bot, mock_cog):
     valid_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-    mock_cog.repository.get_all_active_guilds.return_value = [
+    mock_cog.repository.get_resume_snapshots.return_value = [
         {
             'guild_id': 123,
             'updated_at': valid_time,
@@ -134,7 +127,91 @@ async def test_auto_resume_success(mock_bot, mock_cog):
     
     assert count == 1
     mock_voice_channel.connect.assert_called_once()
-    mock_cog.queue_service.load_from_db.assert_called_with(123)
+    mock_cog.queue_service.restore.assert_called_with(123, [])
     mock_cog.queue_service.push_front.assert_called_once()
     mock_cog.play_next_song.assert_called_once()
     mock_text_channel.send.assert_called()
+
+@pytest.mark.asyncio
+async def test_auto_resume_continues_from_saved_position(mock_bot, mock_cog):
+    valid_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    mock_cog.repository.get_resume_snapshots.return_value = [
+        {
+            'guild_id': 123,
+            'updated_at': valid_time,
+            'voice_channel_id': 456,
+            'text_channel_id': 789,
+            'current_track_url': 'http://example.com',
+            'current_track_title': 'Test Track',
+            'current_track_position': 95.0,
+        }
+    ]
+    mock_voice_channel = MagicMock()
+    mock_voice_channel.connect = AsyncMock()
+    mock_voice_channel.members = [MagicMock(bot=False)]
+    mock_text_channel = AsyncMock()
+    mock_guild = MagicMock()
+    mock_guild.get_channel.side_effect = lambda id: mock_voice_channel if id == 456 else mock_text_channel
+    mock_bot.get_guild.return_value = mock_guild
+
+    assert await auto_resume(mock_bot, mock_cog) == 1
+
+    item = mock_cog.queue_service.push_front.call_args.args[1]
+    assert item['start_at'] == 95.0 - consts.AUTO_RESUME_REWIND_SECONDS
+    assert "(з 01:32)" in mock_text_channel.send.call_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_auto_resume_runs_guilds_concurrently_within_limit(mock_bot, mock_cog):
+    snapshots = [
+        {
+            'guild_id': gid,
+            'voice_channel_id': 456,
+            'text_channel_id': None,
+            'current_track_url': f'http://example.com/{gid}',
+            'queue': [{'url': 'http://q'}],
+            'history': [{'url': 'http://h'}],
+        }
+        for gid in range(5)
+    ]
+    mock_cog.repository.get_resume_snapshots.return_value = snapshots
+    in_flight, peak = 0, 0
+
+    async def connect(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return MagicMock()
+
+    voice_channel = MagicMock(members=[MagicMock(bot=False)], connect=connect)
+    mock_bot.get_guild.return_value = MagicMock(shard_id=0, get_channel=MagicMock(return_value=voice_channel))
+    mock_bot.is_ws_ratelimited.return_value = False
+
+    with patch.object(consts, "AUTO_RESUME_CONCURRENCY", 2):
+        assert await auto_resume(mock_bot, mock_cog) == 5
+
+    assert peak == 2
+    mock_cog.queue_service.restore.assert_any_call(3, [{'url': 'http://q'}])
+    mock_cog.history_service.restore.assert_any_call(3, [{'url': 'http://h'}])
+    assert mock_cog.play_next_song.await_count == 5
+    mock_cog.repository.clear_guild_state.assert_not_called()
+
+
+def test_connect_limiter_spaces_connects_per_shard():
+    now = [0.0]
+    limiter = ConnectLimiter(per_minute=60, burst=2, clock=lambda: now[0])
+    assert [limiter.reserve(0) for _ in range(4)] == [0.0, 0.0, 1.0, 2.0]
+    assert limiter.reserve(1) == 0.0  # інший шард має власний ліміт
+    now[0] = 10.0
+    assert limiter.reserve(0) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_wait_gateway_backs_off_while_ratelimited():
+    bot = MagicMock()
+    bot.is_ws_ratelimited.side_effect = [True, True, False]
+    with patch("discord_music_bot.services.auto_resume.asyncio.sleep", new_callable=AsyncMock) as sleep:
+        assert await _wait_gateway(bot) == 2 * consts.AUTO_RESUME_RATELIMIT_BACKOFF
+    assert sleep.await_count == 2
@@ -23,19 +23,19 @@ def cog():
 
 @pytest.mark.asyncio
 async def test_auto_resume_staleness_error(bot, cog):
-    cog.repository.get_all_active_guilds.return_value = [
-        {'guild_id': 123, 'updated_at': 'invalid-date'}
-    ]
+    cog.repository.clear_stale_guild_states.side_effect = Exception("DB locked")
+    cog.repository.get_resume_snapshots.return_value = []
     with patch('discord_music_bot.services.auto_resume.logger') as mock_logger:
         await auto_resume(bot, cog)
-        mock_logger.warning.assert_called() # Line 51
+        mock_logger.warning.assert_called()
+    cog.repository.get_resume_snapshots.assert_called_once()
 
 @pytest.mark.asyncio
 async def test_auto_resume_voice_channel_missing(bot, cog):
     guild = Mock()
     guild.get_channel.return_value = None # Voice missing
     bot.get_guild.return_value = guild
-    cog.repository.get_all_active_guilds.return_value = [
+    cog.repository.get_resume_snapshots.return_value = [
         {'guild_id': 123, 'voice_channel_id': 456, 'text_channel_id': 789, 'current_track_url': 'test'}
     ]
     await auto_resume(bot, cog)
@@ -43,7 +43,7 @@ async def test_auto_resume_voice_channel_missing(bot, cog):
 
 @pytest.mark.asyncio
 async def test_auto_resume_critical_error(bot, cog):
-    cog.repository.get_all_active_guilds.side_effect = Exception("Critical DB Error")
+    cog.repository.get_resume_snapshots.side_effect = Exception("Critical DB Error")
     with patch('discord_music_bot.services.auto_resume.logger') as mock_logger:
         await auto_resume(bot, cog)
         mock_logger.error.assert_called() # Line 119
@@ -52,6 +52,6 @@ async def test_auto_resume_critical_error(bot, cog):
 async def test_auto_resume_failure_for_guild(bot, cog):
     # Triggers line 114
     bot.get_guild.side_effect = Exception("Guild Fetch Fail")
-    cog.repository.get_all_active_guilds.return_value = [{'guild_id': 123, 'voice_channel_id': 456, 'text_channel_id': 789, 'current_track_url': 'test'}]
+    cog.repository.get_resume_snapshots.return_value = [{'guild_id': 123, 'voice_channel_id': 456, 'text_channel_id': 789, 'current_track_url': 'test'}]
     await auto_resume(bot, cog)
     cog.repository.clear_guild_state.assert_called_with(123)
@@ -0,0 +1,85 @@
+import random
+from collections import Counter
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from discord_music_bot import consts
+from discord_music_bot.automix_index import EXPLORE, POPULAR, FenwickSampler, GuildCandidateIndex
+from discord_music_bot.services.automix_service import AutomixService
+from discord_music_bot.services.history_service import HistoryService
+
+
+def test_fenwick_sampling_follows_weights():
+    rng = random.Random(7)
+    sampler = FenwickSampler()
+    for weight in [1.0, 0.0, 3.0, 6.0]:
+        sampler.append(weight)
+    counts = Counter(sampler.sample(rng) for _ in range(20000))
+    assert counts[1] == 0
+    assert counts[3] / counts[0] == pytest.approx(6.0, rel=0.15)
+
+    sampler.set(3, 0.0)
+    sampler.set(1, 2.0)
+    assert sampler.total() == pytest.approx(6.0)
+    assert {sampler.sample(rng) for _ in range(500)} == {0, 1, 2}
+
+
+def test_index_merges_url_forms_and_skips_blocked():
+    index = GuildCandidateIndex(max_penalty=5, rng=random.Random(1))
+    index.add({"url": "https://youtu.be/dQw4w9WgXcQ", "title": "Song"}, 3)
+    index.record_play({"url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10"})
+    index.add({"url": "https://soundcloud.com/a/b", "title": "Other"}, 1)
+    assert len(index) == 2 and index.play_counts[0] == 4
+
+    blocked = ["https://www.youtube.com/watch?v=dQw4w9WgXcQ"]
+    assert all(index.sample(POPULAR, blocked)["title"] == "Other" for _ in range(50))
+    # Блокування тимчасове: після вибору ваги відновлюються
+    assert {index.sample(POPULAR)["title"] for _ in range(200)} == {"Song", "Other"}
+
+
+@pytest.mark.asyncio
+async def test_index_is_built_once_and_updated_by_history_events():
+    repo = MagicMock()
+    repo.get_top_tracks = AsyncMock(return_value=[
+        {"url": "http://hit", "title": "Hit", "play_count": 50},
+        {"url": "http://rare", "title": "Rare", "play_count": 1},
+    ])
+    repo.get_history = AsyncMock(return_value=[{"url": "http://rare", "title": "Rare"}])
+    service = AutomixService(repo, rng=random.Random(3))
+    history = HistoryService(repo, write_buffer=MagicMock())
+    history.add_listener(service.on_history_event)
+
+    async def pick(strategy, penalties=None):
+        track = await service.recommend_for_strategy(
+            1, strategy, recent_urls=[], automix_recent_urls=[], skip_penalties=penalties or {}
+        )
+        return track["url"]
+
+    top = Counter([await pick(consts.AUTOMIX_STRATEGY_TOP) for _ in range(300)])
+    explore = Counter([await pick(consts.AUTOMIX_STRATEGY_HISTORY) for _ in range(300)])
+    assert top["http://hit"] > top["http://rare"] * 10
+    assert explore["http://rare"] > explore["http://hit"] * 5
+    # Жодних SQL-запитів після першої побудови
+    assert repo.get_top_tracks.await_count == 1 and repo.get_history.await_count == 1
+
+    # Новий трек з історії одразу стає кандидатом; пропуски знижують вагу
+    history.add_to_history(1, {"url": "http://new", "title": "New"})
+    service.skip_recorded(1, "http://hit", 5)
+    picks = Counter([await pick(consts.AUTOMIX_STRATEGY_TOP) for _ in range(300)])
+    assert picks["http://new"] > 0
+    assert picks["http://hit"] < top["http://hit"]
+    assert service.stats() == {"guilds": 1, "tracks": 3, "builds": 1}
+
+    # Очищення історії скидає індекс — наступний вибір перебудує його з БД
+    history.clear_history(1)
+    await pick(consts.AUTOMIX_STRATEGY_TOP)
+    assert repo.get_top_tracks.await_count == 2
+
+
+def test_previous_removes_last_play():
+    index = GuildCandidateIndex(max_penalty=5)
+    service = AutomixService(MagicMock())
+    service._indexes[1] = index
+    service.on_history_event("played", 1, {"url": "http://a"})
+    assert index.sample(EXPLORE)["url"] == "http://a"
+    service.on_history_event("removed", 1, {"url": "http://a"})
+    assert index.sample(EXPLORE) is None
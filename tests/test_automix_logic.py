@@ -1,6 +1,7 @@
 import pytest
 import random
 from unittest.mock import AsyncMock, MagicMock
+from discord_music_bot.automix_index import FenwickSampler
 from discord_music_bot.services.automix_service import AutomixService, AutomixConfig
 from discord_music_bot import consts
 
@@ -111,15 +112,16 @@ async def test_query_failures(automix_service, mock_repo):
     )
     assert res is None
 
-def test_weighted_pick_edge_cases(automix_service):
-    assert automix_service._weighted_pick([]) is None
-    assert automix_service._weighted_pick([({'url': '1'}, 0.0)]) is None
-    
-    # Test picking the last item if random exceeds (floating point safety)
-    items = [({'url': '1'}, 1.0)]
-    # We can't easily mock random.random inside the method without patching
-    # But we can call it.
-    assert automix_service._weighted_pick(items)['url'] == '1'
+def test_weighted_pick_edge_cases():
+    rng = random.Random(0)
+    sampler = FenwickSampler()
+    assert sampler.sample(rng) is None
+    sampler.append(0.0)
+    assert sampler.sample(rng) is None
+
+    # Єдиний елемент з вагою обирається завжди
+    sampler.append(1.0)
+    assert all(sampler.sample(rng) == 1 for _ in range(50))
 
 @pytest.mark.asyncio
 async def test_history_explore_logic(automix_service, mock_repo):
@@ -1,5 +1,6 @@
 import pytest
 from unittest.mock import Mock, AsyncMock
+from discord_music_bot.automix_index import POPULAR, GuildCandidateIndex
 from discord_music_bot.services.automix_service import AutomixService, AutomixConfig
 from discord_music_bot import consts
 
@@ -50,7 +51,9 @@ async def test_automix_fallbacks():
     assert res is None
 
 def test_weighted_pick_edge_cases():
-    service = AutomixService(Mock())
-    assert service._weighted_pick([]) is None
-    assert service._weighted_pick([({"t": 1}, 0.0)]) is None
-    assert service._weighted_pick([({"t": 1}, 1.0)])["t"] == 1
+    index = GuildCandidateIndex(max_penalty=5)
+    assert index.sample(POPULAR) is None
+    index.add({"url": "u1", "title": "T1"}, 0)
+    assert index.sample(POPULAR) is None
+    index.add({"url": "u1"}, 1)
+    assert index.sample(POPULAR)["title"] == "T1"
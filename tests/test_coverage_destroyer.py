@@ -1,6 +1,8 @@
+import io
 import pytest
 import discord
 import asyncio
+from contextlib import asynccontextmanager
 from unittest.mock import Mock, AsyncMock, patch, MagicMock
 from discord_music_bot.repository import MusicRepository
 from discord_music_bot.services.auto_resume import auto_resume
@@ -45,7 +47,15 @@ async def test_repository_missing_lines():
     mock_conn.execute.return_value = mock_cursor
     mock_cursor.rowcount = 0
     
-    with patch('discord_music_bot.repository.get_connection', return_value=mock_conn):
+    @asynccontextmanager
+    async def _borrow():
+        yield mock_conn
+
+    mock_pool = MagicMock()
+    mock_pool.reader.side_effect = _borrow
+    mock_pool.writer.side_effect = _borrow
+
+    with patch('discord_music_bot.repository.get_pool', AsyncMock(return_value=mock_pool)):
         assert await repo.pop_last_history_track(123) is None
         assert await repo.get_automix_diversity_stats(123) == {"rec_total": 0, "rec_distinct": 0}
         await repo.set_automix_strategy(123, "test")
@@ -54,15 +64,15 @@ async def test_repository_missing_lines():
 # --- Audio Source Extreme ---
 def test_audio_source_read_padding():
     ffmpeg = Mock()
-    ffmpeg.poll.return_value = None
+    ffmpeg.poll.return_value = 0
+    ffmpeg.returncode = 0
+    ffmpeg.stdout = io.BytesIO(b'123')
     ytdlp = Mock()
     source = audio_source.YTDLPPipeSource(ytdlp, ffmpeg)
-    source._buffer = b'123'
-    source.MAX_READ_RETRIES = 1
-    ffmpeg.stdout.read.return_value = b''
-    with patch('time.sleep'):
-        res = source.read()
-        assert len(res) == source.FRAME_SIZE
+    source._eof.wait(1)
+    res = source.read()
+    assert len(res) == source.FRAME_SIZE
+    assert res.startswith(b'123')
 
 # --- Auto Resume Extreme ---
 @pytest.mark.asyncio
@@ -72,7 +82,7 @@ async def test_auto_resume_extreme():
     guild.get_channel.return_value = None
     bot.get_guild.return_value = guild
     repo = AsyncMock()
-    repo.get_all_active_guilds.return_value = [{'guild_id': 1, 'voice_channel_id': 2}]
+    repo.get_resume_snapshots.return_value = [{'guild_id': 1, 'voice_channel_id': 2}]
     cog = MagicMock()
     cog._auto_resume_executed = False
     
@@ -100,9 +110,8 @@ async def test_automix_service_extreme():
     await service._recommend_top_weighted(1, recent_urls=[], automix_recent_urls=[], skip_penalties={})
     with patch('random.choice', return_value={'url': 'u1'}):
         await service._recommend_history_explore(1, recent_urls=[], automix_recent_urls=[], skip_penalties={})
-    service._unique_history_pool([{'url': ''}], set())
-    service._weighted_pick([({'t': 1}, -1)])
-    service._weighted_pick([({'t': 1}, 0.5)])
+    service.on_history_event("played", 1, {'url': ''})
+    service.skip_recorded(1, 'u1', 3)
 
 # --- Views Extreme ---
 @pytest.mark.asyncio
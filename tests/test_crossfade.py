@@ -0,0 +1,169 @@
+import array
+import math
+import discord
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+from discord_music_bot.audio_source import CrossfadeSource
+from discord_music_bot.cogs.slash_music_cog import MusicCog
+from discord_music_bot.services.player_service import PlayerService
+
+
+class _Tone:
+    """Фейкове джерело: `frames` кадрів PCM зі сталим значенням семплів."""
+
+    def __init__(self, value, frames, duration=None):
+        self.value = value
+        self.frames = frames
+        self.duration = frames / 50 if duration is None else duration
+        self.volume = 1.0
+        self.cleaned = False
+
+    def read(self):
+        if self.frames <= 0:
+            return b""
+        self.frames -= 1
+        return array.array("h", [self.value] * 1920).tobytes()
+
+    def cleanup(self):
+        self.cleaned = True
+
+
+def _level(frame):
+    return array.array("h", frame)[0]
+
+
+def _drain(mixer):
+    levels = []
+    while True:
+        frame = mixer.read()
+        if not frame:
+            return levels
+        assert len(frame) == CrossfadeSource.FRAME_SIZE
+        levels.append(_level(frame))
+
+
+def test_overlap_is_gapless_and_equal_power():
+    current, nxt = _Tone(10000, 100), _Tone(10000, 100)
+    switched = []
+    mixer = CrossfadeSource(current, fade_seconds=1.0)
+    assert mixer.queue_next(nxt, lambda: switched.append(True))
+
+    levels = _drain(mixer)
+    # 100 + 100 кадрів з перекриттям у 50: жодного кадру тиші між треками
+    assert len(levels) == 150
+    assert switched == [True]
+    assert current.cleaned
+    assert mixer.current is nxt
+    # Рівнопотужна крива: посередині cos + sin ≈ √2
+    mid = levels[75]
+    assert mid == pytest.approx(10000 * 2 * math.cos(math.pi / 4), rel=0.05)
+    assert all(level > 0 for level in levels)
+
+
+def test_fade_out_without_next_track():
+    mixer = CrossfadeSource(_Tone(8000, 100), fade_seconds=1.0)
+    levels = _drain(mixer)
+    assert len(levels) == 100
+    assert levels[0] == 8000
+    assert levels[49] == 8000
+    assert levels[-1] < 500
+    assert levels == sorted(levels, reverse=True)
+
+
+def test_early_end_switches_without_gap():
+    # Метадані кажуть 10с, а потік закінчився через 20 кадрів
+    current = _Tone(1000, 20, duration=10)
+    mixer = CrossfadeSource(current, fade_seconds=1.0)
+    mixer.queue_next(_Tone(2000, 100))
+    levels = _drain(mixer)
+    assert levels[:25] == [1000] * 20 + [2000] * 5
+    assert len(levels) == 120
+
+
+def test_cancel_next_keeps_ownership_with_caller():
+    nxt = _Tone(1, 10)
+    mixer = CrossfadeSource(_Tone(1, 10), fade_seconds=0.5)
+    mixer.queue_next(nxt)
+    assert not mixer.queue_next(_Tone(1, 1))
+    assert mixer.cancel_next() is nxt
+    mixer.cleanup()
+    assert not nxt.cleaned
+
+
+def test_volume_applies_to_both_tracks():
+    current, nxt = _Tone(1, 10), _Tone(1, 10)
+    mixer = CrossfadeSource(current, fade_seconds=0.5)
+    mixer.queue_next(nxt)
+    mixer.volume = 0.3
+    assert current.volume == nxt.volume == 0.3
+
+
+@pytest.mark.asyncio
+async def test_player_service_queue_next_requires_mixer():
+    service = PlayerService()
+    nxt = _Tone(1, 10)
+    vc = MagicMock()
+    assert await service.queue_next(vc, {}, None, None, source=nxt) is None
+    assert nxt.cleaned
+
+    vc.source = CrossfadeSource(_Tone(1, 500), fade_seconds=2)
+    nxt = _Tone(1, 10)
+    assert await service.queue_next(vc, {}, None, None, source=nxt) is nxt
+    assert service.remaining_seconds(vc) == 10
+    assert service.cancel_next(vc) is nxt
+
+
+@pytest.mark.asyncio
+async def test_queue_head_change_drops_prepared_track():
+    bot = Mock(spec=discord.Client)
+    bot.loop = MagicMock()
+    with patch('discord_music_bot.cogs.slash_music_cog.MusicRepository', return_value=MagicMock()):
+        cog = MusicCog(bot)
+
+    guild = MagicMock(id=1)
+    vc = MagicMock()
+    vc.source = CrossfadeSource(_Tone(1, 1000), fade_seconds=1)
+    first, second = {"url": "a"}, {"url": "b"}
+    cog.queue_service.add_tracks(1, [first, second])
+    nxt = _Tone(1, 100)
+    vc.source.queue_next(nxt)
+    cog._crossfade_pending[1] = {
+        "item": first, "player": nxt, "guild": guild, "voice_client": vc,
+        "source_kwargs": {"fade_seconds": 1.0, "fade_in": False, "fade_out": False},
+    }
+
+    cog.queue_service.add_track(1, {"url": "c"})
+    assert 1 in cog._crossfade_pending
+
+    cog.queue_service.move_track(1, 2, 1)
+    assert 1 not in cog._crossfade_pending
+    assert nxt.cleaned
+    assert vc.source.cancel_next() is None
+    cog._crossfade_tasks.pop(1).cancel()
+    for entry in cog.write_buffer._pending:
+        entry.discard()
+
+
+@pytest.mark.asyncio
+async def test_crossfade_switch_records_track_start():
+    bot = Mock(spec=discord.Client)
+    bot.loop = MagicMock()
+    with patch('discord_music_bot.cogs.slash_music_cog.MusicRepository', return_value=MagicMock()):
+        cog = MusicCog(bot)
+
+    guild = MagicMock(id=1)
+    item = {"url": "a"}
+    cog.queue_service.add_track(1, item)
+    player = MagicMock(original=None, start_timings={"resolve": 0.4, "ffmpeg_spawn": 0.2})
+    cog._crossfade_pending[1] = {
+        "item": item, "player": player, "guild": guild, "voice_client": MagicMock(),
+        "source_kwargs": {}, "started_at": 5.0, "prefetched": False,
+    }
+
+    with patch('discord_music_bot.cogs.slash_music_cog.instrumentation') as metrics:
+        cog._crossfade_switched(guild, cog._crossfade_pending[1]["voice_client"])
+
+    metrics.track_started.assert_called_once_with(1, player, 5.0, prefetched=False, crossfade=True)
+    assert cog.queue_service.get_queue(1) == []
+    for entry in cog.write_buffer._pending:
+        entry.discard()
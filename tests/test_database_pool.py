@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from discord_music_bot import database
+from discord_music_bot.repository import MusicRepository
+
+
+@pytest.fixture
+async def pool_db(tmp_path):
+    path = str(tmp_path / "pool.db")
+    with patch('discord_music_bot.database.DB_PATH', path):
+        await database.init_db()
+        yield path
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_pool_is_reused_between_calls(pool_db):
+    first = await database.get_pool()
+    second = await database.get_pool()
+    assert first is second
+    assert not first.closed
+    assert first.path == pool_db
+
+
+@pytest.mark.asyncio
+async def test_repository_does_not_open_new_connections(pool_db):
+    repo = MusicRepository()
+    with patch('discord_music_bot.database.aiosqlite.connect') as mock_connect:
+        await repo.save_guild_state(1, voice_channel_id=10, track_url="http://1")
+        await repo.save_queue(1, [{"url": "http://a", "title": "A"}])
+        assert (await repo.load_guild_state(1))["voice_channel_id"] == 10
+        assert len(await repo.load_queue(1)) == 1
+        mock_connect.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_pool_reopens_when_db_path_changes(pool_db, tmp_path):
+    old = await database.get_pool()
+    with patch('discord_music_bot.database.DB_PATH', str(tmp_path / "other.db")):
+        new = await database.get_pool()
+    assert new is not old
+    assert old.closed
+
+
+@pytest.mark.asyncio
+async def test_writer_rolls_back_on_error(pool_db):
+    pool = await database.get_pool()
+    with pytest.raises(RuntimeError):
+        async with pool.writer() as conn:
+            await conn.execute("INSERT INTO guild_state (guild_id) VALUES (42)")
+            raise RuntimeError("boom")
+    assert await MusicRepository().load_guild_state(42) is None
+
+
+@pytest.mark.asyncio
+async def test_failed_commit_does_not_leave_transaction_open(pool_db):
+    pool = await database.get_pool()
+    repo = MusicRepository()
+    with patch.object(pool._writer, "commit", side_effect=Exception("database is locked")):
+        with pytest.raises(Exception, match="locked"):
+            async with repo.batch():
+                await repo.save_guild_state(7, voice_channel_id=70)
+    assert not pool._writer.in_transaction
+    assert await repo.load_guild_state(7) is None
+
+    # Наступний пакет стартує свій BEGIN без "cannot start a transaction within a transaction"
+    async with repo.batch():
+        await repo.save_guild_state(8, voice_channel_id=80)
+    assert (await repo.load_guild_state(8))["voice_channel_id"] == 80
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_and_reads(pool_db):
+    repo = MusicRepository()
+    await repo.save_guild_state(1)
+    await asyncio.gather(*(
+        repo.add_history_track(1, {"url": f"http://{i}", "title": str(i)})
+        for i in range(20)
+    ))
+    results = await asyncio.gather(*(repo.get_history(1, limit=50) for _ in range(10)))
+    assert all(len(r) == 20 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_close_db_closes_pool(pool_db):
+    pool = await database.get_pool()
+    await database.close_db()
+    assert pool.closed
+    with pytest.raises(RuntimeError):
+        async with pool.reader():
+            pass
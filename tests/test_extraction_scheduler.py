@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+import pytest
+from discord_music_bot.services.extraction_scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_PLAYBACK,
+    ExtractionScheduler,
+    bind_guild,
+)
+
+
+async def _blocked(scheduler):
+    """Займає єдиний робочий потік, поки тест не відпустить gate."""
+    gate, started = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        gate.wait(5)
+
+    task = asyncio.create_task(scheduler.run(hold))
+    await asyncio.sleep(0)
+    assert await asyncio.to_thread(started.wait, 5)
+    return gate, task
+
+
+@pytest.mark.asyncio
+async def test_playback_jumps_ahead_of_background_jobs():
+    scheduler = ExtractionScheduler(workers=1)
+    gate, holder = await _blocked(scheduler)
+    order = []
+    jobs = [
+        asyncio.create_task(scheduler.run(order.append, f"bg{i}", priority=PRIORITY_BACKGROUND))
+        for i in range(3)
+    ]
+    jobs.append(asyncio.create_task(scheduler.run(order.append, "play", priority=PRIORITY_PLAYBACK)))
+    await asyncio.sleep(0)
+    assert scheduler.stats()["background"]["queued"] == 3
+
+    gate.set()
+    await asyncio.gather(holder, *jobs)
+    assert order == ["play", "bg0", "bg1", "bg2"]
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_guilds_are_served_round_robin():
+    scheduler = ExtractionScheduler(workers=1)
+    gate, holder = await _blocked(scheduler)
+    order = []
+
+    async def submit(guild_id, count):
+        bind_guild(guild_id)
+        await asyncio.gather(*(scheduler.run(order.append, (guild_id, i)) for i in range(count)))
+
+    # Гільдія 1 ставить у чергу багато завдань раніше за гільдію 2
+    busy = asyncio.create_task(submit(1, 4))
+    while scheduler.stats()["interactive"]["queued"] < 4:
+        await asyncio.sleep(0)
+    quiet = asyncio.create_task(submit(2, 1))
+    while scheduler.stats()["interactive"]["queued"] < 5:
+        await asyncio.sleep(0)
+
+    gate.set()
+    await asyncio.gather(holder, busy, quiet)
+    assert order[:2] == [(1, 0), (2, 0)]
+    assert [job for job in order if job[0] == 1] == [(1, i) for i in range(4)]
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_is_never_started():
+    scheduler = ExtractionScheduler(workers=1)
+    gate, holder = await _blocked(scheduler)
+    calls = []
+
+    expired = asyncio.create_task(scheduler.run(calls.append, "expired", guild_id=7))
+    await asyncio.sleep(0)
+    with pytest.raises(TimeoutError):
+        async with asyncio.timeout(0.01):
+            await expired
+
+    gate.set()
+    await holder
+    assert await scheduler.run(calls.append, "fresh") is None
+    assert calls == ["fresh"]
+    assert scheduler.stats()["interactive"]["cancelled"] == 1
+    scheduler.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_stats_report_wait_and_service_time():
+    scheduler = ExtractionScheduler(workers=2)
+
+    def boom():
+        raise RuntimeError("extractor failed")
+
+    assert await scheduler.run(time.sleep, 0.02, priority=PRIORITY_PLAYBACK) is None
+    with pytest.raises(RuntimeError):
+        await scheduler.run(boom, priority=PRIORITY_INTERACTIVE)
+
+    stats = scheduler.stats()
+    assert stats["workers"] == 2 and stats["running"] == 0
+    assert stats["playback"]["completed"] == 1
+    assert stats["playback"]["service_avg_ms"] >= 15
+    assert stats["playback"]["wait_max_ms"] >= 0
+    assert stats["interactive"]["failed"] == 1
+    assert stats["background"]["submitted"] == 0
+    with pytest.raises(ValueError):
+        await scheduler.run(boom, priority=42)
+    scheduler.shutdown()
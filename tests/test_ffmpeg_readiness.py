@@ -0,0 +1,72 @@
+import io
+import os
+import struct
+import subprocess
+import time
+from unittest.mock import patch
+import pytest
+from discord_music_bot import consts
+from discord_music_bot.audio_source import OpusPipeSource, StderrTail, YTDLPPipeSource, YTDLSource
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="POSIX shell")
+
+_popen = subprocess.Popen
+
+
+def _fake_ffmpeg(script):
+    """Popen, що замість ffmpeg запускає shell-скрипт (аргументи команди ігноруються)."""
+    return lambda cmd, **kwargs: _popen(["sh", "-c", script], **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_first_frame_marks_pipe_ready():
+    script = f"sleep 0.2; head -c {YTDLPPipeSource.FRAME_SIZE} /dev/zero; sleep 5"
+    with patch("subprocess.Popen", side_effect=_fake_ffmpeg(script)):
+        started = time.perf_counter()
+        source, process = await YTDLSource._start_pipe("http://stream", "anull")
+    try:
+        assert isinstance(source, YTDLPPipeSource)
+        assert time.perf_counter() - started >= 0.2
+        assert process.poll() is None and source.buffered_frames == 1
+    finally:
+        source.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_slow_failure_is_rejected_with_stderr():
+    # Падіння через 0.4 с: фіксована пауза 0.3 с пропустила б такий ffmpeg як живий
+    script = "echo 'HTTP error 403 Forbidden' >&2; sleep 0.4; exit 1"
+    with patch("subprocess.Popen", side_effect=_fake_ffmpeg(script)):
+        source, process = await YTDLSource._start_pipe("http://stream", "anull", opus=True)
+    assert source is None and process.returncode == 1
+    assert "403 Forbidden" in YTDLPPipeSource._read_stderr(process, "ffmpeg")
+
+
+@pytest.mark.asyncio
+async def test_silent_ffmpeg_is_stopped_after_timeout():
+    with patch("subprocess.Popen", side_effect=_fake_ffmpeg("sleep 30")), \
+         patch.object(consts, "FFMPEG_READY_TIMEOUT", 0.2):
+        source, process = await YTDLSource._start_pipe("http://stream", "anull")
+    assert source is None
+    assert process.wait(timeout=2) is not None
+
+
+def test_stderr_tail_keeps_last_lines():
+    stream = io.BytesIO(b"".join(f"line {i}\n".encode() for i in range(500)) + b"x" * 5000)
+    tail = StderrTail(stream, max_lines=10)
+    lines = tail.text(wait=2).splitlines()
+    assert len(lines) == 10
+    assert lines[0] == "line 491" and lines[-1] == "x" * StderrTail.MAX_LINE
+
+
+@pytest.mark.asyncio
+async def test_opus_ready_on_first_packet():
+    read_fd, write_fd = os.pipe()
+    process = type("P", (), {"stdout": os.fdopen(read_fd, "rb"), "stderr": None, "poll": lambda self: None})()
+    source = OpusPipeSource(process)
+    assert await source.wait_ready(0.05) is False
+    page = b"OggS" + struct.pack("<BBQIIIB", 0, 0, 0, 1, 2, 0, 1) + bytes([3]) + b"\x01\x02\x03"
+    os.write(write_fd, page)
+    assert await source.wait_ready(2) is True
+    os.close(write_fd)
+    source.cleanup()
@@ -0,0 +1,187 @@
+import array
+import io
+import time
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from discord_music_bot import consts
+from discord_music_bot.audio_source import FFmpegPipeline, YTDLSource
+from discord_music_bot.loudness_cache import LoudnessCache, loudness_cache, parse_loudnorm_stats
+
+PAGE = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+LOUDNORM_STDERR = b"""[Parsed_loudnorm_1 @ 0x55d5c1c0]
+{
+\t"input_i" : "-23.10",
+\t"input_tp" : "-4.20",
+\t"input_lra" : "7.50",
+\t"input_thresh" : "-33.40",
+\t"output_i" : "-16.02",
+\t"target_offset" : "0.02"
+}
+"""
+
+
+def _pcm(values):
+    return b"".join(array.array("h", [v] * 1920).tobytes() for v in values)
+
+
+def _level(frame):
+    return array.array("h", frame)[0]
+
+
+def _process(stdout, poll=None):
+    proc = Mock()
+    proc.stdout = stdout
+    proc.stderr = None
+    proc.poll.return_value = poll
+    proc.returncode = poll
+    return proc
+
+
+def _af(popen_call):
+    cmd = popen_call.args[0]
+    return cmd[cmd.index("-af") + 1]
+
+
+@pytest.mark.asyncio
+async def test_volume_is_applied_by_ffmpeg_not_per_frame():
+    track = {"url": PAGE, "title": "Song", "duration": 100}
+    proc = _process(io.BytesIO(_pcm([1000] * 3)))
+    with patch("discord_music_bot.audio_source.extract_stream_url", return_value=("http://stream", track)), \
+         patch("subprocess.Popen", return_value=proc) as popen, \
+         patch("discord_music_bot.audio_source.asyncio.sleep", new_callable=AsyncMock):
+        player = await YTDLSource.from_track_dict(track, volume=0.3)
+
+    assert "volume=0.300" in _af(popen.call_args)
+    player.original._eof.wait(1)
+    # Кадр іде як є: масштабування вже зробив ffmpeg
+    assert _level(player.read()) == 1000
+    assert player.volume == 0.3
+    player.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_volume_change_restarts_ffmpeg_from_current_position():
+    track = {"url": PAGE, "title": "Song", "duration": 100}
+    first = _process(io.BytesIO(_pcm([1] * 50)))
+    second = _process(io.BytesIO(_pcm(range(100, 150))))
+    with patch("discord_music_bot.audio_source.extract_stream_url", return_value=("http://stream", track)), \
+         patch("subprocess.Popen", side_effect=[first, second]) as popen, \
+         patch("discord_music_bot.audio_source.asyncio.sleep", new_callable=AsyncMock):
+        player = await YTDLSource.from_track_dict(track, volume=0.5)
+        player.original._eof.wait(1)
+        for _ in range(10):
+            assert _level(player.read()) == 1
+
+        player.volume = 1.0
+        player.volume = 1.0  # повторне значення не запускає ще один процес
+        await player._restart_task
+
+    restart_cmd = popen.call_args_list[1].args[0]
+    assert restart_cmd[restart_cmd.index("-ss") + 1] == "0.200"
+    assert "volume=" not in _af(popen.call_args_list[1])
+    assert popen.call_count == 2
+
+    new_source = player._pending[0]
+    new_source._eof.wait(1)
+    # Відтворення пішло далі, поки новий ffmpeg стартував, — зайві кадри відкидаються
+    for _ in range(3):
+        player.original.read()
+    assert _level(player.read()) == 103
+    assert player.original is new_source
+    assert player.position_frames() == 14
+    first.kill.assert_called()  # старий ffmpeg зупинено після підміни
+    assert player.restarts == 1
+    player.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_restart_slower_than_ring_buffer_still_catches_up():
+    track = {"url": PAGE, "title": "Song", "duration": 100}
+    first = _process(io.BytesIO(_pcm([1] * 2000)))
+    # Кадр нового ffmpeg несе свою позицію в треку (+10000), старт — з кадру 10
+    second = _process(io.BytesIO(_pcm(range(10010, 12000))))
+    with patch("discord_music_bot.audio_source.extract_stream_url", return_value=("http://stream", track)), \
+         patch("subprocess.Popen", side_effect=[first, second]):
+        player = await YTDLSource.from_track_dict(track, volume=0.5)
+        for _ in range(10):
+            player.read()
+        player.volume = 1.0
+        await player._restart_task
+
+    # Поки ffmpeg стартував, відтворення пішло на 400 кадрів — більше за кільцевий буфер
+    for _ in range(400):
+        player.original.read()
+    new_source = player._pending[0]
+    for _ in range(500):
+        if player.original is new_source:
+            break
+        player.read()
+        time.sleep(0.002)
+    assert player.original is new_source
+    assert player.volume == player._applied_volume == 1.0
+    position = player.position_frames()
+    assert _level(player.read()) == 10000 + position
+    player.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_resume_offset_and_seek_restart_ffmpeg_before_input():
+    track = {"url": PAGE, "title": "Song", "duration": 300}
+    first = _process(io.BytesIO(_pcm([1] * 50)))
+    second = _process(io.BytesIO(_pcm(range(200, 250))))
+    with patch("discord_music_bot.audio_source.extract_stream_url", return_value=("http://stream", track)), \
+         patch("subprocess.Popen", side_effect=[first, second]) as popen:
+        player = await YTDLSource.from_track_dict(dict(track, start_at=30.0), volume=1.0)
+        for _ in range(5):
+            assert _level(player.read()) == 1
+        assert player.position_frames() == 30 * 50 + 5
+
+        assert await player.seek(60) is True
+        # Позиція — ціль seek, навіть поки потік плеєра не підхопив новий ffmpeg
+        assert player.position_frames() == 60 * 50
+
+    for call, offset in zip(popen.call_args_list, ("30.000", "60.000")):
+        cmd = call.args[0]
+        assert cmd[cmd.index("-ss") + 1] == offset and cmd.index("-ss") < cmd.index("-i")
+        assert "stream" in cmd[cmd.index("-i") + 1]
+    # Після seek кадри не відкидаються: перший кадр нового ffmpeg — з позиції 60 с
+    assert _level(player.read()) == 200
+    assert player.original is not None and player.position_seconds() == pytest.approx(60.02)
+    first.kill.assert_called()
+    player.cleanup()
+
+
+def test_loudnorm_measurements_switch_to_linear_mode():
+    cache = LoudnessCache(max_entries=2)
+    assert parse_loudnorm_stats("no stats here") is None
+    assert parse_loudnorm_stats('{"input_i": "-inf", "input_tp": "-inf"}') is None
+    assert "print_format=json" in cache.filter_for(PAGE)
+
+    assert cache.record(PAGE, LOUDNORM_STDERR.decode())
+    linear = cache.filter_for(PAGE)
+    assert "measured_I=-23.1" in linear
+    assert "offset=0.02" in linear
+    assert "linear=true" in linear
+
+
+@pytest.mark.asyncio
+async def test_full_playback_records_loudness():
+    track = {"url": PAGE, "title": "Song", "duration": 100}
+    proc = _process(io.BytesIO(_pcm([1] * 2)))
+    loudness_cache.clear()
+    with patch("discord_music_bot.audio_source.extract_stream_url", return_value=("http://stream", track)), \
+         patch("subprocess.Popen", return_value=proc) as popen, \
+         patch("discord_music_bot.audio_source.asyncio.sleep", new_callable=AsyncMock), \
+         patch.object(consts, "LOUDNORM_ENABLED", True):
+        player = await YTDLSource.from_track_dict(track, volume=1.0)
+        assert "loudnorm=I=-16.0" in _af(popen.call_args)
+        assert isinstance(player._pipeline, FFmpegPipeline) and player._pipeline.measuring
+
+        proc.poll.return_value = proc.returncode = 0
+        proc.stderr = io.BytesIO(LOUDNORM_STDERR)
+        player.original._eof.wait(1)
+        while player.read():
+            pass
+        assert "linear=true" in loudness_cache.filter_for(PAGE)
+    loudness_cache.clear()
+    player.cleanup()
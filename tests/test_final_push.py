@@ -55,7 +55,7 @@ async def test_auto_resume_voice_not_found(mock_cog):
     guild.get_channel.return_value = None # Voice channel missing
     bot.get_guild.return_value = guild
     with patch('discord_music_bot.database.get_connection', AsyncMock()):
-        mock_cog.repository.get_all_active_guilds.return_value = [{'guild_id': 123, 'voice_channel_id': 456, 'text_channel_id': 789, 'current_track_url': 'test'}]
+        mock_cog.repository.get_resume_snapshots.return_value = [{'guild_id': 123, 'voice_channel_id': 456, 'text_channel_id': 789, 'current_track_url': 'test'}]
     await auto_resume(bot, mock_cog)
     mock_cog.repository.clear_guild_state.assert_called_with(123) # Line 68
 
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock
 from discord_music_bot.services.history_service import HistoryService
 from discord_music_bot.repository import MusicRepository
 from discord_music_bot import consts
@@ -15,11 +15,11 @@ def mock_repo():
 
 @pytest.fixture
 def history_service(mock_repo):
-    def mock_ensure_future(coro, *args, **kwargs):
-        coro.close()
-        
-    with patch("discord_music_bot.services.history_service.asyncio.ensure_future", side_effect=mock_ensure_future):
-        yield HistoryService(mock_repo)
+    service = HistoryService(mock_repo)
+    yield service
+    # Синхронні тести не мають event loop — відкладені записи так і не скидаються
+    for pending in service._writes._pending:
+        pending.discard()
 
 def test_add_to_history(history_service):
     track = {"title": "Test"}
@@ -2,9 +2,8 @@ import pytest
 import os
 import aiosqlite
 import logging
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
-from discord_music_bot import utils, config, database, healthcheck
-import asyncio
+from unittest.mock import patch
+from discord_music_bot import utils, config, database
 import subprocess
 
 # --- utils.py tests ---
@@ -62,52 +61,3 @@ async def test_init_db_logs(tmp_path):
          patch('discord_music_bot.database.logger') as mock_logger:
         await database.init_db()
         mock_logger.info.assert_called()
-
-# --- healthcheck.py tests ---
-@pytest.mark.asyncio
-async def test_cleanup_zombie_task_cancelled():
-    with patch('discord_music_bot.healthcheck.logger') as mock_logger:
-        with patch('asyncio.sleep', side_effect=asyncio.CancelledError()):
-            await healthcheck.cleanup_zombie_processes(1)
-            mock_logger.info.assert_called_with("Zombie cleanup task cancelled.")
-
-@pytest.mark.asyncio
-async def test_cleanup_zombie_general_error():
-    with patch('discord_music_bot.healthcheck.logger') as mock_logger:
-        # Raise error after one iteration
-        sleep_mock = AsyncMock(side_effect=[None, Exception("Cleanup Fail"), asyncio.CancelledError()])
-        with patch('asyncio.sleep', sleep_mock), \
-             patch('discord_music_bot.healthcheck._kill_zombie_processes', return_value=0):
-            await healthcheck.cleanup_zombie_processes(1)
-            mock_logger.error.assert_called()
-
-def test_kill_zombie_windows_edge_cases():
-    with patch('os.name', 'nt'), \
-         patch('subprocess.run') as mock_run:
-        # 1. Empty lines
-        mock_run.return_value = Mock(stdout=' \n \n ')
-        healthcheck._kill_zombie_processes()
-        
-        # 2. taskkill failure
-        mock_run.side_effect = [
-            Mock(stdout='"yt-dlp.exe","1234","Running"'),
-            Exception("Taskkill failed")
-        ]
-        healthcheck._kill_zombie_processes()
-
-def test_kill_zombie_linux_edge_cases():
-    with patch('os.name', 'posix'), \
-         patch('subprocess.run') as mock_run:
-        # 1. Empty lines
-        mock_run.return_value = Mock(stdout=' \n ')
-        healthcheck._kill_zombie_processes()
-        
-        # 2. process lookup error
-        mock_run.return_value = Mock(stdout=' 1234 1 Z yt-dlp')
-        with patch('os.kill', side_effect=ProcessLookupError()):
-            healthcheck._kill_zombie_processes()
-
-def test_start_zombie_cleanup():
-    loop = MagicMock()
-    healthcheck.start_zombie_cleanup(loop, 100)
-    loop.create_task.assert_called()
@@ -0,0 +1,124 @@
+import asyncio
+import io
+import threading
+import time
+import urllib.request
+from http.server import HTTPServer
+from unittest.mock import MagicMock, patch
+import pytest
+from discord_music_bot import instrumentation as instr
+from discord_music_bot.audio_source import YTDLPPipeSource
+
+
+def _pipe_source(data: bytes, running: bool = True):
+    ffmpeg = MagicMock()
+    ffmpeg.stdout = io.BytesIO(data)
+    ffmpeg.poll.return_value = None if running else 0
+    source = YTDLPPipeSource(None, ffmpeg)
+    source._eof.wait(1)
+    return source
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = instr.Histogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.observe(value)
+    assert h.render("x_seconds", {"guild": "1"}) == [
+        'x_seconds_bucket{guild="1",le="0.1"} 1',
+        'x_seconds_bucket{guild="1",le="1.0"} 3',
+        'x_seconds_bucket{guild="1",le="+Inf"} 4',
+        'x_seconds_sum{guild="1"} 4.25',
+        'x_seconds_count{guild="1"} 4',
+    ]
+
+
+def test_pipe_source_frame_timing_and_track_start_stages():
+    metrics = instr.Instrumentation()
+    # 2.5 кадри: два повні, один неповний (доповнюється тишею), далі кінець
+    source = _pipe_source(b"\x01" * (YTDLPPipeSource.FRAME_SIZE * 5 // 2), running=False)
+    player = MagicMock(original=source, start_timings={"resolve": 0.8, "ffmpeg_spawn": 0.3})
+    player.played_at = time.perf_counter()
+
+    metrics.track_started(7, player, player.played_at - 1.0, prefetched=False)
+    assert source.read() == b"\x01" * YTDLPPipeSource.FRAME_SIZE
+    source.read()
+    assert len(source.read()) == YTDLPPipeSource.FRAME_SIZE
+    assert source.read() == b""
+
+    stats = metrics.guild_audio(7)
+    assert stats.counts == {"frame": 2, "underrun": 0, "startup": 0, "short": 1}
+    assert stats.read_latency.count == 3 and stats.frame_interval.count == 2
+    assert source.stats()["short_frames"] == 1
+    for stage in instr.STAGES:
+        assert metrics.stages[stage].count == 1
+    assert metrics.stages[instr.STAGE_TOTAL].snapshot()[1] >= 1.0
+
+    # Підготовлене джерело: лише first_frame/total, без resolve/ffmpeg_spawn
+    prepared = MagicMock(original=_pipe_source(b"\x01" * YTDLPPipeSource.FRAME_SIZE), start_timings={"resolve": 2.0})
+    prepared.played_at = time.perf_counter()
+    prepared.original.read()  # потік плеєра встиг прочитати кадр до track_started
+    metrics.track_started(7, prepared, prepared.played_at, prefetched=True)
+    assert metrics.stages[instr.STAGE_RESOLVE].count == 1
+    assert metrics.stages[instr.STAGE_FIRST_FRAME].count == 2
+    assert metrics.track_starts == {"cold": 1, "prefetched": 1, "crossfade": 0}
+
+    text = metrics.render()
+    assert 'musicbot_audio_frames_total{guild="7",kind="short"} 1' in text
+    assert 'musicbot_track_start_stage_seconds_count{stage="resolve"} 1' in text
+
+    # Перехід кросфейдом: власний шлях, resolve/ffmpeg_spawn без first_frame/total
+    faded = MagicMock(original=_pipe_source(b""), start_timings={"resolve": 0.5, "ffmpeg_spawn": 0.1})
+    metrics.track_started(7, faded, time.perf_counter(), prefetched=False, crossfade=True)
+    assert metrics.stages[instr.STAGE_RESOLVE].count == 2
+    assert metrics.stages[instr.STAGE_TOTAL].count == 2
+    assert faded.original.frame_timer is not None
+    assert 'musicbot_track_starts_total{path="crossfade"} 1' in metrics.render()
+
+
+def test_underruns_are_counted_per_guild():
+    metrics = instr.Instrumentation()
+    ffmpeg = MagicMock()
+    ffmpeg.poll.return_value = None
+    gate = threading.Event()
+    ffmpeg.stdout.readinto1 = lambda view: gate.wait(5) and 0
+    source = YTDLPPipeSource(None, ffmpeg)
+    source.frame_timer = metrics.attach(3, MagicMock(original=source))
+    source.frames = 1  # трек уже грав — тиша тепер underrun, а не стартова
+    assert source.read() == YTDLPPipeSource.SILENCE
+    gate.set()
+    source.cleanup()
+    assert metrics.guild_audio(3).counts["underrun"] == 1
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_probe_sees_blocking_call():
+    metrics = instr.Instrumentation()
+    metrics.start_loop_probe(interval=0.01)
+    metrics.start_loop_probe(interval=0.01)  # no-op
+    await asyncio.sleep(0.03)
+    time.sleep(0.15)  # блокуючий виклик у корутині
+    await asyncio.sleep(0.03)
+    metrics.stop_loop_probe()
+    assert metrics.loop_lag.count >= 2
+    assert metrics.loop_lag_max >= 0.1
+
+
+def test_health_server_exports_metrics():
+    with patch('dotenv.load_dotenv'), \
+         patch('os.path.exists', return_value=False), \
+         patch('os.makedirs'), \
+         patch('atexit.register'), \
+         patch('builtins.open', MagicMock()), \
+         patch('discord_music_bot.process_supervisor.process_supervisor.start'):
+        import main
+    server = HTTPServer(('127.0.0.1', 0), main._HealthHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5) as resp:
+            body = resp.read().decode()
+            assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    finally:
+        server.shutdown()
+    assert "# TYPE musicbot_event_loop_lag_seconds histogram" in body
+    assert 'musicbot_track_start_stage_seconds_bucket{stage="first_frame",le="+Inf"}' in body
@@ -10,7 +10,7 @@ with patch('dotenv.load_dotenv'):
          patch('os.makedirs'), \
          patch('atexit.register'), \
          patch('builtins.open', MagicMock()), \
-         patch('discord_music_bot.healthcheck.start_zombie_cleanup'):
+         patch('discord_music_bot.process_supervisor.process_supervisor.start'):
         import main
         import discord
         from discord.ext import commands
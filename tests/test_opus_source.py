@@ -0,0 +1,94 @@
+import io
+import os
+import struct
+import pytest
+from unittest.mock import Mock, patch
+from discord.opus import OPUS_SILENCE
+from discord_music_bot.audio_source import OpusPipeSource, YTDLOpusSource, YTDLSource, YTDLPPipeSource
+
+
+def _ogg_page(packets, pagenum):
+    segtable = b""
+    for packet in packets:
+        segtable += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    header = struct.pack("<BBQIIIB", 0, 0, 0, 1, pagenum, 0, len(segtable))
+    return b"OggS" + header + segtable + b"".join(packets)
+
+
+def _process(stdout, poll=None):
+    proc = Mock()
+    proc.stdout = stdout
+    proc.stderr = None
+    proc.poll.return_value = poll
+    proc.returncode = poll
+    return proc
+
+
+def test_opus_source_emits_packets_and_skips_headers():
+    audio = [bytes([i]) * 300 for i in range(1, 4)]
+    data = (
+        _ogg_page([b"OpusHead" + b"\x00" * 11], 0)
+        + _ogg_page([b"OpusTags" + b"\x00" * 8], 1)
+        + _ogg_page(audio, 2)
+    )
+    source = OpusPipeSource(_process(io.BytesIO(data), poll=0))
+    assert source.is_opus()
+    source._eof.wait(1)
+    assert [source.read() for _ in range(3)] == audio
+    assert source.read() == b""
+    assert source.stats()["frames"] == 3
+
+
+def test_opus_source_underrun_returns_silence():
+    read_fd, write_fd = os.pipe()
+    source = OpusPipeSource(_process(os.fdopen(read_fd, "rb")))
+    try:
+        # ffmpeg живий, але пакетів ще немає — read() не блокується
+        assert source.read() == OPUS_SILENCE
+        assert source.stats()["startup_frames"] == 1
+    finally:
+        source.cleanup()
+        os.close(write_fd)
+
+
+def test_opus_source_volume_is_fixed_for_track():
+    source = YTDLOpusSource(Mock(), data={"title": "T", "webpage_url": "u", "duration": 10}, volume=0.5)
+    source.volume = 0.5
+    source.volume = 1.2
+    assert source.volume == 1.2
+    assert source.is_opus()
+
+
+@pytest.mark.asyncio
+async def test_from_track_dict_falls_back_to_pcm_without_libopus():
+    track = {"url": "http://test", "title": "Test", "duration": 100}
+    dead = _process(io.BytesIO(b""), poll=1)
+    dead.stderr = io.BytesIO(b"Unknown encoder 'libopus'")
+    alive = _process(io.BytesIO(b"\x00" * YTDLPPipeSource.FRAME_SIZE), poll=None)
+    with patch("discord_music_bot.audio_source.extract_stream_url", return_value=("http://stream", track)), \
+         patch("subprocess.Popen", side_effect=[dead, alive]) as popen, \
+         patch("asyncio.sleep"), \
+         patch.object(YTDLSource, "_opus_available", True):
+        player = await YTDLSource.from_track_dict(track, opus=True, volume=0.8)
+        assert isinstance(player, YTDLSource)
+        assert isinstance(player.original, YTDLPPipeSource)
+        assert YTDLSource._opus_available is False
+
+    opus_cmd = popen.call_args_list[0].args[0]
+    assert opus_cmd[opus_cmd.index("-c:a") + 1] == "libopus"
+    assert "volume=0.800" in opus_cmd[opus_cmd.index("-af") + 1]
+    assert "s16le" in popen.call_args_list[1].args[0]
+    player.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_from_track_dict_opus_path():
+    track = {"url": "http://test", "title": "Test", "duration": 100}
+    with patch("discord_music_bot.audio_source.extract_stream_url", return_value=("http://stream", track)), \
+         patch("subprocess.Popen", return_value=_process(io.BytesIO(_ogg_page([b"\x01" * 300], 2)), poll=None)), \
+         patch("asyncio.sleep"), \
+         patch.object(YTDLSource, "_opus_available", True):
+        player = await YTDLSource.from_track_dict(track, opus=True)
+    assert isinstance(player, YTDLOpusSource)
+    assert player.title == "Test"
+    player.cleanup()
@@ -0,0 +1,137 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import pytest
+from discord_music_bot import ytdlp_config
+from discord_music_bot.piped_client import PipedClient
+
+STREAMS = {
+    "title": "Song",
+    "duration": 200,
+    "audioStreams": [
+        {"url": "http://media/low", "mimeType": "audio/mp4", "bitrate": 128000},
+        {"url": "http://media/opus", "mimeType": "audio/webm; codecs=opus", "bitrate": 96000},
+    ],
+}
+
+
+class _StubPiped(BaseHTTPRequestHandler):
+    """Кілька «інстансів» на одному сервері: /fast, /slow, /broken — префікси шляху."""
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        instance = self.path.split("/")[1]
+        self.server.hits.append(instance)
+        if instance == "dropping":
+            # Закриває keep-alive з'єднання після відповіді, не попереджаючи клієнта
+            self.close_connection = True
+        if instance == "slow":
+            time.sleep(1.0)
+        if instance == "broken":
+            self._reply(502, {"error": "bad gateway"})
+            return
+        self._reply(200, {**STREAMS, "served_by": instance})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubPiped)
+    server.daemon_threads = True
+    server.hits = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server, base
+    server.shutdown()
+    server.server_close()
+
+
+def _dead_base():
+    """Порт, на якому ніхто не слухає, — з'єднання відхиляється одразу."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def test_slow_instance_is_hedged(stub):
+    server, base = stub
+    client = PipedClient()
+    started = time.monotonic()
+    winner, data = client.get_json([f"{base}/slow", f"{base}/fast"], "/streams/x")
+    elapsed = time.monotonic() - started
+
+    assert winner == f"{base}/fast" and data["served_by"] == "fast"
+    # Другий запит пішов після PIPED_HEDGE_DEFAULT_DELAY, не чекаючи повільний інстанс
+    assert elapsed < 0.9
+    assert client.stats()["hedges"] == 1
+    assert server.hits[:2] == ["slow", "fast"]
+    client.close()
+
+
+def test_dead_instances_are_skipped_and_circuit_broken(stub):
+    server, base = stub
+    dead, broken, fast = _dead_base(), f"{base}/broken", f"{base}/fast"
+    client = PipedClient()
+    winner, _ = client.get_json([dead, broken, fast], "/streams/x")
+    assert winner == fast
+    # Здоровий інстанс тепер першим
+    assert client.ordered([dead, broken, fast])[0] == fast
+
+    for _ in range(3):
+        client.get_json([broken], "/streams/x")
+    assert broken not in client.ordered([dead, broken, fast])
+    assert client.stats()["instances"][broken]["open"] is True
+    hits = len(server.hits)
+    assert client.get_json([broken], "/streams/x") == (None, None)
+    assert len(server.hits) == hits  # відкритий breaker — жодного запиту
+    client.close()
+
+
+def test_connections_are_kept_alive(stub):
+    _, base = stub
+    client = PipedClient()
+    for _ in range(3):
+        assert client.get_json([f"{base}/fast"], "/streams/x")[0] is not None
+    stats = client.stats()
+    assert stats["connections_created"] == 1
+    assert stats["connections_reused"] == 2
+    assert stats["instances"][f"{base}/fast"]["p50_ms"] > 0
+    client.close()
+
+
+def test_stale_keep_alive_connection_is_retried_without_penalty(stub):
+    _, base = stub
+    client = PipedClient()
+    for _ in range(4):
+        assert client.get_json([f"{base}/dropping"], "/streams/x")[0] == f"{base}/dropping"
+    stats = client.stats()
+    assert stats["connections_stale"] == 3
+    health = stats["instances"][f"{base}/dropping"]
+    assert health["error_rate"] == 0 and health["open"] is False
+    client.close()
+
+
+def test_fetch_piped_stream_uses_health_ordered_client(stub, monkeypatch):
+    _, base = stub
+    monkeypatch.delenv("PIPED_API_URL", raising=False)
+    client = PipedClient()
+    with patch.object(ytdlp_config, "piped_client", client), \
+         patch.object(ytdlp_config, "PIPED_INSTANCES", (_dead_base(), f"{base}/fast")):
+        url, meta = ytdlp_config.fetch_piped_stream("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+    assert url == "http://media/opus"
+    assert meta["title"] == "Song" and meta["duration"] == 200
+    client.close()
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+import discord
+import pytest
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+from discord_music_bot.cogs.slash_music_cog import MusicCog
+from discord_music_bot.services.source_service import SourceService
+
+
+def _entries(count, pulled):
+    for i in range(count):
+        pulled.append(i)
+        yield {"ie_key": "Youtube", "url": f"vid{i:08d}xyz"[:11], "title": f"T{i}", "duration": 100 + i}
+
+
+@pytest.mark.asyncio
+async def test_iter_playlist_pages_lazily():
+    pulled = []
+    service = SourceService()
+    with patch("yt_dlp.YoutubeDL") as mock_ydl, \
+         patch("discord_music_bot.consts.PLAYLIST_BATCH_SIZE", 10):
+        ydl = mock_ydl.return_value.__enter__.return_value
+        ydl.extract_info.side_effect = [
+            {"_type": "url", "url": "https://www.youtube.com/playlist?list=PL1", "ie_key": "YoutubeTab"},
+            {"_type": "playlist", "title": "Mix", "entries": _entries(100, pulled)},
+        ]
+        stream = service.iter_playlist("https://www.youtube.com/watch?v=x&list=PL1", limit=25)
+
+        title, first = await stream.__anext__()
+        # Перший трек готовий, а решта плейлиста ще не читалась
+        assert title == "Mix"
+        assert [t["title"] for t in first] == ["T0"]
+        assert first[0]["thumbnail"].startswith("https://i.ytimg.com/vi/")
+        assert len(pulled) == 1
+
+        sizes = [len(batch) async for _, batch in stream]
+    assert sizes == [10, 10, 4]
+    assert ydl.extract_info.call_args_list[1].kwargs["ie_key"] == "YoutubeTab"
+    assert all(call.kwargs["process"] is False for call in ydl.extract_info.call_args_list)
+
+
+@pytest.mark.asyncio
+async def test_fill_playlist_metadata_is_bounded():
+    tracks = [{"url": f"https://soundcloud.com/artist/song-{i}", "title": "x", "duration": None} for i in range(8)]
+    tracks.append({"url": "https://soundcloud.com/artist/known", "title": "Known", "duration": 10})
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def metadata(url):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return {"title": url.rsplit("/", 1)[-1], "duration": 60, "thumbnail": "thumb"}
+
+    with patch("discord_music_bot.consts.PLAYLIST_METADATA_WORKERS", 2):
+        service = SourceService()
+    with patch.object(service, "_entry_metadata", side_effect=metadata) as entry_metadata:
+        assert await service.fill_playlist_metadata(tracks) == 8
+    assert peak[0] <= 2
+    assert entry_metadata.call_count == 8
+    assert tracks[3] == {"url": tracks[3]["url"], "title": "song-3", "duration": 60, "thumbnail": "thumb"}
+    assert tracks[-1]["title"] == "Known"
+
+
+def test_soundcloud_entry_gets_placeholder_title():
+    track = SourceService._playlist_track({"url": "https://soundcloud.com/some-artist/night-drive"})
+    assert track["title"] == "some-artist — night drive"
+    assert track["duration"] is None
+    assert track["thumbnail"] is None
+
+
+@pytest.mark.asyncio
+async def test_playback_starts_before_playlist_finishes_loading():
+    bot = Mock(spec=discord.Client)
+    bot.loop = MagicMock()
+    with patch("discord_music_bot.cogs.slash_music_cog.MusicRepository", return_value=MagicMock()):
+        cog = MusicCog(bot)
+    cog.queue_service = Mock()
+    cog.player_service = Mock()
+    cog.player_service.is_playing.return_value = False
+    cog.player_service.is_paused.return_value = False
+    cog.update_player = AsyncMock()
+    cog.play_next_song = AsyncMock()
+    cog.source_service = Mock()
+    cog.source_service.fill_playlist_metadata = AsyncMock(return_value=1)
+    started_before_rest = []
+
+    async def playlist(query, limit):
+        yield "Mix", [{"url": "u0", "duration": None}]
+        await asyncio.sleep(0)
+        started_before_rest.append(cog.play_next_song.await_count == 1)
+        yield "Mix", [{"url": f"u{i}", "duration": 100} for i in range(1, 26)]
+
+    cog.source_service.iter_playlist = playlist
+    interaction = MagicMock()
+    interaction.followup.send = AsyncMock()
+    await cog._enqueue_playlist(interaction, MagicMock(), "https://www.youtube.com/playlist?list=PL1")
+    await asyncio.gather(*cog._metadata_tasks)
+
+    assert started_before_rest == [True]
+    assert cog.queue_service.add_tracks.call_count == 2
+    assert "**26**" in interaction.followup.send.await_args.args[0]
+    cog.queue_service.tracks_updated.assert_called_with(interaction.guild.id)
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from discord_music_bot.repository import MusicRepository
+from discord_music_bot.services.queue_service import QueueService
+from discord_music_bot.services.prefetch_service import PrefetchService
+from discord_music_bot.services.write_buffer import WriteBehindBuffer
+
+
+def _track(video_id):
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    return {"url": url, "webpage_url": url, "title": video_id, "duration": 200}
+
+
+@pytest.fixture
+def queue():
+    repo = AsyncMock(spec=MusicRepository)
+    repo.batch = MagicMock()
+    service = QueueService(repo, WriteBehindBuffer(repo, flush_interval=10))
+    yield service
+    for entry in service._writes._pending:
+        entry.discard()
+
+
+@pytest.fixture
+def resolve():
+    with patch(
+        "discord_music_bot.services.prefetch_service.YTDLSource.resolve_stream_url",
+        new_callable=AsyncMock,
+        return_value=("http://media", {}, False),
+    ) as mock:
+        yield mock
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_resolves_next_track_before_current_ends(queue, resolve):
+    prefetch = PrefetchService(queue, resolve_lead=60)
+    queue.add_tracks(1, [_track("aaaaaaaaaaa"), _track("bbbbbbbbbbb")])
+    current = queue.get_next_track(1)
+    # Трек довший за lead — розв'язання відкладене
+    prefetch.track_started(1, 3600)
+    await _settle()
+    resolve.assert_not_awaited()
+
+    prefetch.track_started(1, 30)
+    await _settle()
+    resolve.assert_awaited_once()
+    assert resolve.await_args.args[0] == queue.peek_next(1)["webpage_url"]
+    assert current["title"] == "aaaaaaaaaaa"
+
+    nxt = queue.get_next_track(1)
+    assert await prefetch.take(1, nxt) is None
+    assert prefetch.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_changes_redo_prefetch(queue, resolve):
+    prefetch = PrefetchService(queue)
+    queue.add_tracks(1, [_track("aaaaaaaaaaa"), _track("bbbbbbbbbbb"), _track("ccccccccccc")])
+    queue.get_next_track(1)
+    prefetch.track_started(1, None)
+    await _settle()
+    assert resolve.await_args.args[0].endswith("bbbbbbbbbbb")
+
+    queue.move_track(1, 2, 1)
+    await _settle()
+    assert resolve.await_args.args[0].endswith("ccccccccccc")
+
+    queue.push_front(1, _track("ddddddddddd"))
+    await _settle()
+    assert resolve.await_args.args[0].endswith("ddddddddddd")
+    assert resolve.await_count == 3
+
+    queue.clear(1)
+    await _settle()
+    assert prefetch.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_pending_prefetch_cancelled_on_skip(queue, resolve):
+    prefetch = PrefetchService(queue, resolve_lead=10)
+    queue.add_tracks(1, [_track("aaaaaaaaaaa"), _track("bbbbbbbbbbb"), _track("ccccccccccc")])
+    queue.get_next_track(1)
+    prefetch.track_started(1, 600)
+    job = prefetch._jobs[1]
+
+    # Skip: плеєр виймає наступний трек раніше, ніж почалося розв'язання
+    skipped_to = queue.get_next_track(1)
+    assert await prefetch.take(1, skipped_to) is None
+    await _settle()
+    assert job.task.cancelled()
+    resolve.assert_not_awaited()
+    assert prefetch.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_non_cacheable_urls_are_not_prefetched(queue, resolve):
+    prefetch = PrefetchService(queue)
+    queue.add_tracks(1, [{"url": "url1"}, {"url": "url2"}])
+    queue.get_next_track(1)
+    prefetch.track_started(1, 10)
+    await _settle()
+    resolve.assert_not_awaited()
+    assert 1 not in prefetch._jobs
+
+
+@pytest.mark.asyncio
+async def test_warmed_source_handed_over(queue, resolve):
+    source = MagicMock()
+    source.original.is_alive.return_value = True
+    with patch(
+        "discord_music_bot.services.prefetch_service.YTDLSource.from_track_dict",
+        new_callable=AsyncMock,
+        return_value=source,
+    ) as from_track_dict:
+        prefetch = PrefetchService(queue, warm_ffmpeg=True, warm_lead=10)
+        queue.add_tracks(1, [_track("aaaaaaaaaaa"), _track("bbbbbbbbbbb")])
+        queue.get_next_track(1)
+        prefetch.track_started(1, 5, fade_seconds=6.0)
+        await _settle()
+        from_track_dict.assert_awaited_once()
+
+        nxt = queue.get_next_track(1)
+        # Інші параметри fade — прогріте джерело не підходить
+        assert await prefetch.take(1, nxt, fade_seconds=0.0) is None
+        source.cleanup.assert_called_once()
+
+        queue.add_track(1, _track("ccccccccccc"))
+        await _settle()
+        assert await prefetch.take(1, queue.get_next_track(1), fade_seconds=6.0) is source
+        assert prefetch.warmed == 2
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import subprocess
+import time
+from types import SimpleNamespace
+import pytest
+from discord_music_bot.instrumentation import instrumentation
+from discord_music_bot.process_supervisor import ProcessSupervisor, process_supervisor
+from discord_music_bot.services.extraction_scheduler import bind_guild
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="POSIX process groups")
+
+
+class _Source:
+    last_read_at = None
+
+
+def _spawn(*cmd):
+    return subprocess.Popen(list(cmd) or ["sleep", "30"], **ProcessSupervisor.popen_kwargs())
+
+
+async def _until(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_exit_is_reaped_and_kill_takes_the_process_group():
+    supervisor = ProcessSupervisor()
+    bind_guild(5)
+    leader = _spawn("sh", "-c", "sleep 30 & wait")
+    supervisor.register(leader)
+    guilds = supervisor.stats()["guilds"]
+    assert list(guilds) == [5] and guilds[5]["processes"] == 1 and guilds[5]["rss_bytes"] > 0
+
+    supervisor.kill(leader)
+    await _until(lambda: supervisor.stats()["live"] == 0)
+    assert leader.returncode is not None and supervisor.exited == 1
+    await _until(lambda: _group_gone(leader.pid))
+
+    # Процес, що завершився сам, теж знімається з обліку без watchdog
+    quick = _spawn("true")
+    supervisor.register(quick, guild_id=5)
+    await _until(lambda: supervisor.stats()["live"] == 0)
+    assert quick.returncode == 0
+
+
+def _group_gone(pgid):
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return True
+    return False
+
+
+@pytest.mark.asyncio
+async def test_guild_limit_and_idle_timeout_kill_least_active():
+    supervisor = ProcessSupervisor(max_per_guild=2, idle_timeout=0.2)
+    procs = [_spawn() for _ in range(3)]
+    owners = [_Source() for _ in procs]
+    try:
+        for proc, owner in zip(procs[:2], owners):
+            supervisor.register(proc, guild_id=1)
+            supervisor.adopt(proc, owner)
+        owners[0].last_read_at = time.monotonic()  # грає; procs[1] — загублений prefetch
+        supervisor.register(procs[2], guild_id=1)
+        supervisor.adopt(procs[2], owners[2])
+        await _until(lambda: procs[1].poll() is not None)
+        assert procs[0].poll() is None and supervisor.killed_limit == 1
+
+        await asyncio.sleep(0.25)
+        owners[0].last_read_at = time.monotonic()
+        assert supervisor.check() == 1  # лише procs[2]: його не читали довше за idle_timeout
+        await _until(lambda: procs[2].poll() is not None)
+        assert procs[0].poll() is None
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+
+def test_unsupervised_process_falls_back_to_plain_kill():
+    proc = SimpleNamespace(pid="mock", kill=lambda: setattr(proc, "killed", True), poll=lambda: None)
+    process_supervisor.register(proc)
+    process_supervisor.kill(proc)
+    assert proc.killed and process_supervisor.stats()["live"] == 0
+    assert "# TYPE musicbot_subprocesses gauge" in instrumentation.render()
@@ -0,0 +1,104 @@
+import os
+import random
+import tempfile
+import pytest
+from unittest.mock import MagicMock, patch
+from discord_music_bot import ytdlp_config
+from discord_music_bot.database import init_db
+from discord_music_bot.profile_selector import ProfileSelector
+from discord_music_bot.repository import MusicRepository
+from discord_music_bot.ytdlp_pool import YoutubeDLPool
+
+def _youtube_dl(calls):
+    """android отримує бот-чек; інші клієнти віддають URL лише для bestaudio/best."""
+    def build(params):
+        ydl = MagicMock()
+        client = params["extractor_args"]["youtube"]["player_client"][0]
+
+        def extract_info(url, download=False):
+            calls.append((client, params.get("format")))
+            if client == "android":
+                raise Exception("Sign in to confirm you're not a bot")
+            if params.get("format") != "bestaudio/best":
+                return {"formats": []}
+            return {"url": "http://media", "title": "ok"}
+
+        ydl.__enter__.return_value.extract_info.side_effect = extract_info
+        return ydl
+    return build
+
+
+def _extract(selector, monkeypatch, tracks):
+    monkeypatch.setenv("YTDLP_PIPED_FIRST", "0")
+    calls = []
+    with patch.object(ytdlp_config, "profile_selector", selector), \
+         patch.object(ytdlp_config, "ydl_pool", YoutubeDLPool()), \
+         patch.object(ytdlp_config, "get_cookies_path", return_value=None), \
+         patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL", side_effect=_youtube_dl(calls)):
+        for i in range(tracks):
+            assert ytdlp_config.extract_stream_url(f"https://soundcloud.com/a/t{i}")[0] == "http://media"
+    return calls
+
+
+def test_bot_checked_profile_is_short_circuited(monkeypatch):
+    selector = ProfileSelector(rng=random.Random(1))
+    # Історія каже, що android найкращий — тож він іде першим і отримує бот-чек
+    selector.load([
+        {"profile": profile, "format": fmt, "successes": 50 if profile == "guest-android" else 1, "failures": 1}
+        for profile in ("guest-android", "guest-web", "guest-tv")
+        for fmt in ("manual-pick", "bestaudio/best", "ba/b", "worst")
+    ])
+    calls = _extract(selector, monkeypatch, 1)
+    assert calls[0][0] == "android"
+    # Інші формати android у цій екстракції вже не пробуються
+    assert sum(1 for client, _ in calls if client == "android") == 1
+    assert selector.stats()["cooling_down"] == ["guest-android"]
+
+    calls = _extract(selector, monkeypatch, 1)
+    assert calls[0][0] != "android"
+
+
+def test_adaptive_order_cuts_attempts_per_track(monkeypatch):
+    selector = ProfileSelector(rng=random.Random(7))
+    _extract(selector, monkeypatch, 5)
+    warmup = selector.stats()["attempts_per_track"]
+
+    calls = _extract(selector, monkeypatch, 40)
+    recent = calls[-20:]
+    # Вивчений порядок: android на карантині, робоча пара йде першою
+    assert all(client != "android" for client, _ in recent)
+    stats = selector.stats()
+    assert stats["attempts_per_track"] < warmup
+    # Фіксований порядок платив би 6 спроб на трек (4 формати android + 2 guest-web)
+    assert len(calls) / 40 < 2.0
+    best = max(stats["arms"].items(), key=lambda item: item[1]["success_rate"])
+    assert best[0].endswith("/bestaudio/best")
+
+
+@pytest.mark.asyncio
+async def test_stats_survive_restart_via_sqlite():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with patch("discord_music_bot.database.DB_PATH", path):
+            await init_db()
+            repo = MusicRepository()
+            selector = ProfileSelector()
+            selector.record("guest-web", "bestaudio/best", True, 0.4)
+            selector.record("guest-android", None, False, 1.0, bot_check=True)
+            assert selector.dirty
+            await repo.save_extraction_profile_stats(selector.snapshot())
+            assert not selector.dirty
+
+            restored = ProfileSelector()
+            restored.load(await repo.get_extraction_profile_stats())
+        arms = restored.stats()["arms"]
+        assert arms["guest-web/bestaudio/best"]["success_rate"] == 1.0
+        assert arms["guest-web/bestaudio/best"]["latency_ms"] == pytest.approx(400)
+        assert arms["guest-android/manual-pick"]["bot_checks"] == 1
+        # Карантин не зберігається — після рестарту профіль знову пробується
+        assert restored.stats()["cooling_down"] == []
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
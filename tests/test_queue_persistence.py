@@ -0,0 +1,171 @@
+import random
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from discord_music_bot import consts
+from discord_music_bot.database import get_pool, init_db, close_db
+from discord_music_bot.repository import MusicRepository
+from discord_music_bot.services.queue_service import QueueService
+from discord_music_bot.services.write_buffer import WriteBehindBuffer
+
+
+@pytest.fixture
+async def repo(tmp_path):
+    with patch("discord_music_bot.database.DB_PATH", str(tmp_path / "queue.db")):
+        await init_db()
+        yield MusicRepository()
+        await close_db()
+
+
+def _service(repo):
+    return QueueService(repo, WriteBehindBuffer(repo, flush_interval=0))
+
+
+def _mock_repo():
+    repo = AsyncMock(spec=MusicRepository)
+    repo.batch = MagicMock()
+    return repo
+
+
+async def _drain(service):
+    """Чекає, поки всі відкладені записи черги потраплять у БД."""
+    await service._writes.flush()
+
+
+def _track(i):
+    return {
+        "url": f"http://t/{i}",
+        "webpage_url": f"http://t/{i}",
+        "title": f"Track {i}",
+        "duration": i,
+        "thumbnail": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_incremental_ops_match_db(repo):
+    service = _service(repo)
+    rng = random.Random(42)
+    counter = 0
+    for _ in range(400):
+        queue = service.get_queue(1)
+        op = rng.choice(["add", "add_many", "pop", "front", "move", "move", "shuffle"])
+        if op == "add":
+            counter += 1
+            service.add_track(1, _track(counter))
+        elif op == "add_many":
+            batch = [_track(counter + i + 1) for i in range(3)]
+            counter += 3
+            service.add_tracks(1, batch)
+        elif op == "pop":
+            service.get_next_track(1)
+        elif op == "front":
+            counter += 1
+            service.push_front(1, _track(counter))
+        elif op == "move" and queue:
+            service.move_track(1, rng.randint(1, len(queue)), rng.randint(1, len(queue)))
+        elif op == "shuffle" and rng.random() < 0.1:
+            service.shuffle(1)
+        await _drain(service)
+        assert await repo.load_queue(1) == service.get_queue(1)
+
+
+@pytest.mark.asyncio
+async def test_pop_does_not_rewrite_queue(repo):
+    service = _service(repo)
+    service.add_tracks(1, [_track(i) for i in range(100)])
+    await _drain(service)
+
+    with patch.object(repo, "save_queue", wraps=repo.save_queue) as save_queue:
+        for _ in range(10):
+            service.get_next_track(1)
+        await _drain(service)
+        save_queue.assert_not_called()
+    assert await repo.load_queue(1) == service.get_queue(1)
+
+
+@pytest.mark.asyncio
+async def test_move_exhausted_gap_compacts(repo):
+    service = _service(repo)
+    service.add_tracks(1, [_track(i) for i in range(3)])
+    await _drain(service)
+    # Постійно вставляємо між першими двома треками, поки проміжок не вичерпається
+    for _ in range(12):
+        service.move_track(1, 3, 2)
+    await _drain(service)
+    assert await repo.load_queue(1) == service.get_queue(1)
+    assert len(set(service._positions[1])) == 3
+
+
+@pytest.mark.asyncio
+async def test_load_from_db_then_mutate(repo):
+    await repo.save_queue(1, [_track(i) for i in range(3)], positions=[0, 1, 2])
+    service = _service(repo)
+    await service.load_from_db(1)
+    service.move_track(1, 3, 2)
+    service.get_next_track(1)
+    await _drain(service)
+    assert await repo.load_queue(1) == service.get_queue(1)
+
+
+@pytest.mark.asyncio
+async def test_periodic_compaction():
+    repo = _mock_repo()
+    service = _service(repo)
+    service.add_track(1, _track(0))
+    for i in range(consts.QUEUE_COMPACTION_INTERVAL + 1):
+        await _drain(service)
+        service.add_track(1, _track(i + 1))
+    await _drain(service)
+    assert repo.save_queue.await_count == 2
+    assert repo.insert_queue_tracks.await_count == consts.QUEUE_COMPACTION_INTERVAL
+
+
+@pytest.mark.asyncio
+async def test_failed_op_marks_dirty_and_recovers():
+    repo = _mock_repo()
+    repo.delete_queue_track.side_effect = Exception("DB Error")
+    service = _service(repo)
+    service.add_tracks(1, [_track(0), _track(1)])
+    service.get_next_track(1)
+    await _drain(service)
+    assert 1 in service._dirty
+
+    service.add_track(1, _track(2))
+    await _drain(service)
+    assert 1 not in service._dirty
+    repo.save_queue.assert_awaited_with(1, [_track(1), _track(2)], [1024, 2048])
+
+
+@pytest.mark.asyncio
+async def test_snapshot_supersedes_pending_deltas():
+    repo = _mock_repo()
+    service = _service(repo)
+    service.add_tracks(1, [_track(i) for i in range(5)])
+    service.get_next_track(1)
+    service.push_front(1, _track(9))
+    service.shuffle(1)
+    await _drain(service)
+    repo.save_queue.assert_awaited_once()
+    repo.delete_queue_track.assert_not_awaited()
+    repo.insert_queue_tracks.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_batch_forces_full_rewrite(repo):
+    service = _service(repo)
+    service.add_tracks(1, [_track(i) for i in range(3)])
+    await _drain(service)
+
+    # Дельти виконались, але COMMIT пакета впав — у БД лишилась стара черга
+    service.get_next_track(1)
+    service.add_track(1, _track(7))
+    pool = await get_pool()
+    with patch.object(pool._writer, "commit", side_effect=Exception("disk I/O error")):
+        await _drain(service)
+    assert 1 in service._dirty
+    assert [t["url"] for t in await repo.load_queue(1)] == [_track(i)["url"] for i in range(3)]
+
+    service.add_track(1, _track(9))
+    await _drain(service)
+    assert await repo.load_queue(1) == service.get_queue(1)
+    assert [t["title"] for t in service.get_queue(1)] == ["Track 1", "Track 2", "Track 7", "Track 9"]
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock
 from discord_music_bot.services.queue_service import QueueService
 from discord_music_bot.repository import MusicRepository
 
@@ -13,13 +13,11 @@ def mock_repo():
 
 @pytest.fixture
 def queue_service(mock_repo):
-    # Патчимо asyncio.ensure_future, щоб синхронні тести не намагалися
-    # запускати таски на відсутньому event loop.
-    def mock_ensure_future(coro, *args, **kwargs):
-        coro.close()
-        
-    with patch("discord_music_bot.services.queue_service.asyncio.ensure_future", side_effect=mock_ensure_future):
-        yield QueueService(mock_repo)
+    service = QueueService(mock_repo)
+    yield service
+    # Синхронні тести не мають event loop — відкладені записи так і не скидаються
+    for pending in service._writes._pending:
+        pending.discard()
 
 def test_get_queue_empty(queue_service):
     queue = queue_service.get_queue(123)
@@ -1,9 +1,10 @@
 import os
 import tempfile
+import aiosqlite
 import pytest
 from unittest.mock import patch
 from discord_music_bot.repository import MusicRepository
-from discord_music_bot.database import init_db
+from discord_music_bot.database import close_db, init_db
 
 @pytest.fixture
 async def temp_db_path():
@@ -58,6 +59,21 @@ async def test_guild_state(repo):
     assert state["current_track_url"] is None
     assert state["is_paused"] == 0
 
+@pytest.mark.asyncio
+async def test_playback_position_tracks_current_track(repo):
+    await repo.save_guild_state(1, voice_channel_id=10, track_url="http://a")
+    await repo.save_playback_position(1, "http://a", 42.5)
+    assert (await repo.load_guild_state(1))["current_track_position"] == 42.5
+
+    # Запізнілий запис для попереднього треку нічого не змінює; новий трек — з нуля
+    await repo.save_guild_state(1, voice_channel_id=10, track_url="http://b")
+    await repo.save_playback_position(1, "http://a", 99.0)
+    assert (await repo.load_guild_state(1))["current_track_position"] == 0
+
+    await repo.save_playback_position(1, "http://b", 7.0)
+    await repo.clear_guild_state(1)
+    assert (await repo.load_guild_state(1))["current_track_position"] == 0
+
 @pytest.mark.asyncio
 async def test_get_all_active_guilds(repo):
     await repo.save_guild_state(1, voice_channel_id=10, track_url="http://1")
@@ -68,6 +84,37 @@ async def test_get_all_active_guilds(repo):
     assert len(active) == 1
     assert active[0]["guild_id"] == 1
 
+@pytest.mark.asyncio
+async def test_resume_snapshots_batch_and_staleness(repo, temp_db_path):
+    for gid in (1, 2, 3):
+        await repo.save_guild_state(gid, voice_channel_id=gid * 10, track_url=f"http://now{gid}")
+    await repo.save_queue(1, [{"url": "http://q1", "title": "Q1"}, {"url": "http://q2", "title": "Q2"}])
+    for url in ("http://h1", "http://h2", "http://h3"):
+        await repo.add_history_track(1, {"url": url, "title": url})
+    await repo.add_history_track(2, {"url": "http://other", "title": "Other"})
+    async with aiosqlite.connect(temp_db_path) as conn:
+        await conn.execute("UPDATE guild_state SET updated_at = datetime('now', '-2 days') WHERE guild_id = 3")
+        await conn.commit()
+
+    snapshots = {s["guild_id"]: s for s in await repo.get_resume_snapshots(24 * 3600, history_limit=2)}
+    assert sorted(snapshots) == [1, 2]
+    assert [t["url"] for t in snapshots[1]["queue"]] == ["http://q1", "http://q2"]
+    # Останні history_limit прослуховувань, від найстарішого
+    assert [t["webpage_url"] for t in snapshots[1]["history"]] == ["http://h2", "http://h3"]
+    assert [t["url"] for t in snapshots[2]["history"]] == ["http://other"] and snapshots[2]["queue"] == []
+
+    # Тривалість/обкладинка поточного треку доповнюються з каталогу, зокрема для спільного треку
+    await repo.add_history_track(2, {"url": "http://now1", "title": "Now", "duration": 180, "thumbnail": "http://t"})
+    await repo.save_guild_state(2, voice_channel_id=20, track_url="http://now1")
+    snapshots = {s["guild_id"]: s for s in await repo.get_resume_snapshots(24 * 3600)}
+    for gid in (1, 2):
+        assert snapshots[gid]["current_track_duration"] == 180
+        assert snapshots[gid]["current_track_thumbnail"] == "http://t"
+
+    assert await repo.clear_stale_guild_states(24 * 3600) == 1
+    assert (await repo.load_guild_state(3))["voice_channel_id"] is None
+    assert (await repo.load_guild_state(1))["voice_channel_id"] == 10
+
 @pytest.mark.asyncio
 async def test_queue_operations(repo):
     # Ensure foreign key exists
@@ -167,6 +214,43 @@ async def test_analytics(repo):
     assert len(search_results) == 1
     assert search_results[0]["title"] == "T2"
 
+@pytest.mark.asyncio
+async def test_play_counts_follow_history(repo, temp_db_path):
+    await repo.save_guild_state(1)
+    for url in ["http://1", "http://2", "http://2", "http://2", "http://1"]:
+        await repo.add_history_track(1, {"url": url, "title": url})
+
+    top = await repo.get_top_tracks(1)
+    assert [(t["url"], t["play_count"]) for t in top] == [("http://2", 3), ("http://1", 2)]
+
+    # Previous знімає останнє прослуховування і з лічильника
+    await repo.pop_last_history_track(1)
+    await repo.pop_last_history_track(1)
+    await repo.pop_last_history_track(1)
+    assert sorted((t["url"], t["play_count"]) for t in await repo.get_top_tracks(1)) == [("http://1", 1), ("http://2", 1)]
+    assert await repo.get_top_tracks(1, limit=1) == (await repo.get_top_tracks(1))[:1]
+
+    # Лічильники відтворюються з історії, якщо таблиця порожня (оновлення старої БД)
+    async with aiosqlite.connect(temp_db_path) as conn:
+        await conn.execute("DELETE FROM track_play_counts")
+        await conn.commit()
+    await close_db()
+    await init_db()
+    assert sorted((t["url"], t["play_count"]) for t in await repo.get_top_tracks(1)) == [("http://1", 1), ("http://2", 1)]
+
+    await repo.clear_history(1)
+    assert await repo.get_top_tracks(1) == []
+
+@pytest.mark.asyncio
+async def test_popular_tracks_sum_guilds(repo):
+    for guild_id, urls in ((1, ["http://1", "http://2", "http://2"]), (2, ["http://1", "http://1"])):
+        await repo.save_guild_state(guild_id)
+        for url in urls:
+            await repo.add_history_track(guild_id, {"url": url, "title": url})
+    popular = await repo.get_popular_tracks()
+    assert [(t["url"], t["play_count"]) for t in popular] == [("http://1", 3), ("http://2", 2)]
+    assert len(await repo.get_popular_tracks(limit=1)) == 1
+
 @pytest.mark.asyncio
 async def test_automix_feedback(repo):
     await repo.save_guild_state(1)
@@ -218,3 +302,15 @@ async def test_dj_settings_and_events(repo):
     # DJ Events
     await repo.add_dj_event(1, "intro", persona="funny", track_url="http://1", message="Hello!")
     # Just verify no crash for now as there is no get_dj_events yet in repo.
+
+@pytest.mark.asyncio
+async def test_track_features_round_trip(repo):
+    features = {"bpm": 124.5, "loudness": -14.2, "centroid": 1800.0, "key": 21, "chroma": [0.5] * 12}
+    await repo.save_track_features({"url": "https://youtu.be/dQw4w9WgXcQ", "title": "Song"}, features)
+    await repo.save_track_features({"url": "http://2", "title": "Two"}, dict(features, bpm=None))
+    await repo.save_track_features({"url": "http://2", "title": "Two"}, dict(features, key=3))
+
+    stored = await repo.get_track_features()
+    assert stored["youtube:dQw4w9WgXcQ"] == features
+    assert stored["http://2"]["key"] == 3 and stored["http://2"]["bpm"] == 124.5
+    assert (await repo.get_catalog_track("https://www.youtube.com/watch?v=dQw4w9WgXcQ"))["title"] == "Song"
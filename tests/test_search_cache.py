@@ -0,0 +1,108 @@
+import asyncio
+import os
+import tempfile
+import pytest
+from unittest.mock import AsyncMock, patch
+from discord_music_bot.database import init_db
+from discord_music_bot.repository import MusicRepository
+from discord_music_bot.search_cache import SearchCache, normalize_query, search_key
+from discord_music_bot.services.source_service import SourceService
+
+
+def _results(tag):
+    return [{"title": f"{tag} {i}", "url": f"https://www.youtube.com/watch?v={tag}{i}", "duration": 60} for i in range(3)]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_normalized_queries_share_one_search():
+    cache = SearchCache()
+    service = SourceService(cache=cache)
+    with patch.object(service, "_search_uncached", AsyncMock(return_value=_results("a"))) as backend:
+        first = await service.search_videos("  Imagine   DRAGONS ")
+        first[0]["requester"] = "user"  # SearchResultsView/ког змінюють вибраний трек
+        second = await service.search_videos("imagine dragons")
+    backend.assert_awaited_once()
+    assert [r["title"] for r in second] == ["a 0", "a 1", "a 2"]
+    assert "requester" not in second[0]
+    assert normalize_query("Ｉｍａｇｉｎｅ\tDragons") == "imagine dragons"
+    assert search_key("x", 5) != search_key("x", 10)
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_results_are_served_and_refreshed_in_background():
+    clock = _Clock()
+    cache = SearchCache(ttl=60, max_stale=600, clock=clock)
+    service = SourceService(cache=cache)
+    refreshed = asyncio.Event()
+
+    async def slow_refresh(query, max_results, priority=None):
+        await refreshed.wait()
+        return _results("new")
+
+    with patch.object(service, "_search_uncached", AsyncMock(return_value=_results("old"))):
+        await service.search_videos("song")
+
+    clock.now += 120
+    with patch.object(service, "_search_uncached", side_effect=slow_refresh) as backend:
+        # Застарілий запис віддається одразу, не чекаючи на оновлення
+        stale = await service.search_videos("song")
+        again = await service.search_videos("song")
+        assert stale[0]["title"] == "old 0" and again[0]["title"] == "old 0"
+        refreshed.set()
+        await asyncio.gather(*service._revalidating.values())
+    assert backend.call_count == 1  # одне фонове оновлення на ключ
+    assert (await service.search_videos("song"))[0]["title"] == "new 0"
+    assert cache.stats()["stale_hits"] == 2
+
+    # Поза вікном stale запис не віддається взагалі
+    clock.now += 60 + 600 + 1
+    assert cache.get(search_key("song", 10)) is None
+
+
+@pytest.mark.asyncio
+async def test_empty_results_are_not_cached():
+    service = SourceService(cache=SearchCache())
+    with patch.object(service, "_search_uncached", AsyncMock(return_value=[])) as backend:
+        assert await service.search_videos("nothing") == []
+        assert await service.search_videos("nothing") == []
+    assert backend.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_survives_restart_via_sqlite():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with patch("discord_music_bot.database.DB_PATH", path):
+            await init_db()
+            repo = MusicRepository()
+            clock = _Clock()
+            cache = SearchCache(clock=clock)
+            saved = []
+            cache.add_listener(lambda key, results, at: saved.append((key, results, at)))
+            cache.put(search_key("Song", 10), _results("a"))
+            cache.put(search_key("Other", 10), _results("b"), fetched_at=clock.now - 10)
+            for row in saved:
+                await repo.save_search_results(*row)
+
+            await repo.prune_search_cache(keep=1)
+            rows = await repo.get_search_cache(limit=10)
+        assert [key for key, _, _ in rows] == [search_key("song", 10)]
+
+        restored = SearchCache(clock=clock)
+        assert restored.load(rows) == 1
+        results, fresh = restored.get(search_key("SONG ", 10))
+        assert fresh and results[2]["title"] == "a 2"
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
@@ -1,6 +1,7 @@
 import pytest
 import discord
 from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from discord_music_bot.audio_cache import AudioCache
 from discord_music_bot.cogs.slash_music_cog import MusicCog
 from discord_music_bot import consts
 import asyncio
@@ -74,8 +75,10 @@ def interaction():
     return i
 
 @pytest.mark.asyncio
-async def test_cog_load_and_ready_error(cog, bot):
-    await cog.cog_load()
+async def test_cog_load_and_ready_error(cog, bot, tmp_path):
+    # Кеш — у тимчасовій теці, а не в data/audio_cache робочого дерева
+    with patch('discord_music_bot.cogs.slash_music_cog.audio_cache', AudioCache(str(tmp_path))):
+        await cog.cog_load()
     with patch('discord_music_bot.cogs.slash_music_cog.auto_resume', side_effect=Exception("Resume error")):
         with pytest.raises(Exception, match="Resume error"):
             await cog._on_ready_auto_resume()
@@ -89,7 +92,10 @@ async def test_join_move_to(cog, interaction):
 
 @pytest.mark.asyncio
 async def test_play_playlist_error(cog, interaction):
-    cog.source_service.extract_playlist.return_value = (None, None)
+    async def empty_playlist(*args, **kwargs):
+        return
+        yield
+    cog.source_service.iter_playlist = empty_playlist
     await cog.play.callback(cog, interaction, query="http://playlist")
     interaction.followup.send.assert_called_with("❌ Не вдалося завантажити плейлист або він порожній.")
 
@@ -186,3 +192,31 @@ async def test_force_voice_cleanup(cog):
     guild.voice_client = Mock(disconnect=AsyncMock())
     await cog._force_voice_cleanup(guild)
     guild.voice_client.disconnect.assert_called()
+
+@pytest.mark.asyncio
+async def test_seek_command_and_position_save(cog, interaction):
+    player = Mock(duration=200)
+    player.seek = AsyncMock(return_value=True)
+    player.position_seconds = Mock(return_value=61.0)
+    cog.repository.save_playback_position = AsyncMock()
+
+    await MusicCog.seek.callback(cog, interaction, "1:01")
+    assert "нічого не грає" in interaction.response.send_message.call_args.args[0]
+
+    cog.current_song[123] = {'url': 'http://a', 'player': player}
+    interaction.guild.voice_client.is_playing.return_value = True
+    await MusicCog.seek.callback(cog, interaction, "abc")
+    assert "1:30" in interaction.response.send_message.call_args.args[0]
+    await MusicCog.seek.callback(cog, interaction, "3:20")
+    assert "03:20" in interaction.response.send_message.call_args.args[0]
+    player.seek.assert_not_called()
+
+    await MusicCog.seek.callback(cog, interaction, "1:01")
+    player.seek.assert_awaited_once_with(61)
+    assert "01:01" in interaction.followup.send.call_args.args[0]
+    # Позиція одразу йде в буфер записів; без змін повторно не пишеться
+    assert [p.key for p in cog.write_buffer._pending] == [("guild_position", 123)]
+    cog._save_positions()
+    assert cog.write_buffer.coalesced == 0
+    cog.repository.save_playback_position.assert_called_once_with(123, 'http://a', 61.0)
+    cog._position_timer.cancel()
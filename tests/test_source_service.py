@@ -8,7 +8,7 @@ def source_service():
 
 @pytest.mark.asyncio
 async def test_get_video_info_success(source_service):
-    with patch("discord_music_bot.services.source_service.yt_dlp.YoutubeDL") as mock_ytdl:
+    with patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL") as mock_ytdl:
         mock_instance = mock_ytdl.return_value.__enter__.return_value
         mock_instance.extract_info.return_value = {
             "title": "Test Title",
@@ -26,7 +26,7 @@ async def test_get_video_info_success(source_service):
 
 @pytest.mark.asyncio
 async def test_get_video_info_search(source_service):
-    with patch("discord_music_bot.services.source_service.yt_dlp.YoutubeDL") as mock_ytdl:
+    with patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL") as mock_ytdl:
         mock_instance = mock_ytdl.return_value.__enter__.return_value
         mock_instance.extract_info.return_value = {
             "entries": [{
@@ -46,7 +46,7 @@ async def test_get_video_info_search(source_service):
 
 @pytest.mark.asyncio
 async def test_search_videos(source_service):
-    with patch("discord_music_bot.services.source_service.yt_dlp.YoutubeDL") as mock_ytdl:
+    with patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL") as mock_ytdl:
         mock_instance = mock_ytdl.return_value.__enter__.return_value
         mock_instance.extract_info.return_value = {
             "entries": [
@@ -64,7 +64,7 @@ async def test_search_videos(source_service):
 
 @pytest.mark.asyncio
 async def test_extract_playlist(source_service):
-    with patch("discord_music_bot.services.source_service.yt_dlp.YoutubeDL") as mock_ytdl:
+    with patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL") as mock_ytdl:
         mock_instance = mock_ytdl.return_value.__enter__.return_value
         mock_instance.extract_info.return_value = {
             "title": "My Playlist",
@@ -0,0 +1,115 @@
+import io
+import pytest
+from unittest.mock import MagicMock, patch
+from discord_music_bot.audio_source import YTDLSource
+from discord_music_bot.stream_cache import StreamUrlCache, cache_key, parse_expiry, stream_url_cache
+
+PAGE = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _stream(expire):
+    return f"https://rr1---sn.googlevideo.com/videoplayback?itag=251&expire={int(expire)}&sig=x"
+
+
+def test_cache_key_normalizes_url_forms():
+    assert cache_key(PAGE) == "dQw4w9WgXcQ"
+    assert cache_key("https://youtu.be/dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+    assert cache_key("https://www.youtube.com/watch?list=PL1&v=dQw4w9WgXcQ&t=10") == "dQw4w9WgXcQ"
+    assert cache_key("https://soundcloud.com/artist/track") is None
+
+
+def test_parse_expiry():
+    assert parse_expiry(_stream(1_700_000_000)) == 1_700_000_000
+    assert parse_expiry("https://manifest.googlevideo.com/api/manifest/hls/expire/1700000000/ei/x") == 1_700_000_000
+    assert parse_expiry("https://cdn.example.com/audio.opus") is None
+
+
+def test_entry_expires_before_url_with_margin():
+    clock = FakeClock()
+    cache = StreamUrlCache(safety_margin=600, clock=clock)
+    cache.put(PAGE, _stream(clock.now + 3600), {"title": "T"})
+    assert cache.get("https://youtu.be/dQw4w9WgXcQ") == (_stream(clock.now + 3600), {"title": "T"})
+
+    clock.now += 3600 - 600
+    assert cache.get(PAGE) is None
+    assert len(cache) == 0
+
+
+def test_url_expiring_within_margin_is_not_cached():
+    clock = FakeClock()
+    cache = StreamUrlCache(safety_margin=600, clock=clock)
+    cache.put(PAGE, _stream(clock.now + 300))
+    assert cache.get(PAGE) is None
+
+
+def test_url_without_expire_uses_default_ttl():
+    clock = FakeClock()
+    cache = StreamUrlCache(default_ttl=100, clock=clock)
+    cache.put(PAGE, "https://pipedproxy.example/audio")
+    clock.now += 99
+    assert cache.get(PAGE) is not None
+    clock.now += 2
+    assert cache.get(PAGE) is None
+
+
+def test_lru_eviction():
+    clock = FakeClock()
+    cache = StreamUrlCache(max_entries=2, clock=clock)
+    ids = ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+    for vid in ids[:2]:
+        cache.put(f"https://youtu.be/{vid}", _stream(clock.now + 7200))
+    cache.get(f"https://youtu.be/{ids[0]}")  # a стає найсвіжішим
+    cache.put(f"https://youtu.be/{ids[2]}", _stream(clock.now + 7200))
+    assert cache.get(f"https://youtu.be/{ids[1]}") is None
+    assert cache.get(f"https://youtu.be/{ids[0]}") is not None
+    assert cache.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_from_track_dict_uses_cache_on_replay():
+    track = {"url": PAGE, "title": "Song"}
+    stream = _stream(4_000_000_000)
+    with patch("discord_music_bot.audio_source.extract_stream_url") as mock_extract, \
+         patch("subprocess.Popen") as mock_popen, \
+         patch("discord_music_bot.audio_source.asyncio.sleep"):
+        mock_extract.return_value = (stream, {"title": "Song", "webpage_url": PAGE})
+        mock_popen.side_effect = lambda *a, **k: MagicMock(
+            stdout=io.BytesIO(b"\x00" * 3840), **{"poll.return_value": None}
+        )
+
+        assert await YTDLSource.from_track_dict(track) is not None
+        assert await YTDLSource.from_track_dict(track) is not None
+        assert mock_extract.call_count == 1
+        assert stream_url_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_from_track_dict_invalidates_rejected_cached_url():
+    track = {"url": PAGE, "title": "Song"}
+    stale, fresh = _stream(4_000_000_000), _stream(4_000_000_001)
+    stream_url_cache.put(PAGE, stale, {"title": "Song"})
+
+    dead, alive = MagicMock(), MagicMock()
+    dead.poll.return_value = 1
+    dead.returncode = 1
+    dead.stderr.read.return_value = b"403 Forbidden"
+    alive.poll.return_value = None
+    alive.stdout = io.BytesIO(b"\x00" * 3840)
+    with patch("discord_music_bot.audio_source.extract_stream_url", return_value=(fresh, {})) as mock_extract, \
+         patch("subprocess.Popen", side_effect=[dead, alive]) as mock_popen, \
+         patch("discord_music_bot.audio_source.asyncio.sleep"):
+        source = await YTDLSource.from_track_dict(track)
+
+    assert source is not None
+    mock_extract.assert_called_once_with(PAGE)
+    assert stale in mock_popen.call_args_list[0].args[0]
+    assert fresh in mock_popen.call_args_list[1].args[0]
+    assert stream_url_cache.get(PAGE)[0] == fresh
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import aiosqlite
+import pytest
+from unittest.mock import patch
+from discord_music_bot.database import init_db
+from discord_music_bot.repository import MusicRepository
+from discord_music_bot.track_catalog import canonical_track_key
+
+VIDEO = "dQw4w9WgXcQ"
+
+
+@pytest.fixture
+def db_path():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.remove(path)
+    with patch("discord_music_bot.database.DB_PATH", path):
+        yield path
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def test_canonical_key_merges_youtube_url_forms():
+    forms = [
+        f"https://www.youtube.com/watch?v={VIDEO}",
+        f"https://youtu.be/{VIDEO}?t=42",
+        f"https://www.youtube.com/watch?v={VIDEO}&list=PL123&index=3",
+        f"https://www.youtube.com/embed/{VIDEO}",
+    ]
+    assert {canonical_track_key(url) for url in forms} == {f"youtube:{VIDEO}"}
+    assert canonical_track_key("https://soundcloud.com/a/b#t=1:00") == "https://soundcloud.com/a/b"
+
+
+@pytest.mark.asyncio
+async def test_history_references_one_catalog_row(db_path):
+    await init_db()
+    repo = MusicRepository()
+    await repo.save_guild_state(1)
+    # oEmbed-шлях: тривалість невідома
+    await repo.add_history_track(1, {"url": f"https://youtu.be/{VIDEO}", "title": "Song", "duration": None})
+    await repo.add_history_track(1, {"url": f"https://www.youtube.com/watch?v={VIDEO}", "title": "Song", "duration": None})
+    assert await repo.get_total_listening_time(1) == 0
+
+    # Повна екстракція при відтворенні збагачує каталог — усі записи історії бачать тривалість
+    await repo.enrich_tracks([{"url": f"https://www.youtube.com/watch?v={VIDEO}", "title": "Song (Official)",
+                               "duration": 213, "thumbnail": "http://img"}])
+    assert await repo.get_total_listening_time(1) == 426
+    top = await repo.get_top_tracks(1)
+    assert len(top) == 1 and top[0]["play_count"] == 2 and top[0]["title"] == "Song (Official)"
+    stats = await repo.get_listening_stats(1)
+    assert stats["total_tracks"] == 2 and stats["unique_tracks"] == 1
+
+    # Звичайний запис не перетирає відомі метадані
+    await repo.add_history_track(1, {"url": f"https://youtu.be/{VIDEO}", "title": "Unknown", "duration": None})
+    history = await repo.get_history(1)
+    assert [h["duration"] for h in history] == [213, 213, 213]
+    assert (await repo.get_catalog_track(f"https://youtu.be/{VIDEO}"))["thumbnail"] == "http://img"
+
+    await repo.save_guild_state(1, voice_channel_id=5, track_url=f"https://youtu.be/{VIDEO}", track_title="Song")
+    assert (await repo.load_guild_state(1))["current_track_duration"] == 213
+
+
+@pytest.mark.asyncio
+async def test_legacy_tables_are_migrated(db_path):
+    async with aiosqlite.connect(db_path) as conn:
+        await conn.executescript(
+            """
+            CREATE TABLE guild_state (guild_id INTEGER PRIMARY KEY, voice_channel_id INTEGER,
+                text_channel_id INTEGER, current_track_url TEXT, current_track_title TEXT,
+                current_track_duration INTEGER, current_track_thumbnail TEXT,
+                is_paused INTEGER DEFAULT 0, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            CREATE TABLE queue_tracks (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL,
+                position INTEGER NOT NULL, url TEXT NOT NULL, title TEXT, duration INTEGER,
+                thumbnail TEXT, added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            CREATE TABLE history_tracks (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL,
+                url TEXT NOT NULL, title TEXT, duration INTEGER, thumbnail TEXT,
+                played_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            INSERT INTO guild_state (guild_id) VALUES (1);
+            INSERT INTO history_tracks (guild_id, url, title, duration, played_at) VALUES
+                (1, 'https://youtu.be/dQw4w9WgXcQ', 'Unknown', NULL, '2024-01-01 10:00:00'),
+                (1, 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'Song', 213, '2024-01-01 11:00:00'),
+                (1, 'https://soundcloud.com/a/b', 'Other', 100, '2024-01-01 12:00:00');
+            INSERT INTO queue_tracks (guild_id, position, url, title, duration) VALUES
+                (1, 2048, 'https://soundcloud.com/a/b', 'Other', 100),
+                (1, 1024, 'https://youtu.be/dQw4w9WgXcQ', 'Song', NULL);
+            """
+        )
+        await conn.commit()
+
+    await init_db()
+    await init_db()  # повторний запуск — міграція вже не потрібна
+    repo = MusicRepository()
+    history = await repo.get_history(1)
+    assert [h["title"] for h in history] == ["Other", "Song", "Song"]
+    assert await repo.get_total_listening_time(1) == 100 + 213 * 2
+    queue = await repo.load_queue(1)
+    assert [(t["title"], t["duration"]) for t in queue] == [("Song", 213), ("Other", 100)]
+
+    async with aiosqlite.connect(db_path) as conn:
+        cursor = await conn.execute("SELECT COUNT(*) FROM tracks")
+        assert (await cursor.fetchone())[0] == 2
+        cursor = await conn.execute("PRAGMA table_info(history_tracks)")
+        assert "url" not in {r[1] for r in await cursor.fetchall()}
+
+
+@pytest.mark.asyncio
+async def test_legacy_migration_keeps_latest_known_metadata(db_path):
+    async with aiosqlite.connect(db_path) as conn:
+        await conn.executescript(
+            """
+            CREATE TABLE guild_state (guild_id INTEGER PRIMARY KEY, voice_channel_id INTEGER,
+                text_channel_id INTEGER, current_track_url TEXT, current_track_title TEXT,
+                current_track_duration INTEGER, current_track_thumbnail TEXT,
+                is_paused INTEGER DEFAULT 0, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            INSERT INTO guild_state (guild_id) VALUES (1);
+            CREATE TABLE queue_tracks (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL,
+                position INTEGER NOT NULL, url TEXT NOT NULL, title TEXT, duration INTEGER,
+                thumbnail TEXT, added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            CREATE TABLE history_tracks (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL,
+                url TEXT NOT NULL, title TEXT, duration INTEGER, thumbnail TEXT,
+                played_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+            INSERT INTO history_tracks (guild_id, url, title, duration, thumbnail, played_at) VALUES
+                (1, 'https://soundcloud.com/a/b', 'T', 90, 'http://old', '2024-01-01 09:00:00'),
+                (1, 'https://soundcloud.com/a/b', 'SC', 100, NULL, '2024-01-01 12:00:00'),
+                (1, 'https://soundcloud.com/a/b', 'Unknown', NULL, NULL, '2024-01-01 13:00:00');
+            """
+        )
+        await conn.commit()
+
+    await init_db()
+    # Лексикографічний максимум дав би 'T'; беремо найсвіжіше відоме значення кожного поля
+    track = await MusicRepository().get_catalog_track("https://soundcloud.com/a/b")
+    assert (track["title"], track["duration"], track["thumbnail"]) == ("SC", 100, "http://old")
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from discord_music_bot.database import init_db, close_db, get_pool
+from discord_music_bot.repository import MusicRepository
+from discord_music_bot.services.write_buffer import WriteBehindBuffer
+
+
+@pytest.fixture
+async def repo(tmp_path):
+    with patch("discord_music_bot.database.DB_PATH", str(tmp_path / "buffer.db")):
+        await init_db()
+        yield MusicRepository()
+        await close_db()
+
+
+@pytest.fixture
+def mock_repo():
+    repo = AsyncMock(spec=MusicRepository)
+    repo.batch = MagicMock()
+    return repo
+
+
+@pytest.mark.asyncio
+async def test_write_coalesces_by_key(mock_repo):
+    order = []
+    mock_repo.save_guild_state.side_effect = lambda gid, **kw: order.append(("state", gid, kw["track_url"]))
+    mock_repo.add_dj_event.side_effect = lambda gid, action: order.append(("dj", gid, action))
+    buffer = WriteBehindBuffer(mock_repo, flush_interval=10)
+    buffer.write(("guild_state", 1), mock_repo.save_guild_state(1, track_url="a"))
+    buffer.append(None, mock_repo.add_dj_event(1, "comment"))
+    buffer.write(("guild_state", 1), mock_repo.save_guild_state(1, track_url="b"))
+    buffer.write(("guild_state", 2), mock_repo.save_guild_state(2, track_url="c"))
+    assert buffer.depth == 3
+    assert buffer.coalesced == 1
+
+    await buffer.close()
+    # Найновіший запис займає місце найстарішого — порядок відносно подій зберігається
+    assert order == [("state", 1, "b"), ("dj", 1, "comment"), ("state", 2, "c")]
+    assert buffer.stats()["flushed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_events_flushed_in_one_batch(mock_repo):
+    buffer = WriteBehindBuffer(mock_repo, flush_interval=0.01)
+    for i in range(20):
+        buffer.append(None, mock_repo.add_automix_feedback_event(1, "skipped", f"u{i}"))
+    await asyncio.sleep(0.05)
+    assert buffer.depth == 0
+    assert buffer.batches == 1
+    assert mock_repo.batch.call_count == 1
+    assert mock_repo.add_automix_feedback_event.await_count == 20
+
+
+@pytest.mark.asyncio
+async def test_backpressure_triggers_immediate_flush(mock_repo):
+    buffer = WriteBehindBuffer(mock_repo, flush_interval=10, max_pending=5)
+    for i in range(5):
+        buffer.append(None, mock_repo.add_dj_event(1, "comment", message=str(i)))
+    await asyncio.wait_for(buffer.backpressure(), timeout=1)
+    assert buffer.depth < 5
+    await buffer.close()
+    assert mock_repo.add_dj_event.await_count == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_write_does_not_lose_batch(repo):
+    buffer = WriteBehindBuffer(repo, flush_interval=10)
+    await repo.save_guild_state(1)
+    buffer.append(None, repo.add_dj_event(1, "comment", message="before"))
+    # Порушення FOREIGN KEY: гільдії 999 немає в guild_state
+    buffer.append(None, repo.add_history_track(999, {"url": "http://x", "title": "X"}))
+    buffer.append(None, repo.add_dj_event(1, "comment", message="after"))
+    await buffer.flush()
+
+    assert buffer.failed == 1
+    assert buffer.flushed == 2
+    pool = await get_pool()
+    async with pool.reader() as conn:
+        cur = await conn.execute("SELECT message FROM dj_events WHERE guild_id = 1 ORDER BY id")
+        assert [r[0] for r in await cur.fetchall()] == ["before", "after"]
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_and_preserves_order(repo):
+    buffer = WriteBehindBuffer(repo, flush_interval=10)
+    await repo.save_guild_state(1, voice_channel_id=10, track_url="http://a")
+    buffer.write(("guild_state", 1), repo.save_guild_state(1, voice_channel_id=10, track_url="http://b"))
+    buffer.write(("guild_state", 1), repo.clear_guild_state(1))
+    await buffer.close()
+    state = await repo.load_guild_state(1)
+    assert state["current_track_url"] is None
+    assert buffer.depth == 0
@@ -0,0 +1,85 @@
+import threading
+from unittest.mock import MagicMock, patch
+from discord_music_bot import ytdlp_config
+from discord_music_bot.profile_selector import ProfileSelector
+from discord_music_bot.ytdlp_pool import YoutubeDLPool, options_key
+
+
+def _factory():
+    """Кожен виклик YoutubeDL(...) дає окремий mock-екземпляр."""
+    return MagicMock(side_effect=lambda params: MagicMock(name=f"ydl-{params.get('format')}"))
+
+
+def test_same_options_reuse_one_instance():
+    pool = YoutubeDLPool()
+    with patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL", _factory()) as factory:
+        with pool.checkout({"format": "ba", "extractor_args": {"youtube": {"player_client": ["web"]}}}) as first:
+            pass
+        # Порядок ключів і set-и не впливають на ключ
+        with pool.checkout({"extractor_args": {"youtube": {"player_client": ["web"]}}, "format": "ba"}) as second:
+            pass
+        with pool.checkout({"format": "worst"}) as other:
+            pass
+    assert first is second
+    assert other is not first
+    assert factory.call_count == 2
+    assert options_key({"r": {"b", "a"}}) == options_key({"r": {"a", "b"}})
+    assert pool.stats() == {"keys": 2, "idle": 2, "created": 2, "reused": 1, "closed": 0}
+
+
+def test_checked_out_instance_is_exclusive_to_one_thread():
+    pool = YoutubeDLPool()
+    inside, release = threading.Barrier(2), threading.Event()
+    seen = []
+
+    def worker():
+        with pool.checkout({"format": "ba"}) as ydl:
+            seen.append(ydl)
+            inside.wait(5)
+            release.wait(5)
+
+    with patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL", _factory()):
+        threads = [threading.Thread(target=worker) for _ in range(2)]
+        for t in threads:
+            t.start()
+        release.set()
+        for t in threads:
+            t.join(5)
+    assert seen[0] is not seen[1]
+    assert pool.stats()["idle"] == 2
+
+
+def test_instances_are_recycled_and_closed():
+    pool = YoutubeDLPool(max_idle=1, max_keys=1, max_uses=2)
+    with patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL", _factory()):
+        for _ in range(2):
+            with pool.checkout({"format": "ba"}) as ydl:
+                pass
+        # Ліміт викликів вичерпано — екземпляр закрито, наступний створюється заново
+        ydl.__exit__.assert_called_once_with(None, None, None)
+        with pool.checkout({"format": "ba"}) as fresh:
+            pass
+        assert fresh is not ydl
+        # Новий набір опцій витісняє старий ключ (max_keys=1)
+        with pool.checkout({"format": "worst"}):
+            pass
+    fresh.__exit__.assert_called_once()
+    assert pool.stats()["keys"] == 1 and pool.stats()["closed"] == 2
+
+
+def test_extract_stream_url_reuses_instances_across_tracks(monkeypatch):
+    monkeypatch.setenv("YTDLP_PIPED_FIRST", "0")
+    pool = YoutubeDLPool()
+    # Одна пара (профіль, формат) гарантовано перша — усі треки йдуть з тими самими опціями
+    selector = ProfileSelector()
+    selector.load([{"profile": "guest-android", "format": "manual-pick", "successes": 1000}])
+    with patch.object(ytdlp_config, "ydl_pool", pool), \
+         patch.object(ytdlp_config, "profile_selector", selector), \
+         patch("discord_music_bot.ytdlp_pool.yt_dlp.YoutubeDL") as factory, \
+         patch.object(ytdlp_config, "get_cookies_path", return_value=None):
+        ydl = factory.return_value.__enter__.return_value
+        ydl.extract_info.return_value = {"url": "http://media"}
+        for i in range(5):
+            assert ytdlp_config.extract_stream_url(f"https://soundcloud.com/a/t{i}")[0] == "http://media"
+    assert factory.call_count == 1
+    assert ydl.extract_info.call_count == 5